@@ -0,0 +1,406 @@
+"""Admission control for expensive endpoints.
+
+Requests matching a ``Rule`` (LLM calls, scans, planners, batch jobs) pass
+three checks before they reach a route, each answered immediately rather
+than by queueing:
+
+* load shedding: while event-loop lag or Mongo connection-pool wait time is
+  above its threshold, the request gets 503 with ``Retry-After``
+* per-user rate: a token bucket per (user, rule class) of ``rate`` requests
+  per minute with ``burst`` capacity, or 429 with ``Retry-After`` (per
+  (user, path) for ``per_path`` classes such as the operator jobs)
+* per-class concurrency: at most ``concurrency`` requests of the class in
+  flight in this process, or 429
+
+A class with ``min_body`` only applies to bodies at least that large, so one
+route can be throttled as bulk work for big payloads and as interactive use
+for small ones.
+
+Buckets are kept as GCRA "theoretical arrival times" (one float per key,
+same behaviour as a token bucket), in memory by default or in the
+``rate_limits`` collection with ``RATE_LIMIT_STORE=mongo`` so that all workers
+share them. The user is taken from the ``X-User-Id`` header, a ``user_id``
+query parameter, a ``/user/{id}`` path segment or the JSON body, in that
+order, falling back to the client address.
+
+    ADMISSION_ENABLED               0 turns the middleware into a pass-through
+    ADMISSION_<CLASS>_RATE          requests per minute per user (e.g. ADMISSION_LLM_RATE=20)
+    ADMISSION_<CLASS>_BURST         bucket capacity
+    ADMISSION_<CLASS>_CONCURRENCY   in-flight cap per process
+    ADMISSION_<CLASS>_MIN_BODY      smallest body (bytes) the class applies to
+    ADMISSION_MAX_LOOP_LAG_MS       shed above this smoothed loop lag (default 250)
+    ADMISSION_MAX_POOL_WAIT_MS      shed above this smoothed pool checkout wait (default 500)
+"""
+from dataclasses import dataclass, fields, replace
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+from pymongo import monitoring
+
+from tracing import spawn
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("ADMISSION_ENABLED", "1") not in ("0", "false", "off")
+MAX_LOOP_LAG_MS = float(os.environ.get("ADMISSION_MAX_LOOP_LAG_MS", "250"))
+MAX_POOL_WAIT_MS = float(os.environ.get("ADMISSION_MAX_POOL_WAIT_MS", "500"))
+# Largest JSON body buffered to find a user_id in it
+BODY_PEEK_BYTES = 1024 * 1024
+_USER_PATH = re.compile(r"/user/([^/]+)")
+
+
+@dataclass
+class Rule:
+    name: str
+    pattern: str  # regex on "METHOD /path"
+    rate: float  # per user per minute
+    burst: int
+    concurrency: int
+    per_path: bool = False  # rate-limit each path separately
+    min_body: int = 0  # only bodies of at least this many bytes (or of unknown length) match
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern)
+
+
+DEFAULT_RULES: List[Rule] = [
+    Rule("llm", r"^POST /api/(recipes/generate|chat/message)$", rate=10, burst=5, concurrency=32),
+    Rule("scan", r"^POST /api/(products/scan|inventory/scan-receipt)(/upload)?$", rate=30, burst=10, concurrency=64),
+    Rule("plan", r"^POST /api/(meal-plans/generate|shopping-list/generate|shopping-list/[^/]+/sync)$",
+         rate=20, burst=5, concurrency=32),
+    # Large what-if batches are bulk work; a few profiles at a time is a user moving a slider
+    Rule("batch", r"^POST /api/users/targets/batch$", rate=2, burst=2, concurrency=4, min_body=16 * 1024),
+    Rule("whatif", r"^POST /api/users/targets/batch$", rate=120, burst=30, concurrency=32),
+    # Operator jobs usually carry no user id: one bucket per job and host rather than per host
+    Rule("admin", r"^POST /api/(analytics/\w+/run|users/targets/recompute)$", rate=6, burst=3, concurrency=2,
+         per_path=True),
+    Rule("export", r"^GET /api/export/.*$", rate=6, burst=3, concurrency=8),
+]
+
+
+def rules_from_env(rules: List[Rule]) -> List[Rule]:
+    configured = []
+    for rule in rules:
+        overrides = {}
+        for f in fields(Rule):
+            value = os.environ.get(f"ADMISSION_{rule.name.upper()}_{f.name.upper()}")
+            if value is not None and f.name in ("rate", "burst", "concurrency", "min_body"):
+                overrides[f.name] = float(value) if f.name == "rate" else int(value)
+        configured.append(replace(rule, **overrides))
+    return configured
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status, self.detail, self.retry_after = status, detail, retry_after
+
+
+# Token buckets (GCRA): the bucket is full again at ``tat``; each request moves it one interval on
+def _gcra(tat: Optional[float], now: float, rule: Rule) -> Tuple[Optional[float], float]:
+    """(new tat, 0) when allowed, (None, seconds to wait) when not"""
+    interval = 60.0 / rule.rate
+    tolerance = interval * (rule.burst - 1)
+    tat = max(tat or now, now)
+    if tat - now > tolerance:
+        return None, tat - now - tolerance
+    return tat + interval, 0.0
+
+
+class MemoryRateStore:
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+
+    async def hit(self, key: str, rule: Rule, now: float) -> float:
+        """0 when the request is allowed, else seconds until it would be"""
+        tat, wait = _gcra(self._tats.get(key), now, rule)
+        if tat is None:
+            return wait
+        self._tats[key] = tat
+        if len(self._tats) > self.max_keys:
+            # Buckets that have refilled carry no state
+            self._tats = {k: v for k, v in self._tats.items() if v > now}
+        return 0.0
+
+
+class MongoRateStore:
+    """Shared buckets: compare-and-set on the stored tat, so concurrent workers never double-spend"""
+
+    def __init__(self, collection, attempts: int = 5):
+        self.collection = collection
+        self.attempts = attempts
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("key", unique=True)
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def hit(self, key: str, rule: Rule, now: float) -> float:
+        for _ in range(self.attempts):
+            stored = await self.collection.find_one({"key": key}, {"_id": 0, "tat": 1})
+            tat, wait = _gcra(stored["tat"] if stored else None, now, rule)
+            if tat is None:
+                return wait
+            # For a TTL index on expires_at: the bucket is full (stateless) again by then
+            expires_at = datetime.utcnow() + timedelta(seconds=tat - now)
+            if stored is None:
+                result = await self.collection.update_one(
+                    {"key": key}, {"$setOnInsert": {"key": key, "tat": tat, "expires_at": expires_at}}, upsert=True)
+                if result.upserted_id is not None:
+                    return 0.0
+            else:
+                result = await self.collection.update_one(
+                    {"key": key, "tat": stored["tat"]}, {"$set": {"tat": tat, "expires_at": expires_at}})
+                if result.modified_count:
+                    return 0.0
+        # Heavy contention on one key: let it through rather than fail the request
+        return 0.0
+
+
+# Load signals
+class LoopLagMonitor:
+    """Smoothed event-loop lag, sampled by a background task every ``interval`` seconds"""
+
+    def __init__(self, interval: float = 0.1, alpha: float = 0.3):
+        self.interval, self.alpha = interval, alpha
+        self.lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = spawn(self._run(), "admission.loop_lag", detached=True)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max((time.perf_counter() - started - self.interval) * 1000, 0.0)
+            self.lag_ms += self.alpha * (lag - self.lag_ms)
+
+
+class PoolWaitMonitor(monitoring.ConnectionPoolListener):
+    """Smoothed time operations wait to check a connection out of the Mongo pool"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.wait_ms = 0.0
+        self._started = threading.local()  # check-out runs on the calling (executor) thread
+
+    def connection_check_out_started(self, event):
+        self._started.at = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._started, "at", None)
+        if started is not None:
+            self.wait_ms += self.alpha * ((time.perf_counter() - started) * 1000 - self.wait_ms)
+            self._started.at = None
+
+    def connection_check_out_failed(self, event):
+        self.connection_checked_out(event)
+
+    # Remaining pool events are not needed
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
+
+
+loop_lag = LoopLagMonitor()
+pool_wait = PoolWaitMonitor()
+
+
+def overloaded() -> Optional[str]:
+    if loop_lag.lag_ms > MAX_LOOP_LAG_MS:
+        return f"event loop lag {loop_lag.lag_ms:.0f} ms"
+    if pool_wait.wait_ms > MAX_POOL_WAIT_MS:
+        return f"database pool wait {pool_wait.wait_ms:.0f} ms"
+    return None
+
+
+class AdmissionController:
+    def __init__(self, rules: Optional[List[Rule]] = None, store=None):
+        self.rules = rules if rules is not None else rules_from_env(DEFAULT_RULES)
+        self.store = store or MemoryRateStore()
+        self.in_flight = {rule.name: 0 for rule in self.rules}
+        self.counts = {rule.name: {"admitted": 0, "rate_limited": 0, "over_capacity": 0, "shed": 0}
+                       for rule in self.rules}
+
+    def match(self, method: str, path: str, content_length: Optional[int] = None) -> Optional[Rule]:
+        """First rule for the request; ``content_length`` None means unknown (chunked)"""
+        target = f"{method} {path}"
+        return next((rule for rule in self.rules if rule.regex.match(target) and (
+            not rule.min_body or content_length is None or content_length >= rule.min_body)), None)
+
+    async def admit(self, rule: Rule, user_key: str) -> None:
+        """Reserve a slot for one request of ``rule``; raises ``Rejected``. Pair with ``release``."""
+        counts = self.counts[rule.name]
+        reason = overloaded()
+        if reason:
+            counts["shed"] += 1
+            raise Rejected(503, f"Server is busy ({reason}), please retry shortly", 1)
+        if self.in_flight[rule.name] >= rule.concurrency:
+            counts["over_capacity"] += 1
+            raise Rejected(429, "Too many requests of this kind in progress, please retry shortly", 1)
+        # Taken before the store round trip so that requests awaiting it count against the cap
+        self.in_flight[rule.name] += 1
+        try:
+            wait = await self.store.hit(f"{rule.name}:{user_key}", rule, time.time())
+        except Exception as e:
+            # A store outage must not take the endpoints down with it
+            logger.warning(f"Rate limit store unavailable, admitting request: {e}")
+            wait = 0.0
+        except BaseException:
+            self.release(rule)
+            raise
+        if wait > 0:
+            self.release(rule)
+            counts["rate_limited"] += 1
+            raise Rejected(429, "Rate limit exceeded", wait)
+        counts["admitted"] += 1
+
+    def release(self, rule: Rule) -> None:
+        self.in_flight[rule.name] -= 1
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loop_lag_ms": round(loop_lag.lag_ms, 1),
+            "pool_wait_ms": round(pool_wait.wait_ms, 1),
+            "classes": {rule.name: {"in_flight": self.in_flight[rule.name], "limit": rule.concurrency,
+                                    **self.counts[rule.name]} for rule in self.rules},
+        }
+
+
+# Who a request is for; also used to scope idempotency keys
+def user_from_scope(scope) -> str:
+    """User id from the ``X-User-Id`` header, a ``user_id`` query parameter or a ``/user/{id}`` path segment"""
+    user_id = dict(scope.get("headers") or []).get(b"x-user-id", b"").decode("latin-1")
+    if not user_id:
+        query = scope.get("query_string", b"").decode("latin-1")
+        user_id = next((v for k, _, v in (p.partition("=") for p in query.split("&")) if k == "user_id"), "")
+    if not user_id:
+        match = _USER_PATH.search(scope["path"])
+        user_id = match.group(1) if match else ""
+    return user_id
+
+
+def user_from_body(body: bytes) -> Optional[str]:
+    """``user_id`` (or a post's ``author_id``) of a JSON body"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    user_id = (data.get("user_id") or data.get("author_id")) if isinstance(data, dict) else None
+    return str(user_id) if user_id else None
+
+
+def client_key(scope) -> str:
+    """Fallback identity for requests that name no user"""
+    client = scope.get("client")
+    return f"ip:{client[0]}" if client else "anonymous"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying ``AdmissionController`` to matching requests"""
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+        length = dict(scope.get("headers") or []).get(b"content-length", b"")
+        rule = self.controller.match(scope["method"], scope["path"], int(length) if length.isdigit() else None)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        loop_lag.start()
+        user_key, receive = await self._user_key(scope, receive)
+        if rule.per_path:
+            user_key = f"{user_key}:{scope['path']}"
+        try:
+            await self.controller.admit(rule, user_key)
+        except Rejected as e:
+            await self._reject(send, e)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(rule)
+
+    async def _user_key(self, scope, receive):
+        headers = dict(scope.get("headers") or [])
+        user_id = user_from_scope(scope)
+        length = headers.get(b"content-length", b"")
+        if not user_id and headers.get(b"content-type", b"").startswith(b"application/json") \
+                and length.isdigit() and int(length) <= BODY_PEEK_BYTES:
+            # Read the body once and replay it to the app
+            chunks, more = [], True
+            while more:
+                message = await receive()
+                chunks.append(message.get("body", b""))
+                more = message.get("more_body", False)
+            body = b"".join(chunks)
+            user_id = user_from_body(body) or ""
+            replayed = False
+
+            async def receive_replay():
+                nonlocal replayed
+                if not replayed:
+                    replayed = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                return await receive()
+            receive = receive_replay
+        return user_id or client_key(scope), receive
+
+    @staticmethod
+    async def _reject(send, rejection: Rejected) -> None:
+        body = json.dumps({"detail": rejection.detail}).encode("utf-8")
+        await send({"type": "http.response.start", "status": rejection.status, "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(rejection.retry_after))).encode("latin-1")),
+        ]})
+        await send({"type": "http.response.body", "body": body})
+
+
+def build_store(db=None):
+    """Rate store from ``RATE_LIMIT_STORE`` (memory, or mongo with ``db``)"""
+    if os.environ.get("RATE_LIMIT_STORE", "memory").lower() == "mongo" and db is not None:
+        return MongoRateStore(db.rate_limits)
+    return MemoryRateStore()
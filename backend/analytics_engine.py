@@ -0,0 +1,224 @@
+"""Population-level nutrition analytics computed with NumPy/pandas.
+
+``AnalyticsService.calculate_nutrition_summary`` handles one user at a time
+with Python loops over dicts. ``CohortAnalyticsEngine`` instead streams
+profiles and recent products in columnar chunks, reduces each chunk to
+per-user partial sums with a vectorized ``groupby``, and derives grouped
+reports (by goal, BMR band, dietary preference and activity level) plus
+weekly cohort trends. Results are stored in the ``analytics_reports``
+collection. Days whose products were compacted (see lifecycle.py) are read
+from their per (user, day) rollups instead.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+import asyncio
+import logging
+import time
+import uuid
+
+import numpy as np
+
+from lazy_imports import ensure_loaded, lazy_import
+
+# Loaded on the first report, not when the API imports this module
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+REPORT_TYPE = "cohort_nutrition"
+
+MACRO_FIELDS = ["calories", "protein", "carbs", "fat", "fiber", "sugar"]
+PRODUCT_PROJECTION = {"_id": 0, "scanned_by": 1, "created_at": 1, **{name: 1 for name in MACRO_FIELDS}}
+ROLLUP_PROJECTION = {"_id": 0, "user_id": 1, "day": 1, **{name: 1 for name in MACRO_FIELDS}, "products": 1}
+PROFILE_PROJECTION = {"_id": 0, "id": 1, "goals": 1, "dietary_preferences": 1, "activity_level": 1, "bmr": 1}
+
+BMR_BAND_EDGES = [0, 1500, 2000, 2500, 3000, np.inf]
+BMR_BAND_LABELS = ["<1500", "1500-2000", "2000-2500", "2500-3000", "3000+"]
+
+# Energy per gram, used for macro distribution
+KCAL_PER_GRAM = {"protein": 4, "carbs": 4, "fat": 9}
+
+NO_VALUE = "none"
+
+
+def _clean(value: Any) -> Any:
+    """Make NumPy scalars JSON/BSON friendly"""
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else round(float(value), 2)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def _records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [{k: _clean(v) for k, v in row.items()} for row in frame.to_dict("records")]
+
+
+class CohortAnalyticsEngine:
+    def __init__(self, db, batch_size: int = 50_000):
+        self.db = db
+        self.batch_size = batch_size
+
+    # The pandas work of each step runs in a worker thread (asyncio.to_thread), so a
+    # report requested through the API doesn't stall the event loop between reads
+    async def load_profiles(self) -> pd.DataFrame:
+        await asyncio.to_thread(ensure_loaded, pd)
+        frames = []
+        async for batch in self.db.iter_batches("user_profiles", {}, PROFILE_PROJECTION, self.batch_size):
+            frames.append(await asyncio.to_thread(pd.DataFrame.from_records, batch,
+                                                  columns=list(PROFILE_PROJECTION)[1:]))
+        return await asyncio.to_thread(self.prepare_profiles, frames)
+
+    @staticmethod
+    def prepare_profiles(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        if not frames:
+            return pd.DataFrame(columns=list(PROFILE_PROJECTION)[1:]).set_index("id")
+
+        profiles = pd.concat(frames, ignore_index=True).drop_duplicates("id").set_index("id")
+        profiles["bmr"] = pd.to_numeric(profiles["bmr"], errors="coerce")
+        profiles["activity_level"] = profiles["activity_level"].fillna("moderate")
+        for column in ("goals", "dietary_preferences"):
+            profiles[column] = profiles[column].apply(lambda v: v if isinstance(v, list) and v else [NO_VALUE])
+        profiles["primary_goal"] = profiles["goals"].str[0]
+        profiles["bmr_band"] = pd.cut(profiles["bmr"], BMR_BAND_EDGES, labels=BMR_BAND_LABELS, right=False)
+        profiles["bmr_band"] = profiles["bmr_band"].astype(object).where(profiles["bmr"].notna(), NO_VALUE)
+        return profiles
+
+    async def aggregate_products(self, since: datetime, profiles: pd.DataFrame):
+        """Per-user macro sums and weekly (week, goal) trend sums over products since ``since``"""
+        goal_by_user = profiles["primary_goal"]
+        user_parts: List[pd.DataFrame] = []
+        trend_parts: List[pd.DataFrame] = []
+
+        compacted_before = await self.db.get_compacted_before("products")
+        if compacted_before and compacted_before > since:
+            # Whole days only: a rollup starting before ``since`` is left out
+            async for batch in self.db.iter_batches("product_rollups", {"day": {"$gte": since, "$lt": compacted_before}},
+                                                    ROLLUP_PROJECTION, self.batch_size):
+                per_user, trend = await asyncio.to_thread(self.reduce_rollups, batch, goal_by_user)
+                user_parts.append(per_user)
+                trend_parts.append(trend)
+            # Products left over from an interrupted compaction are already in the rollups
+            since = compacted_before
+
+        async for batch in self.db.iter_batches("products", {"created_at": {"$gte": since}},
+                                                PRODUCT_PROJECTION, self.batch_size):
+            per_user, trend = await asyncio.to_thread(self.reduce_products, batch, goal_by_user)
+            user_parts.append(per_user)
+            trend_parts.append(trend)
+
+        return await asyncio.to_thread(self.combine, user_parts, trend_parts)
+
+    @staticmethod
+    def reduce_rollups(batch: List[dict], goal_by_user: pd.Series) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        chunk = pd.DataFrame.from_records(batch, columns=list(ROLLUP_PROJECTION)[1:])
+        per_user = chunk.groupby("user_id", sort=False)[[*MACRO_FIELDS, "products"]].sum()
+        chunk["week"] = pd.to_datetime(chunk["day"]).dt.to_period("W").dt.start_time
+        chunk["goal"] = chunk["user_id"].map(goal_by_user).fillna(NO_VALUE)
+        trend = chunk.groupby(["week", "goal"], sort=False).agg(sum=("calories", "sum"), count=("products", "sum"))
+        return per_user, trend
+
+    @staticmethod
+    def reduce_products(batch: List[dict], goal_by_user: pd.Series) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        chunk = pd.DataFrame.from_records(batch, columns=["scanned_by", "created_at", *MACRO_FIELDS])
+        chunk[MACRO_FIELDS] = chunk[MACRO_FIELDS].apply(pd.to_numeric, errors="coerce").fillna(0.0).astype(np.float64)
+
+        per_user = chunk.groupby("scanned_by", sort=False)[MACRO_FIELDS].sum()
+        per_user["products"] = chunk.groupby("scanned_by", sort=False).size()
+
+        # created_at values are mostly unique, so skip pandas' conversion cache
+        created = pd.to_datetime(chunk["created_at"], cache=False)
+        chunk["week"] = created.dt.to_period("W").dt.start_time
+        chunk["goal"] = chunk["scanned_by"].map(goal_by_user).fillna(NO_VALUE)
+        trend = chunk.groupby(["week", "goal"], sort=False)["calories"].agg(["sum", "count"])
+        return per_user, trend
+
+    @staticmethod
+    def combine(user_parts: List[pd.DataFrame], trend_parts: List[pd.DataFrame]):
+        if user_parts:
+            users = pd.concat(user_parts).groupby(level=0).sum()
+        else:
+            users = pd.DataFrame(columns=[*MACRO_FIELDS, "products"])
+        trends = pd.concat(trend_parts).groupby(level=[0, 1]).sum() if trend_parts else None
+        return users, trends
+
+    @staticmethod
+    def per_user_metrics(users: pd.DataFrame, profiles: pd.DataFrame, days: int) -> pd.DataFrame:
+        metrics = profiles.join(users, how="left")
+        metrics["products"] = metrics["products"].fillna(0)
+        active = metrics["products"] > 0
+        metrics["active"] = active
+        counts = metrics["products"].where(active)
+        for macro in ("protein", "carbs", "fat"):
+            metrics[f"avg_{macro}"] = metrics[macro] / counts
+        metrics["daily_calories"] = (metrics["calories"] / days).where(active)
+        metrics["calorie_target_ratio"] = metrics["daily_calories"] / metrics["bmr"]
+
+        energy = sum(metrics[f"avg_{m}"] * k for m, k in KCAL_PER_GRAM.items())
+        for macro, kcal in KCAL_PER_GRAM.items():
+            metrics[f"{macro}_energy_pct"] = metrics[f"avg_{macro}"] * kcal / energy.replace(0, np.nan) * 100
+        return metrics
+
+    @staticmethod
+    def grouped(metrics: pd.DataFrame, dimension: str) -> List[Dict[str, Any]]:
+        frame = metrics.explode(dimension) if metrics[dimension].map(type).eq(list).any() else metrics
+        grouped = frame.groupby(dimension, observed=True)
+        result = pd.DataFrame({
+            "users": grouped.size(),
+            "active_users": grouped["active"].sum(),
+            "mean_daily_calories": grouped["daily_calories"].mean(),
+            "median_daily_calories": grouped["daily_calories"].median(),
+            "p90_daily_calories": grouped["daily_calories"].quantile(0.9),
+            "mean_calorie_target_ratio": grouped["calorie_target_ratio"].mean(),
+            "avg_protein": grouped["avg_protein"].mean(),
+            "avg_carbs": grouped["avg_carbs"].mean(),
+            "avg_fat": grouped["avg_fat"].mean(),
+            "protein_energy_pct": grouped["protein_energy_pct"].mean(),
+            "carbs_energy_pct": grouped["carbs_energy_pct"].mean(),
+            "fat_energy_pct": grouped["fat_energy_pct"].mean(),
+        })
+        result.index.name = "group"
+        return _records(result.reset_index())
+
+    async def run(self, days: int = 30, persist: bool = True) -> Dict[str, Any]:
+        started = time.perf_counter()
+        since = datetime.utcnow() - timedelta(days=days)
+
+        profiles = await self.load_profiles()
+        users, trends = await self.aggregate_products(since, profiles)
+        report = await asyncio.to_thread(self.build_report, profiles, users, trends, days)
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        if persist:
+            await self.db.save_analytics_report(report)
+        logger.info(f"Cohort analytics over {report['users']} users finished in {report['duration_ms']}ms")
+        return report
+
+    def build_report(self, profiles: pd.DataFrame, users: pd.DataFrame, trends, days: int) -> Dict[str, Any]:
+        metrics = self.per_user_metrics(users, profiles, days)
+
+        trend_records: List[Dict[str, Any]] = []
+        if trends is not None:
+            trends = trends.reset_index()
+            trends["avg_calories_per_product"] = trends["sum"] / trends["count"]
+            trends = trends.rename(columns={"sum": "total_calories", "count": "products"})
+            trends["week"] = trends["week"].dt.to_pydatetime()
+            trend_records = _records(trends.sort_values(["week", "goal"]))
+
+        return {
+            "id": str(uuid.uuid4()),
+            "report_type": REPORT_TYPE,
+            "generated_at": datetime.utcnow(),
+            "period_days": days,
+            "users": int(len(profiles)),
+            "active_users": int(metrics["active"].sum()) if len(metrics) else 0,
+            "groups": {
+                "goal": self.grouped(metrics, "goals"),
+                "bmr_band": self.grouped(metrics, "bmr_band"),
+                "dietary_preference": self.grouped(metrics, "dietary_preferences"),
+                "activity_level": self.grouped(metrics, "activity_level"),
+            } if len(metrics) else {},
+            "weekly_trends": trend_records,
+        }
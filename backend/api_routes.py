@@ -1,20 +1,56 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from models import *
 from database import Database
-from services import MockAPIService, NotificationService, AnalyticsService
+from services import NotificationService, AnalyticsService
+from serialization import fast_list_response
+import nutrition
+import meal_planner
+import shopping
+import receipts
+import images
+import providers
+import admission
+import catalogue
+import conditional
+import realtime
+import insights
+import dashboard
+from loaders import Loaders
+from analytics_engine import CohortAnalyticsEngine, REPORT_TYPE as COHORT_REPORT_TYPE
+from export import ExportError, MEDIA_TYPES, export_filename, stream_export, validate_request as validate_export
+import serialization
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from datetime import datetime
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Database dependency
+# Database dependency: one client per process, so requests share its connection pool
+# instead of each opening (and never closing) a client of their own
+_client: Optional[AsyncIOMotorClient] = None
+
+def get_client() -> AsyncIOMotorClient:
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=[admission.pool_wait])
+    return _client
+
+def close_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
 async def get_database() -> Database:
-    mongo_url = os.environ['MONGO_URL']
-    client = AsyncIOMotorClient(mongo_url)
-    db_name = os.environ.get('DB_NAME', 'nutritionist_app')
-    return Database(client, db_name)
+    return Database(get_client(), os.environ.get('DB_NAME', 'nutritionist_app'))
+
+# Per-request batching of lookups by id (see loaders.py)
+async def get_loaders(db: Database = Depends(get_database)) -> Loaders:
+    return Loaders(db)
 
 router = APIRouter()
 
@@ -37,7 +73,7 @@ async def create_user_profile(
         
         for achievement_data in default_achievements:
             achievement = Achievement(user_id=profile.id, **achievement_data)
-            await db.achievements.insert_one(achievement.dict())
+            await db.achievements.insert_one(achievement.model_dump())
         
         return profile
     except Exception as e:
@@ -47,11 +83,24 @@ async def create_user_profile(
 @router.get("/users/profile/{profile_id}", response_model=UserProfile)
 async def get_user_profile(
     profile_id: str,
+    request: Request,
+    response: Response,
     db: Database = Depends(get_database)
 ):
+    if conditional.is_conditional(request):
+        # Check the client's copy against updated_at alone before loading the profile
+        version = await db.get_user_profile_version(profile_id)
+        if not version:
+            raise HTTPException(status_code=404, detail="User profile not found")
+        if version.get("updated_at"):
+            etag = conditional.etag_for_timestamp(version["updated_at"])
+            if conditional.is_not_modified(request, etag, version["updated_at"]):
+                return conditional.not_modified(etag, version["updated_at"])
     profile = await db.get_user_profile(profile_id)
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
+    response.headers.update(conditional.validator_headers(
+        conditional.etag_for_timestamp(profile.updated_at), profile.updated_at))
     return profile
 
 @router.put("/users/profile/{profile_id}", response_model=UserProfile)
@@ -65,6 +114,23 @@ async def update_user_profile(
         raise HTTPException(status_code=404, detail="User profile not found")
     return profile
 
+# Nutrient target endpoints
+@router.post("/users/targets/batch", response_model=List[Optional[NutrientTargets]])
+async def calculate_targets_batch(request: TargetsBatchRequest):
+    """What-if targets for up to 1000 hypothetical profiles; null where inputs are incomplete"""
+    return nutrition.targets_for([profile.model_dump() for profile in request.profiles])
+
+@router.post("/users/targets/recompute")
+async def recompute_targets(
+    force: bool = False,
+    db: Database = Depends(get_database)
+):
+    try:
+        return await db.recompute_targets(force=force)
+    except Exception as e:
+        logger.error(f"Error recomputing nutrient targets: {e}")
+        raise HTTPException(status_code=500, detail="Failed to recompute nutrient targets")
+
 # User Settings endpoints
 @router.post("/users/{user_id}/settings", response_model=UserSettings)
 async def create_user_settings(
@@ -82,11 +148,23 @@ async def create_user_settings(
 @router.get("/users/{user_id}/settings", response_model=UserSettings)
 async def get_user_settings(
     user_id: str,
+    request: Request,
+    response: Response,
     db: Database = Depends(get_database)
 ):
+    if conditional.is_conditional(request):
+        version = await db.get_user_settings_version(user_id)
+        if not version:
+            raise HTTPException(status_code=404, detail="User settings not found")
+        if version.get("updated_at"):
+            etag = conditional.etag_for_timestamp(version["updated_at"])
+            if conditional.is_not_modified(request, etag, version["updated_at"]):
+                return conditional.not_modified(etag, version["updated_at"])
     settings = await db.get_user_settings(user_id)
     if not settings:
         raise HTTPException(status_code=404, detail="User settings not found")
+    response.headers.update(conditional.validator_headers(
+        conditional.etag_for_timestamp(settings.updated_at), settings.updated_at))
     return settings
 
 @router.put("/users/{user_id}/settings", response_model=UserSettings)
@@ -100,46 +178,139 @@ async def update_user_settings(
         raise HTTPException(status_code=404, detail="User settings not found")
     return settings
 
+# Dashboard endpoints: the home screen's reads in one request
+@router.get("/users/{user_id}/dashboard")
+async def get_user_dashboard(
+    user_id: str,
+    sections: Optional[str] = None,
+    days: int = 7,
+    products_limit: int = Query(20, ge=1, le=dashboard.PRODUCT_HISTORY),
+    db: Database = Depends(get_database)
+):
+    """Requested ``sections`` (default all) read concurrently; failed sections are listed under ``errors``"""
+    try:
+        requested = dashboard.parse_sections(sections)
+    except dashboard.DashboardError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await dashboard.build(db, user_id, requested, days, products_limit)
+    if len(result["errors"]) == len(requested):
+        raise HTTPException(status_code=500, detail="Failed to get dashboard")
+    return result
+
 # Product scanning endpoints
+def _provider_unavailable(error: Exception) -> HTTPException:
+    logger.warning(f"External provider unavailable: {error}")
+    return HTTPException(status_code=503, detail="The service is temporarily unavailable, please retry shortly",
+                         headers={"Retry-After": "5"})
+
+async def _save_scanned_product(db: Database, user_id: str, image_base64: Optional[str],
+                                barcode: Optional[str]) -> Dict[str, Any]:
+    # Barcode-only scans of a catalogued product need no provider call
+    known = catalogue.lookup(barcode) if not image_base64 else None
+    result: Dict[str, Any]
+    if known:
+        result = {"success": True, "product": known}
+    else:
+        # Use mock service for now
+        result = await providers.get_provider().scan_product(image_base64, barcode)
+
+    if result["success"]:
+        # Save scanned product to database
+        product_data = result["product"]
+        product_data["scanned_by"] = user_id
+
+        # Convert expiry_date string to datetime if present
+        if "expiry_date" in product_data and product_data["expiry_date"]:
+            product_data["expiry_date"] = datetime.fromisoformat(product_data["expiry_date"].replace("Z", "+00:00"))
+
+        product = await db.create_product(product_data)
+
+        return {"success": True, "product": product.model_dump()}
+    else:
+        raise HTTPException(status_code=400, detail="Failed to scan product")
+
 @router.post("/products/scan", response_model=Dict[str, Any])
 async def scan_product(
     scan_request: ProductScanRequest,
     db: Database = Depends(get_database)
 ):
     try:
-        # Use mock service for now
-        result = await MockAPIService.scan_product(
-            scan_request.image_base64, 
-            scan_request.barcode
-        )
-        
-        if result["success"]:
-            # Save scanned product to database
-            product_data = result["product"]
-            product_data["scanned_by"] = scan_request.user_id
-            
-            # Convert expiry_date string to datetime if present
-            if "expiry_date" in product_data and product_data["expiry_date"]:
-                product_data["expiry_date"] = datetime.fromisoformat(product_data["expiry_date"].replace("Z", "+00:00"))
-            
-            product = await db.create_product(product_data)
-            
-            return {"success": True, "product": product.dict()}
-        else:
-            raise HTTPException(status_code=400, detail="Failed to scan product")
-            
+        image_base64 = scan_request.image_base64
+        if image_base64:
+            # Large images are decoded and downscaled in the image worker pool
+            image_base64 = (await images.process_base64_async(image_base64)).image_base64
+        return await _save_scanned_product(db, scan_request.user_id, image_base64, scan_request.barcode)
+    except images.UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except providers.ProviderUnavailableError as e:
+        raise _provider_unavailable(e)
     except Exception as e:
         logger.error(f"Error scanning product: {e}")
         raise HTTPException(status_code=500, detail="Failed to scan product")
 
+async def _receive_scan_upload(request: Request, user_id: Optional[str]) -> Tuple[images.Upload, str]:
+    """Image body of a multipart (any file part) or raw upload, and the user it belongs to"""
+    try:
+        upload = await images.receive_upload(request)
+    except images.UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except images.UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    user_id = user_id or upload.fields.get("user_id")
+    if not user_id:
+        images.discard(upload)
+        raise HTTPException(status_code=422, detail="user_id is required")
+    return upload, user_id
+
+@router.post("/products/scan/upload", response_model=Dict[str, Any])
+async def upload_product_scan(
+    request: Request,
+    user_id: Optional[str] = None,
+    barcode: Optional[str] = None,
+    db: Database = Depends(get_database)
+):
+    upload, user_id = await _receive_scan_upload(request, user_id)
+    try:
+        image = await images.process_upload(upload)
+        result = await _save_scanned_product(db, user_id, image.image_base64, barcode or upload.fields.get("barcode"))
+        return {**result, "image": images.describe(image)}
+    except providers.ProviderUnavailableError as e:
+        raise _provider_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error scanning uploaded product image: {e}")
+        raise HTTPException(status_code=500, detail="Failed to scan product")
+
+@router.post("/products/batch", response_model=List[Optional[Product]])
+async def get_products_batch(
+    request: IdsBatchRequest,
+    db: Database = Depends(get_database)
+):
+    """Products by id, in request order; null for unknown ids"""
+    try:
+        return await db.get_products(request.ids)
+    except Exception as e:
+        logger.error(f"Error getting products by id: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get products")
+
 @router.get("/products/user/{user_id}", response_model=List[Product])
 async def get_user_products(
     user_id: str,
+    request: Request,
+    response: Response,
     limit: int = 100,
     db: Database = Depends(get_database)
 ):
     try:
+        if conditional.is_conditional(request):
+            etag = conditional.etag_for_ids(await db.get_product_ids_by_user(user_id, limit))
+            if conditional.is_not_modified(request, etag):
+                return conditional.not_modified(etag)
+        if serialization.FAST_RESPONSES:
+            documents = await db.get_products_by_user(user_id, limit, raw=True)
+            return conditional.with_validators(fast_list_response(documents),
+                                               conditional.etag_for_ids(d["id"] for d in documents))
         products = await db.get_products_by_user(user_id, limit)
+        response.headers.update(conditional.validator_headers(conditional.etag_for_ids(p.id for p in products)))
         return products
     except Exception as e:
         logger.error(f"Error getting user products: {e}")
@@ -158,7 +329,7 @@ async def generate_recipes(
             "dietary_restrictions": recipe_request.dietary_restrictions
         }
         
-        result = await MockAPIService.generate_recipes(
+        result = await providers.get_provider().generate_recipes(
             recipe_request.ingredients, 
             preferences
         )
@@ -169,12 +340,14 @@ async def generate_recipes(
             for recipe_data in result["recipes"]:
                 recipe_data["created_by"] = recipe_request.user_id
                 recipe = await db.create_recipe(recipe_data)
-                saved_recipes.append(recipe.dict())
+                saved_recipes.append(recipe.model_dump())
             
             return {"success": True, "recipes": saved_recipes}
         else:
             raise HTTPException(status_code=400, detail="Failed to generate recipes")
             
+    except providers.ProviderUnavailableError as e:
+        raise _provider_unavailable(e)
     except Exception as e:
         logger.error(f"Error generating recipes: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate recipes")
@@ -182,16 +355,108 @@ async def generate_recipes(
 @router.get("/recipes/user/{user_id}", response_model=List[Recipe])
 async def get_user_recipes(
     user_id: str,
+    request: Request,
+    response: Response,
     limit: int = 50,
     db: Database = Depends(get_database)
 ):
     try:
+        if conditional.is_conditional(request):
+            etag = conditional.etag_for_ids(await db.get_recipe_ids_by_user(user_id, limit))
+            if conditional.is_not_modified(request, etag):
+                return conditional.not_modified(etag)
+        if serialization.FAST_RESPONSES:
+            documents = await db.get_recipes_by_user(user_id, limit, raw=True)
+            return conditional.with_validators(fast_list_response(documents),
+                                               conditional.etag_for_ids(d["id"] for d in documents))
         recipes = await db.get_recipes_by_user(user_id, limit)
+        response.headers.update(conditional.validator_headers(conditional.etag_for_ids(r.id for r in recipes)))
         return recipes
     except Exception as e:
         logger.error(f"Error getting user recipes: {e}")
         raise HTTPException(status_code=500, detail="Failed to get user recipes")
 
+@router.post("/recipes/batch", response_model=List[Optional[Recipe]])
+async def get_recipes_batch(
+    request: IdsBatchRequest,
+    db: Database = Depends(get_database)
+):
+    """Recipes by id, in request order; null for unknown ids"""
+    try:
+        return await db.get_recipes(request.ids)
+    except Exception as e:
+        logger.error(f"Error getting recipes by id: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get recipes")
+
+@router.get("/recipes/{recipe_id}", response_model=Recipe)
+async def get_recipe(
+    recipe_id: str,
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database)
+):
+    # Recipes are never edited once generated, so clients may keep them indefinitely
+    etag = conditional.etag_for_ids([recipe_id])
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag, cache_control=conditional.IMMUTABLE)
+    recipe = await db.get_recipe(recipe_id)
+    if not recipe:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    response.headers.update(conditional.validator_headers(etag, recipe.created_at, conditional.IMMUTABLE))
+    return recipe
+
+# Meal plan endpoints
+@router.post("/meal-plans/generate", response_model=MealPlan)
+async def generate_meal_plan(
+    plan_request: MealPlanRequest,
+    db: Database = Depends(get_database)
+):
+    profile = await db.get_user_profile(plan_request.user_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="User profile not found")
+    try:
+        plan = await meal_planner.generate_plan(
+            db,
+            profile.model_dump(),
+            days=plan_request.days,
+            meals_per_day=plan_request.meals_per_day,
+            calorie_target=plan_request.calorie_target,
+            use_inventory=plan_request.use_inventory
+        )
+        return await db.save_meal_plan(plan)
+    except meal_planner.MealPlanError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating meal plan: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate meal plan")
+
+@router.get("/meal-plans/{plan_id}", response_model=Dict[str, Any])
+async def get_meal_plan(
+    plan_id: str,
+    include_recipes: bool = False,
+    db: Database = Depends(get_database),
+    loaders: Loaders = Depends(get_loaders)
+):
+    """A stored plan; with ``include_recipes`` each meal also carries its full ``recipe``"""
+    plan = await db.get_meal_plan(plan_id)
+    if not plan:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+    if not include_recipes:
+        return plan
+    try:
+        async def with_recipe(meal: dict) -> dict:
+            return {**meal, "recipe": await loaders.recipes.load(meal["recipe_id"])}
+
+        async def with_recipes(day: dict) -> dict:
+            return {**day, "meals": list(await asyncio.gather(*(with_recipe(meal) for meal in day["meals"])))}
+
+        # The loads of every meal are issued in the same tick, so they become one recipes query
+        days = await asyncio.gather(*(with_recipes(day) for day in plan["days"]))
+        return {**plan, "days": list(days)}
+    except Exception as e:
+        logger.error(f"Error getting meal plan recipes: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get meal plan recipes")
+
 # Shopping list endpoints
 @router.post("/shopping-list", response_model=ShoppingList)
 async def create_shopping_list(
@@ -232,6 +497,79 @@ async def update_shopping_list(
         logger.error(f"Error updating shopping list: {e}")
         raise HTTPException(status_code=500, detail="Failed to update shopping list")
 
+@router.post("/shopping-list/generate", response_model=ShoppingList)
+async def generate_shopping_list(
+    generate_request: ShoppingListGenerateRequest,
+    db: Database = Depends(get_database)
+):
+    try:
+        return await shopping.generate_list(
+            db,
+            generate_request.user_id,
+            meal_plan_id=generate_request.meal_plan_id,
+            recipe_ids=generate_request.recipe_ids
+        )
+    except shopping.ShoppingListError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating shopping list: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate shopping list")
+
+@router.post("/shopping-list/{list_id}/sync")
+async def sync_shopping_list(
+    list_id: str,
+    db: Database = Depends(get_database)
+):
+    """Re-net a generated list against the current inventory with per-item updates"""
+    try:
+        stored, diff = await shopping.sync_list(db, list_id)
+    except shopping.ShoppingListError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    return {
+        "updated": len(diff.updates),
+        "added": len(diff.additions),
+        "removed": len(diff.removals),
+        "shopping_list": stored
+    }
+
+@router.post("/shopping-list/{list_id}/items", response_model=ShoppingItem)
+async def add_shopping_item(
+    list_id: str,
+    item_data: ShoppingItemCreate,
+    db: Database = Depends(get_database)
+):
+    try:
+        item = await shopping.add_item(db, list_id, ShoppingItem(**item_data.model_dump()))
+    except shopping.ShoppingListError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not item:
+        raise HTTPException(status_code=404, detail="Shopping list not found")
+    return item
+
+@router.patch("/shopping-list/{list_id}/items/{item_id}", response_model=ShoppingItem)
+async def update_shopping_item(
+    list_id: str,
+    item_id: str,
+    update_data: ShoppingItemUpdate,
+    db: Database = Depends(get_database)
+):
+    item = await db.update_shopping_item(list_id, item_id, update_data)
+    if not item:
+        raise HTTPException(status_code=404, detail="Shopping list item not found")
+    return item
+
+@router.delete("/shopping-list/{list_id}/items/{item_id}")
+async def remove_shopping_item(
+    list_id: str,
+    item_id: str,
+    db: Database = Depends(get_database)
+):
+    if not await db.remove_shopping_item(list_id, item_id):
+        raise HTTPException(status_code=404, detail="Shopping list item not found")
+    return {"success": True}
+
 # Inventory endpoints
 @router.post("/inventory", response_model=InventoryItem)
 async def create_inventory_item(
@@ -251,6 +589,8 @@ async def get_user_inventory(
     db: Database = Depends(get_database)
 ):
     try:
+        if serialization.FAST_RESPONSES:
+            return fast_list_response(await db.get_user_inventory(user_id, raw=True))
         inventory = await db.get_user_inventory(user_id)
         return inventory
     except Exception as e:
@@ -292,29 +632,39 @@ async def scan_receipt(
     db: Database = Depends(get_database)
 ):
     try:
-        result = await MockAPIService.scan_receipt(scan_request.image_base64)
-        
-        if result["success"]:
-            # Add scanned items to inventory
-            for item_data in result["items"]:
-                inventory_item = InventoryItemCreate(
-                    user_id=scan_request.user_id,
-                    name=item_data["name"],
-                    quantity=item_data["quantity"],
-                    unit="pieces",
-                    expiry=datetime.utcnow() + timedelta(days=7),  # Default 7 days
-                    category="Produce",  # Default category
-                    added_from_receipt=True
-                )
-                await db.create_inventory_item(inventory_item)
-            
-            return ReceiptScanResponse(**result)
-        else:
-            raise HTTPException(status_code=400, detail="Failed to scan receipt")
-            
+        result = await receipts.ingest_receipt(db, scan_request.user_id, scan_request.image_base64)
+    except images.UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except receipts.ReceiptInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except receipts.ReceiptScanError:
+        raise HTTPException(status_code=400, detail="Failed to scan receipt")
+    except providers.ProviderUnavailableError as e:
+        raise _provider_unavailable(e)
     except Exception as e:
         logger.error(f"Error scanning receipt: {e}")
         raise HTTPException(status_code=500, detail="Failed to scan receipt")
+    return ReceiptScanResponse(**result)
+
+@router.post("/inventory/scan-receipt/upload", response_model=ReceiptScanResponse)
+async def upload_receipt_scan(
+    request: Request,
+    user_id: Optional[str] = None,
+    db: Database = Depends(get_database)
+):
+    upload, user_id = await _receive_scan_upload(request, user_id)
+    try:
+        result = await receipts.ingest_image(db, user_id, await images.process_upload(upload))
+    except receipts.ReceiptInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except receipts.ReceiptScanError:
+        raise HTTPException(status_code=400, detail="Failed to scan receipt")
+    except providers.ProviderUnavailableError as e:
+        raise _provider_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error scanning uploaded receipt: {e}")
+        raise HTTPException(status_code=500, detail="Failed to scan receipt")
+    return ReceiptScanResponse(**result)
 
 @router.get("/inventory/user/{user_id}/alerts")
 async def get_inventory_alerts(
@@ -323,7 +673,7 @@ async def get_inventory_alerts(
 ):
     try:
         inventory = await db.get_user_inventory(user_id)
-        inventory_dicts = [item.dict() for item in inventory]
+        inventory_dicts = [item.model_dump() for item in inventory]
         
         expiring_items = await NotificationService.check_expiring_items(inventory_dicts)
         low_stock_items = await NotificationService.check_low_stock(inventory_dicts)
@@ -348,9 +698,9 @@ async def send_chat_message(
         
         # Get AI response
         user_profile = await db.get_user_profile(message_data.user_id)
-        profile_dict = user_profile.dict() if user_profile else None
+        profile_dict = user_profile.model_dump() if user_profile else None
         
-        ai_response_text = await MockAPIService.get_ai_response(
+        ai_response_text = await providers.get_provider().get_ai_response(
             message_data.message, 
             profile_dict
         )
@@ -364,6 +714,8 @@ async def send_chat_message(
         ai_message = await db.create_chat_message(ai_message_data, MessageType.AI)
         
         return ai_message
+    except providers.ProviderUnavailableError as e:
+        raise _provider_unavailable(e)
     except Exception as e:
         logger.error(f"Error sending chat message: {e}")
         raise HTTPException(status_code=500, detail="Failed to send chat message")
@@ -376,12 +728,35 @@ async def get_chat_history(
     db: Database = Depends(get_database)
 ):
     try:
+        if serialization.FAST_RESPONSES:
+            return fast_list_response(await db.get_chat_history(user_id, session_id, limit, raw=True))
         messages = await db.get_chat_history(user_id, session_id, limit)
         return messages
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
         raise HTTPException(status_code=500, detail="Failed to get chat history")
 
+# Real-time events
+@router.get("/events/stream")
+async def stream_events(
+    user_id: Optional[str] = None,
+    topics: str = "inventory,shopping,community"
+):
+    """Server-Sent Events for the given topics; see realtime.py for the event format"""
+    requested = [topic.strip() for topic in topics.split(",") if topic.strip()]
+    unknown = set(requested) - realtime.TOPICS
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(sorted(unknown)) or 'none given'}")
+    if not user_id and realtime.USER_TOPICS.intersection(requested):
+        raise HTTPException(status_code=422, detail="user_id is required for inventory and shopping events")
+    if realtime.hub.full():
+        raise HTTPException(status_code=503, detail="Too many open event streams", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        realtime.event_stream(realtime.hub, requested, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Community endpoints
 @router.post("/community/posts", response_model=CommunityPost)
 async def create_community_post(
@@ -402,6 +777,8 @@ async def get_community_posts(
     db: Database = Depends(get_database)
 ):
     try:
+        if serialization.FAST_RESPONSES:
+            return fast_list_response(await db.get_community_posts(limit, tag_filter, raw=True))
         posts = await db.get_community_posts(limit, tag_filter)
         return posts
     except Exception as e:
@@ -434,8 +811,8 @@ async def get_user_analytics(
         user_profile = await db.get_user_profile(user_id)
         user_products = await db.get_products_by_user(user_id)
         
-        profile_dict = user_profile.dict() if user_profile else {}
-        products_dict = [product.dict() for product in user_products]
+        profile_dict = user_profile.model_dump() if user_profile else {}
+        products_dict = [product.model_dump() for product in user_products]
         
         nutrition_summary = await AnalyticsService.calculate_nutrition_summary(products_dict, days)
         insights = await AnalyticsService.generate_insights(profile_dict, nutrition_summary)
@@ -447,4 +824,66 @@ async def get_user_analytics(
         }
     except Exception as e:
         logger.error(f"Error getting user analytics: {e}")
-        raise HTTPException(status_code=500, detail="Failed to get user analytics")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to get user analytics")
+
+@router.post("/analytics/insights/run")
+async def run_insight_job(
+    days: int = 7,
+    db: Database = Depends(get_database)
+):
+    try:
+        return await insights.run_insight_job(db, days)
+    except Exception as e:
+        logger.error(f"Error running insight job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to run insight job")
+
+@router.get("/analytics/user/{user_id}/insights")
+async def get_stored_insights(
+    user_id: str,
+    db: Database = Depends(get_database)
+):
+    stored = await db.get_user_insights(user_id)
+    if not stored:
+        raise HTTPException(status_code=404, detail="No insights generated for this user yet")
+    return stored
+
+@router.post("/analytics/cohorts/run")
+async def run_cohort_analytics(
+    days: int = 30,
+    db: Database = Depends(get_database)
+):
+    try:
+        return await CohortAnalyticsEngine(db).run(days)
+    except Exception as e:
+        logger.error(f"Error running cohort analytics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to run cohort analytics")
+
+@router.get("/analytics/cohorts/latest")
+async def get_latest_cohort_analytics(
+    db: Database = Depends(get_database)
+):
+    report = await db.get_latest_analytics_report(COHORT_REPORT_TYPE)
+    if not report:
+        raise HTTPException(status_code=404, detail="No cohort report has been generated yet")
+    return report
+
+# Export endpoints
+@router.get("/export/user/{user_id}")
+async def export_user_history(
+    user_id: str,
+    format: str = "ndjson",
+    collections: str = "products,inventory,chat",
+    db: Database = Depends(get_database)
+):
+    sources = [name.strip() for name in collections.split(",") if name.strip()]
+    try:
+        validate_export(format, sources)
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = export_filename(format, sources, user_id)
+    return StreamingResponse(
+        stream_export(db, sources, format, user_id),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
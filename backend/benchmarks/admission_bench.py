@@ -0,0 +1,97 @@
+"""One abusive client vs everyone else, with admission control off and on.
+
+A single user fires ``--abuser-concurrency`` back-to-back ``/chat/message``
+requests (ignoring Retry-After) while ``--users`` other users send one every
+``--interval`` seconds, staggered, inside the default llm budget of 10 per
+minute. Every client waits ``--rtt`` after each response, standing in for the
+network.
+Chat goes to the fake provider (``--provider-latency`` seconds, the default
+per-operation concurrency limit), so without admission control the abuser
+holds every provider slot. Reports per group: requests, status counts and
+p50/p95 latency of successful requests.
+
+Run from ``backend/``:
+    python -m benchmarks.admission_bench --duration 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+
+async def _client_loop(client, user_id: str, stop: float, interval: float, rtt: float, results: list,
+                       delay: float = 0) -> None:
+    await asyncio.sleep(delay)
+    while time.perf_counter() < stop:
+        started = time.perf_counter()
+        response = await client.post("/api/chat/message",
+                                     json={"user_id": user_id, "session_id": "bench", "message": "protein ideas?"})
+        results.append((response.status_code, time.perf_counter() - started))
+        await asyncio.sleep(interval + rtt)
+
+
+def _summary(results: list) -> dict:
+    ok = [seconds * 1000 for status, seconds in results if status == 200]
+    return {
+        "requests": len(results),
+        "status": dict(Counter(status for status, _ in results)),
+        "ok_p50_ms": round(float(np.percentile(ok, 50)), 1) if ok else None,
+        "ok_p95_ms": round(float(np.percentile(ok, 95)), 1) if ok else None,
+    }
+
+
+async def run(enabled: bool, args) -> dict:
+    import admission
+    import providers
+    import server
+    from api_routes import get_database
+    from benchmarks.memory_mongo import MemoryClient
+    from database import Database
+
+    mongo = MemoryClient()
+    server.app.dependency_overrides[get_database] = lambda: Database(mongo, "admission_bench")
+    admission.ENABLED = enabled
+    server.admission_controller.store = admission.MemoryRateStore()
+    providers.set_provider(providers.build_provider("fake"))
+
+    abuser, others = [], []
+    stop = time.perf_counter() + args.duration
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await asyncio.gather(
+            *[_client_loop(client, "abuser", stop, 0, args.rtt, abuser) for _ in range(args.abuser_concurrency)],
+            *[_client_loop(client, f"user-{i}", stop, args.interval, args.rtt, others,
+                           delay=args.interval * i / max(args.users, 1)) for i in range(args.users)],
+        )
+    admission.loop_lag.stop()
+    return {"abuser": _summary(abuser), "others": _summary(others)}
+
+
+async def main_async(args) -> dict:
+    return {"off": await run(False, args), "on": await run(True, args)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Admission control benchmark")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--interval", type=float, default=6)
+    parser.add_argument("--rtt", type=float, default=0.005)
+    parser.add_argument("--abuser-concurrency", type=int, default=64)
+    parser.add_argument("--provider-latency", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("MONGO_URL", "mongodb://unused")
+    os.environ["MOCK_API_LATENCY_SCALE"] = "0"
+    os.environ["FAKE_PROVIDER_LATENCY"] = f"fixed:{args.provider_latency}"
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
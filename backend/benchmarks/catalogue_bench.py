@@ -0,0 +1,108 @@
+"""Barcode -> nutrition hot set: dicts and models vs. the compact catalogue.
+
+Generates ``--products`` products (``--names`` distinct names) and holds
+them three ways:
+  * dicts    ``{barcode: {name, calories, ...}}``
+  * models   ``{barcode: Product}``, measured on ``--model-sample`` products
+             and extrapolated
+  * compact  ``catalogue.NutritionCatalogue`` in memory, and memory-mapped
+             from the files ``catalogue_cli.py`` writes
+and reports bytes per product (tracemalloc), build time and lookup latency
+for ``--lookups`` random barcodes (half of them misses), one at a time and
+batched.
+
+Run from ``backend/``:
+    python -m benchmarks.catalogue_bench --products 1000000
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+
+def _products(rng: random.Random, count: int, names: int):
+    from benchmarks.seed import PRODUCT_NAMES
+
+    pool = [f"{rng.choice(PRODUCT_NAMES)} {i}" for i in range(names)]
+    for _ in range(count):
+        yield {"barcode": str(rng.randint(10**12, 10**13 - 1)), "name": rng.choice(pool),
+               **{field: round(rng.uniform(0, 600), 1) for field in ("calories", "protein", "carbs", "fat")},
+               "fiber": round(rng.uniform(0, 10), 1), "sugar": round(rng.uniform(0, 30), 1)}
+
+
+def _measure(build):
+    """(result, bytes allocated and kept, seconds)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+def _lookup_ns(get, keys) -> float:
+    started = time.perf_counter()
+    for key in keys:
+        get(key)
+    return (time.perf_counter() - started) / len(keys) * 1e9
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compact catalogue benchmark")
+    parser.add_argument("--products", type=int, default=1_000_000)
+    parser.add_argument("--names", type=int, default=50_000)
+    parser.add_argument("--model-sample", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    from catalogue import NutritionCatalogue, build_catalogue
+    from models import Product
+
+    rng = random.Random(42)
+    records = list(_products(rng, args.products, args.names))
+    hits = [record["barcode"] for record in rng.sample(records, args.lookups // 2)]
+    keys = hits + [str(rng.randint(10**12, 10**13 - 1)) for _ in range(args.lookups - len(hits))]
+    rng.shuffle(keys)
+    results = {"products": args.products, "distinct_names": args.names}
+
+    # Regenerated from the same seed, so the values' own memory is measured too
+    hot_set, size, seconds = _measure(
+        lambda: {r["barcode"]: r for r in _products(random.Random(42), args.products, args.names)})
+    results["dicts"] = {"bytes_per_product": round(size / args.products),
+                        "build_s_with_generation": round(seconds, 2),
+                        "lookup_ns": round(_lookup_ns(hot_set.get, keys))}
+    del hot_set
+
+    sample = records[:args.model_sample]
+    models, size, seconds = _measure(lambda: {r["barcode"]: Product(**r, scanned_by="catalogue") for r in sample})
+    results["models"] = {"bytes_per_product": round(size / len(sample)),
+                         "build_s_extrapolated": round(seconds * args.products / len(sample), 1)}
+    del models
+
+    compact, size, seconds = _measure(lambda: build_catalogue(records))
+    results["compact"] = {"bytes_per_product": round(size / args.products), "build_s": round(seconds, 2),
+                          "array_bytes": compact.nbytes, "lookup_ns": round(_lookup_ns(compact.get, keys))}
+    started = time.perf_counter()
+    batched = compact.get_many(keys)
+    results["compact"]["batched_lookup_ns"] = round((time.perf_counter() - started) / len(keys) * 1e9)
+    assert sum(entry is not None for entry in batched) >= len(hits)
+
+    with tempfile.TemporaryDirectory() as directory:
+        compact.save(Path(directory))
+        disk = sum(f.stat().st_size for f in Path(directory).iterdir())
+        mapped, size, seconds = _measure(lambda: NutritionCatalogue.load(Path(directory)))
+        results["mapped"] = {"file_bytes": disk, "heap_bytes": size, "load_ms": round(seconds * 1000, 2),
+                             "lookup_ns": round(_lookup_ns(mapped.get, keys))}
+        del mapped
+
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
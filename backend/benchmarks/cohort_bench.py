@@ -0,0 +1,110 @@
+"""Per-user cost of the vectorized cohort engine vs the per-user summary loop.
+
+Seeds the in-memory store, then measures:
+  * loop_e2e      get_products_by_user + calculate_nutrition_summary per user (current path)
+  * loop_compute  calculate_nutrition_summary on pre-fetched product dicts
+  * engine_e2e    CohortAnalyticsEngine.run over every user (chunked scans + groupby)
+  * engine_compute  the same run replayed from pre-fetched batches
+
+The in-memory store evaluates range filters in Python, so ``*_compute``
+numbers are the ones comparable with a real mongod doing the scan.
+
+Run from ``backend/``:
+    python -m benchmarks.cohort_bench --scale 200000
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from analytics_engine import PRODUCT_PROJECTION, PROFILE_PROJECTION, CohortAnalyticsEngine
+from benchmarks.memory_mongo import MemoryClient
+from benchmarks.seed import seed_database
+from database import Database
+from services import AnalyticsService
+
+
+class ReplayDatabase:
+    """Serves batches captured from a previous scan, isolating engine compute from the store"""
+
+    def __init__(self, batches):
+        self.batches = batches
+
+    async def iter_batches(self, collection_name, query, projection=None, batch_size=1000, sort_field=None):
+        for batch in self.batches[collection_name]:
+            yield batch
+
+    async def get_compacted_before(self, collection: str):
+        # Nothing compacted: the captured batches are the raw products
+        return None
+
+
+async def main_async(args) -> dict:
+    client = MemoryClient()
+    db = Database(client, "cohort_bench")
+    summary = await seed_database(client["cohort_bench"], scale=args.scale, seed=args.seed)
+    user_count = summary.counts["user_profiles"]
+    sample = summary.user_ids[:args.loop_sample]
+
+    started = time.perf_counter()
+    for user_id in sample:
+        products = await db.get_products_by_user(user_id)
+        await AnalyticsService.calculate_nutrition_summary([p.model_dump() for p in products], args.days)
+    loop_e2e = (time.perf_counter() - started) / len(sample)
+
+    by_user = defaultdict(list)
+    async for batch in db.iter_batches("products", {}, {"_id": 0}, 10_000):
+        for product in batch:
+            by_user[product["scanned_by"]].append(product)
+    started = time.perf_counter()
+    for user_id in sample:
+        await AnalyticsService.calculate_nutrition_summary(by_user[user_id], args.days)
+    loop_compute = (time.perf_counter() - started) / len(sample)
+
+    started = time.perf_counter()
+    report = await CohortAnalyticsEngine(db, batch_size=args.batch_size).run(args.days, persist=False)
+    engine_e2e = (time.perf_counter() - started) / user_count
+
+    captured = defaultdict(list)
+    since = datetime.utcnow() - timedelta(days=args.days)
+    for name, query, projection in (("user_profiles", {}, PROFILE_PROJECTION),
+                                    ("products", {"created_at": {"$gte": since}}, PRODUCT_PROJECTION)):
+        async for batch in db.iter_batches(name, query, projection, args.batch_size):
+            captured[name].append(batch)
+    started = time.perf_counter()
+    await CohortAnalyticsEngine(ReplayDatabase(captured), batch_size=args.batch_size).run(args.days, persist=False)
+    engine_compute = (time.perf_counter() - started) / user_count
+
+    return {
+        "users": user_count,
+        "products": summary.counts["products"],
+        "loop_sample": len(sample),
+        "per_user_us": {
+            "loop_e2e": round(loop_e2e * 1e6, 1),
+            "loop_compute": round(loop_compute * 1e6, 1),
+            "engine_e2e": round(engine_e2e * 1e6, 1),
+            "engine_compute": round(engine_compute * 1e6, 1),
+        },
+        "engine_total_ms": report["duration_ms"],
+        "speedup_vs_loop_e2e": round(loop_e2e / engine_e2e, 1),
+        "speedup_vs_loop_compute": round(loop_compute / engine_compute, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cohort analytics benchmark")
+    parser.add_argument("--scale", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--loop-sample", type=int, default=500, help="Users timed through the per-user loop")
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
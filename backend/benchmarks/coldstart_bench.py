@@ -0,0 +1,105 @@
+"""API cold start: import time, time to first response and what gets imported.
+
+Starts ``--runs`` fresh interpreters that import ``server`` under
+``-X importtime`` and answer one ``/api/health/live`` request straight
+through the ASGI app (no lifespan, so no database). Reports the median
+process wall time, import time and first-response time, the packages with
+the largest self import time, and whether any ``--lazy`` module (loaded
+on demand via lazy_imports.py) was imported eagerly.
+
+Exits with status 1 when the median wall time exceeds ``--budget-ms`` or
+a lazy module was imported eagerly, so CI can assert the cold-start target.
+
+Run from ``backend/``:
+    python -m benchmarks.coldstart_bench --runs 5 --budget-ms 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+# Runs in the child: import the app, check lazy modules, answer one request
+_PROBE = r"""
+import asyncio, json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+eager = [name for name in sys.argv[1].split(",")
+         if name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"]
+
+async def first_request():
+    messages = []
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/api/health/live", "raw_path": b"/api/health/live", "query_string": b"", "root_path": "",
+             "headers": [], "client": ("probe", 1), "server": ("probe", 80)}
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    await server.app(scope, receive, send)
+    return messages[0]["status"]
+
+status = asyncio.run(first_request())
+answered = time.perf_counter()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_response_ms": (answered - imported) * 1000,
+                  "status": status, "eager": eager}))
+"""
+
+
+def _self_times(importtime: str) -> dict:
+    """Self import time per top-level package, in ms"""
+    totals = defaultdict(float)
+    for line in importtime.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1000
+    return totals
+
+
+def run_once(lazy: str) -> dict:
+    env = {**os.environ, "MONGO_URL": os.environ.get("MONGO_URL", "mongodb://unused"), "PYTHONPATH": "."}
+    started = time.perf_counter()
+    child = subprocess.run([sys.executable, "-X", "importtime", "-c", _PROBE, lazy],
+                           capture_output=True, text=True, env=env, check=True)
+    wall = (time.perf_counter() - started) * 1000
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    return {**result, "wall_ms": wall, "self_times": _self_times(child.stderr)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="API cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2000)
+    parser.add_argument("--lazy", default="pandas,pyarrow,httpx")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.lazy) for _ in range(args.runs)]
+    packages = defaultdict(list)
+    for run in runs:
+        for name, ms in run["self_times"].items():
+            packages[name].append(ms)
+    slowest = sorted(((statistics.median(v), k) for k, v in packages.items()), reverse=True)[:args.top]
+    median = lambda key: round(statistics.median(run[key] for run in runs), 1)
+    eager = sorted({name for run in runs for name in run["eager"]})
+    report = {
+        "runs": args.runs,
+        "wall_ms": median("wall_ms"), "import_ms": median("import_ms"),
+        "first_response_ms": median("first_response_ms"),
+        "status": runs[-1]["status"],
+        "slowest_packages_ms": {name: round(ms, 1) for ms, name in slowest},
+        "eager_lazy_modules": eager,
+        "budget_ms": args.budget_ms,
+    }
+    report["ok"] = report["wall_ms"] <= args.budget_ms and not eager and report["status"] == 200
+    print(json.dumps(report, indent=2))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
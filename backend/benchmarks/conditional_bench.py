@@ -0,0 +1,84 @@
+"""Polling reads with and without conditional requests.
+
+Seeds one user with a profile, settings, ``--products`` products and
+``--recipes`` recipes, then polls each read endpoint ``--polls`` times:
+  * full        plain GET, full body every time
+  * revalidate  GET with the ETag from the first response (304 while unchanged)
+and reports mean latency and response bytes per request.
+
+Run from ``backend/``:
+    python -m benchmarks.conditional_bench --polls 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+
+async def _seed(client, db, products: int, recipes: int) -> str:
+    from benchmarks.seed import product, recipe
+
+    rng, now = random.Random(42), datetime.utcnow()
+    user_id = (await client.post("/api/users/profile", json={
+        "name": "bench", "age": 30, "weight": 70, "height": 175, "gender": "female"})).json()["id"]
+    await client.post(f"/api/users/{user_id}/settings", json={})
+    await db.products.insert_many([product(rng, now, user_id) for _ in range(products)])
+    await db.recipes.insert_many([recipe(rng, now, user_id) for _ in range(recipes)])
+    return user_id
+
+
+async def _poll(client, path: str, polls: int, revalidate: bool) -> dict:
+    headers = {}
+    if revalidate:
+        headers["If-None-Match"] = (await client.get(path)).headers["etag"]
+    sent = 0
+    started = time.perf_counter()
+    for _ in range(polls):
+        response = await client.get(path, headers=headers)
+        sent += len(response.content)
+    return {"mean_us": round((time.perf_counter() - started) / polls * 1e6, 1),
+            "bytes": sent // polls, "status": response.status_code}
+
+
+async def main_async(args) -> dict:
+    import admission
+    import server
+    from api_routes import get_database
+    from benchmarks.memory_mongo import MemoryClient
+    from database import Database
+
+    mongo = MemoryClient()
+    server.app.dependency_overrides[get_database] = lambda: Database(mongo, "conditional_bench")
+    admission.ENABLED = False
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        user_id = await _seed(client, mongo["conditional_bench"], args.products, args.recipes)
+        for name, path in (("profile", f"/api/users/profile/{user_id}"),
+                           ("settings", f"/api/users/{user_id}/settings"),
+                           ("products", f"/api/products/user/{user_id}"),
+                           ("recipes", f"/api/recipes/user/{user_id}")):
+            results[name] = {mode: await _poll(client, path, args.polls, mode == "revalidate")
+                             for mode in ("full", "revalidate")}
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Conditional GET benchmark")
+    parser.add_argument("--polls", type=int, default=500)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--recipes", type=int, default=50)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("MONGO_URL", "mongodb://unused")
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Home screen hydration: six endpoint calls vs. one dashboard request.
+
+Seeds one user with a profile, settings, ``--products`` products,
+``--inventory`` inventory items and a shopping list on the in-memory store,
+with every database operation costing ``--round-trip-ms``, then loads the
+dashboard ``--loads`` times:
+  * sequential  the six separate GETs one after another
+  * parallel    the six separate GETs at once, as a browser would
+  * dashboard   one GET /users/{id}/dashboard
+and reports mean latency per load.
+
+Run from ``backend/``:
+    python -m benchmarks.dashboard_bench --loads 200 --round-trip-ms 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+
+async def _seed(client, db, products: int, inventory: int) -> str:
+    from benchmarks.seed import product
+
+    rng, now = random.Random(42), datetime.utcnow()
+    user_id = (await client.post("/api/users/profile", json={
+        "name": "bench", "age": 30, "weight": 70, "height": 175, "gender": "female"})).json()["id"]
+    await client.post(f"/api/users/{user_id}/settings", json={})
+    await db.products.insert_many([product(rng, now, user_id) for _ in range(products)])
+    for i in range(inventory):
+        expiry = (now + timedelta(days=rng.randint(0, 14))).isoformat()
+        await client.post("/api/inventory", json={"user_id": user_id, "name": f"Item {i}", "quantity": rng.randint(0, 5),
+                                                  "unit": "pieces", "expiry": expiry, "category": "pantry"})
+    await client.post("/api/shopping-list", json={"user_id": user_id, "items": []})
+    return user_id
+
+
+def _separate_paths(user_id: str):
+    return [f"/api/users/profile/{user_id}", f"/api/users/{user_id}/settings",
+            f"/api/inventory/user/{user_id}/alerts", f"/api/shopping-list/user/{user_id}",
+            f"/api/products/user/{user_id}?limit=20", f"/api/analytics/user/{user_id}/summary"]
+
+
+async def _load(client, user_id: str, mode: str) -> None:
+    if mode == "dashboard":
+        responses = [await client.get(f"/api/users/{user_id}/dashboard")]
+    elif mode == "parallel":
+        responses = await asyncio.gather(*(client.get(path) for path in _separate_paths(user_id)))
+    else:
+        responses = [await client.get(path) for path in _separate_paths(user_id)]
+    assert all(response.status_code == 200 for response in responses), [r.status_code for r in responses]
+
+
+async def main_async(args) -> dict:
+    import admission
+    import server
+    from api_routes import get_database
+    from benchmarks import memory_mongo
+    from database import Database
+
+    mongo = memory_mongo.MemoryClient()
+    server.app.dependency_overrides[get_database] = lambda: Database(mongo, "dashboard_bench")
+    admission.ENABLED = False
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        user_id = await _seed(client, mongo["dashboard_bench"], args.products, args.inventory)
+        memory_mongo.ROUND_TRIP_S = args.round_trip_ms / 1000
+        for mode in ("sequential", "parallel", "dashboard"):
+            await _load(client, user_id, mode)
+            started = time.perf_counter()
+            for _ in range(args.loads):
+                await _load(client, user_id, mode)
+            results[mode] = {"mean_ms": round((time.perf_counter() - started) / args.loads * 1000, 2)}
+    results["speedup_vs_sequential"] = round(results["sequential"]["mean_ms"] / results["dashboard"]["mean_ms"], 1)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Dashboard hydration benchmark")
+    parser.add_argument("--loads", type=int, default=200)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--inventory", type=int, default=30)
+    parser.add_argument("--round-trip-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("MONGO_URL", "mongodb://unused")
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Hydrating a list of ids: one find_one per id vs. get_many vs. the batch loader.
+
+Seeds ``--recipes`` recipes on the in-memory store, with every database
+operation costing ``--round-trip-ms``, then resolves ``--ids`` random recipe
+ids (``--rounds`` times, mean reported) as
+  * find_one    ``Database.get_recipe`` per id, one after another
+  * get_many    ``Database.get_recipes`` with the read cache off
+  * cached      ``Database.get_recipes`` with a warm read cache
+  * loader      a ``BatchLoader`` per round, one ``load`` per id from separate tasks
+and reports mean milliseconds per round and database queries per round.
+
+Run from ``backend/``:
+    python -m benchmarks.get_many_bench --ids 100 --round-trip-ms 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+
+async def main_async(args) -> dict:
+    from benchmarks import memory_mongo
+    from benchmarks.seed import recipe
+    from database import Database
+    from loaders import BatchLoader
+    import read_cache
+
+    rng, now = random.Random(42), datetime.utcnow()
+    db = Database(memory_mongo.MemoryClient(), "get_many_bench")
+    await db.recipes.insert_many([recipe(rng, now, "bench") for _ in range(args.recipes)])
+    await db.recipes.create_index("id")
+    all_ids = [document["id"] for document in await db.recipes.find({}, {"_id": 0, "id": 1}).to_list(None)]
+    rounds = [[rng.choice(all_ids) for _ in range(args.ids)] for _ in range(args.rounds)]
+    memory_mongo.ROUND_TRIP_S = args.round_trip_ms / 1000
+
+    queries = 0
+    original_find, original_find_one = db.recipes.find, db.recipes.find_one
+
+    def find(*a, **kw):
+        nonlocal queries
+        queries += 1
+        return original_find(*a, **kw)
+
+    async def find_one(*a, **kw):
+        nonlocal queries
+        queries += 1
+        return await original_find_one(*a, **kw)
+
+    db.recipes.find, db.recipes.find_one = find, find_one
+
+    async def by_find_one(ids):
+        return [await db.get_recipe(id) for id in ids]
+
+    async def by_get_many(ids):
+        return await db.get_recipes(ids)
+
+    async def by_loader(ids):
+        loader = BatchLoader(db.get_recipes)
+        return await asyncio.gather(*(asyncio.ensure_future(loader.load(id)) for id in ids))
+
+    results = {}
+    for name, resolve, cache_ttl in (("find_one", by_find_one, 0), ("get_many", by_get_many, 0),
+                                     ("cached", by_get_many, 60), ("loader", by_loader, 0)):
+        read_cache.cache = read_cache.ReadCache(ttl=cache_ttl)
+        if cache_ttl:
+            await by_get_many(all_ids)
+        queries = 0
+        started = time.perf_counter()
+        for ids in rounds:
+            resolved = await resolve(ids)
+            assert [recipe.id for recipe in resolved] == ids
+        results[name] = {"mean_ms": round((time.perf_counter() - started) / len(rounds) * 1000, 2),
+                         "queries_per_round": round(queries / len(rounds), 1)}
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk lookup by id benchmark")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--ids", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--round-trip-ms", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("MONGO_URL", "mongodb://unused")
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""Client retries of /products/scan with and without an Idempotency-Key.
+
+Each of ``--scans`` scans is sent once, then retried ``--retries`` times while
+the first is still waiting on the provider (a client that timed out early)
+and once more after it finished. Reports provider calls, product documents
+written and p50 latency of first attempts vs. late retries.
+
+Run from ``backend/``:
+    python -m benchmarks.idempotency_bench --scans 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+
+async def _post(client, body: dict, headers: dict, timings: list) -> int:
+    started = time.perf_counter()
+    response = await client.post("/api/products/scan", json=body, headers=headers)
+    timings.append((time.perf_counter() - started) * 1000)
+    return response.status_code
+
+
+async def _scan(client, index: int, keyed: bool, args, first: list, late: list) -> None:
+    body = {"user_id": f"user-{index % 50}", "barcode": f"{index:013d}"}
+    headers = {"Idempotency-Key": str(uuid.uuid4())} if keyed else {}
+    original = asyncio.create_task(_post(client, body, headers, first))
+    await asyncio.sleep(args.provider_latency / 4)
+    await asyncio.gather(*[_post(client, body, headers, []) for _ in range(args.retries)])
+    await original
+    await _post(client, body, headers, late)
+
+
+async def run(keyed: bool, args) -> dict:
+    import admission
+    import providers
+    import server
+    from api_routes import get_database
+    from benchmarks.memory_mongo import MemoryClient
+    from database import Database
+
+    mongo = MemoryClient()
+    server.app.dependency_overrides[get_database] = lambda: Database(mongo, "idempotency_bench")
+    server.idempotency_store.collection = mongo["idempotency_bench"].idempotency_keys
+    admission.ENABLED = False
+    provider = providers.build_provider("fake")
+    providers.set_provider(provider)
+
+    first, late = [], []
+    slots = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def one(index):
+            async with slots:
+                await _scan(client, index, keyed, args, first, late)
+        await asyncio.gather(*[one(i) for i in range(args.scans)])
+    products = await mongo["idempotency_bench"].products.find({}).to_list(None)
+    return {
+        "provider_calls": provider.status()["scan_product"]["attempts"],
+        "products_written": len(products),
+        "first_p50_ms": round(float(np.percentile(first, 50)), 1),
+        "late_retry_p50_ms": round(float(np.percentile(late, 50)), 1),
+    }
+
+
+async def main_async(args) -> dict:
+    return {"scans": args.scans, "retries": args.retries,
+            "without_key": await run(False, args), "with_key": await run(True, args)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Idempotency-Key benchmark")
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--provider-latency", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("MONGO_URL", "mongodb://unused")
+    os.environ["MOCK_API_LATENCY_SCALE"] = "0"
+    os.environ["FAKE_PROVIDER_LATENCY"] = f"fixed:{args.provider_latency}"
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Ingredient line parsing throughput, uncached vs through the LRU.
+
+Builds ``--lines`` recipe/receipt style lines ("2 cups organic spinach",
+"Salmon Fillets") from ``--distinct`` distinct strings and reports:
+  * uncached_us  parse_ingredient.__wrapped__ per line (regex + lookups every time)
+  * cached_us    parse_ingredient per line on a warm cache
+  * lines_per_s  cached throughput
+
+Run from ``backend/``:
+    python -m benchmarks.ingredients_bench --lines 200000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.seed import INGREDIENTS
+import ingredients
+
+QUANTITIES = ["", "1 ", "2 ", "1/2 ", "1 1/2 ", "½ ", "200", "0.5 ", "3 "]
+UNITS = ["", "", "cups ", "tbsp ", "g ", "kg ", "ml ", "pieces ", "oz "]
+DESCRIPTORS = ["", "", "organic ", "fresh ", "chopped ", "large "]
+
+
+def _timed(fn, lines) -> float:
+    started = time.perf_counter()
+    for line in lines:
+        fn(line)
+    return (time.perf_counter() - started) / len(lines) * 1e6
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ingredient parsing benchmark")
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    distinct = [f"{rng.choice(QUANTITIES)}{rng.choice(UNITS)}{rng.choice(DESCRIPTORS)}{rng.choice(INGREDIENTS)}"
+                for _ in range(args.distinct)]
+    lines = [rng.choice(distinct) for _ in range(args.lines)]
+
+    ingredients.parse_ingredient.cache_clear()
+    ingredients.canonical_name.cache_clear()
+    uncached = _timed(ingredients.parse_ingredient.__wrapped__, lines)
+    _timed(ingredients.parse_ingredient, distinct)
+    cached = _timed(ingredients.parse_ingredient, lines)
+    print(json.dumps({
+        "lines": args.lines,
+        "distinct": len(set(distinct)),
+        "uncached_us": round(uncached, 2),
+        "cached_us": round(cached, 3),
+        "lines_per_s": int(1e6 / cached),
+        "cache": ingredients.cache_stats()["parse_ingredient"],
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
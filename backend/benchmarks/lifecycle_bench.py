@@ -0,0 +1,103 @@
+"""Compaction of cold product history: hot set size and analytics before/after.
+
+Seeds ``--users`` users with ``--products`` products and ``--messages`` chat
+messages spread over the last ``--days`` days, runs the retention policies
+(products compacted, chat archived to gzip NDJSON in a temporary directory)
+and reports:
+  * documents and BSON bytes left in the hot collections
+  * archive size on disk
+  * cohort analytics over the whole period, before and after, and whether
+    the per-user macro sums still agree
+
+Run from ``backend/``:
+    python -m benchmarks.lifecycle_bench --products 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import bson
+import numpy as np
+
+
+async def _hot_size(mongo, name: str) -> dict:
+    documents = await mongo["lifecycle_bench"][name].find({}).to_list(None)
+    return {"documents": len(documents), "mb": round(sum(len(bson.encode(d)) for d in documents) / 2**20, 1)}
+
+
+async def main_async(args) -> dict:
+    import lifecycle
+    from analytics_engine import CohortAnalyticsEngine, MACRO_FIELDS
+    from benchmarks.memory_mongo import MemoryClient
+    from benchmarks.seed import chat_message, product, user_profile
+    from database import Database
+
+    rng, now = random.Random(42), datetime.utcnow()
+    mongo = MemoryClient()
+    db = Database(mongo, "lifecycle_bench")
+    await lifecycle.ensure_indexes(mongo["lifecycle_bench"])
+
+    profiles = [user_profile(rng, now) for _ in range(args.users)]
+    await db.user_profiles.insert_many(profiles)
+    spread = lambda: now - timedelta(seconds=rng.randint(0, args.days * 86400))
+    await db.products.insert_many([{**product(rng, now, rng.choice(profiles)["id"]), "created_at": spread()}
+                                   for _ in range(args.products)])
+    await db.chat_messages.insert_many([{**chat_message(rng, now, rng.choice(profiles)["id"], "s"), "timestamp": spread()}
+                                        for _ in range(args.messages)])
+
+    engine = CohortAnalyticsEngine(db)
+    since = now - timedelta(days=args.days + 1)
+    before = {name: await _hot_size(mongo, name) for name in ("products", "chat_messages")}
+    started = time.perf_counter()
+    users_before, _ = await engine.aggregate_products(since, await engine.load_profiles())
+    analytics_before = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        results = await lifecycle.run(db, ["products", "chat_messages"], target="files", fmt="ndjson",
+                                      directory=Path(directory), batch_size=args.batch_size)
+        run_seconds = time.perf_counter() - started
+        archive_mb = sum(f.stat().st_size for f in Path(directory).rglob("*") if f.is_file()) / 2**20
+
+    after = {name: await _hot_size(mongo, name) for name in ("products", "chat_messages")}
+    started = time.perf_counter()
+    users_after, _ = await engine.aggregate_products(since, await engine.load_profiles())
+    analytics_after = time.perf_counter() - started
+
+    columns = [*MACRO_FIELDS, "products"]
+    joined = users_before[columns].join(users_after[columns], rsuffix="_after", how="outer").fillna(0)
+    # Rollups cover whole days, so only the partial first day of the window may differ
+    agree = bool(np.allclose(joined[columns].to_numpy(), joined[[f"{c}_after" for c in columns]].to_numpy(),
+                             rtol=0.01))
+    return {
+        "retention_days": {r["collection"]: lifecycle.POLICIES[r["collection"]].days for r in results},
+        "hot_before": before, "hot_after": after,
+        "rollups": (await db.product_rollups.count_documents({})),
+        "archive_mb": round(archive_mb, 1), "run_s": round(run_seconds, 2),
+        "analytics_s": {"before": round(analytics_before, 2), "after": round(analytics_after, 2)},
+        "per_user_sums_agree": agree,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Data lifecycle benchmark")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+    os.environ.setdefault("MONGO_URL", "mongodb://unused")
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,513 @@
+"""Load-test driver for every API route.
+
+Seeds synthetic data, replays a weighted request mix against the app and
+writes a JSON report with throughput and latency percentiles per route.
+Pass ``--baseline`` with a previous report to fail (exit 1) on regressions.
+
+Examples (run from ``backend/``):
+    python -m benchmarks.load_test --scale 10000 --mix mixed --requests 5000
+    python -m benchmarks.load_test --backend mongod --mongo-url mongodb://localhost:27017 --scale 1000000
+    python -m benchmarks.load_test --mix feed --baseline bench_baseline.json
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.seed import SeedSummary, seed_database
+
+
+@dataclass
+class Operation:
+    route: str  # route template, used as the report key
+    method: str
+    build: Callable[["LoadContext"], Dict[str, Any]]  # returns path/json/params/content/headers for one request
+    # Called with the request and the JSON body of a 200 response, to record documents later requests can target
+    remember: Optional[Callable[["LoadContext", Dict[str, Any], Any], None]] = None
+    stream: bool = False  # never-ending response: timed until its first chunk
+
+
+class LoadContext:
+    """Ids available to request builders, grown as the run creates documents"""
+
+    def __init__(self, summary: SeedSummary, rng: random.Random):
+        self.summary = summary
+        self.rng = rng
+        self.created_inventory_ids: List[str] = []
+        self.created_plan_ids: List[str] = []
+        self.created_list_ids: List[str] = []
+        self.created_items: List[tuple] = []  # (list id, item id)
+
+    def user(self) -> str:
+        return self.rng.choice(self.summary.user_ids)
+
+    def session(self) -> tuple:
+        return self.rng.choice(self.summary.session_ids)
+
+    def post(self) -> str:
+        return self.rng.choice(self.summary.post_ids)
+
+    def inventory_item(self) -> str:
+        return self.rng.choice(self.summary.inventory_ids)
+
+    def shopping_list(self) -> str:
+        return self.rng.choice(self.summary.shopping_list_ids)
+
+    def products(self, count: int = 20) -> List[str]:
+        return self.rng.sample(self.summary.product_ids, min(count, len(self.summary.product_ids)))
+
+    def recipes(self, count: int = 20) -> List[str]:
+        return self.rng.sample(self.summary.recipe_ids, min(count, len(self.summary.recipe_ids)))
+
+    def meal_plan(self) -> str:
+        # Plans only exist once the run has generated some; until then this is a 404
+        return self.rng.choice(self.created_plan_ids) if self.created_plan_ids else "no-plan-yet"
+
+    def generated_list(self) -> str:
+        return self.rng.choice(self.created_list_ids) if self.created_list_ids else self.shopping_list()
+
+
+def _expiry() -> str:
+    return (datetime.utcnow() + timedelta(days=5)).isoformat()
+
+
+def _take_inventory_item(ctx: LoadContext) -> Dict[str, Any]:
+    # Prefer items created during the run; otherwise retire a seeded one so it is not updated later
+    if ctx.created_inventory_ids:
+        item_id = ctx.created_inventory_ids.pop()
+    else:
+        pool = ctx.summary.inventory_ids
+        item_id = pool.pop(ctx.rng.randrange(len(pool)))
+    return {"path": f"/api/inventory/{item_id}"}
+
+
+def _take_shopping_item(ctx: LoadContext) -> Dict[str, Any]:
+    list_id, item_id = ctx.created_items.pop() if ctx.created_items else (ctx.shopping_list(), "no-item-yet")
+    return {"path": f"/api/shopping-list/{list_id}/items/{item_id}"}
+
+
+def _update_shopping_item(ctx: LoadContext) -> Dict[str, Any]:
+    list_id, item_id = ctx.rng.choice(ctx.created_items) if ctx.created_items else (ctx.shopping_list(), "no-item-yet")
+    return {"path": f"/api/shopping-list/{list_id}/items/{item_id}", "json": {"needed": ctx.rng.randint(1, 5)}}
+
+
+def _add_shopping_item(ctx: LoadContext) -> Dict[str, Any]:
+    list_id = ctx.shopping_list()
+    return {"path": f"/api/shopping-list/{list_id}/items", "list_id": list_id, "json": {
+        "name": ctx.rng.choice(["Oats", "Eggs", "Spinach", "Rice"]), "category": "Pantry", "needed": 1,
+        "unit": "pieces"}}
+
+
+def _remember_shopping_item(ctx: LoadContext, request: Dict[str, Any], item: Dict[str, Any]) -> None:
+    # Adding an item already on the list returns the merged entry
+    if (request["list_id"], item["id"]) not in ctx.created_items:
+        ctx.created_items.append((request["list_id"], item["id"]))
+
+
+# PNG signature only: enough for the upload path, which keeps images it cannot decode
+SCAN_IMAGE = base64.b64decode("iVBORw0KGgo=")
+
+
+def _upload(path: str) -> Callable[[LoadContext], Dict[str, Any]]:
+    return lambda c: {"path": path, "params": {"user_id": c.user()}, "content": SCAN_IMAGE,
+                      "headers": {"content-type": "image/png"}}
+
+
+OPERATIONS: Dict[str, Operation] = {op.route: op for op in [
+    Operation("GET /api/", "GET", lambda c: {"path": "/api/"}),
+    Operation("GET /api/health", "GET", lambda c: {"path": "/api/health"}),
+    Operation("POST /api/status", "POST", lambda c: {"path": "/api/status", "json": {"client_name": "bench"}}),
+    Operation("GET /api/status", "GET", lambda c: {"path": "/api/status"}),
+    Operation("POST /api/users/profile", "POST", lambda c: {"path": "/api/users/profile", "json": {
+        "name": "Bench User", "age": 30, "weight": 70.0, "height": 175.0, "gender": "female",
+        "activity_level": "moderate", "goals": ["Weight Loss"]}}),
+    Operation("GET /api/users/profile/{profile_id}", "GET", lambda c: {"path": f"/api/users/profile/{c.user()}"}),
+    Operation("PUT /api/users/profile/{profile_id}", "PUT", lambda c: {
+        "path": f"/api/users/profile/{c.user()}", "json": {"weight": round(c.rng.uniform(50, 120), 1)}}),
+    Operation("POST /api/users/{user_id}/settings", "POST", lambda c: {
+        "path": f"/api/users/{c.user()}/settings", "json": {"language": "en"}}),
+    Operation("GET /api/users/{user_id}/settings", "GET", lambda c: {"path": f"/api/users/{c.user()}/settings"}),
+    Operation("PUT /api/users/{user_id}/settings", "PUT", lambda c: {
+        "path": f"/api/users/{c.user()}/settings", "json": {"language": c.rng.choice(["en", "es", "de"])}}),
+    Operation("POST /api/products/scan", "POST", lambda c: {"path": "/api/products/scan", "json": {
+        "user_id": c.user(), "barcode": "1234567890123"}}),
+    Operation("GET /api/products/user/{user_id}", "GET", lambda c: {"path": f"/api/products/user/{c.user()}"}),
+    Operation("POST /api/recipes/generate", "POST", lambda c: {"path": "/api/recipes/generate", "json": {
+        "user_id": c.user(), "ingredients": ["spinach", "yogurt"]}}),
+    Operation("GET /api/recipes/user/{user_id}", "GET", lambda c: {"path": f"/api/recipes/user/{c.user()}"}),
+    Operation("POST /api/shopping-list", "POST", lambda c: {"path": "/api/shopping-list", "json": {
+        "user_id": c.user(), "items": [{"name": "Milk", "category": "Dairy", "needed": 1, "unit": "l"}]}}),
+    Operation("GET /api/shopping-list/user/{user_id}", "GET", lambda c: {"path": f"/api/shopping-list/user/{c.user()}"}),
+    Operation("PUT /api/shopping-list/{list_id}", "PUT", lambda c: {
+        "path": f"/api/shopping-list/{c.shopping_list()}", "json": {"order_status": c.rng.choice(["pending", "ordered"])}}),
+    Operation("POST /api/inventory", "POST", lambda c: {"path": "/api/inventory", "json": {
+        "user_id": c.user(), "name": "Tomato", "quantity": 3, "unit": "pieces", "expiry": _expiry(),
+        "category": "Produce"}}, remember=lambda c, request, body: c.created_inventory_ids.append(body["id"])),
+    Operation("GET /api/inventory/user/{user_id}", "GET", lambda c: {"path": f"/api/inventory/user/{c.user()}"}),
+    Operation("PUT /api/inventory/{item_id}", "PUT", lambda c: {
+        "path": f"/api/inventory/{c.inventory_item()}", "json": {"quantity": c.rng.randint(0, 10)}}),
+    Operation("DELETE /api/inventory/{item_id}", "DELETE", _take_inventory_item),
+    Operation("POST /api/inventory/scan-receipt", "POST", lambda c: {"path": "/api/inventory/scan-receipt", "json": {
+        "user_id": c.user(), "image_base64": "data:image/png;base64,iVBORw0KGgo="}}),
+    Operation("GET /api/inventory/user/{user_id}/alerts", "GET", lambda c: {"path": f"/api/inventory/user/{c.user()}/alerts"}),
+    Operation("POST /api/chat/message", "POST", lambda c: {"path": "/api/chat/message", "json": dict(zip(
+        ("user_id", "session_id"), c.session()), message="What should I eat for breakfast?")}),
+    Operation("GET /api/chat/history/{user_id}/{session_id}", "GET", lambda c: {
+        "path": "/api/chat/history/{}/{}".format(*c.session())}),
+    Operation("POST /api/community/posts", "POST", lambda c: {"path": "/api/community/posts", "json": {
+        "author_id": c.user(), "author_name": "Bench", "title": "Tip", "content": "Drink water", "tags": ["tips"]}}),
+    Operation("GET /api/community/posts", "GET", lambda c: {"path": "/api/community/posts", "params": (
+        {"tag_filter": c.rng.choice(["tips", "vegan", "breakfast"])} if c.rng.random() < 0.3 else {})}),
+    Operation("POST /api/community/posts/{post_id}/like", "POST", lambda c: {
+        "path": f"/api/community/posts/{c.post()}/like", "params": {"user_id": c.user()}}),
+    Operation("GET /api/analytics/user/{user_id}/summary", "GET", lambda c: {"path": f"/api/analytics/user/{c.user()}/summary"}),
+    # Routes added after the original 29
+    Operation("GET /api/users/{user_id}/dashboard", "GET", lambda c: {"path": f"/api/users/{c.user()}/dashboard"}),
+    Operation("POST /api/users/targets/batch", "POST", lambda c: {"path": "/api/users/targets/batch", "json": {
+        "profiles": [{"age": c.rng.randint(18, 80), "weight": round(c.rng.uniform(50, 120), 1),
+                      "height": round(c.rng.uniform(150, 200), 1), "gender": c.rng.choice(["male", "female"])}
+                     for _ in range(50)]}}),
+    Operation("POST /api/users/targets/recompute", "POST", lambda c: {"path": "/api/users/targets/recompute"}),
+    Operation("POST /api/products/scan/upload", "POST", _upload("/api/products/scan/upload")),
+    Operation("POST /api/products/batch", "POST", lambda c: {"path": "/api/products/batch", "json": {"ids": c.products()}}),
+    Operation("POST /api/recipes/batch", "POST", lambda c: {"path": "/api/recipes/batch", "json": {"ids": c.recipes()}}),
+    Operation("GET /api/recipes/{recipe_id}", "GET", lambda c: {"path": f"/api/recipes/{c.recipes(1)[0]}"}),
+    Operation("POST /api/meal-plans/generate", "POST", lambda c: {"path": "/api/meal-plans/generate", "json": {
+        "user_id": c.user(), "days": 7, "meals_per_day": 3}},
+        remember=lambda c, request, body: c.created_plan_ids.append(body["id"])),
+    Operation("GET /api/meal-plans/{plan_id}", "GET", lambda c: {
+        "path": f"/api/meal-plans/{c.meal_plan()}", "params": {"include_recipes": "true"}}),
+    Operation("POST /api/shopping-list/generate", "POST", lambda c: {"path": "/api/shopping-list/generate", "json": {
+        "user_id": c.user(), "recipe_ids": c.recipes(5)}},
+        remember=lambda c, request, body: c.created_list_ids.append(body["id"])),
+    Operation("POST /api/shopping-list/{list_id}/sync", "POST", lambda c: {
+        "path": f"/api/shopping-list/{c.generated_list()}/sync"}),
+    Operation("POST /api/shopping-list/{list_id}/items", "POST", _add_shopping_item,
+              remember=_remember_shopping_item),
+    Operation("PATCH /api/shopping-list/{list_id}/items/{item_id}", "PATCH", _update_shopping_item),
+    Operation("DELETE /api/shopping-list/{list_id}/items/{item_id}", "DELETE", _take_shopping_item),
+    Operation("POST /api/inventory/scan-receipt/upload", "POST", _upload("/api/inventory/scan-receipt/upload")),
+    Operation("GET /api/events/stream", "GET", lambda c: {"path": "/api/events/stream", "params": {
+        "user_id": c.user(), "topics": "inventory,shopping"}}, stream=True),
+    Operation("POST /api/analytics/insights/run", "POST", lambda c: {"path": "/api/analytics/insights/run"}),
+    Operation("GET /api/analytics/user/{user_id}/insights", "GET", lambda c: {
+        "path": f"/api/analytics/user/{c.user()}/insights"}),
+    Operation("POST /api/analytics/cohorts/run", "POST", lambda c: {"path": "/api/analytics/cohorts/run"}),
+    Operation("GET /api/analytics/cohorts/latest", "GET", lambda c: {"path": "/api/analytics/cohorts/latest"}),
+    Operation("GET /api/export/user/{user_id}", "GET", lambda c: {"path": f"/api/export/user/{c.user()}", "params": (
+        {"format": "csv", "collections": "products"} if c.rng.random() < 0.5 else {})}),
+]}
+
+# Whole-collection jobs: rare in the mixed workload, as in production
+JOB_ROUTES = {"POST /api/users/targets/recompute", "POST /api/analytics/insights/run",
+              "POST /api/analytics/cohorts/run"}
+
+# Relative weights per workload; routes missing from a mix are not exercised by it
+MIXES: Dict[str, Dict[str, float]] = {
+    "mixed": {route: 0.05 if route in JOB_ROUTES else 1.0 for route in OPERATIONS},
+    "scan": {
+        "POST /api/products/scan": 30, "GET /api/products/user/{user_id}": 20,
+        "POST /api/inventory/scan-receipt": 10, "GET /api/inventory/user/{user_id}": 15,
+        "PUT /api/inventory/{item_id}": 8, "POST /api/inventory": 5, "DELETE /api/inventory/{item_id}": 2,
+        "GET /api/inventory/user/{user_id}/alerts": 5, "GET /api/analytics/user/{user_id}/summary": 5,
+    },
+    "chat": {
+        "POST /api/chat/message": 45, "GET /api/chat/history/{user_id}/{session_id}": 40,
+        "GET /api/users/profile/{profile_id}": 10, "GET /api/users/{user_id}/settings": 5,
+    },
+    "feed": {
+        "GET /api/community/posts": 70, "POST /api/community/posts/{post_id}/like": 20,
+        "POST /api/community/posts": 5, "GET /api/users/profile/{profile_id}": 5,
+    },
+    "plan": {
+        "POST /api/meal-plans/generate": 20, "GET /api/meal-plans/{plan_id}": 20,
+        "POST /api/shopping-list/generate": 15, "POST /api/shopping-list/{list_id}/sync": 10,
+        "POST /api/shopping-list/{list_id}/items": 10, "PATCH /api/shopping-list/{list_id}/items/{item_id}": 10,
+        "DELETE /api/shopping-list/{list_id}/items/{item_id}": 5, "GET /api/users/{user_id}/dashboard": 10,
+    },
+}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies_ms: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies_ms)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 3),
+        "p90_ms": round(percentile(values, 90), 3),
+        "p95_ms": round(percentile(values, 95), 3),
+        "p99_ms": round(percentile(values, 99), 3),
+        "max_ms": round(values[-1], 3) if values else 0.0,
+    }
+
+
+async def _first_chunk_http(client, path: str, params: Optional[dict]) -> int:
+    async with client.stream("GET", path, params=params) as response:
+        async for _ in response.aiter_raw():
+            break
+        return response.status_code
+
+
+async def _first_chunk_asgi(app, path: str, params: Optional[dict]) -> int:
+    """GET straight through the ASGI app, disconnecting after the first body chunk.
+
+    httpx's ASGITransport buffers the whole response, which for an event stream never ends.
+    """
+    status, requested = 599, False
+    first_chunk, disconnected = asyncio.Event(), asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            first_chunk.set()
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode("latin-1"), "root_path": "",
+             "query_string": urlencode(params or {}).encode("latin-1"), "headers": [(b"host", b"benchmark")],
+             "server": ("benchmark", 80), "client": ("127.0.0.1", 0)}
+    app_task = asyncio.ensure_future(app(scope, receive, send))
+    waiter = asyncio.ensure_future(first_chunk.wait())
+    await asyncio.wait([app_task, waiter], return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+    disconnected.set()
+    await app_task
+    return status
+
+
+async def run_load(client, ctx: LoadContext, mix: Dict[str, float], total_requests: int,
+                   concurrency: int, duration: Optional[float] = None, app=None) -> Dict[str, Any]:
+    """``app``: the in-process ASGI app behind ``client``, if any (streamed routes bypass the client)"""
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    latencies: Dict[str, List[float]] = {route: [] for route in routes}
+    errors: Dict[str, int] = {route: 0 for route in routes}
+    status_codes: Dict[str, Dict[str, int]] = {route: {} for route in routes}
+    remaining = total_requests
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def open_stream(path: str, params: Optional[dict]) -> int:
+        if app is not None:
+            return await _first_chunk_asgi(app, path, params)
+        return await _first_chunk_http(client, path, params)
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0 and (deadline is None or time.perf_counter() < deadline):
+            remaining -= 1
+            route = ctx.rng.choices(routes, weights)[0]
+            op = OPERATIONS[route]
+            request = op.build(ctx)
+            started = time.perf_counter()
+            try:
+                if op.stream:
+                    code = await open_stream(request["path"], request.get("params"))
+                else:
+                    response = await client.request(op.method, request["path"], json=request.get("json"),
+                                                    params=request.get("params"), content=request.get("content"),
+                                                    headers=request.get("headers"))
+                    code = response.status_code
+                    if op.remember and code == 200:
+                        op.remember(ctx, request, response.json())
+            except Exception:
+                code = 599
+            latencies[route].append((time.perf_counter() - started) * 1000)
+            status_codes[route][str(code)] = status_codes[route].get(str(code), 0) + 1
+            if code >= 500:
+                errors[route] += 1
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    cpu_elapsed = time.process_time() - cpu_started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    routes_report = {}
+    for route in routes:
+        if latencies[route]:
+            routes_report[route] = summarize(latencies[route], errors[route], elapsed)
+            routes_report[route]["status_codes"] = status_codes[route]
+    overall = summarize(all_latencies, sum(errors.values()), elapsed)
+    # Process CPU (includes the in-process client when not using --base-url)
+    overall["cpu_ms_per_request"] = round(cpu_elapsed * 1000 / len(all_latencies), 4) if all_latencies else 0.0
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "overall": overall,
+        "routes": routes_report,
+    }
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                    min_delta_ms: float = 1.0) -> List[str]:
+    """Return human-readable regressions of p95 latency or throughput beyond ``tolerance``"""
+    regressions = []
+    for route, stats in current["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if not base:
+            continue
+        if stats["p95_ms"] > base["p95_ms"] * (1 + tolerance) and stats["p95_ms"] - base["p95_ms"] > min_delta_ms:
+            regressions.append(f"{route}: p95 {base['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if stats["errors"] > base.get("errors", 0):
+            regressions.append(f"{route}: errors {base.get('errors', 0)} -> {stats['errors']}")
+    base_rps = baseline.get("overall", {}).get("throughput_rps")
+    if base_rps and current["overall"]["throughput_rps"] < base_rps * (1 - tolerance):
+        regressions.append(f"overall throughput {base_rps} -> {current['overall']['throughput_rps']} rps")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def _build_client(args):
+    """Return (database client, httpx client, in-process app or None) for the chosen backend"""
+    import httpx
+
+    if args.backend == "memory":
+        from benchmarks.memory_mongo import MemoryClient
+        mongo_client = MemoryClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_client = AsyncIOMotorClient(args.mongo_url)
+
+    if args.base_url:
+        return mongo_client, httpx.AsyncClient(base_url=args.base_url, timeout=60), None
+
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    os.environ["DB_NAME"] = args.db_name
+    os.environ["MOCK_API_LATENCY_SCALE"] = str(args.mock_latency)
+
+    import admission
+    import serialization
+    import services
+    import server
+    from api_routes import get_database
+    from database import Database
+
+    services.MOCK_LATENCY_SCALE = args.mock_latency
+    admission.ENABLED = args.admission == "on"
+    serialization.FAST_RESPONSES = args.fast_responses == "on"
+    server.db = mongo_client[args.db_name]
+    server.idempotency_store.collection = server.db.idempotency_keys
+
+    async def get_benchmark_database() -> Database:
+        return Database(mongo_client, args.db_name)
+
+    server.app.dependency_overrides[get_database] = get_benchmark_database
+
+    transport = httpx.ASGITransport(app=server.app)
+    return mongo_client, httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60), server.app
+
+
+async def main_async(args) -> int:
+    mongo_client, http_client, app = _build_client(args)
+    db = mongo_client[args.db_name]
+
+    seed_started = time.perf_counter()
+    summary = await seed_database(db, scale=args.scale, seed=args.seed, batch_size=args.batch_size)
+    seed_elapsed = time.perf_counter() - seed_started
+    print(f"Seeded {sum(summary.counts.values())} documents in {seed_elapsed:.1f}s", file=sys.stderr)
+
+    ctx = LoadContext(summary, random.Random(args.seed))
+    async with http_client:
+        if args.warmup:
+            await run_load(http_client, ctx, MIXES[args.mix], args.warmup, args.concurrency, app=app)
+        results = await run_load(http_client, ctx, MIXES[args.mix], args.requests, args.concurrency, args.duration,
+                                 app=app)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "backend": args.backend,
+            "target": args.base_url or "in-process",
+            "mix": args.mix,
+            "scale": args.scale,
+            "seeded": summary.counts,
+            "seed_s": round(seed_elapsed, 3),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mock_latency_scale": args.mock_latency,
+            "fast_responses": args.fast_responses,
+        },
+        **results,
+    }
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["overall"], indent=2))
+    print(f"Report written to {args.report}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Nutritionist API")
+    parser.add_argument("--backend", choices=["memory", "mongod"], default="memory")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="benchmark_nutritionist")
+    parser.add_argument("--base-url", help="Drive a running server over HTTP instead of in-process")
+    parser.add_argument("--scale", type=int, default=10_000, help="Total synthetic documents to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mock-latency", type=float, default=0.0,
+                        help="Multiplier for simulated external API delays (0 measures only our code)")
+    parser.add_argument("--fast-responses", choices=["on", "off"], default="on",
+                        help="Toggle the raw-document JSON path on list endpoints")
+    parser.add_argument("--admission", choices=["on", "off"], default="off",
+                        help="Rate limiting/admission control (off keeps reports comparable to older baselines)")
+    parser.add_argument("--report", default="bench_report.json")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main_async(parse_args())))
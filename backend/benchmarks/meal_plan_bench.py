@@ -0,0 +1,90 @@
+"""Meal-plan generation latency and fit over a large recipe catalogue.
+
+Seeds the in-memory store with ``--recipes`` recipes and ``--users`` profiles
+(with inventory), then reports:
+  * catalogue_build_ms  first request: scan + array build
+  * plan_ms             warm requests (cached catalogue), p50/p95/max
+  * fit                 mean absolute daily deviation from the calorie and protein targets
+
+Run from ``backend/``:
+    python -m benchmarks.meal_plan_bench --recipes 50000
+"""
+from datetime import datetime
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.memory_mongo import MemoryClient
+from benchmarks.seed import inventory_item, recipe, user_profile
+from database import Database
+import meal_planner
+import nutrition
+
+
+async def main_async(args) -> dict:
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    client = MemoryClient()
+    db = Database(client, "meal_plan_bench")
+
+    profiles = [user_profile(rng, now) for _ in range(args.users)]
+    for profile in profiles:
+        profile["targets"] = nutrition.targets_for([profile])[0].model_dump()
+    await db.user_profiles.insert_many(profiles)
+    await db.recipes.insert_many([recipe(rng, now, profiles[0]["id"]) for _ in range(args.recipes)])
+    await db.inventory_items.insert_many(
+        [inventory_item(rng, now, p["id"]) for p in profiles for _ in range(rng.randint(3, 15))])
+    await db.inventory_items.create_index("user_id")
+
+    meal_planner.catalogue_cache.invalidate()
+    started = time.perf_counter()
+    await meal_planner.catalogue_cache.get(db)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    timings, calorie_error, protein_error = [], [], []
+    for profile in profiles:
+        started = time.perf_counter()
+        plan = await meal_planner.generate_plan(db, profile, days=args.days, meals_per_day=args.meals)
+        timings.append((time.perf_counter() - started) * 1000)
+        for day in plan.days:
+            calorie_error.append(abs(day.totals["calories"] / plan.targets["calories"] - 1))
+            protein_error.append(abs(day.totals["protein"] / plan.targets["protein"] - 1))
+
+    return {
+        "recipes": args.recipes,
+        "users": args.users,
+        "days": args.days,
+        "meals_per_day": args.meals,
+        "catalogue_build_ms": round(build_ms, 1),
+        "plan_ms": {
+            "p50": round(statistics.median(timings), 2),
+            "p95": round(float(np.percentile(timings, 95)), 2),
+            "max": round(max(timings), 2),
+        },
+        "fit": {
+            "calorie_deviation_pct": round(statistics.mean(calorie_error) * 100, 2),
+            "protein_deviation_pct": round(statistics.mean(protein_error) * 100, 2),
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Meal planner benchmark")
+    parser.add_argument("--recipes", type=int, default=50_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--meals", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
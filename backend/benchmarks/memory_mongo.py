@@ -0,0 +1,633 @@
+"""In-memory stand-in for the subset of the Motor API used by ``Database``.
+
+Good enough to drive every route for benchmarks without a running
+``mongod``: equality/range/``$in``/``$expr`` filters, sort/skip/limit,
+projections, the update operators the app issues, and single-field hash
+indexes (created via ``create_index``) so lookups by ``id``/``user_id`` stay
+O(1) at multi-million document scale.
+
+Every coroutine yields to the event loop once, like a real round-trip would,
+so concurrent requests interleave the way they do against ``mongod``; set
+``ROUND_TRIP_S`` to make each of those yields cost a network round trip.
+Returned documents are shallow copies; callers must not mutate nested lists.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+import asyncio
+import itertools
+import re
+
+# Simulated network latency per operation (and per cursor batch)
+ROUND_TRIP_S = 0.0
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids: Dict[int, Any] = {}
+
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict[str, Any], path: str) -> Any:
+    return _resolve_parts(doc, path.split("."))
+
+
+def _resolve_parts(value: Any, parts: List[str]) -> Any:
+    for i, part in enumerate(parts):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            index = int(part)
+            value = value[index] if index < len(value) else _MISSING
+        elif isinstance(value, list):
+            # Like MongoDB, "items.id" over an array of subdocuments is every element's id,
+            # so {"items.id": x} matches when any element has that id
+            found: List[Any] = []
+            for element in value:
+                if not isinstance(element, dict):
+                    continue
+                resolved = _resolve_parts(element, parts[i:])
+                if isinstance(resolved, list):
+                    found.extend(resolved)
+                elif resolved is not _MISSING:
+                    found.append(resolved)
+            return found if found else _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    target: Any = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+        else:
+            target = target.setdefault(part, {})
+    if isinstance(target, list):
+        target[int(parts[-1])] = value
+    else:
+        target[parts[-1]] = value
+
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    target: Any = doc
+    for part in parts[:-1]:
+        target = target.get(part) if isinstance(target, dict) else None
+        if target is None:
+            return
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+
+
+def _compare(op: str, value: Any, operand: Any) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$lt":
+            return value < operand
+        if op == "$lte":
+            return value <= operand
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {op}")
+
+
+def _eval_expr(doc: Dict[str, Any], expr: Any) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get_path(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, dict) and len(expr) == 1:
+        op, args = next(iter(expr.items()))
+        if op in ("$lt", "$lte", "$gt", "$gte", "$eq", "$ne"):
+            left, right = (_eval_expr(doc, arg) for arg in args)
+            if op == "$eq":
+                return left == right
+            if op == "$ne":
+                return left != right
+            return _compare(op, left, right)
+        if op == "$and":
+            return all(_eval_expr(doc, arg) for arg in args)
+        if op == "$or":
+            return any(_eval_expr(doc, arg) for arg in args)
+        raise ValueError(f"Unsupported $expr operator {op}")
+    return expr
+
+
+def _match_value(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$in":
+                candidates = value if isinstance(value, list) else [value]
+                if not any(c in operand for c in candidates):
+                    return False
+            elif op == "$nin":
+                candidates = value if isinstance(value, list) else [value]
+                if any(c in operand for c in candidates):
+                    return False
+            elif op == "$ne":
+                if value == operand or (isinstance(value, list) and operand in value):
+                    return False
+            elif op == "$eq":
+                if not _match_value(value, operand):
+                    return False
+            elif op == "$exists":
+                if (value is not _MISSING) != bool(operand):
+                    return False
+            elif op == "$regex":
+                if not isinstance(value, str) or not re.search(operand, value, re.I if "i" in condition.get("$options", "") else 0):
+                    return False
+            elif op == "$options":
+                continue
+            elif op == "$elemMatch":
+                if not isinstance(value, list) or not any(matches(v, operand) for v in value if isinstance(v, dict)):
+                    return False
+            elif isinstance(value, list) and op in ("$lt", "$lte", "$gt", "$gte"):
+                if not any(_compare(op, v, operand) for v in value):
+                    return False
+            elif not _compare(op, value, operand):
+                return False
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    if value is _MISSING:
+        return condition is None
+    return value == condition
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$expr":
+            if not _eval_expr(doc, condition):
+                return False
+        elif not _match_value(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return dict(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: doc[k] for k in include if k in doc}
+        for k, v in projection.items():
+            # {"array": {"$elemMatch": {...}}} keeps only the first matching element
+            if isinstance(v, dict) and "$elemMatch" in v and isinstance(result.get(k), list):
+                first = next((e for e in result[k] if isinstance(e, dict) and matches(e, v["$elemMatch"])), None)
+                if first is None:
+                    result.pop(k)
+                else:
+                    result[k] = [first]
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _sort_key(value: Any):
+    # Missing/None sort first in ascending order, like MongoDB
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+
+def _apply_sort(docs: List[Dict[str, Any]], sort_spec: List[tuple]) -> List[Dict[str, Any]]:
+    for field, direction in reversed(sort_spec):
+        docs.sort(key=lambda d: _sort_key(_get_path(d, field)), reverse=direction < 0)
+    return docs
+
+
+def _normalize_sort(key_or_list, direction=None) -> List[tuple]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    return list(key_or_list)
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Dict[str, Any], projection=None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[tuple] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict[str, Any]]] = None
+        self._position = 0
+        self._batch_size = 101
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        self._batch_size = size
+        return self
+
+    def _execute(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            docs = list(self._collection._scan(self._query))
+            if self._sort:
+                docs = _apply_sort(docs, self._sort)
+            if self._skip:
+                docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [_project(doc, self._projection) for doc in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Like Motor, each call continues where the previous one stopped
+        await asyncio.sleep(ROUND_TRIP_S)
+        results = self._execute()
+        end = self._position + length if length else len(results)
+        chunk = results[self._position:end]
+        self._position += len(chunk)
+        return chunk
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        results = self._execute()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        # Yield to the loop once per "network batch" rather than per document
+        if self._position % self._batch_size == 0:
+            await asyncio.sleep(ROUND_TRIP_S)
+        self._position += 1
+        return results[self._position - 1]
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[Any, set]] = {}
+        self._ids = itertools.count()
+
+    # Indexing
+    async def create_index(self, keys, **kwargs) -> str:
+        await asyncio.sleep(ROUND_TRIP_S)
+        fields = _normalize_sort(keys, 1)
+        field = fields[0][0]
+        if len(fields) == 1 and field not in self._indexes:
+            index: Dict[Any, set] = {}
+            for key, doc in self._docs.items():
+                for value in self._index_values(doc, field):
+                    index.setdefault(value, set()).add(key)
+            self._indexes[field] = index
+        return "_".join(f"{f}_{d}" for f, d in fields)
+
+    async def create_indexes(self, models) -> List[str]:
+        await asyncio.sleep(ROUND_TRIP_S)
+        return [await self.create_index(model.document["key"].items()) for model in models]
+
+    @staticmethod
+    def _index_values(doc: Dict[str, Any], field: str) -> Iterable[Any]:
+        value = _get_path(doc, field)
+        if value is _MISSING:
+            return ()
+        values = value if isinstance(value, list) else [value]
+        return [v for v in values if isinstance(v, (str, int, float, bool)) or v is None]
+
+    def _index_add(self, key: int, doc: Dict[str, Any]) -> None:
+        for field, index in self._indexes.items():
+            for value in self._index_values(doc, field):
+                index.setdefault(value, set()).add(key)
+
+    def _index_remove(self, key: int, doc: Dict[str, Any]) -> None:
+        for field, index in self._indexes.items():
+            for value in self._index_values(doc, field):
+                bucket = index.get(value)
+                if bucket:
+                    bucket.discard(key)
+
+    def _candidates(self, query: Dict[str, Any]) -> Iterable[int]:
+        for field, condition in query.items():
+            if field in self._indexes:
+                if isinstance(condition, dict) and set(condition) == {"$in"}:
+                    keys: set = set()
+                    for value in condition["$in"]:
+                        keys |= self._indexes[field].get(value, set())
+                    return sorted(keys)
+                if not isinstance(condition, (dict, list)):
+                    return sorted(self._indexes[field].get(condition, ()))
+        return list(self._docs)
+
+    def _scan_keys(self, query: Dict[str, Any]) -> Iterable[int]:
+        for key in self._candidates(query or {}):
+            doc = self._docs.get(key)
+            if doc is not None and matches(doc, query or {}):
+                yield key
+
+    def _scan(self, query: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        for key in self._scan_keys(query):
+            yield self._docs[key]
+
+    # Writes
+    def _insert(self, document: Dict[str, Any]) -> int:
+        document.setdefault("_id", ObjectId())
+        key = next(self._ids)
+        stored = dict(document)
+        self._docs[key] = stored
+        self._index_add(key, stored)
+        return key
+
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        self._insert(document)
+        return InsertOneResult(document["_id"])
+
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs) -> InsertManyResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        inserted_ids = []
+        for doc in documents:
+            self._insert(doc)
+            inserted_ids.append(doc["_id"])
+        return InsertManyResult(inserted_ids)
+
+    def _apply_update(self, key: int, update: Dict[str, Any], query: Dict[str, Any], inserting: bool = False) -> bool:
+        doc = self._docs[key]
+        before = repr(doc)
+        self._index_remove(key, doc)
+        # Like MongoDB, "$" refers to the element the query matched before any field changes
+        resolved = {path: self._resolve_positional(doc, path, query)
+                    for fields in update.values() for path in fields if "$" in path.split(".")}
+        for op, fields in update.items():
+            for path, value in fields.items():
+                path = resolved.get(path, path)
+                current = _get_path(doc, path)
+                if op == "$set":
+                    _set_path(doc, path, value)
+                elif op == "$setOnInsert":
+                    if inserting:
+                        _set_path(doc, path, value)
+                elif op == "$unset":
+                    _unset_path(doc, path)
+                elif op == "$inc":
+                    _set_path(doc, path, (0 if current is _MISSING else current) + value)
+                elif op == "$max":
+                    if current is _MISSING or current is None or value > current:
+                        _set_path(doc, path, value)
+                elif op == "$min":
+                    if current is _MISSING or current is None or value < current:
+                        _set_path(doc, path, value)
+                elif op == "$push":
+                    items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                    _set_path(doc, path, ([] if current is _MISSING else list(current)) + list(items))
+                elif op == "$addToSet":
+                    items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                    existing = [] if current is _MISSING else list(current)
+                    existing.extend(item for item in items if item not in existing)
+                    _set_path(doc, path, existing)
+                elif op == "$pull":
+                    if current is not _MISSING:
+                        if isinstance(value, dict):
+                            kept = [v for v in current if not (isinstance(v, dict) and matches(v, value))]
+                        else:
+                            kept = [v for v in current if v != value]
+                        _set_path(doc, path, kept)
+                else:
+                    raise ValueError(f"Unsupported update operator {op}")
+        self._index_add(key, doc)
+        return repr(doc) != before
+
+    @staticmethod
+    def _resolve_positional(doc: Dict[str, Any], path: str, query: Dict[str, Any]) -> str:
+        parts = path.split(".")
+        position = parts.index("$")
+        array_path = ".".join(parts[:position])
+        array = _get_path(doc, array_path)
+        for field, condition in query.items():
+            if field == array_path and isinstance(condition, dict) and "$elemMatch" in condition:
+                for i, element in enumerate(array or []):
+                    if isinstance(element, dict) and matches(element, condition["$elemMatch"]):
+                        parts[position] = str(i)
+                        return ".".join(parts)
+            if field.startswith(array_path + "."):
+                sub_field = field[len(array_path) + 1:]
+                for i, element in enumerate(array or []):
+                    if isinstance(element, dict) and _match_value(_get_path(element, sub_field), condition):
+                        parts[position] = str(i)
+                        return ".".join(parts)
+        raise ValueError(f"No array element matched positional path {path}")
+
+    def _upsert(self, query: Dict[str, Any], update: Dict[str, Any]):
+        seed = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+        key = self._insert(seed)
+        self._apply_update(key, update, query, inserting=True)
+        return self._docs[key]["_id"]
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        for key in self._scan_keys(query):
+            modified = self._apply_update(key, update, query)
+            return UpdateResult(1, int(modified))
+        if upsert:
+            return UpdateResult(0, 0, self._upsert(query, update))
+        return UpdateResult(0, 0)
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        keys = list(self._scan_keys(query))
+        modified = sum(self._apply_update(key, update, query) for key in keys)
+        if not keys and upsert:
+            return UpdateResult(0, 0, self._upsert(query, update))
+        return UpdateResult(len(keys), modified)
+
+    async def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False, **kwargs) -> UpdateResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        for key in self._scan_keys(query):
+            doc = self._docs[key]
+            self._index_remove(key, doc)
+            self._docs[key] = {"_id": doc["_id"], **replacement}
+            self._index_add(key, self._docs[key])
+            return UpdateResult(1, 1)
+        if upsert:
+            key = self._insert(dict(replacement))
+            return UpdateResult(0, 0, self._docs[key]["_id"])
+        return UpdateResult(0, 0)
+
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs) -> BulkWriteResult:
+        """Apply pymongo write models (InsertOne, UpdateOne/Many, ReplaceOne, DeleteOne/Many) in order"""
+        result = BulkWriteResult()
+        for index, op in enumerate(requests):
+            kind = type(op).__name__
+            if kind == "InsertOne":
+                await self.insert_one(op._doc)
+                result.inserted_count += 1
+                continue
+            if kind in ("DeleteOne", "DeleteMany"):
+                delete = self.delete_one if kind == "DeleteOne" else self.delete_many
+                result.deleted_count += (await delete(op._filter)).deleted_count
+                continue
+            if kind == "ReplaceOne":
+                outcome = await self.replace_one(op._filter, op._doc, upsert=bool(op._upsert))
+            elif kind in ("UpdateOne", "UpdateMany"):
+                update = self.update_one if kind == "UpdateOne" else self.update_many
+                outcome = await update(op._filter, op._doc, upsert=bool(op._upsert))
+            else:
+                raise TypeError(f"Unsupported bulk operation {kind}")
+            result.matched_count += outcome.matched_count
+            result.modified_count += outcome.modified_count
+            if outcome.upserted_id is not None:
+                result.upserted_count += 1
+                result.upserted_ids[index] = outcome.upserted_id
+        return result
+
+    async def delete_one(self, query: Dict[str, Any], **kwargs) -> DeleteResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        for key in self._scan_keys(query):
+            self._index_remove(key, self._docs.pop(key))
+            return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def delete_many(self, query: Dict[str, Any], **kwargs) -> DeleteResult:
+        await asyncio.sleep(ROUND_TRIP_S)
+        keys = list(self._scan_keys(query))
+        for key in keys:
+            self._index_remove(key, self._docs.pop(key))
+        return DeleteResult(len(keys))
+
+    # Reads
+    def find(self, query: Optional[Dict[str, Any]] = None, projection=None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, query or {}, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, projection=None, sort=None, **kwargs) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(ROUND_TRIP_S)
+        if not sort:
+            for doc in self._scan(query or {}):
+                return _project(doc, projection)
+            return None
+        results = await MemoryCursor(self, query or {}, projection).sort(sort).limit(1).to_list(1)
+        return results[0] if results else None
+
+    async def find_one_and_update(self, query: Dict[str, Any], update: Dict[str, Any], projection=None,
+                                  upsert: bool = False, return_document: bool = False, **kwargs) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(ROUND_TRIP_S)
+        for key in self._scan_keys(query):
+            before = _project(self._docs[key], projection)
+            self._apply_update(key, update, query)
+            return _project(self._docs[key], projection) if return_document else before
+        if upsert:
+            upserted_id = self._upsert(query, update)
+            if return_document:
+                return await self.find_one({"_id": upserted_id}, projection)
+        return None
+
+    async def count_documents(self, query: Optional[Dict[str, Any]] = None, **kwargs) -> int:
+        await asyncio.sleep(ROUND_TRIP_S)
+        if not query:
+            return len(self._docs)
+        return sum(1 for _ in self._scan_keys(query))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        await asyncio.sleep(ROUND_TRIP_S)
+        return len(self._docs)
+
+    async def drop(self) -> None:
+        await asyncio.sleep(ROUND_TRIP_S)
+        self._docs.clear()
+        for index in self._indexes.values():
+            index.clear()
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self) -> List[str]:
+        await asyncio.sleep(ROUND_TRIP_S)
+        return list(self._collections)
+
+    async def command(self, command, **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(ROUND_TRIP_S)
+        return {"ok": 1.0}
+
+    def watch(self, *args, **kwargs):
+        # Like a standalone mongod
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", 40573)
+
+
+class MemoryClient:
+    """Drop-in for ``AsyncIOMotorClient`` backed by process memory"""
+
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, MemoryDatabase] = {}
+        self.admin = MemoryDatabase("admin")
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    def close(self) -> None:
+        pass
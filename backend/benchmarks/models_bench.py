@@ -0,0 +1,149 @@
+"""Micro-benchmarks for model validation and serialization.
+
+Times every Pydantic model in ``models.py`` at list sizes 1..10k, comparing
+the original code path (``Model(**doc)`` / ``.dict()``) with the fast paths
+now used by ``Database`` (cached ``TypeAdapter`` list validation,
+``model_dump``), plus ``model_construct`` and JSON encoders for reference.
+
+Run from ``backend/``:
+    python -m benchmarks.models_bench
+    python -m benchmarks.models_bench --sizes 1 100 10000 --models Product Recipe --report models_bench.json
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+import argparse
+import inspect
+import json
+import random
+import sys
+import timeit
+import warnings
+
+from pydantic import BaseModel, TypeAdapter
+
+import models
+from benchmarks import seed
+
+try:
+    import orjson
+except ImportError:  # optional, only used for the encoder comparison
+    orjson = None
+
+
+def _subset(model, source: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in source.items() if k in model.model_fields}
+
+
+def _sample_factories() -> Dict[str, Callable[[random.Random, datetime], Dict[str, Any]]]:
+    """One document factory per model, derived from the seed generators where possible"""
+    profile = lambda r, n: seed.user_profile(r, n)
+    product = lambda r, n: seed.product(r, n, "user-1")
+    recipe = lambda r, n: seed.recipe(r, n, "user-1")
+    inventory = lambda r, n: seed.inventory_item(r, n, "user-1")
+    shopping = lambda r, n: seed.shopping_list(r, n, "user-1")
+    chat = lambda r, n: seed.chat_message(r, n, "user-1", "session-1")
+    post = lambda r, n: seed.community_post(r, n, "user-1")
+    return {
+        "UserSettings": lambda r, n: seed.user_settings(r, n, "user-1"),
+        "UserProfile": profile,
+        "Product": product,
+        "Recipe": recipe,
+        "ShoppingItem": lambda r, n: shopping(r, n)["items"][0],
+        "ShoppingList": shopping,
+        "InventoryItem": inventory,
+        "ChatMessage": chat,
+        "CommunityPost": post,
+        "Achievement": lambda r, n: {"id": "a-1", "user_id": "user-1", "title": "Recipe Master",
+                                     "description": "Try 10 different recipes", "earned": False,
+                                     "progress": r.randint(0, 10), "max_progress": 10, "created_at": n},
+        "UserProfileCreate": profile,
+        "UserProfileUpdate": profile,
+        "UserSettingsCreate": lambda r, n: seed.user_settings(r, n, "user-1"),
+        "UserSettingsUpdate": lambda r, n: seed.user_settings(r, n, "user-1"),
+        "ProductScanRequest": lambda r, n: {"user_id": "user-1", **product(r, n)},
+        "RecipeGenerateRequest": lambda r, n: {"user_id": "user-1", "ingredients": seed.recipe(r, n, "user-1")["ingredients"]},
+        "ChatMessageCreate": chat,
+        "CommunityPostCreate": post,
+        "CommunityPostUpdate": post,
+        "InventoryItemCreate": inventory,
+        "InventoryItemUpdate": inventory,
+        "ShoppingItemCreate": lambda r, n: shopping(r, n)["items"][0],
+        "ShoppingListCreate": lambda r, n: {"user_id": "user-1", "items": shopping(r, n)["items"]},
+        "ShoppingListUpdate": shopping,
+        "ReceiptScanRequest": lambda r, n: {"user_id": "user-1", "image_base64": "iVBORw0KGgo=" * 64},
+        "ReceiptScanResponse": lambda r, n: {"success": True, "items": [{"name": "Greek Yogurt", "quantity": 2, "price": 5.99}], "total": 5.99},
+    }
+
+
+def all_models() -> List[type]:
+    return [obj for _, obj in inspect.getmembers(models, inspect.isclass)
+            if issubclass(obj, BaseModel) and obj is not BaseModel and obj.__module__ == models.__name__]
+
+
+def _time(func: Callable[[], Any], size: int) -> float:
+    """Best-of-3 time per call in milliseconds, with repetitions scaled to the list size"""
+    number = max(1, 2000 // size)
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def bench_model(model, size: int, rng: random.Random) -> Dict[str, float]:
+    factory = _sample_factories()[model.__name__]
+    now = datetime.utcnow()
+    docs = [_subset(model, factory(rng, now)) for _ in range(size)]
+    adapter = TypeAdapter(List[model])
+    objs = adapter.validate_python(docs)
+
+    results = {
+        "validate_ctor_ms": _time(lambda: [model(**d) for d in docs], size),
+        "validate_model_validate_ms": _time(lambda: [model.model_validate(d) for d in docs], size),
+        "validate_type_adapter_ms": _time(lambda: adapter.validate_python(docs), size),
+        "construct_ms": _time(lambda: [model.model_construct(**d) for d in docs], size),
+        "dump_dict_ms": _time(lambda: [o.dict() for o in objs], size),
+        "dump_model_dump_ms": _time(lambda: [o.model_dump() for o in objs], size),
+        "dump_type_adapter_ms": _time(lambda: adapter.dump_python(objs), size),
+        "json_stdlib_ms": _time(lambda: json.dumps([o.model_dump() for o in objs], default=str), size),
+        "json_type_adapter_ms": _time(lambda: adapter.dump_json(objs), size),
+    }
+    if orjson is not None:
+        results["json_orjson_ms"] = _time(lambda: orjson.dumps(adapter.dump_python(objs)), size)
+    results["validate_speedup"] = round(results["validate_ctor_ms"] / results["validate_type_adapter_ms"], 2)
+    results["dump_speedup"] = round(results["dump_dict_ms"] / results["dump_model_dump_ms"], 2)
+    return {k: round(v, 4) for k, v in results.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Model validation/serialization micro-benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--models", nargs="+", help="Restrict to these model names")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", help="Write results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    # .dict() is deliberately measured as the "before" path
+    warnings.filterwarnings("ignore", category=DeprecationWarning)
+    warnings.filterwarnings("ignore", message=".*dict.*deprecated.*")
+
+    rng = random.Random(args.seed)
+    selected = [m for m in all_models() if not args.models or m.__name__ in args.models]
+    report: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    header = f"{'model':<22}{'size':>7}{'ctor':>10}{'adapter':>10}{'x':>6}{'.dict':>10}{'dump':>10}{'x':>6}{'json':>10}{'fastjson':>10}"
+    print(header)
+    for model in selected:
+        report[model.__name__] = {}
+        for size in args.sizes:
+            r = bench_model(model, size, rng)
+            report[model.__name__][str(size)] = r
+            print(f"{model.__name__:<22}{size:>7}{r['validate_ctor_ms']:>10.3f}{r['validate_type_adapter_ms']:>10.3f}"
+                  f"{r['validate_speedup']:>6.2f}{r['dump_dict_ms']:>10.3f}{r['dump_model_dump_ms']:>10.3f}"
+                  f"{r['dump_speedup']:>6.2f}{r['json_stdlib_ms']:>10.3f}{r['json_type_adapter_ms']:>10.3f}")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Provider call latency with and without hedging, and fail-fast with an open circuit.
+
+Uses ``FakeProvider`` (mock responses, no mock sleeps) with a bimodal latency:
+most calls take ``--fast`` seconds, ``--slow-share`` of them ``--slow``.
+``--calls`` scan_product calls run ``--concurrency`` at a time through
+``ResilientProvider`` with:
+  * plain   one attempt, no hedge
+  * hedged  a second attempt after ``--hedge-after`` seconds
+and report p50/p99/max latency. ``outage`` then fails every call and
+reports how quickly callers get an answer once the breaker has opened.
+
+Run from ``backend/``:
+    python -m benchmarks.providers_bench
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+import services
+import providers
+
+
+async def _timed_calls(provider, calls: int, concurrency: int) -> list:
+    slots = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await provider.scan_product(barcode="1234567890123")
+            except providers.ProviderError:
+                pass
+            timings.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*[one() for _ in range(calls)])
+    return timings
+
+
+def _summary(timings: list) -> dict:
+    return {"p50_ms": round(float(np.percentile(timings, 50)), 1),
+            "p99_ms": round(float(np.percentile(timings, 99)), 1),
+            "max_ms": round(max(timings), 1)}
+
+
+async def main_async(args) -> dict:
+    services.MOCK_LATENCY_SCALE = 0
+    latency = {"default": f"bimodal:{args.fast}:{args.slow}:{args.slow_share}"}
+    results = {}
+    for mode, hedge_after in (("plain", None), ("hedged", args.hedge_after)):
+        inner = providers.FakeProvider(latency, seed=args.seed)
+        policy = providers.Policy(timeout=args.slow * 2, concurrency=args.concurrency * 2,
+                                  attempts=1 if hedge_after is None else 2, hedge_after=hedge_after)
+        provider = providers.ResilientProvider(inner, {"scan_product": policy})
+        results[mode] = {**_summary(await _timed_calls(provider, args.calls, args.concurrency)),
+                         "attempts": provider.status()["scan_product"]["attempts"]}
+
+    inner = providers.FakeProvider({"default": f"fixed:{args.fast}"}, failure_rate=1.0, seed=args.seed)
+    provider = providers.ResilientProvider(inner, {"scan_product": providers.Policy(attempts=1, failure_threshold=5)})
+    timings = await _timed_calls(provider, args.calls, args.concurrency)
+    status = provider.status()["scan_product"]
+    results["outage"] = {**_summary(timings), "reached_provider": status["attempts"], "rejected": status["rejected"]}
+    return {"calls": args.calls, "concurrency": args.concurrency, "latency": latency["default"], **results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Provider resilience benchmark")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--fast", type=float, default=0.02)
+    parser.add_argument("--slow", type=float, default=0.5)
+    parser.add_argument("--slow-share", type=float, default=0.03)
+    parser.add_argument("--hedge-after", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
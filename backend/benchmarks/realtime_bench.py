@@ -0,0 +1,88 @@
+"""Push delivery vs. client polling for inventory updates.
+
+``--users`` clients each subscribe to their inventory topic while
+``--writes`` inventory writes per second go to random users for
+``--duration`` seconds, with the polling source (the fallback used on a
+standalone mongod and with the in-memory store) at ``--poll`` seconds.
+Reports write-to-delivery latency and how many database queries the push
+path issued, next to the requests the same clients would send polling
+``/inventory/user/{id}`` every ``--client-poll`` seconds.
+
+Run from ``backend/``:
+    python -m benchmarks.realtime_bench --users 1000 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+async def _consume(subscription, latencies: list, sent_at: dict) -> None:
+    while True:
+        event = await subscription.queue.get()
+        item_id = event.get("id")
+        if item_id in sent_at:
+            latencies.append((time.perf_counter() - sent_at.pop(item_id)) * 1000)
+
+
+async def main_async(args) -> dict:
+    import realtime
+    from benchmarks.memory_mongo import MemoryClient
+    from database import Database
+    from models import InventoryItemCreate
+
+    mongo = MemoryClient()
+    db = Database(mongo, "realtime_bench")
+    await db.inventory_items.create_index("user_id")
+    hub = realtime.Hub()
+    hub.configure(mongo["realtime_bench"])
+    realtime.POLL_SECONDS = args.poll
+
+    latencies, sent_at = [], {}
+    users = [f"user-{i}" for i in range(args.users)]
+    subscriptions = [hub.subscribe(["inventory"], user) for user in users]
+    consumers = [asyncio.create_task(_consume(s, latencies, sent_at)) for s in subscriptions]
+
+    rng = random.Random(42)
+    expiry = datetime.utcnow() + timedelta(days=7)
+    writes = int(args.writes * args.duration)
+    for _ in range(writes):
+        item = await db.create_inventory_item(InventoryItemCreate(
+            user_id=rng.choice(users), name="milk", quantity=1, unit="l", expiry=expiry, category="Dairy"))
+        sent_at[item.id] = time.perf_counter()
+        await asyncio.sleep(1 / args.writes)
+    await asyncio.sleep(args.poll * 2)
+
+    for consumer in consumers:
+        consumer.cancel()
+    source = hub.source.active
+    await hub.stop()
+    return {
+        "users": args.users, "writes": writes, "delivered": len(latencies),
+        "latency_ms": {"p50": round(float(np.percentile(latencies, 50)), 1),
+                       "p99": round(float(np.percentile(latencies, 99)), 1)},
+        "source": type(source).__name__,
+        "push_queries": source.queries,
+        "client_poll_requests": int(args.users * args.duration / args.client_poll),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Real-time push benchmark")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--writes", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--poll", type=float, default=0.5)
+    parser.add_argument("--client-poll", type=float, default=5)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Receipt ingestion: per-line inserts vs the dedup/merge pipeline.
+
+``--users`` users each upload ``--receipts`` receipts concurrently, a share
+(``--resubmit``) of them twice. Both paths use the same mock OCR (latency
+scaled by ``MOCK_API_LATENCY_SCALE``) and report:
+  * wall_s          total time for all uploads
+  * inventory_rows  inventory documents afterwards (lower = fewer duplicates)
+  * rows_per_item   rows per distinct (user, item); 1.0 means fully merged
+  * max_loop_lag_ms worst event-loop delay seen by a 10 ms ticker
+
+Run from ``backend/``:
+    MOCK_API_LATENCY_SCALE=0.05 python -m benchmarks.receipts_bench --users 200
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import base64
+import json
+import random
+import sys
+import time
+
+from benchmarks.memory_mongo import MemoryClient
+from database import Database
+from ingredients import canonical_name
+from models import InventoryItemCreate
+from services import MockAPIService
+import receipts
+
+
+async def naive_ingest(db, user_id: str, image_base64: str) -> None:
+    """The previous route: one insert per OCR line, no dedup"""
+    result = await MockAPIService.scan_receipt(image_base64)
+    for item in result["items"]:
+        await db.create_inventory_item(InventoryItemCreate(
+            user_id=user_id, name=item["name"], quantity=item["quantity"], unit="pieces",
+            expiry=datetime.utcnow() + timedelta(days=7), category="Produce", added_from_receipt=True))
+
+
+async def _loop_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst * 1000
+
+
+async def run(path: str, uploads, seed: int) -> dict:
+    random.seed(seed)  # same OCR output for both paths
+    db = Database(MemoryClient(), "receipts_bench")
+    await db.inventory_items.create_index("user_id")
+    await db.receipt_scans.create_index("user_id")
+    ingest = receipts.ingest_receipt if path == "pipeline" else naive_ingest
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(_loop_lag(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*[ingest(db, user_id, image) for user_id, image in uploads])
+    wall = time.perf_counter() - started
+    stop.set()
+
+    rows = await db.inventory_items.find({}, {"_id": 0, "user_id": 1, "name": 1}).to_list(length=None)
+    distinct = {(row["user_id"], canonical_name(row["name"])) for row in rows}
+    return {
+        "wall_s": round(wall, 3),
+        "inventory_rows": len(rows),
+        "rows_per_item": round(len(rows) / max(len(distinct), 1), 2),
+        "max_loop_lag_ms": round(await lag, 1),
+    }
+
+
+async def main_async(args) -> dict:
+    rng = random.Random(args.seed)
+    uploads = []
+    for user in range(args.users):
+        for receipt in range(args.receipts):
+            image = base64.b64encode(f"receipt-{user}-{receipt}".encode()).decode()
+            uploads.append((f"user-{user}", image))
+            if rng.random() < args.resubmit:
+                uploads.append((f"user-{user}", image))
+    rng.shuffle(uploads)
+    return {
+        "uploads": len(uploads),
+        "naive": await run("naive", uploads, args.seed),
+        "pipeline": await run("pipeline", uploads, args.seed),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Receipt ingestion benchmark")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--receipts", type=int, default=4)
+    parser.add_argument("--resubmit", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Scalar vs vectorized nutrient-target computation.
+
+  * scalar      nutrition.targets_for called once per profile (profile create/update path)
+  * vectorized  one nutrition.targets_for call per batch (recompute job, /users/targets/batch)
+  * arrays      nutrition.compute_targets alone, without building NutrientTargets models
+
+Run from ``backend/``:
+    python -m benchmarks.targets_bench --profiles 100000
+"""
+from datetime import datetime
+import argparse
+import json
+import random
+import sys
+import time
+
+import nutrition
+from benchmarks.seed import user_profile
+
+
+def _timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Nutrient target benchmark")
+    parser.add_argument("--profiles", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    profiles = [user_profile(rng, now) for _ in range(args.profiles)]
+    batches = [profiles[i:i + args.batch_size] for i in range(0, len(profiles), args.batch_size)]
+    columns = [[p.get(field) for p in profiles] for field in nutrition.TARGET_INPUT_FIELDS]
+
+    results = {
+        "scalar": _timed(lambda: [nutrition.targets_for([p]) for p in profiles]),
+        "vectorized": _timed(lambda: [nutrition.targets_for(batch) for batch in batches]),
+        "arrays": _timed(lambda: nutrition.compute_targets(*columns)),
+    }
+    per_profile = {name: round(seconds / args.profiles * 1e6, 2) for name, seconds in results.items()}
+    print(json.dumps({
+        "profiles": args.profiles,
+        "batch_size": args.batch_size,
+        "per_profile_us": per_profile,
+        "speedup_vectorized": round(per_profile["scalar"] / per_profile["vectorized"], 1),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
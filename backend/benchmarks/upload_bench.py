@@ -0,0 +1,87 @@
+"""Event-loop lag while scan images are decoded and hashed.
+
+``--uploads`` base64 images of ``--mb`` MiB are processed concurrently in
+three ways, while a 5 ms ticker records how late the loop wakes it:
+  * inline   images.process_base64 on the event loop (the JSON handlers before)
+  * threads  images.process_base64_async with IMAGE_PROCESS_WORKERS=0
+  * pool     images.process_base64_async with the process pool
+
+Reports wall time and loop lag p50/p99/max per mode.
+
+Run from ``backend/``:
+    python -m benchmarks.upload_bench --uploads 32 --mb 4
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import images
+
+TICK = 0.005
+
+
+async def _ticker(stop: asyncio.Event, lags: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append((time.perf_counter() - started - TICK) * 1000)
+
+
+async def _inline(payload: str):
+    await asyncio.sleep(0)
+    return images.process_base64(payload)
+
+
+async def run(mode: str, payloads) -> dict:
+    images.PROCESS_WORKERS = 0 if mode == "threads" else int(os.environ.get("IMAGE_PROCESS_WORKERS", "4"))
+    process = _inline if mode == "inline" else images.process_base64_async
+    if mode == "pool":
+        await process(payloads[0])  # start the workers outside the measurement
+
+    lags: list = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(TICK * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*[process(payload) for payload in payloads])
+    wall = time.perf_counter() - started
+    stop.set()
+    await ticker
+    images.shutdown()
+    return {
+        "wall_s": round(wall, 3),
+        "lag_ms": {
+            "p50": round(float(np.percentile(lags, 50)), 1),
+            "p99": round(float(np.percentile(lags, 99)), 1),
+            "max": round(max(lags), 1),
+        },
+    }
+
+
+async def main_async(args) -> dict:
+    payloads = [base64.b64encode(os.urandom(int(args.mb * 1024 * 1024))).decode("ascii")
+                for _ in range(args.uploads)]
+    images.MAX_UPLOAD_BYTES = int(args.mb * 1024 * 1024) + 1024
+    results = {"uploads": args.uploads, "mb": args.mb, "pillow": images.Image is not None}
+    for mode in ("inline", "threads", "pool"):
+        results[mode] = await run(mode, payloads)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Scan upload event-loop lag benchmark")
+    parser.add_argument("--uploads", type=int, default=32)
+    parser.add_argument("--mb", type=float, default=4)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Request-path insert cost: one insert_one per document vs. the write-behind buffer.
+
+``--docs`` chat-message-sized documents are inserted by ``--concurrency``
+concurrent writers into an in-memory collection that charges ``--rtt`` ms
+per round trip plus ``--per-doc-us`` per document, roughly a Mongo server
+on the same network. Reports writer-side latency p50/p99, wall time
+(until everything is in the collection) and round trips.
+
+Run from ``backend/``:
+    python -m benchmarks.write_behind_bench --docs 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+import write_behind
+from benchmarks.memory_mongo import MemoryClient
+
+
+class _TimedCollection:
+    """A collection whose calls cost a round trip"""
+
+    def __init__(self, collection, rtt: float, per_doc: float):
+        self.collection = collection
+        self.name = collection.name
+        self.rtt = rtt
+        self.per_doc = per_doc
+        self.round_trips = 0
+
+    async def insert_one(self, document):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt + self.per_doc)
+        return await self.collection.insert_one(document)
+
+    async def insert_many(self, documents, ordered=True):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt + self.per_doc * len(documents))
+        return await self.collection.insert_many(documents, ordered=ordered)
+
+
+async def run(mode: str, args) -> dict:
+    collection = _TimedCollection(MemoryClient()["bench"]["chat_messages"], args.rtt / 1000, args.per_doc_us / 1e6)
+    buffer = write_behind.WriteBehindBuffer(mode=mode)
+    timings = []
+    slots = asyncio.Semaphore(args.concurrency)
+
+    async def one(i):
+        async with slots:
+            document = {"id": str(i), "user_id": f"user-{i % 500}", "session_id": "s", "message": "x" * 200,
+                        "message_type": "user", "timestamp": datetime.utcnow()}
+            started = time.perf_counter()
+            await buffer.insert(collection, document)
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(args.docs)])
+    await buffer.close()
+    wall = time.perf_counter() - started
+    written = len(await collection.collection.find({}).to_list(None))
+    return {"p50_ms": round(float(np.percentile(timings, 50)), 3), "p99_ms": round(float(np.percentile(timings, 99)), 3),
+            "wall_s": round(wall, 2), "docs_per_s": int(args.docs / wall), "round_trips": collection.round_trips,
+            "written": written}
+
+
+async def main_async(args) -> dict:
+    return {"docs": args.docs, "concurrency": args.concurrency,
+            "sync": await run("sync", args), "buffered": await run("buffered", args)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write-behind buffer benchmark")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rtt", type=float, default=1.0)
+    parser.add_argument("--per-doc-us", type=float, default=10)
+    args = parser.parse_args(argv)
+    print(json.dumps(asyncio.run(main_async(args)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
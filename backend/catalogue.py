@@ -0,0 +1,219 @@
+"""Compact barcode -> nutrition catalogue.
+
+A barcode hot set of millions of products costs around a kilobyte per product
+as ``Product`` models or dicts. The catalogue keeps it as columns instead:
+
+    barcodes      uint64, sorted: lookups are a binary search (``np.searchsorted``)
+    nutrients     float32, one row per nutrient (calories ... sugar, per 100 g)
+    name_ids      uint32 index into the interned name table
+    name_offsets  uint64 offsets of each distinct name in ``names``
+    names         the distinct names, UTF-8, back to back
+
+That is 36 bytes per product plus each distinct name once. Barcodes are
+compared as numbers (GTIN style: leading zeros don't matter); non-numeric
+barcodes are skipped when building. When a barcode appears more than once
+the last record wins.
+
+``NutritionCatalogue.save`` writes one ``.npy`` file per column (see
+catalogue_cli.py) and ``load`` memory-maps them read-only, so every worker
+on a host shares one copy through the page cache; the server maps it before
+forking (warmup.py). Barcode-only scans of a catalogued product are answered
+from it without calling the scan provider.
+
+    NUTRITION_CATALOGUE_PATH   directory written by catalogue_cli.py; unset disables the catalogue
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import array
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_PATH = os.environ.get("NUTRITION_CATALOGUE_PATH")
+FORMAT_VERSION = 1
+NUTRIENT_FIELDS = ("calories", "protein", "carbs", "fat", "fiber", "sugar")
+COLUMNS = ("barcodes", "nutrients", "name_ids", "name_offsets", "names")
+MAX_BARCODE = 2 ** 64 - 1
+
+
+class CatalogueError(ValueError):
+    pass
+
+
+def parse_barcode(value: Any) -> Optional[int]:
+    """Numeric barcode as an integer, or None if it can't be one"""
+    text = str(value).strip() if value is not None else ""
+    if not text.isdigit() or len(text) > 19:
+        return None
+    return int(text)
+
+
+class NutritionCatalogue:
+    def __init__(self, barcodes: np.ndarray, nutrients: np.ndarray, name_ids: np.ndarray,
+                 name_offsets: np.ndarray, names: np.ndarray, built_at: Optional[float] = None):
+        self.barcodes = barcodes
+        self.nutrients = nutrients
+        self.name_ids = name_ids
+        self.name_offsets = name_offsets
+        self.names = names
+        self.built_at = built_at
+
+    def __len__(self) -> int:
+        return len(self.barcodes)
+
+    def __contains__(self, barcode: Any) -> bool:
+        return self._position(barcode) >= 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, column).nbytes for column in COLUMNS)
+
+    def _position(self, barcode: Any) -> int:
+        code = parse_barcode(barcode)
+        if code is None:
+            return -1
+        # The method with a uint64 key: a Python int would make NumPy convert the whole column
+        i = int(self.barcodes.searchsorted(np.uint64(code)))
+        return i if i < len(self.barcodes) and self.barcodes[i] == code else -1
+
+    def name(self, name_id: int) -> str:
+        start, end = self.name_offsets[name_id:name_id + 2].tolist()
+        return self.names[start:end].tobytes().decode("utf-8")
+
+    def _record(self, name_id: int, values: List[float], barcode: str) -> Dict[str, Any]:
+        record = dict(zip(NUTRIENT_FIELDS, values))
+        record["name"], record["barcode"] = self.name(name_id), barcode
+        return record
+
+    def get(self, barcode: str) -> Optional[Dict[str, Any]]:
+        """Name and nutrients for ``barcode``, or None"""
+        i = self._position(barcode)
+        if i < 0:
+            return None
+        # Rounded so float32 values read back as entered (130.1, not 130.10000610351562)
+        values = [round(value, 2) for value in self.nutrients[:, i].tolist()]
+        return self._record(int(self.name_ids[i]), values, str(barcode).strip())
+
+    def get_many(self, barcodes: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """``get`` for a batch, with one vectorised search"""
+        codes = [parse_barcode(barcode) for barcode in barcodes]
+        keys = np.array([code if code is not None else 0 for code in codes], dtype=np.uint64)
+        positions = np.minimum(np.searchsorted(self.barcodes, keys), max(len(self.barcodes) - 1, 0))
+        found = (self.barcodes[positions] == keys) if len(self.barcodes) else np.zeros(len(keys), dtype=bool)
+        found &= np.array([code is not None for code in codes], dtype=bool)
+        hits = positions[found]
+        # Gather every hit's columns at once
+        values = self.nutrients[:, hits].astype(np.float64).round(2).T.tolist()
+        name_ids = self.name_ids[hits].tolist()
+        results: List[Optional[Dict[str, Any]]] = [None] * len(barcodes)
+        for j, k in enumerate(np.flatnonzero(found).tolist()):
+            results[k] = self._record(name_ids[j], values[j], str(barcodes[k]).strip())
+        return results
+
+    # Files
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for column in COLUMNS:
+            np.save(directory / f"{column}.npy", np.ascontiguousarray(getattr(self, column)))
+        # Written last: a directory without it is an unfinished build
+        meta = {"version": FORMAT_VERSION, "products": len(self), "names": len(self.name_offsets) - 1,
+                "nutrients": list(NUTRIENT_FIELDS), "built_at": self.built_at or time.time()}
+        (directory / "meta.json").write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "NutritionCatalogue":
+        directory = Path(directory)
+        try:
+            meta = json.loads((directory / "meta.json").read_text())
+        except FileNotFoundError:
+            raise CatalogueError(f"No catalogue in {directory} (meta.json missing)")
+        if meta.get("version") != FORMAT_VERSION or meta.get("nutrients") != list(NUTRIENT_FIELDS):
+            raise CatalogueError(f"Catalogue in {directory} has an unsupported format; rebuild it")
+        # Empty files can't be mapped
+        mode = "r" if mmap and meta.get("products") else None
+        columns = {column: np.load(directory / f"{column}.npy", mmap_mode=mode) for column in COLUMNS}
+        return cls(**columns, built_at=meta.get("built_at"))
+
+
+class CatalogueBuilder:
+    """Accumulates records in compact columns; ``finish`` sorts them into a catalogue"""
+
+    def __init__(self):
+        self.barcodes = array.array("Q")
+        self.nutrients = [array.array("f") for _ in NUTRIENT_FIELDS]
+        self.name_ids = array.array("I")
+        self.interned: Dict[str, int] = {}
+        self.skipped = 0
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Records with ``barcode``, ``name`` and the nutrient fields (missing ones count as 0)"""
+        for record in records:
+            code = parse_barcode(record.get("barcode"))
+            if code is None or code > MAX_BARCODE:
+                self.skipped += 1
+                continue
+            self.barcodes.append(code)
+            for column, field in zip(self.nutrients, NUTRIENT_FIELDS):
+                column.append(float(record.get(field) or 0))
+            name = str(record.get("name") or "")
+            self.name_ids.append(self.interned.setdefault(name, len(self.interned)))
+
+    def finish(self) -> NutritionCatalogue:
+        if self.skipped:
+            logger.info(f"Skipped {self.skipped} records without a numeric barcode")
+        codes = np.array(self.barcodes, dtype=np.uint64)
+        order = np.argsort(codes, kind="stable")
+        # Of repeated barcodes keep the last record
+        sorted_codes = codes[order]
+        order = order[np.append(sorted_codes[1:] != sorted_codes[:-1], True)] if len(order) else order
+
+        encoded = [name.encode("utf-8") for name in self.interned]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(name) for name in encoded], out=offsets[1:])
+        return NutritionCatalogue(
+            barcodes=codes[order],
+            nutrients=np.array([np.array(column, dtype=np.float32)[order] for column in self.nutrients],
+                               dtype=np.float32).reshape(len(NUTRIENT_FIELDS), len(order)),
+            name_ids=np.array(self.name_ids, dtype=np.uint32)[order],
+            name_offsets=offsets,
+            names=np.frombuffer(b"".join(encoded), dtype=np.uint8).copy(),
+            built_at=time.time(),
+        )
+
+
+def build_catalogue(records: Iterable[Dict[str, Any]]) -> NutritionCatalogue:
+    builder = CatalogueBuilder()
+    builder.add(records)
+    return builder.finish()
+
+
+# The process's catalogue, mapped once (before fork when preloading)
+_catalogue: Optional[NutritionCatalogue] = None
+_loaded = False
+
+
+def get_catalogue() -> Optional[NutritionCatalogue]:
+    global _catalogue, _loaded
+    if not _loaded:
+        _loaded = True
+        if CATALOGUE_PATH:
+            try:
+                _catalogue = NutritionCatalogue.load(Path(CATALOGUE_PATH))
+                logger.info(f"Mapped nutrition catalogue of {len(_catalogue)} products from {CATALOGUE_PATH}")
+            except (CatalogueError, OSError, ValueError) as e:
+                logger.error(f"Nutrition catalogue not loaded: {e}")
+    return _catalogue
+
+
+def lookup(barcode: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Catalogue entry for ``barcode``, or None (also when no catalogue is configured)"""
+    catalogue = get_catalogue()
+    if catalogue is None or not barcode:
+        return None
+    return catalogue.get(barcode)
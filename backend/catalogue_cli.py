@@ -0,0 +1,103 @@
+"""Command-line build of the memory-mapped nutrition catalogue (see catalogue.py).
+
+Examples (run from ``backend/``):
+    python catalogue_cli.py build --out catalogue/                       # from scanned products in MongoDB
+    python catalogue_cli.py build --from-file products.ndjson.gz --out catalogue/
+    python catalogue_cli.py lookup 1234567890123 --path catalogue/
+
+Then start the server with ``NUTRITION_CATALOGUE_PATH=catalogue/``. The build
+writes to a temporary directory next to ``--out`` and swaps it in, so running
+workers keep their mapping of the previous build until they restart.
+"""
+from pathlib import Path
+from typing import Iterator, Optional
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import time
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+import typer
+
+from catalogue import NUTRIENT_FIELDS, CatalogueBuilder, CatalogueError, NutritionCatalogue
+from database import Database
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(add_completion=False)
+
+PRODUCT_PROJECTION = {"_id": 0, "barcode": 1, "name": 1, **{field: 1 for field in NUTRIENT_FIELDS}}
+
+
+def _read_file(path: Path) -> Iterator[dict]:
+    """NDJSON (optionally gzip-compressed) records"""
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def _add_products(builder: CatalogueBuilder, batch_size: int) -> None:
+    """Scanned products with a barcode, oldest first so the latest scan of a barcode wins"""
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = Database(client, os.environ.get('DB_NAME', 'nutritionist_app'))
+    try:
+        async for batch in db.iter_batches("products", {"barcode": {"$nin": [None, ""]}}, PRODUCT_PROJECTION,
+                                           batch_size, "created_at"):
+            builder.add(batch)
+    finally:
+        client.close()
+
+
+@app.command()
+def build(
+    out: Path = typer.Option(Path("catalogue"), help="Catalogue directory"),
+    from_file: Optional[Path] = typer.Option(None, help="NDJSON(.gz) of products; omit to read scanned products"),
+    batch_size: int = typer.Option(10_000, help="Products read per batch from MongoDB"),
+):
+    """Build the catalogue and swap it in at ``--out``"""
+    started = time.perf_counter()
+    builder = CatalogueBuilder()
+    if from_file:
+        builder.add(_read_file(from_file))
+    else:
+        asyncio.run(_add_products(builder, batch_size))
+    catalogue = builder.finish()
+
+    staging = out.with_name(out.name + ".building")
+    shutil.rmtree(staging, ignore_errors=True)
+    catalogue.save(staging)
+    previous = out.with_name(out.name + ".previous")
+    shutil.rmtree(previous, ignore_errors=True)
+    if out.exists():
+        out.rename(previous)
+    staging.rename(out)
+    shutil.rmtree(previous, ignore_errors=True)
+    typer.echo(f"Wrote {len(catalogue)} products ({len(catalogue.name_offsets) - 1} distinct names, "
+               f"{catalogue.nbytes / 2**20:.1f} MiB) to {out} in {time.perf_counter() - started:.1f}s")
+
+
+@app.command()
+def lookup(
+    barcode: str,
+    path: Path = typer.Option(Path("catalogue"), help="Catalogue directory"),
+):
+    """Print the catalogue entry for a barcode"""
+    try:
+        catalogue = NutritionCatalogue.load(path)
+    except CatalogueError as e:
+        raise typer.BadParameter(str(e))
+    entry = catalogue.get(barcode)
+    if entry is None:
+        typer.echo(f"{barcode} is not in the catalogue")
+        raise typer.Exit(1)
+    typer.echo(json.dumps(entry))
+
+
+if __name__ == "__main__":
+    app()
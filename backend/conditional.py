@@ -0,0 +1,85 @@
+"""Conditional GETs: ETag/Last-Modified validators and 304 responses.
+
+Read endpoints that clients poll compute a validator from a cheap projection
+(``updated_at`` for profiles and settings, the ordered ids for product and
+recipe lists, which are never edited in place) before loading the full
+documents. When the request's ``If-None-Match`` (or, without it,
+``If-Modified-Since``) still matches, they answer ``304 Not Modified`` and
+skip the full read, model validation and serialization.
+
+ETags are weak: the same data may be encoded differently depending on
+``FAST_JSON_RESPONSES``.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+import hashlib
+
+from fastapi import Request, Response
+
+# Re-validate every time (cheap with a 304), never share between users
+REVALIDATE = "private, no-cache"
+# Documents that never change once written
+IMMUTABLE = "private, max-age=31536000, immutable"
+
+
+def etag_for_timestamp(updated_at: datetime) -> str:
+    return f'W/"{int(_utc(updated_at).timestamp() * 1000):x}"'
+
+
+def etag_for_ids(ids: Iterable[str]) -> str:
+    digest = hashlib.sha1("\n".join(ids).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _utc(value: datetime) -> datetime:
+    # Stored datetimes are naive UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether the client's cached copy is current (weak comparison, If-None-Match first)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            return False
+        # HTTP dates have whole seconds
+        return _utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None,
+                      cache_control: str = REVALIDATE) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_utc(last_modified).replace(microsecond=0), usegmt=True)
+    return headers
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None,
+                 cache_control: str = REVALIDATE) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified, cache_control))
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def with_validators(response: Response, etag: str, last_modified: Optional[datetime] = None,
+                    cache_control: str = REVALIDATE) -> Response:
+    response.headers.update(validator_headers(etag, last_modified, cache_control))
+    return response
@@ -0,0 +1,126 @@
+"""The home screen's reads in one request.
+
+The dashboard used to be six calls (profile, settings, inventory alerts,
+shopping list, recent products, analytics summary), each with its own
+round trip. ``build`` resolves the requested sections in one request: every
+section runs concurrently on the request's ``Database``, and reads that
+several sections need (the profile, the product history, the inventory) are
+started once per request and awaited by each of them. A section that fails
+is reported under ``errors``; the others are still returned.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+
+from database import Database
+from services import AnalyticsService, NotificationService
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("profile", "settings", "inventory_alerts", "shopping_list", "recent_products", "analytics")
+
+# Products the analytics summary is computed over, as in /analytics/user/{user_id}/summary;
+# recent products are the newest of these
+PRODUCT_HISTORY = 100
+
+
+class DashboardError(ValueError):
+    pass
+
+
+def parse_sections(sections: Optional[str]) -> List[str]:
+    """Comma-separated section names in ``SECTIONS``; all of them when empty"""
+    requested = [name.strip() for name in (sections or "").split(",") if name.strip()]
+    unknown = sorted(set(requested) - set(SECTIONS))
+    if unknown:
+        raise DashboardError(f"Unknown dashboard sections: {', '.join(unknown)}")
+    return list(dict.fromkeys(requested)) or list(SECTIONS)
+
+
+class SharedReads:
+    """Reads of one user, each started at most once per request however many sections await it"""
+
+    def __init__(self, db: Database, user_id: str):
+        self.db = db
+        self.user_id = user_id
+        self._reads: Dict[str, asyncio.Future] = {}
+
+    def once(self, key: str, read: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        if key not in self._reads:
+            self._reads[key] = asyncio.ensure_future(read())
+        return self._reads[key]
+
+    def profile(self) -> asyncio.Future:
+        return self.once("profile", lambda: self.db.get_user_profile(self.user_id))
+
+    def products(self) -> asyncio.Future:
+        return self.once("products", lambda: self.db.get_products_by_user(self.user_id, PRODUCT_HISTORY, raw=True))
+
+    def inventory(self) -> asyncio.Future:
+        return self.once("inventory", lambda: self.db.get_user_inventory(self.user_id, raw=True))
+
+    def cancel(self) -> None:
+        for read in self._reads.values():
+            read.cancel()
+
+
+# Sections
+async def _profile(reads: SharedReads, options: dict):
+    return await reads.profile()
+
+async def _settings(reads: SharedReads, options: dict):
+    return await reads.db.get_user_settings(reads.user_id)
+
+async def _inventory_alerts(reads: SharedReads, options: dict):
+    inventory = await reads.inventory()
+    return {
+        "expiring_items": await NotificationService.check_expiring_items(inventory),
+        "low_stock_items": await NotificationService.check_low_stock(inventory),
+    }
+
+async def _shopping_list(reads: SharedReads, options: dict):
+    return await reads.db.get_user_shopping_list(reads.user_id)
+
+async def _recent_products(reads: SharedReads, options: dict):
+    return (await reads.products())[:options["products_limit"]]
+
+async def _analytics(reads: SharedReads, options: dict):
+    profile, products = await asyncio.gather(reads.profile(), reads.products())
+    summary = await AnalyticsService.calculate_nutrition_summary(products, options["days"])
+    insights = await AnalyticsService.generate_insights(profile.model_dump() if profile else {}, summary)
+    return {"nutrition_summary": summary, "insights": insights}
+
+SECTION_READERS = {
+    "profile": _profile,
+    "settings": _settings,
+    "inventory_alerts": _inventory_alerts,
+    "shopping_list": _shopping_list,
+    "recent_products": _recent_products,
+    "analytics": _analytics,
+}
+
+
+async def build(db: Database, user_id: str, sections: List[str], days: int = 7,
+                products_limit: int = 20) -> Dict[str, Any]:
+    """``{"user_id", <section>: value..., "errors": {section: message}}``"""
+    reads = SharedReads(db, user_id)
+    options = {"days": days, "products_limit": products_limit}
+    try:
+        results = await asyncio.gather(*(SECTION_READERS[name](reads, options) for name in sections),
+                                       return_exceptions=True)
+    finally:
+        # Only reads no section awaited are left, e.g. after the request was cancelled
+        reads.cancel()
+
+    dashboard: Dict[str, Any] = {"user_id": user_id}
+    errors: Dict[str, str] = {}
+    for name, result in zip(sections, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            logger.error(f"Error reading dashboard section {name} for {user_id}: {result}")
+            errors[name] = f"Failed to get {name.replace('_', ' ')}"
+            result = None
+        dashboard[name] = result
+    dashboard["errors"] = errors
+    return dashboard
@@ -1,12 +1,52 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from models import *
 import os
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional, Tuple, Union, overload
 from datetime import datetime
+import asyncio
 import logging
+import uuid
+from functools import lru_cache
+from pydantic import TypeAdapter
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from tracing import instrument, tracer
+import meal_planner
+import nutrition
+import read_cache
+import write_behind
 
 logger = logging.getLogger(__name__)
 
+# Model (de)serialization helpers, traced so their cost shows up next to the query.
+# Lists go through a cached TypeAdapter: one validator call for the whole result
+# set is ~1.7x faster than constructing models one by one (see benchmarks/models_bench.py).
+@lru_cache(maxsize=None)
+def _list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+def _to_model(model, data: dict):
+    with tracer.start_span("model.validate", {"model": model.__name__}):
+        return model.model_validate(data)
+
+def _to_models(model, documents: List[dict]) -> list:
+    with tracer.start_span("model.validate", {"model": model.__name__, "count": len(documents)}):
+        return _list_adapter(model).validate_python(documents)
+
+# Documents are model dumps, so list reads can skip _id and be returned as-is
+# (``raw=True``) by endpoints that trust them; see serialization.py
+RAW_PROJECTION = {"_id": 0}
+
+# Ids per $in query in get_many; longer lists are read in concurrent chunks
+GET_MANY_CHUNK = 1000
+
+DUPLICATE_KEY = 11000
+
+def _to_document(obj) -> dict:
+    with tracer.start_span("model.dump", {"model": type(obj).__name__}):
+        return obj.model_dump()
+
+@instrument("db", kind="client")
 class Database:
     def __init__(self, client: AsyncIOMotorClient, db_name: str):
         self.client = client
@@ -22,31 +62,54 @@ class Database:
         self.chat_messages = self.db.chat_messages
         self.community_posts = self.db.community_posts
         self.achievements = self.db.achievements
+        self.analytics_reports = self.db.analytics_reports
+        self.user_insights = self.db.user_insights
+        self.meal_plans = self.db.meal_plans
+        self.receipt_scans = self.db.receipt_scans
+        self.product_rollups = self.db.product_rollups
+        self.lifecycle_state = self.db.lifecycle_state
+
+    async def ensure_indexes(self) -> None:
+        """Keys that writes rely on for correctness, not just speed"""
+        # The receipt claim upsert is only exclusive across workers with a unique key
+        await self.receipt_scans.create_index([("user_id", 1), ("image_hash", 1)], unique=True)
+        await self.receipt_scans.create_index("id")
 
     # User Profile operations
     async def create_user_profile(self, profile_data: UserProfileCreate) -> UserProfile:
-        # Calculate BMR if we have the required data
-        bmr = None
-        if profile_data.weight and profile_data.height and profile_data.age and profile_data.gender:
-            bmr = self._calculate_bmr(
-                profile_data.weight, 
-                profile_data.height, 
-                profile_data.age, 
-                profile_data.gender,
-                profile_data.activity_level
-            )
-        
-        profile = UserProfile(**profile_data.dict(), bmr=bmr)
-        await self.user_profiles.insert_one(profile.dict())
+        # Targets (and the legacy bmr figure) need weight, height, age and gender
+        targets = nutrition.targets_for([profile_data.model_dump()])[0]
+        profile = UserProfile(**profile_data.model_dump(), bmr=nutrition.legacy_bmr(targets), targets=targets)
+        await self.user_profiles.insert_one(_to_document(profile))
         return profile
 
     async def get_user_profile(self, profile_id: str) -> Optional[UserProfile]:
         profile_data = await self.user_profiles.find_one({"id": profile_id})
-        return UserProfile(**profile_data) if profile_data else None
+        return _to_model(UserProfile, profile_data) if profile_data else None
+
+    async def get_user_profiles(self, profile_ids: List[str], raw: bool = False) -> List[Optional[UserProfile]]:
+        # Not read-cached: profiles are edited, and other workers' edits would be served stale
+        return await self.get_many("user_profiles", UserProfile, profile_ids, raw, cached=False)
+
+    async def get_user_profile_version(self, profile_id: str) -> Optional[dict]:
+        """Just ``updated_at``, for conditional reads; None if there is no such profile"""
+        return await self.user_profiles.find_one({"id": profile_id}, {"_id": 0, "updated_at": 1})
 
     async def update_user_profile(self, profile_id: str, update_data: UserProfileUpdate) -> Optional[UserProfile]:
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
+        update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
+
+        # Keep bmr/targets in step with the inputs they were computed from
+        if any(field in update_dict for field in nutrition.TARGET_INPUT_FIELDS):
+            current = await self.user_profiles.find_one(
+                {"id": profile_id},
+                {"_id": 0, **{field: 1 for field in nutrition.TARGET_INPUT_FIELDS}}
+            )
+            if current is None:
+                return None
+            targets = nutrition.targets_for([{**current, **update_dict}])[0]
+            update_dict["bmr"] = nutrition.legacy_bmr(targets)
+            update_dict["targets"] = targets.model_dump() if targets else None
         
         result = await self.user_profiles.update_one(
             {"id": profile_id}, 
@@ -63,16 +126,19 @@ class Database:
 
     # User Settings operations
     async def create_user_settings(self, user_id: str, settings_data: UserSettingsCreate) -> UserSettings:
-        settings = UserSettings(user_id=user_id, **settings_data.dict())
-        await self.user_settings.insert_one(settings.dict())
+        settings = UserSettings(user_id=user_id, **settings_data.model_dump())
+        await self.user_settings.insert_one(_to_document(settings))
         return settings
 
     async def get_user_settings(self, user_id: str) -> Optional[UserSettings]:
         settings_data = await self.user_settings.find_one({"user_id": user_id})
-        return UserSettings(**settings_data) if settings_data else None
+        return _to_model(UserSettings, settings_data) if settings_data else None
+
+    async def get_user_settings_version(self, user_id: str) -> Optional[dict]:
+        return await self.user_settings.find_one({"user_id": user_id}, {"_id": 0, "updated_at": 1})
 
     async def update_user_settings(self, user_id: str, update_data: UserSettingsUpdate) -> Optional[UserSettings]:
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
+        update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
         
         result = await self.user_settings.update_one(
@@ -87,37 +153,73 @@ class Database:
     # Product operations
     async def create_product(self, product_data: dict) -> Product:
         product = Product(**product_data)
-        await self.products.insert_one(product.dict())
+        await self.products.insert_one(_to_document(product))
         return product
 
-    async def get_products_by_user(self, user_id: str, limit: int = 100) -> List[Product]:
-        cursor = self.products.find({"scanned_by": user_id}).sort("created_at", -1).limit(limit)
+    @overload
+    async def get_products_by_user(self, user_id: str, limit: int = ..., raw: Literal[False] = ...) -> List[Product]: ...
+    @overload
+    async def get_products_by_user(self, user_id: str, limit: int = ..., *, raw: Literal[True]) -> List[dict]: ...
+    async def get_products_by_user(self, user_id: str, limit: int = 100, raw: bool = False) -> Union[List[Product], List[dict]]:
+        cursor = self.products.find({"scanned_by": user_id}, RAW_PROJECTION).sort("created_at", -1).limit(limit)
         products = await cursor.to_list(length=limit)
-        return [Product(**product) for product in products]
+        return products if raw else _to_models(Product, products)
+
+    async def get_product_ids_by_user(self, user_id: str, limit: int = 100) -> List[str]:
+        """Ids in ``get_products_by_user`` order; products are never edited, so this versions the list"""
+        cursor = self.products.find({"scanned_by": user_id}, {"_id": 0, "id": 1}).sort("created_at", -1).limit(limit)
+        return [product["id"] for product in await cursor.to_list(length=limit)]
+
+    async def get_products(self, product_ids: List[str], raw: bool = False) -> List[Optional[Product]]:
+        return await self.get_many("products", Product, product_ids, raw)
 
     async def get_product(self, product_id: str) -> Optional[Product]:
         product_data = await self.products.find_one({"id": product_id})
-        return Product(**product_data) if product_data else None
+        return _to_model(Product, product_data) if product_data else None
 
     # Recipe operations
     async def create_recipe(self, recipe_data: dict) -> Recipe:
         recipe = Recipe(**recipe_data)
-        await self.recipes.insert_one(recipe.dict())
+        await self.recipes.insert_one(_to_document(recipe))
+        # So this worker's next meal plan can use it
+        meal_planner.catalogue_cache.invalidate()
         return recipe
 
-    async def get_recipes_by_user(self, user_id: str, limit: int = 50) -> List[Recipe]:
-        cursor = self.recipes.find({"created_by": user_id}).sort("created_at", -1).limit(limit)
+    @overload
+    async def get_recipes_by_user(self, user_id: str, limit: int = ..., raw: Literal[False] = ...) -> List[Recipe]: ...
+    @overload
+    async def get_recipes_by_user(self, user_id: str, limit: int = ..., *, raw: Literal[True]) -> List[dict]: ...
+    async def get_recipes_by_user(self, user_id: str, limit: int = 50, raw: bool = False) -> Union[List[Recipe], List[dict]]:
+        cursor = self.recipes.find({"created_by": user_id}, RAW_PROJECTION).sort("created_at", -1).limit(limit)
         recipes = await cursor.to_list(length=limit)
-        return [Recipe(**recipe) for recipe in recipes]
+        return recipes if raw else _to_models(Recipe, recipes)
+
+    async def get_recipe_ids_by_user(self, user_id: str, limit: int = 50) -> List[str]:
+        cursor = self.recipes.find({"created_by": user_id}, {"_id": 0, "id": 1}).sort("created_at", -1).limit(limit)
+        return [recipe["id"] for recipe in await cursor.to_list(length=limit)]
+
+    async def get_recipes(self, recipe_ids: List[str], raw: bool = False) -> List[Optional[Recipe]]:
+        return await self.get_many("recipes", Recipe, recipe_ids, raw)
 
     async def get_recipe(self, recipe_id: str) -> Optional[Recipe]:
         recipe_data = await self.recipes.find_one({"id": recipe_id})
-        return Recipe(**recipe_data) if recipe_data else None
+        return _to_model(Recipe, recipe_data) if recipe_data else None
+
+    # Meal plan operations
+    async def save_meal_plan(self, plan: MealPlan) -> MealPlan:
+        await self.meal_plans.insert_one(_to_document(plan))
+        return plan
+
+    async def get_meal_plan(self, plan_id: str) -> Optional[dict]:
+        return await self.meal_plans.find_one({"id": plan_id}, RAW_PROJECTION)
+
+    async def get_latest_meal_plan(self, user_id: str) -> Optional[dict]:
+        return await self.meal_plans.find_one({"user_id": user_id}, RAW_PROJECTION, sort=[("created_at", -1)])
 
     # Shopping List operations
     async def create_shopping_list(self, shopping_data: ShoppingListCreate) -> ShoppingList:
-        shopping_list = ShoppingList(**shopping_data.dict())
-        await self.shopping_lists.insert_one(shopping_list.dict())
+        shopping_list = ShoppingList(**shopping_data.model_dump())
+        await self.shopping_lists.insert_one(_to_document(shopping_list))
         return shopping_list
 
     async def get_user_shopping_list(self, user_id: str) -> Optional[ShoppingList]:
@@ -126,10 +228,10 @@ class Database:
             {"user_id": user_id}, 
             sort=[("created_at", -1)]
         )
-        return ShoppingList(**shopping_data) if shopping_data else None
+        return _to_model(ShoppingList, shopping_data) if shopping_data else None
 
     async def update_shopping_list(self, list_id: str, update_data: ShoppingListUpdate) -> Optional[ShoppingList]:
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
+        update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
         
         result = await self.shopping_lists.update_one(
@@ -139,22 +241,89 @@ class Database:
         
         if result.modified_count:
             shopping_data = await self.shopping_lists.find_one({"id": list_id})
-            return ShoppingList(**shopping_data) if shopping_data else None
+            return _to_model(ShoppingList, shopping_data) if shopping_data else None
         return None
 
+    async def get_shopping_list(self, list_id: str) -> Optional[dict]:
+        return await self.shopping_lists.find_one({"id": list_id}, RAW_PROJECTION)
+
+    async def save_shopping_list(self, shopping_list: ShoppingList) -> ShoppingList:
+        await self.shopping_lists.insert_one(_to_document(shopping_list))
+        return shopping_list
+
+    # Shopping list item operations: single-element updates instead of rewriting ``items``
+    async def find_shopping_item(self, list_id: str, match: dict) -> Optional[dict]:
+        """First item of the list matching ``match``"""
+        document = await self.shopping_lists.find_one({"id": list_id}, {"_id": 0, "items": {"$elemMatch": match}})
+        items = (document or {}).get("items")
+        return items[0] if items else None
+
+    async def get_shopping_item(self, list_id: str, item_id: str) -> Optional[ShoppingItem]:
+        item = await self.find_shopping_item(list_id, {"id": item_id})
+        return _to_model(ShoppingItem, item) if item else None
+
+    async def push_shopping_item(self, list_id: str, item: ShoppingItem) -> Optional[ShoppingItem]:
+        result = await self.shopping_lists.update_one(
+            {"id": list_id},
+            {"$push": {"items": _to_document(item)}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return item if result.matched_count else None
+
+    async def set_shopping_item_fields(self, list_id: str, match: dict, fields: dict) -> bool:
+        """``$set`` fields on the first item matching ``match``, leaving the rest of the array untouched"""
+        result = await self.shopping_lists.update_one(
+            {"id": list_id, "items": {"$elemMatch": match}},
+            {"$set": {**{f"items.$.{k}": v for k, v in fields.items()}, "updated_at": datetime.utcnow()}}
+        )
+        return result.matched_count > 0
+
+    async def update_shopping_item(self, list_id: str, item_id: str, update_data: ShoppingItemUpdate) -> Optional[ShoppingItem]:
+        fields = {k: v for k, v in update_data.model_dump().items() if v is not None}
+        if not await self.set_shopping_item_fields(list_id, {"id": item_id}, fields):
+            return None
+        return await self.get_shopping_item(list_id, item_id)
+
+    async def remove_shopping_item(self, list_id: str, item_id: str) -> bool:
+        result = await self.shopping_lists.update_one(
+            {"id": list_id, "items.id": item_id},
+            {"$pull": {"items": {"id": item_id}}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+        return result.modified_count > 0
+
+    async def apply_shopping_diff(self, list_id: str, diff) -> int:
+        """Apply a shopping.ListDiff as one ordered bulk write of per-item operations"""
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne({"id": list_id, "items.id": item_id},
+                      {"$set": {**{f"items.$.{k}": v for k, v in fields.items()}, "updated_at": now}})
+            for item_id, fields in diff.updates.items()
+        ]
+        if diff.removals:
+            requests.append(UpdateOne({"id": list_id}, {"$pull": {"items": {"id": {"$in": diff.removals}}}}))
+        if diff.additions:
+            requests.append(UpdateOne({"id": list_id}, {"$push": {"items": {"$each": [_to_document(i) for i in diff.additions]}}}))
+        if not requests:
+            return 0
+        result = await self.shopping_lists.bulk_write(requests, ordered=True)
+        return result.modified_count
+
     # Inventory operations
     async def create_inventory_item(self, item_data: InventoryItemCreate) -> InventoryItem:
-        item = InventoryItem(**item_data.dict())
-        await self.inventory_items.insert_one(item.dict())
+        item = InventoryItem(**item_data.model_dump())
+        await self.inventory_items.insert_one(_to_document(item))
         return item
 
-    async def get_user_inventory(self, user_id: str) -> List[InventoryItem]:
-        cursor = self.inventory_items.find({"user_id": user_id}).sort("created_at", -1)
+    @overload
+    async def get_user_inventory(self, user_id: str, raw: Literal[False] = ...) -> List[InventoryItem]: ...
+    @overload
+    async def get_user_inventory(self, user_id: str, *, raw: Literal[True]) -> List[dict]: ...
+    async def get_user_inventory(self, user_id: str, raw: bool = False) -> Union[List[InventoryItem], List[dict]]:
+        cursor = self.inventory_items.find({"user_id": user_id}, RAW_PROJECTION).sort("created_at", -1)
         items = await cursor.to_list(length=None)
-        return [InventoryItem(**item) for item in items]
+        return items if raw else _to_models(InventoryItem, items)
 
     async def update_inventory_item(self, item_id: str, update_data: InventoryItemUpdate) -> Optional[InventoryItem]:
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
+        update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
         
         result = await self.inventory_items.update_one(
@@ -164,7 +333,7 @@ class Database:
         
         if result.modified_count:
             item_data = await self.inventory_items.find_one({"id": item_id})
-            return InventoryItem(**item_data) if item_data else None
+            return _to_model(InventoryItem, item_data) if item_data else None
         return None
 
     async def delete_inventory_item(self, item_id: str) -> bool:
@@ -181,7 +350,7 @@ class Database:
         }).sort("expiry", 1)
         
         items = await cursor.to_list(length=None)
-        return [InventoryItem(**item) for item in items]
+        return _to_models(InventoryItem, items)
 
     async def get_low_stock_items(self, user_id: str) -> List[InventoryItem]:
         cursor = self.inventory_items.find({
@@ -190,40 +359,72 @@ class Database:
         })
         
         items = await cursor.to_list(length=None)
-        return [InventoryItem(**item) for item in items]
+        return _to_models(InventoryItem, items)
+
+    # Receipt scans, one per (user, image hash)
+    async def claim_receipt_scan(self, user_id: str, image_hash: str) -> Tuple[str, Optional[dict]]:
+        """Id of a new "processing" scan, or of the existing one together with its document"""
+        scan = {"id": str(uuid.uuid4()), "user_id": user_id, "image_hash": image_hash,
+                "status": "processing", "created_at": datetime.utcnow()}
+        try:
+            result = await self.receipt_scans.update_one(
+                {"user_id": user_id, "image_hash": image_hash}, {"$setOnInsert": scan}, upsert=True
+            )
+            if result.upserted_id is not None:
+                return scan["id"], None
+        except DuplicateKeyError:
+            # A concurrent upsert (maybe in another worker) inserted the scan first
+            pass
+        stored = await self.receipt_scans.find_one({"user_id": user_id, "image_hash": image_hash}, RAW_PROJECTION)
+        return stored["id"], stored
+
+    async def complete_receipt_scan(self, scan_id: str, document: dict) -> None:
+        await self.receipt_scans.update_one({"id": scan_id}, {"$set": document})
+
+    async def release_receipt_scan(self, scan_id: str) -> None:
+        await self.receipt_scans.delete_one({"id": scan_id, "status": "processing"})
 
     # Chat operations
     async def create_chat_message(self, message_data: ChatMessageCreate, message_type: MessageType) -> ChatMessage:
         message = ChatMessage(
             message_type=message_type,
-            **message_data.dict()
+            **message_data.model_dump()
         )
-        await self.chat_messages.insert_one(message.dict())
+        # Written behind the response; history reads may trail by one flush interval
+        await write_behind.buffer.insert(self.chat_messages, _to_document(message))
         return message
 
-    async def get_chat_history(self, user_id: str, session_id: str, limit: int = 50) -> List[ChatMessage]:
+    @overload
+    async def get_chat_history(self, user_id: str, session_id: str, limit: int = ..., raw: Literal[False] = ...) -> List[ChatMessage]: ...
+    @overload
+    async def get_chat_history(self, user_id: str, session_id: str, limit: int = ..., *, raw: Literal[True]) -> List[dict]: ...
+    async def get_chat_history(self, user_id: str, session_id: str, limit: int = 50, raw: bool = False) -> Union[List[ChatMessage], List[dict]]:
         cursor = self.chat_messages.find({
             "user_id": user_id, 
             "session_id": session_id
-        }).sort("timestamp", 1).limit(limit)
+        }, RAW_PROJECTION).sort("timestamp", 1).limit(limit)
         
         messages = await cursor.to_list(length=limit)
-        return [ChatMessage(**message) for message in messages]
+        return messages if raw else _to_models(ChatMessage, messages)
 
     # Community operations
     async def create_community_post(self, post_data: CommunityPostCreate) -> CommunityPost:
-        post = CommunityPost(**post_data.dict())
-        await self.community_posts.insert_one(post.dict())
+        post = CommunityPost(**post_data.model_dump())
+        await self.community_posts.insert_one(_to_document(post))
         return post
 
-    async def get_community_posts(self, limit: int = 50, tag_filter: Optional[str] = None) -> List[CommunityPost]:
+    @overload
+    async def get_community_posts(self, limit: int = ..., tag_filter: Optional[str] = ..., raw: Literal[False] = ...) -> List[CommunityPost]: ...
+    @overload
+    async def get_community_posts(self, limit: int = ..., tag_filter: Optional[str] = ..., *, raw: Literal[True]) -> List[dict]: ...
+    async def get_community_posts(self, limit: int = 50, tag_filter: Optional[str] = None, raw: bool = False) -> Union[List[CommunityPost], List[dict]]:
         query = {}
         if tag_filter:
             query["tags"] = tag_filter
             
-        cursor = self.community_posts.find(query).sort("created_at", -1).limit(limit)
+        cursor = self.community_posts.find(query, RAW_PROJECTION).sort("created_at", -1).limit(limit)
         posts = await cursor.to_list(length=limit)
-        return [CommunityPost(**post) for post in posts]
+        return posts if raw else _to_models(CommunityPost, posts)
 
     async def like_post(self, post_id: str, user_id: str) -> bool:
         # Check if user already liked the post
@@ -254,22 +455,172 @@ class Database:
         
         return result.modified_count > 0
 
+    # Analytics report operations
+    async def save_analytics_report(self, report: dict) -> None:
+        await self.analytics_reports.insert_one(dict(report))
+
+    async def get_latest_analytics_report(self, report_type: str) -> Optional[dict]:
+        return await self.analytics_reports.find_one(
+            {"report_type": report_type},
+            RAW_PROJECTION,
+            sort=[("generated_at", -1)]
+        )
+
+    # Data lifecycle operations (see lifecycle.py)
+    async def save_product_rollups(self, documents: List[dict], batch_size: int = 1000) -> int:
+        """Insert (user, day) rollups; a day that already has one keeps it"""
+        written = 0
+        for start in range(0, len(documents), batch_size):
+            requests = [
+                UpdateOne({"user_id": document["user_id"], "day": document["day"]},
+                          {"$setOnInsert": document}, upsert=True)
+                for document in documents[start:start + batch_size]
+            ]
+            result = await self.product_rollups.bulk_write(requests, ordered=False)
+            written += result.upserted_count
+        return written
+
+    async def save_lifecycle_state(self, collection: str, fields: dict) -> None:
+        await self.lifecycle_state.update_one(
+            {"collection": collection}, {"$set": {**fields, "updated_at": datetime.utcnow()}}, upsert=True
+        )
+
+    async def get_compacted_before(self, collection: str) -> Optional[datetime]:
+        """Boundary below which ``collection`` is only available as rollups"""
+        state = await self.lifecycle_state.find_one({"collection": collection}, {"_id": 0, "compacted_before": 1})
+        return state.get("compacted_before") if state else None
+
+    async def count_older_than(self, collection_name: str, time_field: str, before: datetime) -> int:
+        return await self.db[collection_name].count_documents({time_field: {"$lt": before}})
+
+    async def get_oldest(self, collection_name: str, time_field: str, before: datetime, limit: int) -> List[dict]:
+        """The oldest ``limit`` documents from before ``before``, with their ``_id``"""
+        cursor = self.db[collection_name].find({time_field: {"$lt": before}}).sort(time_field, 1).limit(limit)
+        return await cursor.to_list(limit)
+
+    async def delete_documents(self, collection_name: str, object_ids: List) -> int:
+        result = await self.db[collection_name].delete_many({"_id": {"$in": object_ids}})
+        return result.deleted_count
+
+    async def save_archived(self, collection_name: str, documents: List[dict]) -> None:
+        """Copy documents to ``<collection>_archive``; ones already there (same ``_id``) are skipped"""
+        try:
+            await self.db[f"{collection_name}_archive"].insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            if any(error.get("code") != DUPLICATE_KEY for error in e.details.get("writeErrors", [])):
+                raise
+
+    # Stored insight operations
+    async def save_user_insights(self, documents: List[dict], batch_size: int = 1000) -> int:
+        """Upsert one insight document per user"""
+        written = 0
+        for start in range(0, len(documents), batch_size):
+            requests = [
+                UpdateOne({"user_id": document["user_id"]}, {"$set": document}, upsert=True)
+                for document in documents[start:start + batch_size]
+            ]
+            result = await self.user_insights.bulk_write(requests, ordered=False)
+            written += result.modified_count + result.upserted_count
+        return written
+
+    async def get_user_insights(self, user_id: str) -> Optional[dict]:
+        return await self.user_insights.find_one({"user_id": user_id}, RAW_PROJECTION)
+
+    # Nutrient target operations
+    async def recompute_targets(self, force: bool = False, batch_size: int = 1000) -> Dict[str, int]:
+        """Recompute bmr/targets for every profile computed with an older formula version"""
+        query = {} if force else {"targets.formula_version": {"$ne": nutrition.FORMULA_VERSION}}
+        projection = {"_id": 0, "id": 1, "targets": 1, **{field: 1 for field in nutrition.TARGET_INPUT_FIELDS}}
+        scanned = modified = incomplete = 0
+        now = datetime.utcnow()
+
+        async for batch in self.iter_batches("user_profiles", query, projection, batch_size):
+            scanned += len(batch)
+            requests = []
+            for profile, targets in zip(batch, nutrition.targets_for(batch)):
+                if targets is None and profile.get("targets") is None:
+                    # Inputs still incomplete: nothing to write, and updated_at (the ETag) stays put
+                    incomplete += 1
+                    continue
+                requests.append(UpdateOne({"id": profile["id"]}, {"$set": {
+                    "bmr": nutrition.legacy_bmr(targets),
+                    "targets": targets.model_dump() if targets else None,
+                    "updated_at": now,
+                }}))
+            if requests:
+                result = await self.user_profiles.bulk_write(requests, ordered=False)
+                modified += result.modified_count
+
+        return {"scanned": scanned, "modified": modified, "incomplete": incomplete,
+                "formula_version": nutrition.FORMULA_VERSION}
+
+    # Bulk reads by id
+    def _cache_namespace(self, collection_name: str) -> str:
+        return f"{self.db.name}.{collection_name}"
+
+    async def get_many(self, collection_name: str, model, ids: List[str], raw: bool = False,
+                       cached: bool = True) -> list:
+        """Documents by ``id`` in the order of ``ids`` (None where there is none).
+
+        One ``$in`` query per ``GET_MANY_CHUNK`` distinct ids, run concurrently, for
+        whatever the read cache (read_cache.py) doesn't already hold.
+        """
+        namespace = self._cache_namespace(collection_name)
+        distinct = list(dict.fromkeys(ids))
+        if cached:
+            found, missing = read_cache.cache.get_many(namespace, distinct)
+        else:
+            found, missing = {}, distinct
+        if missing:
+            collection = self.db[collection_name]
+            chunks = [missing[i:i + GET_MANY_CHUNK] for i in range(0, len(missing), GET_MANY_CHUNK)]
+            results = await asyncio.gather(*(
+                collection.find({"id": {"$in": chunk}}, RAW_PROJECTION).to_list(length=None) for chunk in chunks))
+            read = {document["id"]: document for documents in results for document in documents}
+            if cached:
+                read_cache.cache.put_many(namespace, read)
+            found.update(read)
+        documents = [found.get(id) for id in ids]
+        if raw:
+            # Cached documents are shared: callers get copies they are free to modify
+            return [dict(document) if document is not None else None for document in documents]
+        models = iter(_to_models(model, [document for document in documents if document is not None]))
+        return [next(models) if document is not None else None for document in documents]
+
+    # Batch scan operations
+    async def iter_batches(self, collection_name: str, query: dict, projection: Optional[dict] = None,
+                           batch_size: int = 1000, sort_field: Optional[str] = None):
+        """Stream matching documents through a server-side cursor as lists of ``batch_size``"""
+        cursor = self.db[collection_name].find(query, projection, allow_disk_use=True)
+        if sort_field:
+            cursor = cursor.sort(sort_field, 1)
+        cursor = cursor.batch_size(batch_size)
+
+        # Successive to_list calls continue the same cursor, one getMore round-trip per batch
+        while True:
+            batch = await cursor.to_list(length=batch_size)
+            if not batch:
+                break
+            yield batch
+            if len(batch) < batch_size:
+                break
+
+    async def iter_export_batches(self, source, user_id: Optional[str] = None, batch_size: int = 1000):
+        """Stream an export source (see export.py), batch by batch"""
+        if user_id:
+            query = {source.user_field: user_id}
+            sort_field = source.sort_field
+        else:
+            # Whole-collection exports follow _id order so no in-memory sort is needed
+            query, sort_field = {}, "_id"
+
+        async for batch in self.iter_batches(source.collection, query, source.projection, batch_size, sort_field):
+            yield batch
+
     # Utility methods
     def _calculate_bmr(self, weight: float, height: float, age: int, gender: str, activity_level: str) -> int:
         """Calculate Basal Metabolic Rate using Mifflin-St Jeor Equation"""
-        if gender.lower() == "male":
-            bmr = 10 * weight + 6.25 * height - 5 * age + 5
-        else:
-            bmr = 10 * weight + 6.25 * height - 5 * age - 161
-        
-        # Apply activity multiplier
-        activity_multipliers = {
-            "sedentary": 1.2,
-            "light": 1.375,
-            "moderate": 1.55,
-            "active": 1.725,
-            "very_active": 1.9
-        }
-        
-        multiplier = activity_multipliers.get(activity_level, 1.55)
-        return int(bmr * multiplier)
\ No newline at end of file
+        targets = nutrition.targets_for([{
+            "weight": weight, "height": height, "age": age, "gender": gender, "activity_level": activity_level
+        }])[0]
+        return nutrition.legacy_bmr(targets)
@@ -0,0 +1,190 @@
+"""Streaming export of a user's (or every user's) nutrition history.
+
+Documents are read through a server-side cursor in fixed-size batches and
+encoded batch by batch, so memory stays constant regardless of history size.
+Media fields (base64 images) are projected out in the query itself.
+
+Formats: NDJSON (any number of collections in one stream), CSV and Parquet
+(one collection per stream/file). Parquet needs the optional ``pyarrow``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, get_args, get_origin
+import csv
+import io
+
+from lazy_imports import available, lazy_import
+from models import ChatMessage, InventoryItem, Product
+from serialization import dumps
+
+# Optional, and only loaded by the first Parquet export
+pyarrow = lazy_import("pyarrow") if available("pyarrow") else None
+
+EXPORT_FORMATS = ("ndjson", "csv", "parquet")
+DEFAULT_BATCH_SIZE = 1000
+
+# Never exported: large inline media
+MEDIA_FIELDS = ("image_base64",)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@dataclass(frozen=True)
+class ExportSource:
+    collection: str
+    model: type
+    user_field: str
+    sort_field: str
+
+    @property
+    def columns(self) -> List[str]:
+        return [name for name in self.model.model_fields if name not in MEDIA_FIELDS]
+
+    @property
+    def projection(self) -> Dict[str, int]:
+        return {"_id": 0, **{name: 0 for name in MEDIA_FIELDS if name in self.model.model_fields}}
+
+
+EXPORT_SOURCES: Dict[str, ExportSource] = {
+    "products": ExportSource("products", Product, "scanned_by", "created_at"),
+    "inventory": ExportSource("inventory_items", InventoryItem, "user_id", "created_at"),
+    "chat": ExportSource("chat_messages", ChatMessage, "user_id", "timestamp"),
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def validate_request(fmt: str, sources: List[str]) -> None:
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    unknown = [name for name in sources if name not in EXPORT_SOURCES]
+    if unknown:
+        raise ExportError(f"Unknown collections: {', '.join(unknown)}")
+    if not sources:
+        raise ExportError("No collections requested")
+    if fmt != "ndjson" and len(sources) != 1:
+        raise ExportError(f"{fmt} exports hold a single collection; request one at a time")
+    if fmt == "parquet" and pyarrow is None:
+        raise ExportError("Parquet export requires the optional 'pyarrow' package")
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, dict)):
+        return dumps(value).decode("utf-8")
+    return value
+
+
+def _arrow_type(annotation):
+    if get_origin(annotation) is not None and type(None) in get_args(annotation):
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    if annotation is bool:
+        return pyarrow.bool_()
+    if annotation is int:
+        return pyarrow.int64()
+    if annotation is float:
+        return pyarrow.float64()
+    if annotation is datetime:
+        return pyarrow.timestamp("ms")
+    if get_origin(annotation) in (list, List):
+        return pyarrow.list_(pyarrow.string())
+    return pyarrow.string()
+
+
+def arrow_schema(source: ExportSource):
+    return pyarrow.schema([
+        (name, _arrow_type(source.model.model_fields[name].annotation)) for name in source.columns
+    ])
+
+
+def arrow_batch(source: ExportSource, schema, documents: List[Dict[str, Any]]):
+    """Documents as an Arrow table of ``schema`` (see ``arrow_schema``); also used by lifecycle.py"""
+    columns = {}
+    for name in source.columns:
+        values = [document.get(name) for document in documents]
+        if pyarrow.types.is_string(schema.field(name).type):
+            values = [None if v is None else (v.value if isinstance(v, Enum) else str(v)) for v in values]
+        columns[name] = values
+    return pyarrow.Table.from_pydict(columns, schema=schema)
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only buffer whose contents are handed out and cleared after every row group"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_export(db, sources: List[str], fmt: str = "ndjson", user_id: Optional[str] = None,
+                        batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Yield the encoded export one batch at a time"""
+    validate_request(fmt, sources)
+
+    if fmt == "ndjson":
+        for name in sources:
+            source = EXPORT_SOURCES[name]
+            async for batch in db.iter_export_batches(source, user_id, batch_size):
+                yield b"".join(dumps({"collection": name, **document}) + b"\n" for document in batch)
+        return
+
+    source = EXPORT_SOURCES[sources[0]]
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=source.columns, extrasaction="ignore")
+        writer.writeheader()
+        async for batch in db.iter_export_batches(source, user_id, batch_size):
+            writer.writerows({k: _csv_value(v) for k, v in document.items()} for document in batch)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+        return
+
+    import pyarrow.parquet
+    schema = arrow_schema(source)
+    sink = _DrainableSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        async for batch in db.iter_export_batches(source, user_id, batch_size):
+            writer.write_table(arrow_batch(source, schema, batch))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_filename(fmt: str, sources: List[str], user_id: Optional[str]) -> str:
+    scope = user_id or "all-users"
+    return f"nutrition-export-{scope}-{'-'.join(sources)}.{fmt}"
@@ -0,0 +1,63 @@
+"""Command-line export of nutrition history.
+
+Examples (run from ``backend/``):
+    python export_cli.py --user-id <id> --format ndjson --out exports/
+    python export_cli.py --format parquet --collections products --out exports/   # all users
+"""
+from pathlib import Path
+from typing import Optional
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+import typer
+
+from database import Database
+from export import EXPORT_SOURCES, ExportError, export_filename, stream_export, validate_request
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(add_completion=False)
+
+
+async def _export(user_id: Optional[str], fmt: str, collections: list, out: Path, batch_size: int) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = Database(client, os.environ.get('DB_NAME', 'nutritionist_app'))
+    out.mkdir(parents=True, exist_ok=True)
+    try:
+        # NDJSON bundles every collection in one file; columnar formats get one file each
+        groups = [collections] if fmt == "ndjson" else [[name] for name in collections]
+        for sources in groups:
+            path = out / export_filename(fmt, sources, user_id)
+            written = 0
+            with open(path, "wb") as f:
+                async for chunk in stream_export(db, sources, fmt, user_id, batch_size):
+                    f.write(chunk)
+                    written += len(chunk)
+            typer.echo(f"Wrote {written} bytes to {path}")
+    finally:
+        client.close()
+
+
+@app.command()
+def export(
+    user_id: Optional[str] = typer.Option(None, help="Export a single user; omit for all users"),
+    format: str = typer.Option("ndjson", help="ndjson, csv or parquet"),
+    collections: str = typer.Option(",".join(EXPORT_SOURCES), help="Comma-separated: products,inventory,chat"),
+    out: Path = typer.Option(Path("exports"), help="Output directory"),
+    batch_size: int = typer.Option(1000, help="Documents fetched and encoded per batch"),
+):
+    """Export products, inventory and chat history without media fields"""
+    sources = [name.strip() for name in collections.split(",") if name.strip()]
+    try:
+        for name in sources:
+            validate_request(format, [name])
+    except ExportError as e:
+        raise typer.BadParameter(str(e))
+    asyncio.run(_export(user_id, format, sources, out, batch_size))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,40 @@
+"""Production entry point: N uvicorn workers under gunicorn.
+
+Run from ``backend/``:
+    gunicorn server:app -c gunicorn.conf.py
+
+The app is imported once in the master (``preload_app``), which builds the
+shared read-only data (see warmup.py) before forking; workers then share
+those pages copy-on-write. Nothing in the import opens a socket or starts a
+thread: the Mongo client connects on first use, and pools, the provider
+HTTP client and background tasks start inside each worker. Each worker runs
+its own lifespan warm-up and reports ready on /api/health/ready when done.
+
+    WEB_CONCURRENCY           workers (default: one per CPU)
+    BIND                      listen address (default 0.0.0.0:8001)
+    GUNICORN_TIMEOUT          seconds before a silent worker is restarted (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT seconds a worker gets to drain on shutdown (default 30)
+    GUNICORN_MAX_REQUESTS     recycle workers after this many requests, 0 = never (default 0)
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get("BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+accesslog = "-"
+
+
+def when_ready(server):
+    # The app is loaded; move everything allocated so far out of the collector's reach,
+    # so garbage collection in the workers doesn't write to (and un-share) preloaded pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded app, forking {workers} workers ({gc.get_freeze_count()} objects frozen)")
@@ -0,0 +1,353 @@
+"""Idempotency-Key support for endpoints that call external services or create documents.
+
+A client that retries ``POST /api/products/scan``, ``/recipes/generate``,
+``/inventory/scan-receipt`` (and their ``/upload`` variants) or
+``/community/posts`` with the same ``Idempotency-Key`` header gets the
+response of the first attempt instead of a second provider call and a second
+set of documents:
+
+* the first request claims the key in the ``idempotency_keys`` collection and
+  runs; its response (status, headers, body) is stored with an ``expires_at``
+  for the TTL index
+* a retry after that is answered from the stored response, marked with
+  ``Idempotent-Replayed: true``
+* a retry while the first is still running waits for it: on an in-process
+  future when both hit the same worker, else by polling the claim, and gets
+  409 with ``Retry-After`` if it is not done within ``IDEMPOTENCY_WAIT_SECONDS``
+* the same key with a different request (method, path, query, body) is 422
+
+Keys are scoped to the user (see ``admission.user_from_scope``, falling back
+to the JSON body's ``user_id``/``author_id`` and then the client address), so
+two users who happen to pick the same key never see each other's responses.
+
+5xx responses and 408/409/425/429 are not stored, so those retries run again.
+The whole body is hashed into the fingerprint as it is read, whatever its
+size or transfer encoding; bodies over ``SPOOL_BYTES`` (image uploads) are
+spooled to a temporary file for the app rather than held in memory, and
+bodies over ``MAX_BODY_BYTES`` are refused with 413.
+Store errors fail open: the request runs as if it had no key.
+
+    IDEMPOTENCY_ENABLED         0 turns the middleware into a pass-through
+    IDEMPOTENCY_TTL_HOURS       how long responses are kept (default 24)
+    IDEMPOTENCY_WAIT_SECONDS    how long a concurrent retry waits (default 30)
+    IDEMPOTENCY_LOCK_SECONDS    a claim older than this is taken over (default 120)
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+from pymongo.errors import DuplicateKeyError
+
+from admission import BODY_PEEK_BYTES, client_key, user_from_body, user_from_scope
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.environ.get("IDEMPOTENCY_ENABLED", "1") not in ("0", "false", "off")
+TTL = timedelta(hours=float(os.environ.get("IDEMPOTENCY_TTL_HOURS", "24")))
+WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "30"))
+LOCK = timedelta(seconds=float(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", "120")))
+POLL_INTERVAL = 0.1
+SPOOL_BYTES = 1024 * 1024
+MAX_BODY_BYTES = 32 * 1024 * 1024
+REPLAY_CHUNK_BYTES = 256 * 1024
+MAX_STORED_BYTES = 1024 * 1024
+MAX_KEY_LENGTH = 255
+
+ROUTES = [re.compile(pattern) for pattern in (
+    r"^POST /api/products/scan(/upload)?$",
+    r"^POST /api/recipes/generate$",
+    r"^POST /api/inventory/scan-receipt(/upload)?$",
+    r"^POST /api/community/posts$",
+)]
+
+# Outcomes a retry should re-run rather than replay
+UNSTORED_STATUSES = {408, 409, 425, 429}
+HEADER = b"idempotency-key"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+CONFLICT = "Idempotency-Key was already used for a different request"
+IN_PROGRESS = "A request with this Idempotency-Key is still in progress"
+
+
+def fingerprint(method: str, path: str, query: bytes, body_sha256: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}?".encode("latin-1") + query + b"\n")
+    digest.update(body_sha256)
+    return digest.hexdigest()
+
+
+class BodyTooLargeError(ValueError):
+    pass
+
+
+class _Body:
+    """A request body read once, hashed chunk by chunk, and replayed to the app"""
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._file = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        # Set when the client went away before the end of the body
+        self.disconnect: Optional[dict] = None
+        self._replayed = False
+
+    async def read(self) -> None:
+        more = True
+        while more:
+            message = await self._receive()
+            if message["type"] != "http.request":
+                self.disconnect = message
+                break
+            chunk = message.get("body", b"")
+            self.size += len(chunk)
+            if self.size > MAX_BODY_BYTES:
+                raise BodyTooLargeError(f"Request body exceeds {MAX_BODY_BYTES} bytes")
+            self.sha256.update(chunk)
+            self._file.write(chunk)
+            more = message.get("more_body", False)
+        self._file.seek(0)
+
+    def peek(self, limit: int) -> Optional[bytes]:
+        """The whole body if it is at most ``limit`` bytes"""
+        if self.size > limit:
+            return None
+        data = self._file.read()
+        self._file.seek(0)
+        return data
+
+    async def receive(self):
+        if self._replayed:
+            return self.disconnect or await self._receive()
+        chunk = self._file.read(REPLAY_CHUNK_BYTES)
+        self._replayed = self._file.tell() >= self.size
+        return {"type": "http.request", "body": chunk, "more_body": not self._replayed}
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# Store
+class IdempotencyStore:
+    """Claims and stored responses in ``idempotency_keys``, one document per key"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index("key", unique=True)
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def claim(self, key: str, fingerprint: str) -> Tuple[bool, Optional[dict]]:
+        """(True, None) if this request owns the key now, else (False, stored document)"""
+        now = datetime.utcnow()
+        claim = {"key": key, "fingerprint": fingerprint, "status": "in_progress",
+                 "locked_until": now + LOCK, "created_at": now, "expires_at": now + TTL}
+        try:
+            result = await self.collection.update_one({"key": key}, {"$setOnInsert": claim}, upsert=True)
+            if result.upserted_id is not None:
+                return True, None
+        except DuplicateKeyError:
+            # Lost an upsert race to another worker
+            pass
+        stored = await self.collection.find_one({"key": key}, {"_id": 0})
+        if stored is None:
+            # Expired between the two calls
+            return await self.claim(key, fingerprint)
+        if stored["status"] == "in_progress" and stored["fingerprint"] == fingerprint \
+                and stored["locked_until"] < now:
+            # The owner died mid-request; take the claim over
+            result = await self.collection.update_one(
+                {"key": key, "status": "in_progress", "locked_until": stored["locked_until"]},
+                {"$set": {"locked_until": now + LOCK, "expires_at": now + TTL}})
+            if result.modified_count:
+                return True, None
+        return False, stored
+
+    async def get(self, key: str) -> Optional[dict]:
+        return await self.collection.find_one({"key": key}, {"_id": 0})
+
+    async def complete(self, key: str, response: Dict[str, Any]) -> None:
+        await self.collection.update_one(
+            {"key": key, "status": "in_progress"},
+            {"$set": {"status": "done", "response": response, "expires_at": datetime.utcnow() + TTL}})
+
+    async def release(self, key: str) -> None:
+        await self.collection.delete_one({"key": key, "status": "in_progress"})
+
+
+class _Response:
+    """An ASGI response captured on its way to the client"""
+
+    def __init__(self):
+        self.status: Optional[int] = None
+        self.headers: List[Tuple[bytes, bytes]] = []
+        self.chunks: List[bytes] = []
+        self.size = 0
+
+    def record(self, message) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            self.headers = list(message.get("headers") or [])
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            self.size += len(body)
+            if self.size <= MAX_STORED_BYTES:
+                self.chunks.append(body)
+
+    @property
+    def storable(self) -> bool:
+        return self.status is not None and self.status < 500 and self.status not in UNSTORED_STATUSES \
+            and self.size <= MAX_STORED_BYTES
+
+    def document(self) -> Dict[str, Any]:
+        return {"status": self.status,
+                "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers],
+                "body": b"".join(self.chunks)}
+
+
+async def _send_stored(send, response: Dict[str, Any]) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response["headers"]]
+    await send({"type": "http.response.start", "status": response["status"], "headers": headers + [REPLAYED_HEADER]})
+    await send({"type": "http.response.body", "body": bytes(response["body"])})
+
+
+async def _send_error(send, status: int, detail: str, retry_after: Optional[int] = None) -> None:
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+    if retry_after is not None:
+        headers.append((b"retry-after", str(retry_after).encode("latin-1")))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware replaying the first response for a repeated ``Idempotency-Key``"""
+
+    def __init__(self, app, store: Optional[IdempotencyStore] = None):
+        self.app = app
+        self.store = store
+        self._in_flight: Dict[str, Tuple[str, "asyncio.Future[Optional[Dict[str, Any]]]"]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED or self.store is None:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        raw_key = headers.get(HEADER)
+        target = f"{scope['method']} {scope['path']}"
+        if raw_key is None or not any(route.match(target) for route in ROUTES):
+            await self.app(scope, receive, send)
+            return
+        if not raw_key or len(raw_key) > MAX_KEY_LENGTH:
+            await _send_error(send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+            return
+
+        body = _Body(receive)
+        try:
+            try:
+                await body.read()
+            except BodyTooLargeError as e:
+                await _send_error(send, 413, str(e))
+                return
+            if body.disconnect is not None:
+                # Client went away mid-body; let the app see it
+                await self.app(scope, body.receive, send)
+                return
+            await self._handle(scope, body, raw_key.decode("latin-1"), send)
+        finally:
+            body.close()
+
+    async def _handle(self, scope, body: _Body, raw_key: str, send) -> None:
+        target = f"{scope['method']} {scope['path']}"
+        user = user_from_scope(scope)
+        if not user and dict(scope.get("headers") or []).get(b"content-type", b"").startswith(b"application/json"):
+            peeked = body.peek(BODY_PEEK_BYTES)
+            user = user_from_body(peeked) if peeked is not None else None
+        key = f"{target}:{user or client_key(scope)}:{raw_key}"
+        request_fingerprint = fingerprint(scope["method"], scope["path"], scope.get("query_string", b""),
+                                          body.sha256.digest())
+        receive = body.receive
+
+        if key in self._in_flight:
+            # Same worker: wait on the original rather than the store
+            original_fingerprint, future = self._in_flight[key]
+            if original_fingerprint != request_fingerprint:
+                await _send_error(send, 422, CONFLICT)
+                return
+            try:
+                response = await asyncio.wait_for(asyncio.shield(future), WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                response = None
+            if response is None:
+                await _send_error(send, 409, IN_PROGRESS, 1)
+            else:
+                await _send_stored(send, response)
+            return
+
+        try:
+            owner, stored = await self.store.claim(key, request_fingerprint)
+        except Exception as e:
+            logger.warning(f"Idempotency store unavailable, running request without it: {e}")
+            await self.app(scope, receive, send)
+            return
+        if not owner:
+            await self._answer_retry(key, request_fingerprint, stored, send)
+            return
+        await self._execute(key, request_fingerprint, scope, receive, send)
+
+    async def _answer_retry(self, key: str, request_fingerprint: str, stored: dict, send) -> None:
+        if stored["fingerprint"] != request_fingerprint:
+            await _send_error(send, 422, CONFLICT)
+            return
+        if stored["status"] != "done":
+            # Another worker owns it: poll until it finishes
+            deadline = asyncio.get_running_loop().time() + WAIT_SECONDS
+            while stored is not None and stored["status"] != "done" \
+                    and asyncio.get_running_loop().time() < deadline:
+                await asyncio.sleep(POLL_INTERVAL)
+                stored = await self.store.get(key)
+            if stored is None or stored["status"] != "done":
+                # Released after a failure, or still running: the client retries later
+                await _send_error(send, 409, IN_PROGRESS, 1)
+                return
+        await _send_stored(send, stored["response"])
+
+    async def _execute(self, key: str, request_fingerprint: str, scope, receive, send) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (request_fingerprint, future)
+        response = _Response()
+
+        async def send_recording(message):
+            response.record(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_recording)
+        except BaseException:
+            # Waiters get 409 and retry; so does the client once it sees the failure
+            future.set_result(None)
+            self._in_flight.pop(key, None)
+            await self._release(key)
+            raise
+        self._in_flight.pop(key, None)
+        document = response.document() if response.status is not None else None
+        # Concurrent retries share this outcome even when it is not kept for later ones
+        future.set_result(document)
+        if response.storable:
+            try:
+                await self.store.complete(key, document)
+                return
+            except Exception as e:
+                logger.warning(f"Could not store idempotent response for {key}: {e}")
+        await self._release(key)
+
+    async def _release(self, key: str) -> None:
+        try:
+            await self.store.release(key)
+        except Exception as e:
+            logger.warning(f"Could not release idempotency key {key}: {e}")
@@ -0,0 +1,217 @@
+"""Scan image handling off the event loop.
+
+Scan images arrive either as base64 in a JSON body or as a multipart /
+``application/octet-stream`` upload. Uploads are streamed into a temporary
+file with the size limit enforced chunk by chunk; decoding, hashing and
+downscaling then run in a process pool, so a multi-MB image never holds the
+event loop. Downscaling needs Pillow; without it the image is passed on as
+is and only hashed.
+
+    SCAN_UPLOAD_MAX_BYTES   largest accepted image (default 10 MiB)
+    IMAGE_PROCESS_WORKERS   process pool size; 0 runs the work in threads
+    IMAGE_MAX_SIDE          longest side of the image sent to providers (default 1600)
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, NamedTuple, Optional, Tuple
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import mmap
+import os
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # optional: images are hashed but not downscaled
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+MAX_UPLOAD_BYTES = int(os.environ.get("SCAN_UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+PROCESS_WORKERS = int(os.environ.get("IMAGE_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_SIDE = int(os.environ.get("IMAGE_MAX_SIDE", "1600"))
+# Base64 payloads below this are cheaper to handle inline than to ship to a worker
+INLINE_BASE64_CHARS = 64 * 1024
+CHUNK_SIZE = 256 * 1024
+# Multipart framing and form fields on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+_SIGNATURES = [(b"\xff\xd8\xff", "jpeg"), (b"\x89PNG\r\n\x1a\n", "png"), (b"GIF8", "gif"), (b"RIFF", "webp")]
+
+
+class UploadError(ValueError):
+    pass
+
+
+class UploadTooLargeError(UploadError):
+    pass
+
+
+class ProcessedImage(NamedTuple):
+    sha256: str  # of the original bytes, so both upload paths dedup alike
+    size: int
+    format: str
+    width: Optional[int]
+    height: Optional[int]
+    image_base64: str  # downscaled when Pillow is available, else the original
+
+
+class Upload(NamedTuple):
+    path: str
+    size: int
+    fields: Dict[str, str]
+
+
+def _sniff(head: bytes) -> str:
+    for signature, name in _SIGNATURES:
+        if head.startswith(signature):
+            return name
+    return "unknown"
+
+
+def _downscale(data) -> Optional[Tuple[bytes, int, int]]:
+    """JPEG no larger than MAX_SIDE, or None when Pillow is missing or cannot read the data"""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+            image.thumbnail((MAX_SIDE, MAX_SIDE))
+            out = io.BytesIO()
+            image.convert("RGB").save(out, "JPEG", quality=85)
+            return out.getvalue(), width, height
+    except Exception:
+        return None
+
+
+def process_bytes(data) -> ProcessedImage:
+    """Hash, sniff and downscale one image (bytes or a memoryview)"""
+    digest = hashlib.sha256(data).hexdigest()
+    downscaled = _downscale(data)
+    if downscaled is None:
+        return ProcessedImage(digest, len(data), _sniff(bytes(data[:8])), None, None,
+                              base64.b64encode(data).decode("ascii"))
+    thumbnail, width, height = downscaled
+    return ProcessedImage(digest, len(data), _sniff(bytes(data[:8])), width, height,
+                          base64.b64encode(thumbnail).decode("ascii"))
+
+
+def process_file(path: str) -> ProcessedImage:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return process_bytes(b"")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return process_bytes(view)
+            finally:
+                view.release()
+
+
+def process_base64(image_base64: str) -> ProcessedImage:
+    """Decode a JSON-body image; text that is not valid base64 is hashed as is"""
+    data = image_base64.split(",", 1)[1] if image_base64.startswith("data:") else image_base64
+    try:
+        payload = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        digest = hashlib.sha256(data.encode("utf-8")).hexdigest()
+        return ProcessedImage(digest, len(data), "unknown", None, None, image_base64)
+    return process_bytes(payload)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+async def _run(fn, *args):
+    global _pool
+    if PROCESS_WORKERS <= 0:
+        return await asyncio.to_thread(fn, *args)
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+    return await asyncio.get_running_loop().run_in_executor(_pool, fn, *args)
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def process_base64_async(image_base64: str) -> ProcessedImage:
+    if len(image_base64) * 3 // 4 > MAX_UPLOAD_BYTES:
+        raise UploadTooLargeError(f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+    if len(image_base64) < INLINE_BASE64_CHARS:
+        return process_base64(image_base64)
+    return await _run(process_base64, image_base64)
+
+
+async def process_upload(upload: Upload) -> ProcessedImage:
+    """Process a received upload in the pool and remove its temporary file"""
+    try:
+        return await _run(process_file, upload.path)
+    finally:
+        discard(upload)
+
+
+def discard(upload: Upload) -> None:
+    try:
+        os.unlink(upload.path)
+    except FileNotFoundError:
+        pass
+
+
+async def receive_upload(request, limit: int = MAX_UPLOAD_BYTES) -> Upload:
+    """Stream a raw or multipart image body to a temporary file, failing as soon as it passes ``limit``"""
+    declared = request.headers.get("content-length")
+    content_type = request.headers.get("content-type", "")
+    multipart = content_type.startswith("multipart/form-data")
+    if declared and declared.isdigit() and int(declared) > limit + (MULTIPART_OVERHEAD if multipart else 0):
+        raise UploadTooLargeError(f"Image exceeds {limit} bytes")
+
+    target = tempfile.NamedTemporaryFile(prefix="scan-", suffix=".img", delete=False)
+    size, fields = 0, {}
+    try:
+        with target:
+            if multipart:
+                form = await request.form(max_files=1, max_fields=10)
+                try:
+                    upload = next((v for v in form.values() if hasattr(v, "read")), None)
+                    if upload is None:
+                        raise UploadError("Multipart body has no file part")
+                    fields = {k: v for k, v in form.items() if isinstance(v, str)}
+                    size = await asyncio.to_thread(_copy_limited, upload.file, target, limit)
+                finally:
+                    await form.close()
+            else:
+                async for chunk in request.stream():
+                    size += len(chunk)
+                    if size > limit:
+                        raise UploadTooLargeError(f"Image exceeds {limit} bytes")
+                    target.write(chunk)
+    except BaseException:
+        os.unlink(target.name)
+        raise
+    return Upload(target.name, size, fields)
+
+
+def _copy_limited(source, target, limit: int) -> int:
+    size = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            return size
+        size += len(chunk)
+        if size > limit:
+            raise UploadTooLargeError(f"Image exceeds {limit} bytes")
+        target.write(chunk)
+
+
+def describe(processed: ProcessedImage) -> Dict[str, object]:
+    """Image metadata for responses (without the payload)"""
+    return {"sha256": processed.sha256, "size": processed.size, "format": processed.format,
+            "width": processed.width, "height": processed.height}
+
@@ -0,0 +1,220 @@
+"""Ingredient canonicalisation: names, quantities, units and categories.
+
+Recipe ingredients, inventory items, shopping items and receipt lines are all
+free text ("2 cups baby spinach", "Organic Spinach", "pieces"). This module
+maps them onto one vocabulary:
+
+* ``canonical_name``  lower-case canonical ingredient ("organic spinach" -> "spinach")
+* ``parse_ingredient`` quantity, unit and name out of a recipe/receipt line
+* ``unit_info`` / ``convert``  unit aliases, dimensions and conversions
+* ``infer_category``  inventory/shopping category from the name
+
+The tables below are compiled into dicts and a single regex at import time,
+and the per-string functions are memoised with ``lru_cache``, so they can run
+on every receipt line and recipe ingredient.
+"""
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import re
+
+# canonical name -> variants seen in recipes and on receipts
+SYNONYMS: Dict[str, List[str]] = {
+    "spinach": ["baby spinach", "spinach leaves", "organic spinach"],
+    "greek yogurt": ["greek yoghurt", "plain greek yogurt", "organic greek yogurt", "greek style yogurt"],
+    "yogurt": ["yoghurt", "natural yogurt", "plain yogurt"],
+    "salmon": ["salmon fillet", "salmon fillets", "salmon filet", "fresh salmon fillet"],
+    "chicken breast": ["chicken breasts", "chicken fillet", "boneless chicken breast"],
+    "chicken": ["whole chicken"],
+    "berries": ["mixed berries", "fresh berries", "berry mix"],
+    "blueberries": ["blueberry"],
+    "whole grain bread": ["wholegrain bread", "whole wheat bread", "wholemeal bread"],
+    "bread": ["white bread", "loaf"],
+    "olive oil": ["extra virgin olive oil", "evoo"],
+    "almond milk": ["almond drink", "unsweetened almond milk"],
+    "milk": ["whole milk", "semi skimmed milk", "skimmed milk", "cow's milk"],
+    "cheddar": ["cheddar cheese", "mature cheddar"],
+    "brown rice": ["wholegrain rice"],
+    "rice": ["white rice", "long grain rice", "basmati rice", "jasmine rice"],
+    "oats": ["oat flakes", "rolled oats", "porridge oats", "oatmeal"],
+    "egg": ["eggs", "free range eggs", "large eggs"],
+    "tomato": ["tomatoes", "cherry tomatoes", "vine tomatoes"],
+    "banana": ["bananas"],
+    "lemon": ["lemons", "lemon juice"],
+    "garlic": ["garlic cloves", "garlic clove"],
+    "cucumber": ["cucumbers"],
+    "honey": ["raw honey", "runny honey"],
+    "onion": ["onions", "yellow onion", "red onion", "white onion"],
+    "avocado": ["avocados"],
+}
+
+# Words that describe an ingredient without changing what it is
+DESCRIPTORS = {"organic", "fresh", "large", "small", "medium", "chopped", "sliced", "diced", "minced",
+               "ripe", "raw", "free-range", "boneless", "skinless", "lean", "premium", "local"}
+
+# unit alias -> (canonical unit, dimension, factor to the dimension's base unit: g, ml or piece)
+UNITS: Dict[str, Tuple[str, str, float]] = {}
+for _canonical, _dimension, _factor, _aliases in [
+    ("mg", "mass", 0.001, ["mg", "milligram", "milligrams"]),
+    ("g", "mass", 1, ["g", "gr", "gram", "grams", "grammes"]),
+    ("kg", "mass", 1000, ["kg", "kgs", "kilo", "kilos", "kilogram", "kilograms"]),
+    ("oz", "mass", 28.3495, ["oz", "ounce", "ounces"]),
+    ("lb", "mass", 453.592, ["lb", "lbs", "pound", "pounds"]),
+    ("ml", "volume", 1, ["ml", "millilitre", "millilitres", "milliliter", "milliliters"]),
+    ("l", "volume", 1000, ["l", "litre", "litres", "liter", "liters"]),
+    ("tsp", "volume", 5, ["tsp", "teaspoon", "teaspoons"]),
+    ("tbsp", "volume", 15, ["tbsp", "tablespoon", "tablespoons"]),
+    ("cup", "volume", 240, ["cup", "cups"]),
+    ("pieces", "count", 1, ["piece", "pieces", "pc", "pcs", "x", "clove", "cloves", "can", "cans",
+                            "pack", "packs", "bunch", "bunches", "slice", "slices", "fillet", "fillets"]),
+]:
+    for _alias in _aliases:
+        UNITS[_alias] = (_canonical, _dimension, _factor)
+
+DEFAULT_UNIT = "pieces"
+BASE_UNITS = {"mass": "g", "volume": "ml", "count": "pieces"}
+
+# category -> name keywords, checked in order (first match wins)
+CATEGORY_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("Frozen", ["frozen", "ice cream"]),
+    ("Dairy", ["yogurt", "milk", "cheese", "cheddar", "butter", "cream", "egg", "kefir"]),
+    ("Meat", ["chicken", "beef", "pork", "lamb", "turkey", "bacon", "ham", "sausage", "salmon", "tuna",
+              "fish", "shrimp", "prawn", "cod"]),
+    ("Bakery", ["bread", "bagel", "tortilla", "croissant", "bun", "roll", "pita"]),
+    ("Pantry", ["rice", "oil", "honey", "flour", "pasta", "oat", "bean", "lentil", "sugar", "salt", "sauce",
+                "vinegar", "spice", "nut", "seed", "cereal", "quinoa"]),
+    ("Produce", ["spinach", "lettuce", "tomato", "banana", "berry", "berries", "blueberries", "strawberries",
+                 "raspberries", "lemon", "lime", "cucumber", "garlic", "onion", "apple", "avocado", "carrot",
+                 "pepper", "potato", "broccoli", "kale", "herb"]),
+]
+DEFAULT_CATEGORY = "Other"
+# Typical days until expiry, for items added without a date (receipts)
+SHELF_LIFE_DAYS = {"Produce": 7, "Dairy": 10, "Meat": 3, "Bakery": 5, "Pantry": 180, "Frozen": 90, DEFAULT_CATEGORY: 7}
+# Keywords match whole words, with an optional plural ("bun" matches "buns" but not "bunch")
+_CATEGORY_PATTERNS = [(category, re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")(?:e?s)?\b"))
+                      for category, keywords in CATEGORY_KEYWORDS]
+
+_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+_PUNCTUATION = re.compile(r"[^\w\s'-]")
+# A unit is only read after a quantity, so names such as "can of beans" or "slice" stay names
+_LINE = re.compile(
+    r"^\s*(?:(?P<quantity>\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?|[" + "".join(_FRACTIONS) + r"])(?![/\d])\s*"
+    r"(?:(?P<unit>" + "|".join(sorted(map(re.escape, UNITS), key=len, reverse=True)) + r")\b\.?\s*)?"
+    r"(?:of\s+)?)?(?P<name>.*?)\s*$",
+    re.IGNORECASE,
+)
+# Receipt style size after the name: "Greek Yogurt 500g", "Milk 1L"
+_TRAILING_SIZE = re.compile(
+    r"^(?P<name>.*?\S)\s*(?P<quantity>\d+(?:[.,]\d+)?)\s*"
+    r"(?P<unit>" + "|".join(sorted(map(re.escape, UNITS), key=len, reverse=True)) + r")\.?\s*$",
+    re.IGNORECASE,
+)
+
+_VARIANTS: Dict[str, str] = {variant: canonical for canonical, variants in SYNONYMS.items() for variant in variants}
+_VARIANTS.update({canonical: canonical for canonical in SYNONYMS})
+
+
+class UnitError(ValueError):
+    pass
+
+
+class ParsedIngredient(NamedTuple):
+    name: str  # canonical
+    quantity: float
+    unit: str  # canonical
+    dimension: str
+    base_quantity: float  # in g, ml or pieces
+    category: str
+
+
+def _clean(text: str) -> str:
+    words = _PUNCTUATION.sub(" ", text.lower()).split()
+    return " ".join(word for word in words if word not in DESCRIPTORS)
+
+
+@lru_cache(maxsize=65_536)
+def canonical_name(name: str) -> str:
+    """Lower-case canonical ingredient name; unknown names are cleaned but otherwise kept"""
+    raw = " ".join(name.lower().split())
+    if raw in _VARIANTS:
+        return _VARIANTS[raw]
+    cleaned = _clean(name)
+    if cleaned in _VARIANTS:
+        return _VARIANTS[cleaned]
+    # Simple plurals of known names
+    for stem in (cleaned[:-2] if cleaned.endswith("es") else None, cleaned[:-1] if cleaned.endswith("s") else None):
+        if stem and stem in _VARIANTS:
+            return _VARIANTS[stem]
+    return cleaned
+
+
+def display_name(name: str) -> str:
+    """Canonical name as shown in lists ("greek yogurt" -> "Greek Yogurt")"""
+    return " ".join(word.capitalize() for word in canonical_name(name).split())
+
+
+@lru_cache(maxsize=1024)
+def unit_info(unit: Optional[str]) -> Tuple[str, str, float]:
+    """(canonical unit, dimension, factor to base) for a unit; unknown or empty units count as pieces"""
+    return UNITS.get((unit or DEFAULT_UNIT).strip().lower().rstrip("."), UNITS[DEFAULT_UNIT])
+
+
+def to_base(quantity: float, unit: Optional[str]) -> Tuple[str, float]:
+    _, dimension, factor = unit_info(unit)
+    return dimension, quantity * factor
+
+
+def convert(quantity: float, from_unit: str, to_unit: str) -> float:
+    _, from_dimension, from_factor = unit_info(from_unit)
+    _, to_dimension, to_factor = unit_info(to_unit)
+    if from_dimension != to_dimension:
+        raise UnitError(f"Cannot convert {from_unit} ({from_dimension}) to {to_unit} ({to_dimension})")
+    return quantity * from_factor / to_factor
+
+
+def _quantity(text: Optional[str]) -> float:
+    if not text:
+        return 1.0
+    text = text.strip()
+    if text in _FRACTIONS:
+        return _FRACTIONS[text]
+    try:
+        if "/" in text:
+            whole, _, fraction = text.rpartition(" ")
+            numerator, denominator = fraction.split("/")
+            return (float(whole) if whole else 0.0) + float(numerator) / float(denominator)
+        return float(text.replace(",", "."))
+    except (ValueError, ZeroDivisionError):
+        # OCR and model output: "1/0", "1/2/3" count as no quantity at all
+        return 1.0
+
+
+@lru_cache(maxsize=65_536)
+def parse_ingredient(text: str) -> ParsedIngredient:
+    """Split "2 cups baby spinach" into quantity 2, unit cup, name spinach (480 ml, Produce).
+
+    A size after the name ("Greek Yogurt 500g") is read when there is no leading quantity.
+    """
+    match = _LINE.match(text)
+    if not match.group("quantity"):
+        match = _TRAILING_SIZE.match(text) or match
+    name, unit_text, quantity_text = match.group("name", "unit", "quantity")
+    if not name:
+        # Nothing left after the quantity ("2 cans"): keep the whole line as the name
+        name, unit_text = text, None
+    canonical_unit, dimension, factor = unit_info(unit_text)
+    quantity = _quantity(quantity_text)
+    canonical = canonical_name(name)
+    return ParsedIngredient(canonical, quantity, canonical_unit, dimension, quantity * factor, infer_category(canonical))
+
+
+@lru_cache(maxsize=65_536)
+def infer_category(name: str) -> str:
+    canonical = canonical_name(name)
+    for category, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(canonical):
+            return category
+    return DEFAULT_CATEGORY
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {fn.__name__: fn.cache_info()._asdict() for fn in (canonical_name, parse_ingredient, infer_category, unit_info)}
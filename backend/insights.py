@@ -0,0 +1,255 @@
+"""Declarative nutrition insight rules.
+
+Rules are plain data: every condition of a rule must hold for its message to
+be shown. A condition compares a metric (a ``UserProfile`` field, a nutrition
+summary field or a derived metric) against a constant or against another
+metric times a factor::
+
+    {"metric": "daily_calories", "op": "lt", "ref": "bmr", "factor": 0.8}
+    {"metric": "goals", "op": "contains", "value": "Weight Loss"}
+
+``compile_rules`` turns the rule list into an ``InsightEngine`` once, at
+import time. The engine evaluates one user (request path) or a whole DataFrame
+of users with column masks (nightly job). Set ``INSIGHT_RULES_FILE`` to a JSON file with the
+same structure to replace the built-in rules.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+import asyncio
+import hashlib
+import json
+import logging
+import operator
+import os
+
+import numpy as np
+
+from lazy_imports import lazy_import
+
+# Only the batch (DataFrame) path needs pandas
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+INSIGHT_RULES: List[Dict[str, Any]] = [
+    {
+        "id": "under_eating",
+        "message": "You might be under-eating. Consider adding healthy, calorie-dense foods like nuts, avocados, or olive oil.",
+        "when": [
+            {"metric": "bmr", "op": "truthy"},
+            {"metric": "total_calories", "op": "truthy"},
+            {"metric": "daily_calories", "op": "lt", "ref": "bmr", "factor": 0.8},
+        ],
+    },
+    {
+        "id": "over_eating",
+        "message": "You're consuming more calories than needed. Focus on portion control and nutrient-dense foods.",
+        "when": [
+            {"metric": "bmr", "op": "truthy"},
+            {"metric": "total_calories", "op": "truthy"},
+            {"metric": "daily_calories", "op": "gt", "ref": "bmr", "factor": 1.3},
+        ],
+    },
+    {
+        "id": "low_protein",
+        "message": "Try to increase your protein intake! Add Greek yogurt, lean meats, or legumes to your meals.",
+        "when": [{"metric": "avg_protein", "op": "lt", "value": 15, "default": 0}],
+    },
+    {
+        "id": "goal_weight_loss",
+        "message": "For weight loss, focus on high-protein, high-fiber foods that keep you full longer.",
+        "when": [{"metric": "goals", "op": "contains", "value": "Weight Loss"}],
+    },
+    {
+        "id": "goal_muscle_building",
+        "message": "Great choice for muscle building! Make sure to have protein within 30 minutes after workouts.",
+        "when": [{"metric": "goals", "op": "contains", "value": "Muscle Building"}],
+    },
+]
+
+FALLBACK_INSIGHT = "You're doing great! Keep focusing on balanced, nutritious meals."
+DEFAULT_PERIOD_DAYS = 7
+
+_COMPARISONS = {"lt": operator.lt, "le": operator.le, "gt": operator.gt, "ge": operator.ge,
+                "eq": operator.eq, "ne": operator.ne}
+OPERATORS = (*_COMPARISONS, "truthy", "contains")
+
+
+def _daily_calories(metrics: Dict[str, Any]) -> Any:
+    return (metrics.get("total_calories") or 0) / (metrics.get("period_days") or DEFAULT_PERIOD_DAYS)
+
+
+# Metrics computed from the raw profile/summary fields
+DERIVED_METRICS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "daily_calories": _daily_calories,
+}
+
+
+class RuleError(ValueError):
+    pass
+
+
+class InsightEngine:
+    """Compiled rule set; build with ``compile_rules``"""
+
+    def __init__(self, rules: List[Dict[str, Any]], fallback: str = FALLBACK_INSIGHT):
+        self.rules = rules
+        self.fallback = fallback
+        self.version = _fingerprint(rules)
+        self._predicates = [[self._compile_condition(c) for c in rule["when"]] for rule in rules]
+        self._metrics = sorted({c["metric"] for rule in rules for c in rule["when"]} |
+                               {c["ref"] for rule in rules for c in rule["when"] if "ref" in c})
+
+    @staticmethod
+    def _compile_condition(condition: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+        metric, op = condition["metric"], condition["op"]
+        default = condition.get("default")
+        if op == "truthy":
+            return lambda m: bool(m.get(metric))
+        if op == "contains":
+            value = condition["value"]
+            return lambda m: value in (m.get(metric) or ())
+
+        compare = _COMPARISONS[op]
+        if "ref" in condition:
+            ref, factor = condition["ref"], condition.get("factor", 1)
+
+            def predicate(m):
+                left, right = m.get(metric, default), m.get(ref)
+                return left is not None and right is not None and compare(left, right * factor)
+            return predicate
+
+        value = condition["value"]
+
+        def predicate(m):
+            left = m.get(metric, default)
+            return left is not None and compare(left, value)
+        return predicate
+
+    def metrics_for(self, profile: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+        metrics = {**profile, **summary}
+        for name, derive in DERIVED_METRICS.items():
+            metrics[name] = derive(metrics)
+        return metrics
+
+    def evaluate(self, profile: Dict[str, Any], summary: Dict[str, Any]) -> List[str]:
+        """Messages for one user, in rule order"""
+        metrics = self.metrics_for(profile, summary)
+        insights = [rule["message"] for rule, predicates in zip(self.rules, self._predicates)
+                    if all(predicate(metrics) for predicate in predicates)]
+        return insights or [self.fallback]
+
+    def _mask(self, frame: pd.DataFrame, condition: Dict[str, Any]) -> np.ndarray:
+        op = condition["op"]
+        column = frame[condition["metric"]]
+        if op == "contains":
+            # One row per list element, then fold back onto row positions
+            exploded = column.reset_index(drop=True).explode()
+            hits = np.zeros(len(column), dtype=bool)
+            hits[exploded.index[(exploded == condition["value"]).to_numpy(dtype=bool)]] = True
+            return hits
+
+        numeric = pd.to_numeric(column, errors="coerce")
+        if condition.get("default") is not None:
+            numeric = numeric.fillna(condition["default"])
+        if op == "truthy":
+            return (numeric.notna() & (numeric != 0)).to_numpy()
+        right = pd.to_numeric(frame[condition["ref"]], errors="coerce") * condition.get("factor", 1) \
+            if "ref" in condition else condition["value"]
+        # NaN compares False, matching the scalar path's None checks
+        return _COMPARISONS[op](numeric, right).to_numpy(dtype=bool)
+
+    def evaluate_frame(self, frame: pd.DataFrame) -> List[List[str]]:
+        """Messages for every row of ``frame`` (one column per metric), via boolean column masks"""
+        frame = frame.copy()
+        for metric in ("total_calories", "period_days", *self._metrics):
+            if metric not in frame and metric not in DERIVED_METRICS:
+                frame[metric] = np.nan
+        if "daily_calories" not in frame:
+            period = pd.to_numeric(frame["period_days"], errors="coerce").fillna(DEFAULT_PERIOD_DAYS)
+            frame["daily_calories"] = frame["total_calories"].fillna(0) / period.replace(0, DEFAULT_PERIOD_DAYS)
+
+        masks = np.column_stack([
+            np.logical_and.reduce([self._mask(frame, c) for c in rule["when"]])
+            for rule in self.rules
+        ]) if self.rules else np.zeros((len(frame), 0), dtype=bool)
+        # Few distinct rule combinations occur, so build each message list once and share it
+        codes = masks.astype(np.int64) @ (1 << np.arange(masks.shape[1], dtype=np.int64))
+        lists = {}
+        for code in np.unique(codes).tolist():
+            lists[code] = [rule["message"] for j, rule in enumerate(self.rules) if code >> j & 1] or [self.fallback]
+        return [lists[code] for code in codes.tolist()]
+
+
+def _fingerprint(rules: List[Dict[str, Any]]) -> str:
+    # Stable across processes, so every worker stamps the same ruleset version
+    return hashlib.sha1(json.dumps(rules, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def compile_rules(rules: List[Dict[str, Any]], fallback: str = FALLBACK_INSIGHT) -> InsightEngine:
+    """Validate rule data and build an ``InsightEngine``"""
+    for rule in rules:
+        if not rule.get("id") or not rule.get("message") or not rule.get("when"):
+            raise RuleError(f"Rule {rule.get('id', '?')} needs an id, a message and at least one condition")
+        for condition in rule["when"]:
+            if condition.get("op") not in OPERATORS:
+                raise RuleError(f"Rule {rule['id']}: unknown operator {condition.get('op')!r}")
+            if condition["op"] in _COMPARISONS and ("value" in condition) == ("ref" in condition):
+                raise RuleError(f"Rule {rule['id']}: comparisons need exactly one of 'value' or 'ref'")
+            if condition["op"] == "contains" and "value" not in condition:
+                raise RuleError(f"Rule {rule['id']}: 'contains' needs a 'value'")
+    return InsightEngine(rules, fallback)
+
+
+def _load_rules() -> List[Dict[str, Any]]:
+    path = os.environ.get("INSIGHT_RULES_FILE")
+    if not path:
+        return INSIGHT_RULES
+    with open(path) as f:
+        logger.info(f"Loading insight rules from {path}")
+        return json.load(f)
+
+
+engine = compile_rules(_load_rules())
+
+
+def insights_for(profile: Dict[str, Any], summary: Dict[str, Any]) -> List[str]:
+    """Single-user evaluation used by ``AnalyticsService.generate_insights``
+
+    Not memoized: the rules are precompiled and cheap next to the product
+    read and summary that produce ``summary``.
+    """
+    return engine.evaluate(profile, summary)
+
+
+def _evaluate_users(profiles: pd.DataFrame, users: pd.DataFrame, days: int) -> List[Dict[str, Any]]:
+    frame = profiles.join(users, how="left")
+    counts = frame["products"].where(frame["products"] > 0)
+    frame["total_calories"] = frame["calories"].fillna(0)
+    # Rounded like calculate_nutrition_summary so both paths agree on thresholds
+    frame["avg_protein"] = (frame["protein"] / counts).round(1).fillna(0)
+    frame["period_days"] = days
+
+    results = engine.evaluate_frame(frame)
+    generated_at = datetime.utcnow()
+    return [
+        {"user_id": user_id, "insights": insights, "period_days": days,
+         "ruleset_version": engine.version, "generated_at": generated_at}
+        for user_id, insights in zip(frame.index, results)
+    ]
+
+
+async def run_insight_job(db, days: int = DEFAULT_PERIOD_DAYS, batch_size: int = 50_000) -> Dict[str, Any]:
+    """Nightly job: evaluate every user's insights in one pass and store them in ``user_insights``"""
+    from analytics_engine import CohortAnalyticsEngine
+
+    analytics = CohortAnalyticsEngine(db, batch_size=batch_size)
+    profiles = await analytics.load_profiles()
+    since = datetime.utcnow() - timedelta(days=days)
+    users, _ = await analytics.aggregate_products(since, profiles)
+    # Off the event loop: the job can be started from an API request
+    documents = await asyncio.to_thread(_evaluate_users, profiles, users, days)
+    written = await db.save_user_insights(documents)
+    return {"users": len(documents), "written": written, "ruleset_version": engine.version}
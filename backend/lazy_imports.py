@@ -0,0 +1,44 @@
+"""Deferred imports for heavy modules that most requests never touch.
+
+``lazy_import("pandas")`` returns the module object right away but only runs
+the module's code on first attribute access (``importlib.util.LazyLoader``).
+Importing the API therefore doesn't pay for pandas, pyarrow or httpx until a
+batch job, a Parquet export or a real provider call needs them.
+
+Modules using it must not touch the lazy module at import time, including in
+annotations: they start with ``from __future__ import annotations``.
+"""
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+# LazyLoader's first attribute access is not thread-safe before Python 3.12
+_load_lock = threading.Lock()
+
+
+def available(name: str) -> bool:
+    """Whether ``name`` can be imported, without importing it"""
+    return name in sys.modules or importlib.util.find_spec(name) is not None
+
+
+def lazy_import(name: str) -> ModuleType:
+    """``name`` as a module that loads on first use; raises ImportError if it isn't installed"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def ensure_loaded(module: ModuleType) -> ModuleType:
+    """Finish loading a lazy module now; safe to call from several threads at once"""
+    with _load_lock:
+        getattr(module, "__spec__")
+    return module
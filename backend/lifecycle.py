@@ -0,0 +1,275 @@
+"""Retention, archiving and compaction for append-only collections.
+
+Status checks, chat messages, receipt scans and scanned products were kept
+forever, so their indexes and recent pages kept growing out of RAM. Each
+collection now has a retention policy:
+
+* ``expire``   a TTL index removes documents once they are older than the
+               retention period (status checks: nobody reads old ones)
+* ``archive``  ``run`` moves documents older than the period, in batches, to
+               compressed NDJSON or Parquet files or to ``<collection>_archive``
+* ``compact``  like ``archive``, but first writes per (user, day) macro
+               rollups to ``product_rollups`` so cohort analytics
+               (analytics_engine.py) still cover the archived period
+
+Every batch is written to the archive before it is deleted, so an
+interrupted run leaves at most one batch in both places; run it again to
+finish. Rollups for a day are written once, from the complete day, before
+any product of that day is deleted, and ``lifecycle_state`` records the
+boundary below which analytics read rollups instead of products.
+
+Configuration:
+
+    RETENTION_<COLLECTION>_DAYS   retention per collection, e.g. RETENTION_CHAT_MESSAGES_DAYS;
+                                  0 leaves the collection alone
+    ARCHIVE_TARGET                files (default) or collection
+    ARCHIVE_FORMAT                ndjson (gzip-compressed, default) or parquet
+    ARCHIVE_DIR                   where archive files go (default archive/)
+    ARCHIVE_BATCH_SIZE            documents moved per batch (default 1000)
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import gzip
+import logging
+import os
+
+import numpy as np
+from pymongo.errors import OperationFailure
+
+from analytics_engine import MACRO_FIELDS
+from export import ExportSource, arrow_batch, arrow_schema, pyarrow
+from lazy_imports import lazy_import
+from models import ChatMessage, Product
+from serialization import dumps
+
+# Only product rollups need pandas
+pd = lazy_import("pandas")
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_TARGETS = ("files", "collection")
+ARCHIVE_FORMATS = ("ndjson", "parquet")
+ARCHIVE_TARGET = os.environ.get("ARCHIVE_TARGET", "files")
+ARCHIVE_FORMAT = os.environ.get("ARCHIVE_FORMAT", "ndjson")
+ARCHIVE_DIR = Path(os.environ.get("ARCHIVE_DIR", "archive"))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "1000"))
+
+ROLLUP_COLLECTION = "product_rollups"
+INDEX_OPTIONS_CONFLICT = 85
+
+
+def _retention_days(collection: str, default: int) -> int:
+    return int(os.environ.get(f"RETENTION_{collection.upper()}_DAYS", str(default)))
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    collection: str
+    time_field: str
+    days: int
+    action: str
+    model: Optional[type] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.days > 0
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the oldest day that is kept; whole days keep rollups exact"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.days)
+        return cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+POLICIES: Dict[str, RetentionPolicy] = {
+    "status_checks": RetentionPolicy("status_checks", "timestamp", _retention_days("status_checks", 7), "expire"),
+    "chat_messages": RetentionPolicy("chat_messages", "timestamp", _retention_days("chat_messages", 365),
+                                     "archive", ChatMessage),
+    "receipt_scans": RetentionPolicy("receipt_scans", "created_at", _retention_days("receipt_scans", 90), "archive"),
+    "products": RetentionPolicy("products", "created_at", _retention_days("products", 365), "compact", Product),
+}
+
+
+class LifecycleError(ValueError):
+    pass
+
+
+def validate_options(target: str, fmt: str) -> None:
+    if target not in ARCHIVE_TARGETS:
+        raise LifecycleError(f"Unsupported archive target '{target}', expected one of {', '.join(ARCHIVE_TARGETS)}")
+    if fmt not in ARCHIVE_FORMATS:
+        raise LifecycleError(f"Unsupported archive format '{fmt}', expected one of {', '.join(ARCHIVE_FORMATS)}")
+    if target == "files" and fmt == "parquet" and pyarrow is None:
+        raise LifecycleError("Parquet archives require the optional 'pyarrow' package")
+
+
+# Indexes
+async def ensure_indexes(db) -> None:
+    """TTL indexes for ``expire`` policies, time indexes for the archive scans and the rollup key"""
+    for policy in POLICIES.values():
+        collection = db[policy.collection]
+        if policy.action != "expire":
+            await collection.create_index(policy.time_field)
+        elif policy.enabled:
+            seconds = policy.days * 86400
+            try:
+                await collection.create_index(policy.time_field, expireAfterSeconds=seconds)
+            except OperationFailure as e:
+                if e.code != INDEX_OPTIONS_CONFLICT:
+                    raise
+                # Retention changed since the index was built: adjust it in place
+                await db.command("collMod", policy.collection,
+                                 index={"keyPattern": {policy.time_field: 1}, "expireAfterSeconds": seconds})
+    await db[ROLLUP_COLLECTION].create_index([("user_id", 1), ("day", 1)], unique=True)
+    await db[ROLLUP_COLLECTION].create_index("day")
+
+
+# Archive sinks
+class _ArchiveSource(ExportSource):
+    """Export schema that keeps media fields: archived documents are deleted afterwards"""
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.model.model_fields)
+
+
+class _FileSink:
+    """One gzip member per batch, appended and fsynced, so the file stays readable after a crash"""
+
+    def __init__(self, policy: RetentionPolicy, fmt: str, directory: Path, run_id: str):
+        if fmt == "parquet" and policy.model is None:
+            logger.info(f"{policy.collection} has no schema; archiving it as NDJSON")
+            fmt = "ndjson"
+        self.fmt = fmt
+        self.directory = directory / policy.collection
+        self.prefix = f"{policy.collection}-{run_id}"
+        self.source = _ArchiveSource(policy.collection, policy.model, "", policy.time_field) if policy.model else None
+        self.files: List[str] = []
+        self._batches = 0
+
+    async def write(self, documents: List[dict]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        rows = [{k: v for k, v in document.items() if k != "_id"} for document in documents]
+        if self.fmt == "ndjson":
+            path = self.directory / f"{self.prefix}.ndjson.gz"
+            with open(path, "ab") as f:
+                f.write(gzip.compress(b"".join(dumps(row) + b"\n" for row in rows)))
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            # Parquet footers are written on close, so every batch is a file of its own
+            path = self.directory / f"{self.prefix}-{self._batches:05d}.parquet"
+            schema = arrow_schema(self.source)
+            import pyarrow.parquet
+            pyarrow.parquet.write_table(arrow_batch(self.source, schema, rows), path, compression="zstd")
+        self._batches += 1
+        if str(path) not in self.files:
+            self.files.append(str(path))
+
+
+class _CollectionSink:
+    """``<collection>_archive`` in the same database; re-running a batch is a no-op thanks to ``_id``"""
+
+    def __init__(self, db, policy: RetentionPolicy):
+        self.db = db
+        self.collection = policy.collection
+        self.files: List[str] = []
+
+    async def write(self, documents: List[dict]) -> None:
+        await self.db.save_archived(self.collection, documents)
+
+
+# Rollups
+ROLLUP_SOURCE_PROJECTION = {"_id": 0, "scanned_by": 1, "created_at": 1, **{name: 1 for name in MACRO_FIELDS}}
+ROLLUP_FIELDS = [*MACRO_FIELDS, "products"]
+
+
+def _rollup_documents(frame: pd.DataFrame) -> List[dict]:
+    documents = []
+    for (user_id, day), row in frame.iterrows():
+        documents.append({"user_id": user_id, "day": day.to_pydatetime(),
+                          **{name: round(float(row[name]), 2) for name in MACRO_FIELDS},
+                          "products": int(row["products"])})
+    return documents
+
+
+async def rollup_products(db, before: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Write (user, day) rollups for every whole day before ``before`` that has none yet"""
+    written = 0
+    pending: Optional[pd.DataFrame] = None
+    async for batch in db.iter_batches("products", {"created_at": {"$lt": before}},
+                                       ROLLUP_SOURCE_PROJECTION, batch_size, "created_at"):
+        chunk = pd.DataFrame.from_records(batch, columns=list(ROLLUP_SOURCE_PROJECTION)[1:])
+        chunk[MACRO_FIELDS] = chunk[MACRO_FIELDS].apply(pd.to_numeric, errors="coerce").fillna(0.0).astype(np.float64)
+        chunk["day"] = pd.to_datetime(chunk["created_at"], cache=False).dt.floor("D")
+        grouped = chunk.groupby(["scanned_by", "day"], sort=False)
+        part = grouped[MACRO_FIELDS].sum()
+        part["products"] = grouped.size()
+        pending = part if pending is None else pd.concat([pending, part]).groupby(level=[0, 1]).sum()
+
+        # Products arrive in created_at order, so days before this batch's last one are complete
+        complete = pending.index.get_level_values(1) < chunk["day"].max()
+        if complete.any():
+            written += await db.save_product_rollups(_rollup_documents(pending[complete]))
+            pending = pending[~complete]
+    if pending is not None and len(pending):
+        written += await db.save_product_rollups(_rollup_documents(pending))
+    return written
+
+
+# Jobs
+async def archive(db, policy: RetentionPolicy, before: datetime, sink, batch_size: int) -> Dict[str, int]:
+    """Move documents older than ``before`` into ``sink``, one batch at a time"""
+    moved = 0
+    while True:
+        # Always the oldest remaining batch: deleted documents never shift a cursor position
+        batch = await db.get_oldest(policy.collection, policy.time_field, before, batch_size)
+        if not batch:
+            break
+        await sink.write(batch)
+        deleted = await db.delete_documents(policy.collection, [document["_id"] for document in batch])
+        moved += deleted
+        if len(batch) < batch_size or not deleted:
+            break
+    return {"archived": moved}
+
+
+async def run_policy(db, policy: RetentionPolicy, target: str = ARCHIVE_TARGET, fmt: str = ARCHIVE_FORMAT,
+                     directory: Path = ARCHIVE_DIR, batch_size: int = ARCHIVE_BATCH_SIZE,
+                     dry_run: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+    before = policy.cutoff(now)
+    result: Dict[str, Any] = {"collection": policy.collection, "action": policy.action, "before": before}
+    if not policy.enabled:
+        result["skipped"] = "retention disabled"
+        return result
+
+    eligible = await db.count_older_than(policy.collection, policy.time_field, before)
+    result["eligible"] = eligible
+    if policy.action == "expire" or dry_run or not eligible:
+        # TTL indexes do the deleting for expire policies
+        return result
+
+    if policy.action == "compact":
+        result["rollups"] = await rollup_products(db, before, batch_size)
+        # From here on analytics read this range from rollups, even while products are still being moved
+        await db.save_lifecycle_state(policy.collection, {"compacted_before": before})
+
+    run_id = f"{before:%Y%m%d}-{datetime.utcnow():%Y%m%dT%H%M%S}"
+    sink = _FileSink(policy, fmt, directory, run_id) if target == "files" else _CollectionSink(db, policy)
+    result.update(await archive(db, policy, before, sink, batch_size))
+    result["files"] = sink.files
+    logger.info(f"Archived {result['archived']} {policy.collection} documents older than {before:%Y-%m-%d}")
+    return result
+
+
+async def run(db, collections: Optional[List[str]] = None, **options) -> List[Dict[str, Any]]:
+    """Apply the retention policy of every (or every named) collection"""
+    validate_options(options.get("target", ARCHIVE_TARGET), options.get("fmt", ARCHIVE_FORMAT))
+    names = collections or list(POLICIES)
+    unknown = [name for name in names if name not in POLICIES]
+    if unknown:
+        raise LifecycleError(f"No retention policy for: {', '.join(unknown)}")
+    return [await run_policy(db, POLICIES[name], **options) for name in names]
@@ -0,0 +1,72 @@
+"""Command-line retention run: archive and compact cold data (see lifecycle.py).
+
+Examples (run from ``backend/``):
+    python lifecycle_cli.py --dry-run                       # what each policy would move
+    python lifecycle_cli.py --collections chat_messages --format parquet --out archive/
+    python lifecycle_cli.py --target collection             # move into <collection>_archive instead of files
+"""
+from pathlib import Path
+from typing import Optional
+import asyncio
+import os
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+import typer
+
+from database import Database
+import lifecycle
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+app = typer.Typer(add_completion=False)
+
+
+async def _run(collections: Optional[list], target: str, fmt: str, out: Path, batch_size: int, dry_run: bool) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = Database(client, os.environ.get('DB_NAME', 'nutritionist_app'))
+    try:
+        await lifecycle.ensure_indexes(db.db)
+        results = await lifecycle.run(db, collections, target=target, fmt=fmt, directory=out,
+                                      batch_size=batch_size, dry_run=dry_run)
+        for result in results:
+            if "skipped" in result:
+                typer.echo(f"{result['collection']}: {result['skipped']}")
+                continue
+            line = f"{result['collection']} ({result['action']}, before {result['before']:%Y-%m-%d}): " \
+                   f"{result['eligible']} eligible"
+            if "archived" in result:
+                line += f", {result['archived']} archived"
+            if "rollups" in result:
+                line += f", {result['rollups']} rollups"
+            typer.echo(line)
+            for path in result.get("files", []):
+                typer.echo(f"  {path}")
+    finally:
+        client.close()
+
+
+@app.command()
+def run(
+    collections: Optional[str] = typer.Option(None, help="Comma-separated; omit for every policy"),
+    target: str = typer.Option(lifecycle.ARCHIVE_TARGET, help="files or collection"),
+    format: str = typer.Option(lifecycle.ARCHIVE_FORMAT, help="ndjson (gzip) or parquet, for file archives"),
+    out: Path = typer.Option(lifecycle.ARCHIVE_DIR, help="Archive directory"),
+    batch_size: int = typer.Option(lifecycle.ARCHIVE_BATCH_SIZE, help="Documents moved per batch"),
+    dry_run: bool = typer.Option(False, help="Only count what would be moved"),
+):
+    """Apply retention policies to status checks, chat, receipt scans and products"""
+    names = [name.strip() for name in collections.split(",") if name.strip()] if collections else None
+    try:
+        lifecycle.validate_options(target, format)
+        for name in names or []:
+            if name not in lifecycle.POLICIES:
+                raise lifecycle.LifecycleError(f"No retention policy for {name}")
+    except lifecycle.LifecycleError as e:
+        raise typer.BadParameter(str(e))
+    asyncio.run(_run(names, target, format, out, batch_size, dry_run))
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,74 @@
+"""Per-request batching of lookups by id (the DataLoader pattern).
+
+Code that hydrates a list item by item, e.g. ``await gather(*(loaders.recipes.load(id)
+for id in ids))``, would issue one ``find_one`` per item. A ``BatchLoader``
+instead collects every ``load`` made in the same event-loop tick and resolves
+them with a single ``Database.get_many`` once the tick is over. Ids are also
+memoised for the rest of the request, so the same id is never read twice.
+
+Loaders hold request state: create a ``Loaders`` per request (the
+``get_loaders`` dependency in api_routes.py), never share one between
+requests.
+"""
+from typing import Any, Awaitable, Callable, Dict, List
+import asyncio
+
+from database import Database
+
+
+class BatchLoader:
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[List[Any]]]):
+        """``fetch(ids)`` returns one value (or None) per id, in order"""
+        self.fetch = fetch
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self.batches = 0
+
+    def load(self, id: str) -> asyncio.Future:
+        future = self._futures.get(id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[id] = loop.create_future()
+            if not self._queue:
+                # After the callbacks already scheduled, i.e. everything issued in this tick
+                loop.call_soon(self._dispatch)
+            self._queue.append(id)
+        return future
+
+    async def load_many(self, ids: List[str]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(id) for id in ids)))
+
+    def prime(self, id: str, value: Any) -> None:
+        """Remember a value already read elsewhere in the request"""
+        if id not in self._futures:
+            future = self._futures[id] = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+
+    def _dispatch(self) -> None:
+        queue, self._queue = self._queue, []
+        # get_many chunks long id lists itself
+        asyncio.ensure_future(self._resolve(queue))
+
+    async def _resolve(self, ids: List[str]) -> None:
+        self.batches += 1
+        try:
+            values = await self.fetch(ids)
+        except Exception as e:
+            for id in ids:
+                # Forget failures so a later load in the request can retry
+                future = self._futures.pop(id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for id, value in zip(ids, values):
+            if not self._futures[id].done():
+                self._futures[id].set_result(value)
+
+
+class Loaders:
+    """The request's loaders, one per entity read by id"""
+
+    def __init__(self, db: Database):
+        self.products = BatchLoader(db.get_products)
+        self.recipes = BatchLoader(db.get_recipes)
+        self.profiles = BatchLoader(db.get_user_profiles)
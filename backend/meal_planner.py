@@ -0,0 +1,361 @@
+"""Meal plans that fit recipes to a user's calorie and macro targets.
+
+The recipe catalogue is read once into NumPy arrays (nutrient vectors, tag
+bitmasks and a flat recipe/ingredient incidence list) and shared by every
+request until ``MEAL_PLAN_CATALOGUE_TTL`` seconds pass. Per request:
+
+1. Allergies, dietary preferences and recipes already used earlier in the
+   week become a boolean exclusion mask over the catalogue.
+2. The remaining recipes are ranked by distance from a per-meal share of the
+   daily targets (minus a bonus for ingredients on hand) and the best
+   ``candidates`` are kept.
+3. A beam search fills each day's meal slots from those candidates, scoring
+   partial days as if the remaining slots hit the per-meal target exactly.
+
+A meal is one recipe at its listed ``calories``. Recipes without stored
+macros get an estimate from their calories and dietary tags.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+from ingredients import canonical_name, parse_ingredient
+from models import MealPlan, MealPlanDay, PlannedMeal
+import nutrition
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_TTL = float(os.environ.get("MEAL_PLAN_CATALOGUE_TTL", "600"))
+CATALOGUE_PROJECTION = {"_id": 0, "id": 1, "title": 1, "ingredients": 1, "calories": 1,
+                        "protein": 1, "carbs": 1, "fat": 1, "dietary_tags": 1}
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+# Relative importance of hitting each daily target
+NUTRIENT_WEIGHTS = np.array([1.0, 0.6, 0.3, 0.3])
+INVENTORY_BONUS = 0.15
+
+# Energy split used when a recipe has no stored macros: (protein, carbs, fat) shares
+DEFAULT_SPLIT = (0.20, 0.50, 0.30)
+TAG_SPLITS = {
+    "high-protein": (0.35, 0.35, 0.30),
+    "low-carb": (0.30, 0.15, 0.55),
+}
+
+MEAT_FISH = ["chicken", "beef", "pork", "lamb", "turkey", "bacon", "ham", "salmon", "tuna", "fish",
+             "shrimp", "prawn", "crab", "lobster", "anchov"]
+DAIRY_EGG = ["milk", "yogurt", "yoghurt", "cheese", "butter", "cream", "egg", "whey"]
+GLUTEN = ["bread", "wheat", "pasta", "flour", "barley", "rye", "couscous", "noodle", "cracker"]
+
+# Ingredient keywords excluded by an allergy (the allergy name itself always is)
+ALLERGEN_KEYWORDS = {
+    "lactose": ["milk", "yogurt", "yoghurt", "cheese", "butter", "cream", "whey"],
+    "dairy": ["milk", "yogurt", "yoghurt", "cheese", "butter", "cream", "whey"],
+    "gluten": GLUTEN,
+    "nuts": ["almond", "walnut", "peanut", "cashew", "pecan", "hazelnut", "pistachio", "nut"],
+    "shellfish": ["shrimp", "prawn", "crab", "lobster", "mussel", "oyster", "clam", "scallop"],
+    "fish": ["salmon", "tuna", "cod", "fish", "anchov", "sardine"],
+    "eggs": ["egg"],
+    "soy": ["soy", "tofu", "tempeh", "edamame"],
+}
+
+# Dietary preferences: ingredient keywords they exclude and tags they require
+DIET_EXCLUSIONS = {
+    "vegetarian": MEAT_FISH,
+    "vegan": MEAT_FISH + DAIRY_EGG + ["honey"],
+    "gluten-free": GLUTEN,
+    "paleo": GLUTEN + ["rice", "oat", "bean", "lentil", "sugar", "milk", "yogurt", "cheese"],
+    "pescatarian": ["chicken", "beef", "pork", "lamb", "turkey", "bacon", "ham"],
+}
+DIET_REQUIRED_TAGS = {
+    "keto": "low-carb",
+}
+
+MEAL_SLOTS = ["breakfast", "lunch", "dinner", "snack", "snack 2", "snack 3"]
+
+
+class MealPlanError(ValueError):
+    pass
+
+
+def _estimated_macros(calories: float, tags: Iterable[str]) -> List[float]:
+    split = DEFAULT_SPLIT
+    for tag in tags:
+        split = TAG_SPLITS.get(tag.lower(), split)
+    return [calories * share / nutrition.KCAL_PER_GRAM[name]
+            for share, name in zip(split, ("protein", "carbs", "fat"))]
+
+
+class RecipeCatalogue:
+    """Column-oriented, read-only view of the recipes collection"""
+
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.size = len(documents)
+        self.ids = [d["id"] for d in documents]
+        self.titles = [d.get("title", "") for d in documents]
+        self.built_at = time.monotonic()
+
+        vectors = np.zeros((self.size, len(NUTRIENTS)), dtype=np.float64)
+        self.estimated = np.zeros(self.size, dtype=bool)
+        tag_names: Dict[str, int] = {}
+        self.tag_bits = np.zeros(self.size, dtype=np.int64)
+        vocab: Dict[str, int] = {}
+        flat_ids: List[int] = []
+        flat_recipes: List[int] = []
+
+        for i, document in enumerate(documents):
+            calories = float(document.get("calories") or 0)
+            tags = document.get("dietary_tags") or []
+            macros = [document.get(name) for name in ("protein", "carbs", "fat")]
+            if any(value is None for value in macros):
+                macros = _estimated_macros(calories, tags)
+                self.estimated[i] = True
+            vectors[i] = (calories, *macros)
+
+            for tag in tags:
+                bit = tag_names.setdefault(tag.lower(), len(tag_names))
+                if bit < 63:
+                    self.tag_bits[i] |= 1 << bit
+            for ingredient in document.get("ingredients") or []:
+                flat_ids.append(vocab.setdefault(parse_ingredient(str(ingredient)).name, len(vocab)))
+                flat_recipes.append(i)
+
+        self.vectors = vectors
+        self.tag_index = tag_names
+        self.vocab = vocab
+        self.vocab_names = list(vocab)
+        self.ingredient_ids = np.array(flat_ids, dtype=np.int32)
+        self.ingredient_recipes = np.array(flat_recipes, dtype=np.int32)
+        self.ingredient_counts = np.bincount(self.ingredient_recipes, minlength=self.size)
+
+    def vocab_matching(self, keywords: Iterable[str]) -> np.ndarray:
+        """Ingredient ids whose name contains any of ``keywords``"""
+        keywords = [k.lower() for k in keywords if k]
+        return np.array([i for i, name in enumerate(self.vocab_names) if any(k in name for k in keywords)],
+                        dtype=np.int32)
+
+    def using_any(self, ingredient_ids: np.ndarray) -> np.ndarray:
+        """Mask of recipes that use at least one of ``ingredient_ids``"""
+        if not len(ingredient_ids):
+            return np.zeros(self.size, dtype=bool)
+        hits = np.isin(self.ingredient_ids, ingredient_ids)
+        return np.bincount(self.ingredient_recipes[hits], minlength=self.size) > 0
+
+    def coverage(self, ingredient_ids: np.ndarray) -> np.ndarray:
+        """Share of each recipe's ingredients found in ``ingredient_ids``"""
+        if not len(ingredient_ids):
+            return np.zeros(self.size)
+        hits = np.isin(self.ingredient_ids, ingredient_ids)
+        found = np.bincount(self.ingredient_recipes[hits], minlength=self.size)
+        return found / np.maximum(self.ingredient_counts, 1)
+
+    def with_tag(self, tag: str) -> np.ndarray:
+        bit = self.tag_index.get(tag.lower())
+        if bit is None or bit >= 63:
+            return np.zeros(self.size, dtype=bool)
+        return (self.tag_bits >> bit) & 1 == 1
+
+
+class CatalogueCache:
+    """One catalogue per process, rebuilt in a worker thread after ``ttl`` seconds.
+
+    An empty catalogue is never reused (the next request reads the recipes
+    again), and ``Database.create_recipe`` invalidates the catalogue.
+    """
+
+    def __init__(self, ttl: float = CATALOGUE_TTL, batch_size: int = 10_000):
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self._catalogue: Optional[RecipeCatalogue] = None
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return (self._catalogue is not None and self._catalogue.size > 0
+                and time.monotonic() - self._catalogue.built_at < self.ttl)
+
+    async def get(self, db) -> RecipeCatalogue:
+        if self._fresh():
+            return self._catalogue
+        async with self._lock:
+            if not self._fresh():
+                started = time.perf_counter()
+                documents: List[Dict[str, Any]] = []
+                async for batch in db.iter_batches("recipes", {}, CATALOGUE_PROJECTION, self.batch_size):
+                    documents.extend(batch)
+                self._catalogue = await asyncio.to_thread(RecipeCatalogue, documents)
+                logger.info(f"Recipe catalogue of {len(documents)} recipes built in "
+                            f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        return self._catalogue
+
+    def invalidate(self) -> None:
+        self._catalogue = None
+
+
+catalogue_cache = CatalogueCache()
+
+
+@dataclass
+class PlanTargets:
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+
+    @property
+    def vector(self) -> np.ndarray:
+        return np.array([self.calories, self.protein, self.carbs, self.fat], dtype=np.float64)
+
+    @classmethod
+    def from_calories(cls, calories: float) -> "PlanTargets":
+        macros = _estimated_macros(calories, [])
+        return cls(calories, *macros)
+
+
+def targets_for_profile(profile: Dict[str, Any], calorie_target: Optional[int] = None) -> PlanTargets:
+    """Daily targets from the profile's nutrient targets, optionally rescaled to ``calorie_target``"""
+    targets = profile.get("targets")
+    if targets and targets.get("formula_version") == nutrition.FORMULA_VERSION:
+        base = PlanTargets(targets["calories"], targets["protein"], targets["carbs"], targets["fat"])
+    else:
+        computed = nutrition.targets_for([profile])[0]
+        base = PlanTargets(computed.calories, computed.protein, computed.carbs, computed.fat) if computed else None
+
+    if calorie_target:
+        if base is None:
+            return PlanTargets.from_calories(calorie_target)
+        scale = calorie_target / base.calories
+        return PlanTargets(calorie_target, base.protein * scale, base.carbs * scale, base.fat * scale)
+    if base is None:
+        raise MealPlanError("Profile needs age, weight, height and gender to derive targets; "
+                            "set calorie_target instead")
+    return base
+
+
+def exclusion_mask(catalogue: RecipeCatalogue, allergies: List[str], preferences: List[str]) -> np.ndarray:
+    """Recipes a user must not be offered"""
+    keywords: List[str] = []
+    for allergy in allergies:
+        key = allergy.strip().lower()
+        keywords += [key, *ALLERGEN_KEYWORDS.get(key, [])]
+    excluded = catalogue.using_any(catalogue.vocab_matching(keywords))
+
+    for preference in preferences:
+        key = preference.strip().lower()
+        if key in DIET_EXCLUSIONS:
+            excluded |= catalogue.using_any(catalogue.vocab_matching(DIET_EXCLUSIONS[key]))
+        if key in DIET_REQUIRED_TAGS:
+            excluded |= ~catalogue.with_tag(DIET_REQUIRED_TAGS[key])
+    return excluded
+
+
+def _beam_day(vectors: np.ndarray, penalty: np.ndarray, target: np.ndarray, weights: np.ndarray,
+              meals: int, beam_width: int) -> List[int]:
+    """Best combination of ``meals`` distinct candidate positions for one day"""
+    per_meal = target / meals
+    k = len(vectors)
+    sums = np.zeros((1, len(target)))
+    chosen = np.zeros((1, 0), dtype=np.int64)
+    bonus = np.zeros(1)
+    costs = np.zeros(1)
+    positions = np.arange(k)
+
+    for slot in range(meals):
+        remaining = meals - slot - 1
+        projected = sums[:, None, :] + vectors[None, :, :] + remaining * per_meal
+        cost = (np.abs(projected - target) * weights).sum(axis=2) + bonus[:, None] + penalty[None, :]
+        # Combinations, not permutations: each beam only extends with later candidates
+        last = chosen[:, -1] if slot else np.full(len(sums), -1)
+        cost[positions[None, :] <= last[:, None]] = np.inf
+
+        flat = cost.ravel()
+        width = min(beam_width, int(np.isfinite(flat).sum()))
+        if width == 0:
+            break
+        best = np.argpartition(flat, width - 1)[:width]
+        beam, candidate = np.divmod(best, k)
+        sums = sums[beam] + vectors[candidate]
+        bonus = bonus[beam] + penalty[candidate]
+        chosen = np.concatenate([chosen[beam], candidate[:, None]], axis=1)
+        costs = flat[best]
+
+    return chosen[int(np.argmin(costs))].tolist()
+
+
+def plan_meals(catalogue: RecipeCatalogue, targets: PlanTargets, days: int, meals_per_day: int,
+               excluded: np.ndarray, on_hand: Optional[np.ndarray] = None,
+               candidates: int = 400, beam_width: int = 32) -> List[MealPlanDay]:
+    target = targets.vector
+    weights = NUTRIENT_WEIGHTS / np.maximum(target, 1)
+    coverage = catalogue.coverage(on_hand) if on_hand is not None else np.zeros(catalogue.size)
+
+    # Rank once against the per-meal target; days then draw from what is left
+    per_meal = target / meals_per_day
+    score = (np.abs(catalogue.vectors - per_meal) * weights).sum(axis=1) * meals_per_day \
+        - INVENTORY_BONUS * coverage
+    available = ~excluded
+    plan: List[MealPlanDay] = []
+
+    for day in range(days):
+        pool = np.flatnonzero(available)
+        if len(pool) < meals_per_day:
+            # Small catalogues: allow repeats rather than return an empty day
+            pool = np.flatnonzero(~excluded)
+        if len(pool) < meals_per_day:
+            raise MealPlanError("Not enough recipes match this profile's allergies and preferences")
+        if len(pool) > candidates:
+            pool = pool[np.argpartition(score[pool], candidates - 1)[:candidates]]
+        pool = pool[np.argsort(score[pool], kind="stable")]
+
+        picked = pool[_beam_day(catalogue.vectors[pool], -INVENTORY_BONUS * coverage[pool],
+                                target, weights, meals_per_day, beam_width)]
+        available[picked] = False
+
+        meals = [
+            PlannedMeal(
+                slot=MEAL_SLOTS[slot],
+                recipe_id=catalogue.ids[i],
+                title=catalogue.titles[i],
+                **{name: round(float(value), 1) for name, value in zip(NUTRIENTS, catalogue.vectors[i])},
+                macros_estimated=bool(catalogue.estimated[i]),
+                inventory_coverage=round(float(coverage[i]), 2),
+            )
+            for slot, i in enumerate(picked)
+        ]
+        totals = catalogue.vectors[picked].sum(axis=0)
+        plan.append(MealPlanDay(
+            day=day + 1,
+            meals=meals,
+            totals={name: round(float(value), 1) for name, value in zip(NUTRIENTS, totals)},
+        ))
+    return plan
+
+
+async def generate_plan(db, profile: Dict[str, Any], days: int = 7, meals_per_day: int = 3,
+                        calorie_target: Optional[int] = None, use_inventory: bool = True) -> MealPlan:
+    if meals_per_day > len(MEAL_SLOTS):
+        raise MealPlanError(f"At most {len(MEAL_SLOTS)} meals per day")
+    targets = targets_for_profile(profile, calorie_target)
+    catalogue = await catalogue_cache.get(db)
+    if not catalogue.size:
+        raise MealPlanError("The recipe catalogue is empty")
+
+    on_hand = None
+    if use_inventory:
+        inventory = await db.get_user_inventory(profile["id"], raw=True)
+        names = {canonical_name(str(item["name"])) for item in inventory if (item.get("quantity") or 0) > 0}
+        on_hand = np.array([catalogue.vocab[name] for name in names if name in catalogue.vocab], dtype=np.int32)
+
+    excluded = exclusion_mask(catalogue, profile.get("allergies") or [], profile.get("dietary_preferences") or [])
+    plan_days = plan_meals(catalogue, targets, days, meals_per_day, excluded, on_hand)
+
+    return MealPlan(
+        user_id=profile["id"],
+        targets={name: round(float(value), 1) for name, value in zip(NUTRIENTS, targets.vector)},
+        days=plan_days,
+        catalogue_size=catalogue.size,
+        eligible_recipes=int((~excluded).sum()),
+    )
@@ -21,6 +21,17 @@ class UserSettings(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class NutrientTargets(BaseModel):
+    bmr: int  # Mifflin-St Jeor, kcal/day
+    tdee: int  # bmr x activity multiplier
+    calories: int  # daily calorie target for the goal
+    protein: float  # g/day
+    carbs: float  # g/day
+    fat: float  # g/day
+    fiber: float  # g/day
+    goal: str
+    formula_version: int
+
 class UserProfile(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -34,6 +45,7 @@ class UserProfile(BaseModel):
     allergies: List[str] = []
     goals: List[str] = []
     bmr: Optional[int] = None  # calculated basal metabolic rate
+    targets: Optional[NutrientTargets] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -62,6 +74,9 @@ class Recipe(BaseModel):
     cook_time: int  # in minutes
     servings: int
     calories: int  # total calories
+    protein: Optional[float] = None  # g, whole recipe
+    carbs: Optional[float] = None  # g, whole recipe
+    fat: Optional[float] = None  # g, whole recipe
     difficulty: str
     cuisine_type: Optional[str] = None
     dietary_tags: List[str] = []
@@ -70,6 +85,31 @@ class Recipe(BaseModel):
     created_by: str  # user_id
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PlannedMeal(BaseModel):
+    slot: str
+    recipe_id: str
+    title: str
+    calories: float
+    protein: float
+    carbs: float
+    fat: float
+    macros_estimated: bool = False  # recipe had no stored macros
+    inventory_coverage: float = 0  # share of ingredients on hand
+
+class MealPlanDay(BaseModel):
+    day: int
+    meals: List[PlannedMeal]
+    totals: Dict[str, float]
+
+class MealPlan(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    targets: Dict[str, float]  # daily
+    days: List[MealPlanDay]
+    catalogue_size: int
+    eligible_recipes: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 class ShoppingItem(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -87,6 +127,7 @@ class ShoppingList(BaseModel):
     delivery_address: Optional[str] = None
     total_amount: Optional[float] = None
     order_status: str = "pending"  # pending, ordered, delivered
+    source_recipe_ids: List[str] = []  # set when generated from recipes/meal plans
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -160,6 +201,20 @@ class UserProfileUpdate(BaseModel):
     allergies: Optional[List[str]] = None
     goals: Optional[List[str]] = None
 
+class TargetsInput(BaseModel):
+    age: Optional[int] = None
+    weight: Optional[float] = None
+    height: Optional[float] = None
+    gender: Optional[str] = None
+    activity_level: str = "moderate"
+    goals: List[str] = []
+
+class TargetsBatchRequest(BaseModel):
+    profiles: List[TargetsInput] = Field(..., max_length=1000)
+
+class IdsBatchRequest(BaseModel):
+    ids: List[str] = Field(..., max_length=1000)
+
 class UserSettingsCreate(BaseModel):
     language: str = "en"
     theme: Dict[str, str] = {"name": "Pure White", "value": "#FFFFFF", "text": "#000000"}
@@ -180,6 +235,13 @@ class RecipeGenerateRequest(BaseModel):
     difficulty: Optional[str] = None
     dietary_restrictions: List[str] = []
 
+class MealPlanRequest(BaseModel):
+    user_id: str
+    days: int = Field(7, ge=1, le=14)
+    meals_per_day: int = Field(3, ge=1, le=6)
+    calorie_target: Optional[int] = Field(None, ge=800, le=6000)
+    use_inventory: bool = True
+
 class ChatMessageCreate(BaseModel):
     user_id: str
     session_id: str
@@ -224,6 +286,19 @@ class ShoppingListCreate(BaseModel):
     user_id: str
     items: List[ShoppingItemCreate] = []
 
+class ShoppingItemUpdate(BaseModel):
+    name: Optional[str] = None
+    category: Optional[str] = None
+    needed: Optional[int] = None
+    unit: Optional[str] = None
+    purchased: Optional[bool] = None
+    price: Optional[float] = None
+
+class ShoppingListGenerateRequest(BaseModel):
+    user_id: str
+    meal_plan_id: Optional[str] = None  # defaults to the user's latest plan
+    recipe_ids: List[str] = []  # used instead of a meal plan when given
+
 class ShoppingListUpdate(BaseModel):
     items: Optional[List[ShoppingItem]] = None
     selected_store: Optional[Dict[str, Any]] = None
@@ -238,4 +313,7 @@ class ReceiptScanRequest(BaseModel):
 class ReceiptScanResponse(BaseModel):
     success: bool
     items: List[Dict[str, Any]]
-    total: float
\ No newline at end of file
+    total: float
+    scan_id: Optional[str] = None
+    duplicate: bool = False  # same image scanned before; nothing was added again
+    merged: List[Dict[str, Any]] = []  # per line: the inventory item it was merged into or created as
\ No newline at end of file
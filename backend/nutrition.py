@@ -0,0 +1,129 @@
+"""BMR, TDEE and daily nutrient targets, vectorized over arrays of profiles.
+
+BMR uses the Mifflin-St Jeor equation, TDEE applies the activity multiplier,
+and calorie/macro targets follow the user's primary goal. Every function takes
+equal-length sequences so one call covers a single profile, a what-if batch
+from the frontend or a whole collection chunk during a recompute.
+
+Bump ``FORMULA_VERSION`` whenever a formula, multiplier or split changes; the
+recompute job only rewrites profiles computed with an older version.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from models import NutrientTargets
+
+FORMULA_VERSION = 1
+
+ACTIVITY_MULTIPLIERS = {
+    "sedentary": 1.2,
+    "light": 1.375,
+    "moderate": 1.55,
+    "active": 1.725,
+    "very_active": 1.9,
+}
+DEFAULT_ACTIVITY = "moderate"
+
+# Per-goal calorie adjustment (kcal/day), protein (g per kg body weight) and fat share of energy
+GOAL_PLANS = {
+    "weight loss": (-500, 1.8, 0.30),
+    "muscle building": (300, 2.0, 0.25),
+    "maintain weight": (0, 1.2, 0.30),
+    "better energy": (0, 1.2, 0.30),
+}
+DEFAULT_GOAL = "maintain weight"
+
+MIN_CALORIES = {"male": 1500, "female": 1200}
+FIBER_G_PER_1000_KCAL = 14
+KCAL_PER_GRAM = {"protein": 4, "carbs": 4, "fat": 9}
+ENERGY_FIELDS = ("bmr", "tdee", "calories")
+
+# Profile fields that feed the targets; updating any of them triggers a recompute
+TARGET_INPUT_FIELDS = ("weight", "height", "age", "gender", "activity_level", "goals")
+
+_GOAL_NAMES = list(GOAL_PLANS)
+_GOAL_TABLE = np.array([GOAL_PLANS[name] for name in _GOAL_NAMES], dtype=np.float64)
+
+
+def _as_float(values: Sequence[Any]) -> np.ndarray:
+    """Numeric array with missing (None/0) inputs as NaN"""
+    array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    array[array <= 0] = np.nan
+    return array
+
+
+def primary_goal(goals: Optional[Sequence[str]]) -> str:
+    """First goal with a known plan, else the maintenance plan"""
+    for goal in goals or ():
+        key = str(goal).strip().lower()
+        if key in GOAL_PLANS:
+            return key
+    return DEFAULT_GOAL
+
+
+def compute_targets(weight: Sequence[Any], height: Sequence[Any], age: Sequence[Any], gender: Sequence[Any],
+                    activity_level: Sequence[Any], goals: Sequence[Any]) -> Dict[str, np.ndarray]:
+    """Column-wise targets; rows missing weight, height, age or gender come back as NaN"""
+    weight, height, age = _as_float(weight), _as_float(height), _as_float(age)
+    is_male = np.array([str(g).lower() == "male" for g in gender])
+    has_gender = np.array([bool(g) for g in gender])
+    multiplier = np.array([ACTIVITY_MULTIPLIERS.get(a, ACTIVITY_MULTIPLIERS[DEFAULT_ACTIVITY]) for a in activity_level])
+    plan = _GOAL_TABLE[[_GOAL_NAMES.index(primary_goal(g)) for g in goals]]
+
+    bmr = 10 * weight + 6.25 * height - 5 * age + np.where(is_male, 5.0, -161.0)
+    bmr[~has_gender] = np.nan
+    tdee = bmr * multiplier
+
+    floor = np.where(is_male, MIN_CALORIES["male"], MIN_CALORIES["female"])
+    calories = np.maximum(tdee + plan[:, 0], floor)
+    calories[np.isnan(tdee)] = np.nan
+
+    protein = weight * plan[:, 1]
+    fat = calories * plan[:, 2] / KCAL_PER_GRAM["fat"]
+    carbs = np.maximum(calories - protein * KCAL_PER_GRAM["protein"] - fat * KCAL_PER_GRAM["fat"], 0) / KCAL_PER_GRAM["carbs"]
+    protein[np.isnan(calories)] = np.nan
+
+    return {
+        "bmr": bmr,
+        "tdee": tdee,
+        "calories": calories,
+        "protein": protein,
+        "carbs": carbs,
+        "fat": fat,
+        "fiber": calories / 1000 * FIBER_G_PER_1000_KCAL,
+    }
+
+
+def targets_for(profiles: List[Dict[str, Any]]) -> List[Optional[NutrientTargets]]:
+    """Targets for a list of profile-like dicts, ``None`` where inputs are incomplete"""
+    if not profiles:
+        return []
+    columns = compute_targets(
+        *([p.get(field) for p in profiles] for field in TARGET_INPUT_FIELDS[:4]),
+        [p.get("activity_level") or DEFAULT_ACTIVITY for p in profiles],
+        [p.get("goals") or [] for p in profiles],
+    )
+    valid = ~np.isnan(columns["calories"])
+    goals = [primary_goal(p.get("goals")) for p in profiles]
+
+    # Energy figures are whole kcal (truncated, as the stored bmr always was); grams keep one decimal
+    rows = {name: (np.trunc(values) if name in ENERGY_FIELDS else np.round(values, 1)).tolist()
+            for name, values in columns.items()}
+
+    results: List[Optional[NutrientTargets]] = []
+    for i in range(len(profiles)):
+        if not valid[i]:
+            results.append(None)
+            continue
+        results.append(NutrientTargets(
+            **{name: values[i] for name, values in rows.items()},
+            goal=goals[i],
+            formula_version=FORMULA_VERSION,
+        ))
+    return results
+
+
+def legacy_bmr(targets: Optional[NutrientTargets]) -> Optional[int]:
+    """Value for the profile's ``bmr`` field, which has always stored the activity-adjusted figure (TDEE)"""
+    return targets.tdee if targets else None
@@ -0,0 +1,438 @@
+"""External service providers (product scanner, recipe generator, receipt OCR, AI chat).
+
+Routes call ``get_provider()`` instead of ``MockAPIService``. The provider is
+chosen with ``EXTERNAL_PROVIDER``:
+
+    mock  ``MockAPIService`` (default)
+    fake  mock responses with a configurable latency distribution and failure
+          rate, for load tests (``FAKE_PROVIDER_LATENCY``, ``FAKE_PROVIDER_FAILURE_RATE``)
+    http  JSON over HTTP to ``EXTERNAL_API_BASE_URL`` through one shared, pooled
+          ``httpx.AsyncClient``
+
+Whatever the provider, calls go through ``ResilientProvider``, which applies
+a per-operation ``Policy``: a concurrency limit (callers wait for a slot up to
+``queue_timeout``), a per-attempt timeout, retries with backoff, an optional
+hedged second attempt when the first is slower than ``hedge_after``, and a
+circuit breaker that fails fast for ``reset_after`` seconds once
+``failure_threshold`` calls in a row have failed. Policies can be tuned per
+operation with ``PROVIDER_<OPERATION>_<FIELD>``, e.g.
+``PROVIDER_SCAN_RECEIPT_CONCURRENCY=64``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import os
+import random
+import time
+
+from lazy_imports import lazy_import
+from services import MockAPIService
+from tracing import instrument
+
+# Only the http provider needs it
+httpx = lazy_import("httpx")
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("scan_product", "generate_recipes", "scan_receipt", "get_ai_response")
+
+
+class ProviderError(RuntimeError):
+    retryable = True
+
+
+class ProviderTimeoutError(ProviderError):
+    pass
+
+
+class ProviderResponseError(ProviderError):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        # Client errors will fail the same way again
+        self.retryable = status is None or status >= 500 or status == 429
+
+
+class ProviderUnavailableError(ProviderError):
+    """Circuit open, no free slot, or every attempt failed; routes answer 503"""
+    retryable = False
+
+
+class ProviderBusyError(ProviderUnavailableError):
+    pass
+
+
+# Provider interface
+class Provider:
+    name = "base"
+
+    async def scan_product(self, image_base64: Optional[str] = None, barcode: Optional[str] = None) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def generate_recipes(self, ingredients: List[str], preferences: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def scan_receipt(self, image_base64: str) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def get_ai_response(self, message: str, user_profile: Optional[Dict[str, Any]] = None) -> str:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class MockProvider(Provider):
+    name = "mock"
+
+    async def scan_product(self, image_base64=None, barcode=None):
+        return await MockAPIService.scan_product(image_base64, barcode)
+
+    async def generate_recipes(self, ingredients, preferences):
+        return await MockAPIService.generate_recipes(ingredients, preferences)
+
+    async def scan_receipt(self, image_base64):
+        return await MockAPIService.scan_receipt(image_base64)
+
+    async def get_ai_response(self, message, user_profile=None):
+        return await MockAPIService.get_ai_response(message, user_profile)
+
+
+class Latency:
+    """Latency distribution parsed from ``kind:arg[:arg]``
+
+    ``fixed:0.2``, ``uniform:0.05:0.5``, ``lognormal:0.2:0.6`` (median, sigma),
+    ``bimodal:0.1:2.0:0.05`` (fast, slow, share of slow calls).
+    """
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, *args = spec.split(":")
+        self.kind, self.args, self.rng = kind, [float(a) for a in args], rng
+        if kind not in ("fixed", "uniform", "lognormal", "bimodal"):
+            raise ValueError(f"Unknown latency distribution {spec!r}")
+
+    def sample(self) -> float:
+        a = self.args
+        if self.kind == "fixed":
+            return a[0]
+        if self.kind == "uniform":
+            return self.rng.uniform(a[0], a[1])
+        if self.kind == "lognormal":
+            return self.rng.lognormvariate(0, a[1]) * a[0]
+        return a[1] if self.rng.random() < a[2] else a[0]
+
+
+class FakeProvider(MockProvider):
+    """Mock responses with configurable latency and failures; run with MOCK_API_LATENCY_SCALE=0
+    so only the configured distribution applies"""
+    name = "fake"
+
+    def __init__(self, latency: Optional[Dict[str, str]] = None, failure_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        latency = latency or {}
+        self.latency = {op: Latency(latency.get(op, latency.get("default", "fixed:0")), self.rng) for op in OPERATIONS}
+        self.failure_rate = failure_rate
+
+    async def _delay(self, operation: str) -> None:
+        await asyncio.sleep(self.latency[operation].sample())
+        if self.rng.random() < self.failure_rate:
+            raise ProviderResponseError(f"fake {operation} failure", status=503)
+
+    async def scan_product(self, image_base64=None, barcode=None):
+        await self._delay("scan_product")
+        return await super().scan_product(image_base64, barcode)
+
+    async def generate_recipes(self, ingredients, preferences):
+        await self._delay("generate_recipes")
+        return await super().generate_recipes(ingredients, preferences)
+
+    async def scan_receipt(self, image_base64):
+        await self._delay("scan_receipt")
+        return await super().scan_receipt(image_base64)
+
+    async def get_ai_response(self, message, user_profile=None):
+        await self._delay("get_ai_response")
+        return await super().get_ai_response(message, user_profile)
+
+
+# Shared HTTP client: one connection pool for every provider call in the process
+HTTP_MAX_CONNECTIONS = int(os.environ.get("PROVIDER_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("PROVIDER_HTTP_MAX_KEEPALIVE", "20"))
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+            # Backstop only; each attempt is bounded by its Policy.timeout
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+    return _http_client
+
+
+class HTTPProvider(Provider):
+    """JSON provider API: one POST per operation, responses shaped like ``MockAPIService``'s"""
+    name = "http"
+    PATHS = {
+        "scan_product": "/products/scan",
+        "generate_recipes": "/recipes/generate",
+        "scan_receipt": "/receipts/scan",
+        "get_ai_response": "/chat",
+    }
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+    async def _post(self, operation: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await http_client().post(self.base_url + self.PATHS[operation], json=payload,
+                                                headers=self.headers)
+        except httpx.TimeoutException as e:
+            raise ProviderTimeoutError(f"{operation} timed out") from e
+        except httpx.HTTPError as e:
+            raise ProviderResponseError(f"{operation} failed: {e}") from e
+        if response.status_code >= 400:
+            raise ProviderResponseError(f"{operation} returned {response.status_code}", status=response.status_code)
+        return response.json()
+
+    async def scan_product(self, image_base64=None, barcode=None):
+        return await self._post("scan_product", {"image_base64": image_base64, "barcode": barcode})
+
+    async def generate_recipes(self, ingredients, preferences):
+        return await self._post("generate_recipes", {"ingredients": ingredients, "preferences": preferences})
+
+    async def scan_receipt(self, image_base64):
+        return await self._post("scan_receipt", {"image_base64": image_base64})
+
+    async def get_ai_response(self, message, user_profile=None):
+        data = await self._post("get_ai_response", {"message": message, "user_profile": user_profile})
+        return data["response"]
+
+
+@dataclass
+class Policy:
+    timeout: float = 10.0  # per attempt
+    concurrency: int = 16
+    queue_timeout: float = 5.0  # wait for a free slot before answering busy
+    attempts: int = 2  # retries and hedges included
+    hedge_after: Optional[float] = None  # start another attempt if the first is slower than this
+    backoff: float = 0.2  # before retry n: backoff * n
+    failure_threshold: int = 5
+    reset_after: float = 30.0
+
+
+DEFAULT_POLICIES: Dict[str, Policy] = {
+    "scan_product": Policy(timeout=5.0, concurrency=32, hedge_after=2.5),
+    # LLM calls are expensive: retry on failure but never run two at once
+    "generate_recipes": Policy(timeout=15.0, concurrency=16),
+    "scan_receipt": Policy(timeout=10.0, concurrency=int(os.environ.get("RECEIPT_OCR_CONCURRENCY", "32")),
+                           hedge_after=4.0),
+    "get_ai_response": Policy(timeout=20.0, concurrency=16),
+}
+
+
+def policy_from_env(operation: str, base: Policy) -> Policy:
+    overrides = {}
+    for f in fields(Policy):
+        value = os.environ.get(f"PROVIDER_{operation.upper()}_{f.name.upper()}")
+        if value is not None:
+            overrides[f.name] = None if value.lower() in ("", "none", "off") else \
+                (int(value) if f.name in ("concurrency", "attempts", "failure_threshold") else float(value))
+    return replace(base, **overrides)
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` failures in a row; one probe call after ``reset_after``"""
+
+    def __init__(self, failure_threshold: int, reset_after: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures, self.opened_at, self._probing = 0, None, False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at, self._probing = self.clock(), False
+
+
+class _Operation:
+    def __init__(self, policy: Policy):
+        self.policy = policy
+        self.slots = asyncio.Semaphore(policy.concurrency)
+        self.breaker = CircuitBreaker(policy.failure_threshold, policy.reset_after)
+        self.in_flight = 0
+        self.counts = {"calls": 0, "attempts": 0, "hedges": 0, "failures": 0, "rejected": 0}
+
+
+@instrument("external.provider", kind="client")
+class ResilientProvider(Provider):
+    def __init__(self, inner: Provider, policies: Optional[Dict[str, Policy]] = None):
+        self.inner = inner
+        self.name = inner.name
+        policies = policies or {op: policy_from_env(op, DEFAULT_POLICIES[op]) for op in OPERATIONS}
+        self._operations = {op: _Operation(policies.get(op, Policy())) for op in OPERATIONS}
+
+    async def scan_product(self, image_base64=None, barcode=None):
+        return await self._call("scan_product", lambda: self.inner.scan_product(image_base64, barcode))
+
+    async def generate_recipes(self, ingredients, preferences):
+        return await self._call("generate_recipes", lambda: self.inner.generate_recipes(ingredients, preferences))
+
+    async def scan_receipt(self, image_base64):
+        return await self._call("scan_receipt", lambda: self.inner.scan_receipt(image_base64))
+
+    async def get_ai_response(self, message, user_profile=None):
+        return await self._call("get_ai_response", lambda: self.inner.get_ai_response(message, user_profile))
+
+    async def close(self) -> None:
+        await self.inner.close()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            op: {"state": o.breaker.state, "in_flight": o.in_flight, "limit": o.policy.concurrency, **o.counts}
+            for op, o in self._operations.items()
+        }
+
+    async def _call(self, operation: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        op = self._operations[operation]
+        op.counts["calls"] += 1
+        if not op.breaker.allow():
+            op.counts["rejected"] += 1
+            raise ProviderUnavailableError(f"{self.name}.{operation} is failing; circuit open")
+        try:
+            result = await self._attempts(op, call)
+        except ProviderBusyError:
+            # Our own backpressure, not a provider fault
+            op.counts["rejected"] += 1
+            raise
+        except ProviderError:
+            op.counts["failures"] += 1
+            op.breaker.record_failure()
+            raise
+        op.breaker.record_success()
+        return result
+
+    async def _attempt(self, op: _Operation, call: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            await asyncio.wait_for(op.slots.acquire(), op.policy.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ProviderBusyError("Too many requests in flight to the provider")
+        op.in_flight += 1
+        op.counts["attempts"] += 1
+        try:
+            return await asyncio.wait_for(call(), op.policy.timeout)
+        except asyncio.TimeoutError:
+            raise ProviderTimeoutError(f"No answer within {op.policy.timeout}s")
+        except ProviderError:
+            raise
+        except Exception as e:
+            raise ProviderResponseError(str(e)) from e
+        finally:
+            op.in_flight -= 1
+            op.slots.release()
+
+    async def _attempts(self, op: _Operation, call: Callable[[], Awaitable[Any]]) -> Any:
+        """First successful attempt; hedges a slow attempt and retries failed ones up to ``attempts``"""
+        policy = op.policy
+        pending: set = set()
+        launched, last_error = 0, None
+        try:
+            while True:
+                if launched < policy.attempts and (not pending or last_error is None):
+                    if pending:
+                        op.counts["hedges"] += 1
+                    pending.add(asyncio.ensure_future(self._attempt(op, call)))
+                    launched += 1
+                hedge = policy.hedge_after if launched < policy.attempts and last_error is None else None
+                done, pending = await asyncio.wait(pending, timeout=hedge, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        return task.result()
+                    if not getattr(error, "retryable", False):
+                        raise error
+                    last_error = error
+                if pending:
+                    continue
+                if launched >= policy.attempts:
+                    raise ProviderUnavailableError(f"{self.name} failed after {launched} attempts: {last_error}") \
+                        from last_error
+                await asyncio.sleep(policy.backoff * launched)
+                last_error = None
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def build_provider(kind: Optional[str] = None) -> ResilientProvider:
+    kind = (kind or os.environ.get("EXTERNAL_PROVIDER", "mock")).lower()
+    if kind == "mock":
+        inner: Provider = MockProvider()
+    elif kind == "fake":
+        latency = {"default": os.environ.get("FAKE_PROVIDER_LATENCY", "lognormal:0.2:0.5")}
+        for op in OPERATIONS:
+            if f"FAKE_PROVIDER_LATENCY_{op.upper()}" in os.environ:
+                latency[op] = os.environ[f"FAKE_PROVIDER_LATENCY_{op.upper()}"]
+        seed = os.environ.get("FAKE_PROVIDER_SEED")
+        inner = FakeProvider(latency, float(os.environ.get("FAKE_PROVIDER_FAILURE_RATE", "0")),
+                             int(seed) if seed else None)
+    elif kind == "http":
+        inner = HTTPProvider(os.environ["EXTERNAL_API_BASE_URL"], os.environ.get("EXTERNAL_API_KEY"))
+    else:
+        raise ValueError(f"Unknown EXTERNAL_PROVIDER {kind!r}")
+    logger.info(f"External provider: {inner.name}")
+    return ResilientProvider(inner)
+
+
+_provider: Optional[ResilientProvider] = None
+
+
+def get_provider() -> ResilientProvider:
+    global _provider
+    if _provider is None:
+        _provider = build_provider()
+    return _provider
+
+
+def set_provider(provider: Optional[ResilientProvider]) -> None:
+    """Swap the process-wide provider (tests, benchmarks)"""
+    global _provider
+    _provider = provider
+
+
+async def shutdown() -> None:
+    global _http_client
+    if _provider is not None:
+        await _provider.close()
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -0,0 +1,77 @@
+"""Process-local read-through cache of documents by id, for ``Database.get_many``.
+
+Bulk lookups by id (recipes of a meal plan, products of a feed) first take
+what this cache holds and query MongoDB only for the misses. Entries expire ``READ_CACHE_TTL`` seconds after they were read and
+the least recently used are evicted beyond ``READ_CACHE_SIZE``; misses are
+not cached.
+
+Only documents that are never edited are cached: products and recipes,
+whose entries go stale only when a document is archived or deleted.
+Profiles are read around it, since an edit made by another worker would be
+served stale for up to the TTL. Cached documents are shared, so
+``get_many(raw=True)`` hands out shallow copies of them.
+
+    READ_CACHE_TTL    seconds an entry is served (default 60; 0 disables the cache)
+    READ_CACHE_SIZE   entries kept (default 50000)
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+import time
+
+READ_CACHE_TTL = float(os.environ.get("READ_CACHE_TTL", "60"))
+READ_CACHE_SIZE = int(os.environ.get("READ_CACHE_SIZE", "50000"))
+
+
+class ReadCache:
+    def __init__(self, ttl: float = READ_CACHE_TTL, max_entries: int = READ_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get_many(self, namespace: str, ids: Iterable[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """(cached documents by id, ids that have to be read)"""
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        now = time.monotonic()
+        for id in ids:
+            entry = self._entries.get((namespace, id)) if self.enabled else None
+            if entry is None or entry[0] < now:
+                missing.append(id)
+                continue
+            self._entries.move_to_end((namespace, id))
+            found[id] = entry[1]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, namespace: str, documents: Dict[str, Dict[str, Any]]) -> None:
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl
+        for id, document in documents.items():
+            self._entries[(namespace, id)] = (expires, document)
+            self._entries.move_to_end((namespace, id))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, id: str) -> None:
+        self._entries.pop((namespace, id), None)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == namespace]:
+            del self._entries[key]
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl": self.ttl}
+
+
+cache = ReadCache()
@@ -0,0 +1,366 @@
+"""Real-time push of inventory, shopping list and community feed changes.
+
+Clients subscribe over Server-Sent Events (``GET /api/events/stream``) to
+some of these topics:
+
+    inventory   inventory_items of the user
+    shopping    shopping_lists of the user
+    community   every community post
+
+Events are ``upsert`` (with the document), ``delete`` (ids only) or
+``resync`` (refetch everything). One ``Hub`` per process fans them out to
+its subscribers. It is fed by a single source, started with the first
+subscriber:
+
+* ``ChangeStreamSource`` watches the three collections with a Mongo change
+  stream (replica set or sharded cluster), resuming from the last token
+  after errors. Deletes carry no document; they are routed with the
+  pre-image when the collection has ``changeStreamPreAndPostImages``
+  enabled, else by remembering which user recently owned each ``_id``.
+  Pre-images are only asked for with ``REALTIME_PRE_IMAGES`` or on MongoDB
+  6.0+, since older servers reject the option. If the first ``watch`` fails
+  with a non-resumable error, ``auto`` falls back to polling.
+* ``PollingSource`` is the fallback for a standalone ``mongod`` (and the
+  in-memory benchmark store): every ``REALTIME_POLL_SECONDS`` it reads
+  documents with a newer ``updated_at`` (``created_at`` for posts) for the
+  users that have subscribers. It does not see deletes or likes.
+
+Each connection has a bounded queue (``REALTIME_QUEUE_SIZE``). A client that
+falls behind is not allowed to grow it: its pending events are dropped and
+replaced by one ``resync`` event, after which it refetches over REST (cheap
+with the ETags on those endpoints).
+
+    REALTIME_SOURCE          auto (default), changestream or polling
+    REALTIME_QUEUE_SIZE      events buffered per connection (default 100)
+    REALTIME_MAX_CONNECTIONS per process, beyond which streams get 503 (default 10000)
+    REALTIME_POLL_SECONDS    polling interval of the fallback (default 2)
+    REALTIME_HEARTBEAT_SECONDS  SSE comment interval keeping proxies from closing idle streams (default 15)
+    REALTIME_PRE_IMAGES      1 enables pre-images on the user collections at startup
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import asyncio
+import logging
+import os
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import serialization
+from tracing import spawn
+
+logger = logging.getLogger(__name__)
+
+SOURCE = os.environ.get("REALTIME_SOURCE", "auto")
+QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", "100"))
+MAX_CONNECTIONS = int(os.environ.get("REALTIME_MAX_CONNECTIONS", "10000"))
+POLL_SECONDS = float(os.environ.get("REALTIME_POLL_SECONDS", "2"))
+HEARTBEAT_SECONDS = float(os.environ.get("REALTIME_HEARTBEAT_SECONDS", "15"))
+RECONNECT_MS = 3000
+PRE_IMAGES = os.environ.get("REALTIME_PRE_IMAGES", "0") in ("1", "true", "on")
+
+# collection -> (topic, field holding the user, field that moves on every write)
+COLLECTIONS = {
+    "inventory_items": ("inventory", "user_id", "updated_at"),
+    "shopping_lists": ("shopping", "user_id", "updated_at"),
+    "community_posts": ("community", None, "created_at"),
+}
+TOPICS = {topic for topic, _, _ in COLLECTIONS.values()}
+USER_TOPICS = {topic for topic, user_field, _ in COLLECTIONS.values() if user_field}
+
+# Error code of $changeStream on a standalone server
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# fullDocumentBeforeChange is rejected by older servers
+PRE_IMAGES_MIN_VERSION = (6, 0)
+
+
+class TooManyConnectionsError(RuntimeError):
+    pass
+
+
+def topic_key(topic: str, user_id: Optional[str]) -> str:
+    return f"{topic}:{user_id}" if topic in USER_TOPICS else topic
+
+
+def upsert_event(collection: str, document: dict) -> Dict[str, Any]:
+    return {"type": "upsert", "collection": collection, "id": document.get("id"),
+            "document": {k: v for k, v in document.items() if k != "_id"}}
+
+
+def delete_event(collection: str, before: Optional[dict], document_id: Any) -> Dict[str, Any]:
+    # Our own "id" when the pre-image has it, else Mongo's _id
+    return {"type": "delete", "collection": collection,
+            "id": before.get("id") if before else None, "_id": str(document_id)}
+
+
+# Subscribers
+class Subscription:
+    """One connection's bounded queue of events"""
+
+    def __init__(self, keys: Iterable[str], size: int = QUEUE_SIZE):
+        self.keys = list(keys)
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(size)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: replace the backlog with one resync
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "reason": "overflow"})
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    """In-process fan-out from one change source to topic subscribers"""
+
+    def __init__(self):
+        self.db = None
+        self.source = None
+        self._task: Optional[asyncio.Task] = None
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.connections = 0
+        self.published = 0
+
+    def configure(self, db) -> None:
+        self.db = db
+
+    def full(self) -> bool:
+        return self.connections >= MAX_CONNECTIONS
+
+    def subscribe(self, topics: Iterable[str], user_id: Optional[str]) -> Subscription:
+        if self.full():
+            raise TooManyConnectionsError("Too many open event streams")
+        subscription = Subscription(topic_key(topic, user_id) for topic in topics)
+        for key in subscription.keys:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        self.connections += 1
+        self._ensure_source()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for key in subscription.keys:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[key]
+        self.connections -= 1
+
+    def publish(self, key: str, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscribers.get(key, ())):
+            subscription.offer(event)
+        self.published += 1
+
+    def subscribed_users(self, topic: str) -> List[str]:
+        prefix = f"{topic}:"
+        return [key[len(prefix):] for key in self._subscribers if key.startswith(prefix)]
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subscribers if topic not in USER_TOPICS else bool(self.subscribed_users(topic))
+
+    def _ensure_source(self) -> None:
+        if self.db is None or (self._task is not None and not self._task.done()):
+            return
+        self.source = build_source(self.db, self)
+        self._task = spawn(self.source.run(), "realtime.source", detached=True)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        source = getattr(self.source, "active", None) or self.source
+        return {"source": type(source).__name__ if source else None, "connections": self.connections,
+                "topics": len(self._subscribers), "published": self.published}
+
+
+# Sources
+class ChangeStreamSource:
+    """Events from a change stream on the database, resumed from the last token"""
+
+    def __init__(self, db, hub: Hub, owner_cache_size: int = 100_000):
+        self.db = db
+        self.hub = hub
+        self.resume_token = None
+        # _id -> {"id", "user_id"}, to route deletes when pre-images are not enabled
+        self._owners: "OrderedDict[Any, dict]" = OrderedDict()
+        self.owner_cache_size = owner_cache_size
+
+    async def run(self) -> None:
+        pipeline = [{"$match": {"ns.coll": {"$in": list(COLLECTIONS)}}}]
+        options = {"full_document": "updateLookup"}
+        if PRE_IMAGES or await server_version(self.db) >= PRE_IMAGES_MIN_VERSION:
+            options["full_document_before_change"] = "whenAvailable"
+        opened = False
+        while True:
+            try:
+                async with self.db.watch(pipeline, resume_after=self.resume_token, **options) as stream:
+                    opened = True
+                    async for change in stream:
+                        self.resume_token = stream.resume_token
+                        self.dispatch(change)
+            except OperationFailure as e:
+                # The server can't run this stream at all: let the caller fall back to polling
+                if e.code == CHANGE_STREAMS_UNSUPPORTED or (
+                        not opened and not e.has_error_label("ResumableChangeStreamError")):
+                    raise
+                logger.warning(f"Change stream failed, resuming: {e}")
+                await asyncio.sleep(1)
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted, resuming: {e}")
+                await asyncio.sleep(1)
+
+    def dispatch(self, change: Dict[str, Any]) -> None:
+        collection = change.get("ns", {}).get("coll")
+        if collection not in COLLECTIONS:
+            return
+        topic, user_field, _ = COLLECTIONS[collection]
+        document = change.get("fullDocument")
+        before = change.get("fullDocumentBeforeChange")
+        document_id = change.get("documentKey", {}).get("_id")
+
+        if change["operationType"] == "delete":
+            known = before or self._owners.pop(document_id, None)
+            if user_field and known is None:
+                return
+            event = delete_event(collection, known, document_id)
+        elif document is not None:
+            known = document
+            event = upsert_event(collection, document)
+            if user_field:
+                self._remember(document_id, {"id": document.get("id"), user_field: document.get(user_field)})
+        else:
+            # Updated, then deleted before the lookup
+            return
+        self.hub.publish(topic_key(topic, known.get(user_field) if user_field else None), event)
+
+    def _remember(self, document_id: Any, owner: dict) -> None:
+        self._owners[document_id] = owner
+        self._owners.move_to_end(document_id)
+        if len(self._owners) > self.owner_cache_size:
+            self._owners.popitem(last=False)
+
+
+class PollingSource:
+    """Events from periodic ``updated_at``/``created_at`` queries, for servers without change streams"""
+
+    def __init__(self, db, hub: Hub, interval: Optional[float] = None, since: Optional[datetime] = None):
+        self.db = db
+        self.hub = hub
+        self.interval = interval or POLL_SECONDS
+        since = since or datetime.utcnow()
+        self.since = {collection: since for collection in COLLECTIONS}
+        # Ids already sent at exactly ``since``: Mongo keeps milliseconds, so later
+        # writes can share it and the query has to include the boundary
+        self.sent_at_since: Dict[str, Set[str]] = {collection: set() for collection in COLLECTIONS}
+        self.queries = 0
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Realtime polling failed: {e}")
+
+    async def poll(self) -> None:
+        for collection, (topic, user_field, version_field) in COLLECTIONS.items():
+            query: Dict[str, Any] = {version_field: {"$gte": self.since[collection]}}
+            if user_field:
+                users = self.hub.subscribed_users(topic)
+                if not users:
+                    continue
+                query[user_field] = {"$in": users}
+            elif not self.hub.has_subscribers(topic):
+                continue
+            self.queries += 1
+            documents = await self.db[collection].find(query, {"_id": 0}).sort(version_field, 1).to_list(None)
+            sent = self.sent_at_since[collection]
+            for document in documents:
+                if document[version_field] == self.since[collection] and document.get("id") in sent:
+                    continue
+                self.hub.publish(topic_key(topic, document.get(user_field) if user_field else None),
+                                 upsert_event(collection, document))
+            if documents and documents[-1][version_field] != self.since[collection]:
+                self.since[collection] = documents[-1][version_field]
+                sent.clear()
+            sent.update(d.get("id") for d in documents if d[version_field] == self.since[collection])
+
+
+class _AutoSource:
+    """Change streams when the server supports them, polling otherwise"""
+
+    def __init__(self, db, hub: Hub):
+        self.db = db
+        self.hub = hub
+        self.active = None
+        # Writes made while the change stream is being tried still count
+        self.started = datetime.utcnow()
+
+    async def run(self) -> None:
+        self.active = ChangeStreamSource(self.db, self.hub)
+        try:
+            await self.active.run()
+        except OperationFailure as e:
+            logger.info(f"Change streams unavailable ({e}); polling every {POLL_SECONDS}s instead")
+        self.active = PollingSource(self.db, self.hub, since=self.started)
+        await self.active.run()
+
+
+async def server_version(db) -> Tuple[int, ...]:
+    """(major, minor, ...) of the server, or () when it can't be told"""
+    try:
+        info = await db.command("buildInfo")
+    except PyMongoError as e:
+        logger.warning(f"Could not read the server version: {e}")
+        return ()
+    return tuple(info.get("versionArray") or ())
+
+
+def build_source(db, hub: Hub):
+    if SOURCE == "changestream":
+        return ChangeStreamSource(db, hub)
+    if SOURCE == "polling":
+        return PollingSource(db, hub)
+    return _AutoSource(db, hub)
+
+
+async def enable_pre_images(db) -> None:
+    """Let delete events carry the document (MongoDB 6.0+, needs collMod rights)"""
+    for collection, (_, user_field, _) in COLLECTIONS.items():
+        if user_field:
+            await db.command("collMod", collection, changeStreamPreAndPostImages={"enabled": True})
+
+
+# Server-Sent Events
+def format_event(event: Dict[str, Any]) -> bytes:
+    return b"event: " + event["type"].encode("ascii") + b"\ndata: " + serialization.dumps(event) + b"\n\n"
+
+
+async def event_stream(hub: Hub, topics: List[str], user_id: Optional[str]):
+    """SSE body of one subscription, which lasts until the client goes away"""
+    subscription = hub.subscribe(topics, user_id)
+    try:
+        yield f"retry: {RECONNECT_MS}\n".encode("ascii") + format_event({"type": "ready", "topics": subscription.keys})
+        while True:
+            event = await subscription.next(HEARTBEAT_SECONDS)
+            yield format_event(event) if event is not None else b": keep-alive\n\n"
+    finally:
+        hub.unsubscribe(subscription)
+
+
+hub = Hub()
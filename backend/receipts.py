@@ -0,0 +1,202 @@
+"""Receipt ingestion: OCR, dedup and merge into the user's inventory.
+
+A scan goes through four stages:
+
+1. the image (see ``images``) is hashed and claimed in ``receipt_scans`` under (user, hash),
+   so submitting the same receipt again returns the first result instead of
+   adding everything twice;
+2. OCR goes through the provider layer, whose ``scan_receipt`` concurrency
+   limit (``RECEIPT_OCR_CONCURRENCY``) makes a burst of uploads queue instead
+   of piling onto the provider;
+3. lines are parsed with ``ingredients`` and collapsed per item;
+4. every line is matched against the inventory (canonical name, then a
+   fuzzy ``difflib`` match) and written in one ``bulk_write``: ``$inc`` the
+   quantity and ``$max`` the expiry of a matched item, insert the rest.
+   Merges for one user run one at a time within a process.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import difflib
+import logging
+import os
+import weakref
+
+from pymongo import InsertOne, UpdateOne
+
+from ingredients import SHELF_LIFE_DAYS, UnitError, canonical_name, convert, display_name, parse_ingredient
+from models import InventoryItem
+import images
+import providers
+
+logger = logging.getLogger(__name__)
+
+# difflib ratio from which a receipt line counts as an existing inventory item
+MATCH_CUTOFF = float(os.environ.get("RECEIPT_MATCH_CUTOFF", "0.85"))
+
+
+class ReceiptScanError(RuntimeError):
+    pass
+
+
+class ReceiptInProgressError(ReceiptScanError):
+    pass
+
+
+async def run_ocr(image_base64: str) -> Dict[str, Any]:
+    return await providers.get_provider().scan_receipt(image_base64)
+
+
+@dataclass
+class ReceiptLine:
+    name: str  # canonical
+    quantity: float
+    unit: str
+    dimension: str
+    category: str
+    raw_names: List[str] = field(default_factory=list)
+
+
+def parse_lines(items: List[Dict[str, Any]]) -> List[ReceiptLine]:
+    """Receipt items as inventory quantities, one line per (item, dimension)"""
+    lines: Dict[Tuple[str, str], ReceiptLine] = {}
+    for item in items:
+        parsed = parse_ingredient(str(item.get("name", "")))
+        if not parsed.name:
+            continue
+        count = float(item.get("quantity") or 1)
+        line = lines.get((parsed.name, parsed.dimension))
+        if line is None:
+            lines[(parsed.name, parsed.dimension)] = ReceiptLine(
+                parsed.name, count * parsed.quantity, parsed.unit, parsed.dimension, parsed.category, [item["name"]])
+        else:
+            line.quantity += convert(count * parsed.quantity, parsed.unit, line.unit)
+            line.raw_names.append(item["name"])
+    return list(lines.values())
+
+
+def _match(line: ReceiptLine, by_name: Dict[str, List[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """Newest inventory item with the same (or a close) name whose unit converts"""
+    names = [line.name] if line.name in by_name else \
+        difflib.get_close_matches(line.name, list(by_name), n=3, cutoff=MATCH_CUTOFF)
+    for name in names:
+        for item in by_name[name]:
+            try:
+                convert(1, line.unit, item.get("unit"))
+            except UnitError:
+                continue
+            return item
+    return None
+
+
+def merge_operations(user_id: str, lines: List[ReceiptLine], inventory: List[Dict[str, Any]],
+                     now: Optional[datetime] = None) -> Tuple[list, List[Dict[str, Any]]]:
+    """Bulk write requests that fold ``lines`` into ``inventory``, plus a per-line summary"""
+    now = now or datetime.utcnow()
+    by_name: Dict[str, List[Dict[str, Any]]] = {}
+    for item in inventory:  # newest first
+        by_name.setdefault(canonical_name(item.get("name", "")), []).append(item)
+
+    requests, summary = [], []
+    for line in lines:
+        expiry = now + timedelta(days=SHELF_LIFE_DAYS[line.category])
+        existing = _match(line, by_name)
+        if existing is not None:
+            quantity = convert(line.quantity, line.unit, existing["unit"])
+            requests.append(UpdateOne(
+                {"id": existing["id"]},
+                {"$inc": {"quantity": quantity}, "$max": {"expiry": expiry}, "$set": {"updated_at": now}},
+            ))
+            summary.append({"name": existing["name"], "quantity": quantity, "unit": existing["unit"],
+                            "item_id": existing["id"], "action": "merged"})
+            continue
+        item = InventoryItem(user_id=user_id, name=display_name(line.name), quantity=line.quantity,
+                             unit=line.unit, expiry=expiry, category=line.category, added_from_receipt=True,
+                             created_at=now, updated_at=now)
+        requests.append(InsertOne(item.model_dump()))
+        # Later receipt lines of the same item (other units) merge into this one
+        by_name.setdefault(line.name, []).insert(0, item.model_dump())
+        summary.append({"name": item.name, "quantity": item.quantity, "unit": item.unit,
+                        "item_id": item.id, "action": "created"})
+    return requests, summary
+
+
+_merge_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _merge_lock(user_id: str) -> asyncio.Lock:
+    lock = _merge_locks.get(user_id)
+    if lock is None:
+        lock = _merge_locks[user_id] = asyncio.Lock()
+    return lock
+
+
+# Same image submitted again while the first scan is still running in this process
+_in_flight: Dict[Tuple[str, str], "asyncio.Future[Dict[str, Any]]"] = {}
+
+
+async def ingest_receipt(db, user_id: str, image_base64: str) -> Dict[str, Any]:
+    """Scan a receipt and merge it into the inventory; re-submissions return the first result"""
+    return await ingest_image(db, user_id, await images.process_base64_async(image_base64))
+
+
+async def ingest_image(db, user_id: str, image: images.ProcessedImage) -> Dict[str, Any]:
+    """``ingest_receipt`` for an image already decoded and hashed (upload path)"""
+    key = (user_id, image.sha256)
+    if key in _in_flight:
+        return {**await asyncio.shield(_in_flight[key]), "duplicate": True}
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        result = await _ingest(db, user_id, image.sha256, image.image_base64)
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Nobody else may be waiting; don't leave "exception never retrieved" behind
+        future.exception()
+        raise
+    finally:
+        _in_flight.pop(key, None)
+
+
+async def _ingest(db, user_id: str, image_hash: str, image_base64: str) -> Dict[str, Any]:
+    scan_id, stored = await db.claim_receipt_scan(user_id, image_hash)
+    if stored is not None:
+        if stored.get("status") != "done":
+            # Claimed by another worker that has not finished yet
+            raise ReceiptInProgressError("This receipt is still being processed")
+        return {**_result(stored), "duplicate": True}
+
+    try:
+        ocr = await run_ocr(image_base64)
+        if not ocr.get("success"):
+            raise ReceiptScanError("Receipt could not be read")
+        lines = parse_lines(ocr["items"])
+        # Read-match-write per user in sequence, or two receipts could both insert the same new item
+        async with _merge_lock(user_id):
+            inventory = await db.get_user_inventory(user_id, raw=True)
+            requests, summary = merge_operations(user_id, lines, inventory)
+            if requests:
+                await db.inventory_items.bulk_write(requests, ordered=True)
+    except BaseException:
+        # Let the user retry the same image
+        await db.release_receipt_scan(scan_id)
+        raise
+
+    document = {"items": ocr["items"], "total": ocr.get("total", 0), "merged": summary,
+                "status": "done", "completed_at": datetime.utcnow()}
+    await db.complete_receipt_scan(scan_id, document)
+    logger.debug(f"Receipt {image_hash[:12]} for {user_id}: {len(ocr['items'])} lines, "
+                f"{sum(s['action'] == 'merged' for s in summary)} merged")
+    return {**_result({"id": scan_id, **document}), "duplicate": False}
+
+
+def _result(scan: Dict[str, Any]) -> Dict[str, Any]:
+    return {"success": True, "items": scan.get("items", []), "total": scan.get("total", 0),
+            "scan_id": scan.get("id"), "merged": scan.get("merged", [])}
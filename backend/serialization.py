@@ -0,0 +1,57 @@
+"""Fast JSON responses for trusted database output.
+
+List endpoints normally validate every document into a model, then FastAPI
+validates the returned models again against ``response_model`` and encodes
+them with the stdlib encoder. For documents we wrote ourselves (model dumps)
+that work is redundant: ``fast_list_response`` encodes the raw documents
+directly, with orjson when it is installed.
+
+Set ``FAST_JSON_RESPONSES=0`` to fall back to the validated path.
+"""
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Sequence
+import json
+import os
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_RESPONSES = os.environ.get("FAST_JSON_RESPONSES", "1") != "0"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson (stdlib fallback), datetimes as ISO strings"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def strip_ids(documents: Iterable[dict]) -> List[dict]:
+    """Drop Mongo's ``_id`` in case a query did not project it out"""
+    return [{k: v for k, v in document.items() if k != "_id"} for document in documents]
+
+
+def fast_list_response(documents: Sequence[Dict[str, Any]]) -> FastJSONResponse:
+    return FastJSONResponse(strip_ids(documents) if documents and "_id" in documents[0] else documents)
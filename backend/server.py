@@ -1,4 +1,6 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Query
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -6,24 +8,79 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 import uuid
 from datetime import datetime
 
 # Import our new modules
 from api_routes import router as api_routes_router
+import api_routes
+from database import Database
+from tracing import TracingMiddleware, shutdown_tracing
+import admission
+import idempotency
+import images
+import lifecycle
+import meal_planner
+import providers
+import read_cache
+import realtime
+import warmup
+import write_behind
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# MongoDB connection, created by connect() from the lifespan hook: in the worker that uses it,
+# not at import time (nor in a preforking master). The API routes use the same client.
 db_name = os.environ.get('DB_NAME', 'nutritionist_app')
-db = client[db_name]
+client: Optional[AsyncIOMotorClient] = None
+db = None
+
+def connect() -> AsyncIOMotorClient:
+    """Create the process's Mongo client and hand its database to the stores that use it"""
+    global client, db
+    if client is None:
+        client = api_routes.get_client()
+        db = client[db_name]
+        admission_controller.store = admission.build_store(db)
+        idempotency_store.collection = db.idempotency_keys
+        # Push events are read from this process's own database handle
+        realtime.hub.configure(db)
+    return client
+
+def close() -> None:
+    global client, db
+    api_routes.close_client()
+    client = db = None
+
+# Shared read-only data, built before fork when gunicorn preloads the app
+warmup.preload()
+
+async def warm_up():
+    await warmup.warm_pool(client)
+    await ensure_indexes()
+    await meal_planner.catalogue_cache.get(Database(client, db_name))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    connect()
+    await warmup.readiness.start(warm_up)
+    yield
+    # Fail readiness first so load balancers stop sending traffic while we drain
+    await warmup.readiness.stop()
+    # Buffered writes go out while the client is still open
+    await write_behind.buffer.close()
+    # Background tasks that read the database stop before the client closes
+    admission.loop_lag.stop()
+    await realtime.hub.stop()
+    close()
+    images.shutdown()
+    await providers.shutdown()
+    shutdown_tracing()
 
 # Create the main app without a prefix
-app = FastAPI(title="Nutritionist in Your Pocket API", version="1.0.0")
+app = FastAPI(title="Nutritionist in Your Pocket API", version="1.0.0", lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -44,18 +101,31 @@ async def root():
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {"status": "healthy", "timestamp": datetime.utcnow(), "admission": admission_controller.status(),
+            "realtime": realtime.hub.status(), "write_behind": write_behind.buffer.status(),
+            "warmup": warmup.readiness.status(), "read_cache": read_cache.cache.status()}
+
+# Probes: liveness only needs the event loop, readiness also needs warm-up to have finished
+@api_router.get("/health/live")
+async def liveness():
+    return {"status": "alive"}
+
+@api_router.get("/health/ready")
+async def readiness():
+    status = warmup.readiness.status()
+    return JSONResponse(status, status_code=200 if warmup.readiness.ready else 503)
 
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
+    status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await write_behind.buffer.insert(db.status_checks, status_obj.model_dump())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(limit: int = Query(100, ge=1, le=1000)):
+    # Newest first off the TTL index on timestamp, instead of the first 1000 in natural order
+    status_checks = await db.status_checks.find({}, {"_id": 0}).sort("timestamp", -1).to_list(limit)
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 # Include the main API routes
@@ -64,12 +134,25 @@ api_router.include_router(api_routes_router)
 # Include the router in the main app
 app.include_router(api_router)
 
+# Rejections are cheap and still traced, so admission sits just inside tracing
+admission_controller = admission.AdmissionController(store=admission.build_store())
+app.add_middleware(admission.AdmissionMiddleware, controller=admission_controller)
+
+# Outside admission so that replayed retries don't spend the user's rate budget
+idempotency_store = idempotency.IdempotencyStore(None)
+app.add_middleware(idempotency.IdempotencyMiddleware, store=idempotency_store)
+
+# Covers response serialization and the rejections from the layers inside it
+app.add_middleware(TracingMiddleware)
+
+# Outermost so that 429/503 rejections and idempotency conflicts carry CORS headers too
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["traceparent", "Idempotent-Replayed", "Retry-After"],
 )
 
 # Configure logging
@@ -79,6 +162,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def ensure_indexes():
+    # TTL indexes expire idempotency keys and shared rate limit buckets
+    for store in (idempotency_store, admission_controller.store):
+        if hasattr(store, "ensure_indexes"):
+            try:
+                await store.ensure_indexes()
+            except Exception as e:
+                logger.warning(f"Could not create indexes for {type(store).__name__}: {e}")
+    # Unique keys that concurrent writers rely on, such as the receipt scan claim
+    try:
+        await Database(client, db_name).ensure_indexes()
+    except Exception as e:
+        logger.warning(f"Could not create database indexes: {e}")
+    # Retention: TTL on status checks, time indexes for archiving, product rollup keys
+    try:
+        await lifecycle.ensure_indexes(db)
+    except Exception as e:
+        logger.warning(f"Could not create lifecycle indexes: {e}")
+    if realtime.PRE_IMAGES:
+        try:
+            await realtime.enable_pre_images(db)
+        except Exception as e:
+            logger.warning(f"Could not enable change stream pre-images: {e}")
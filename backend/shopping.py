@@ -0,0 +1,210 @@
+"""Shopping lists computed from planned recipes minus what is already at home.
+
+Quantities are reduced to a base unit per dimension (grams, millilitres,
+pieces) so that "500 g" on a list and "1 kg" in the inventory can be netted
+against each other, then shown in the most readable unit again. Names, quantities and units are
+read through ``ingredients``, so "2 cups baby spinach" in a recipe and
+"Organic Spinach" in the inventory are the same item. Lists are
+edited with per-item operations (see ``Database`` shopping item methods); a sync
+against fresh needs is expressed as a diff of such operations rather than a
+rewrite of the whole ``items`` array.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import math
+
+from ingredients import DEFAULT_CATEGORY, canonical_name, display_name, parse_ingredient, to_base
+from models import ShoppingItem, ShoppingList
+
+# Larger display unit per dimension and the base quantity from which it is used
+DISPLAY_UNITS = {"mass": ("g", "kg", 1000), "volume": ("ml", "l", 1000), "count": ("pieces", "pieces", math.inf)}
+
+
+class ShoppingListError(ValueError):
+    pass
+
+
+def dimension_of(unit: Optional[str]) -> str:
+    return to_base(0, unit)[0]
+
+
+def from_base(dimension: str, quantity: float) -> Tuple[int, str]:
+    """Whole display quantity (rounded up); the larger unit only when it loses nothing"""
+    small, large, threshold = DISPLAY_UNITS[dimension]
+    quantity = math.ceil(round(quantity, 6))
+    if quantity >= threshold and quantity % threshold == 0:
+        return int(quantity // threshold), large
+    return quantity, small
+
+
+def item_key(name: str) -> str:
+    return canonical_name(name)
+
+
+@dataclass
+class Need:
+    name: str
+    dimension: str
+    quantity: float  # base unit
+    category: str = DEFAULT_CATEGORY
+
+
+def recipe_needs(recipes: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, str], Need]:
+    """Total ingredient needs over ``recipes``; an ingredient without a quantity counts as one piece"""
+    needs: Dict[Tuple[str, str], Need] = {}
+    for recipe in recipes:
+        for ingredient in recipe.get("ingredients") or []:
+            text = str(ingredient).strip()
+            if not text:
+                continue
+            parsed = parse_ingredient(text)
+            key = (parsed.name, parsed.dimension)
+            if key in needs:
+                needs[key].quantity += parsed.base_quantity
+            else:
+                needs[key] = Need(display_name(parsed.name), parsed.dimension, parsed.base_quantity, parsed.category)
+    return needs
+
+
+def subtract_inventory(needs: Dict[Tuple[str, str], Need], inventory: Iterable[Dict[str, Any]]) -> None:
+    """Net ``needs`` in place against on-hand inventory; also borrows inventory categories"""
+    for item in inventory:
+        dimension, on_hand = to_base(float(item.get("quantity") or 0), item.get("unit"))
+        need = needs.get((item_key(item.get("name", "")), dimension))
+        if need is None:
+            continue
+        need.quantity = max(need.quantity - on_hand, 0)
+        if need.category == DEFAULT_CATEGORY and item.get("category"):
+            need.category = item["category"]
+
+
+def to_items(needs: Iterable[Need]) -> List[ShoppingItem]:
+    items = []
+    for need in needs:
+        if need.quantity <= 0:
+            continue
+        quantity, unit = from_base(need.dimension, need.quantity)
+        items.append(ShoppingItem(name=need.name, category=need.category, needed=quantity, unit=unit))
+    return sorted(items, key=lambda item: (item.category, item_key(item.name)))
+
+
+def compute_items(recipes: Iterable[Dict[str, Any]], inventory: Iterable[Dict[str, Any]]) -> List[ShoppingItem]:
+    needs = recipe_needs(recipes)
+    subtract_inventory(needs, inventory)
+    return to_items(needs.values())
+
+
+def _as_stock(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Purchased list entries, shaped like inventory items"""
+    return [{"name": i["name"], "quantity": i.get("needed") or 0, "unit": i.get("unit")} for i in items if i.get("purchased")]
+
+
+@dataclass
+class ListDiff:
+    """Per-item operations that turn a stored list into a freshly computed one"""
+    updates: Dict[str, Dict[str, Any]]  # item id -> fields to $set
+    additions: List[ShoppingItem]
+    removals: List[str]  # item ids
+
+    @property
+    def empty(self) -> bool:
+        return not (self.updates or self.additions or self.removals)
+
+
+def diff_items(existing: List[Dict[str, Any]], computed: List[ShoppingItem],
+               managed: Optional[Iterable[Tuple[str, str]]] = None) -> ListDiff:
+    """Per-item operations that make the unpurchased part of ``existing`` match ``computed``.
+
+    Only entries whose (name, dimension) key is in ``managed`` (default: all) may be removed,
+    so items the user added by hand survive a sync. Duplicate unpurchased entries for the
+    same item collapse into the first one.
+    """
+    current: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for item in existing:
+        if not item.get("purchased"):
+            current.setdefault((item_key(item["name"]), dimension_of(item.get("unit"))), []).append(item)
+
+    updates: Dict[str, Dict[str, Any]] = {}
+    additions: List[ShoppingItem] = []
+    for item in computed:
+        stored = current.pop((item_key(item.name), dimension_of(item.unit)), None)
+        if stored is None:
+            additions.append(item)
+            continue
+        first, duplicates = stored[0], stored[1:]
+        if (first.get("needed"), first.get("unit")) != (item.needed, item.unit):
+            updates[first["id"]] = {"needed": item.needed, "unit": item.unit}
+        current[("", first["id"])] = duplicates
+
+    managed = None if managed is None else set(managed)
+    removals = [item["id"] for key, items in current.items()
+                if managed is None or key[0] == "" or key in managed for item in items]
+    return ListDiff(updates, additions, removals)
+
+
+async def _planned_recipes(db, recipe_ids: List[str]) -> List[Dict[str, Any]]:
+    """Recipes in plan order, repeated as often as they are planned"""
+    return [recipe for recipe in await db.get_recipes(recipe_ids, raw=True) if recipe is not None]
+
+
+async def generate_list(db, user_id: str, meal_plan_id: Optional[str] = None,
+                        recipe_ids: Optional[List[str]] = None) -> ShoppingList:
+    """New list with everything the planned recipes need that the inventory does not cover"""
+    if not recipe_ids:
+        plan = await (db.get_meal_plan(meal_plan_id) if meal_plan_id else db.get_latest_meal_plan(user_id))
+        if not plan or plan.get("user_id") != user_id:
+            raise ShoppingListError("Meal plan not found")
+        recipe_ids = [meal["recipe_id"] for day in plan["days"] for meal in day["meals"]]
+
+    recipes = await _planned_recipes(db, recipe_ids)
+    inventory = await db.get_user_inventory(user_id, raw=True)
+    shopping_list = ShoppingList(user_id=user_id, items=compute_items(recipes, inventory),
+                                 source_recipe_ids=recipe_ids)
+    return await db.save_shopping_list(shopping_list)
+
+
+async def add_item(db, list_id: str, item: ShoppingItem, attempts: int = 3) -> Optional[ShoppingItem]:
+    """Add ``item`` to a list, merging it into an unpurchased entry of the same item and dimension.
+
+    Entries are matched on the (canonical name, dimension) key that generate and sync use,
+    so "Eggs" merges into "egg" and "1 l milk" into "500 ml milk", but not into "2 pieces milk".
+    """
+    dimension, quantity = to_base(item.needed, item.unit)
+    key = (item_key(item.name), dimension)
+    for _ in range(attempts):
+        stored = await db.get_shopping_list(list_id)
+        if stored is None:
+            return None
+        existing = next((entry for entry in stored.get("items", []) if not entry.get("purchased")
+                         and (item_key(entry["name"]), dimension_of(entry.get("unit"))) == key), None)
+        if existing is None:
+            return await db.push_shopping_item(list_id, item)
+
+        needed, unit = from_base(dimension, to_base(existing["needed"], existing.get("unit"))[1] + quantity)
+        # Conditional on the values just read, so concurrent adds retry instead of overwriting each other
+        expected = {"id": existing["id"], "needed": existing["needed"], "unit": existing.get("unit")}
+        if await db.set_shopping_item_fields(list_id, expected, {"needed": needed, "unit": unit}):
+            return ShoppingItem(**{**existing, "needed": needed, "unit": unit})
+    raise ShoppingListError("The item changed while it was being updated; try again")
+
+
+async def sync_list(db, list_id: str) -> Tuple[Optional[Dict[str, Any]], ListDiff]:
+    """Bring a generated list up to date with the current inventory using per-item operations"""
+    stored = await db.get_shopping_list(list_id)
+    if not stored:
+        return None, ListDiff({}, [], [])
+    if not stored.get("source_recipe_ids"):
+        raise ShoppingListError("Only lists generated from recipes can be synced")
+
+    recipes = await _planned_recipes(db, stored["source_recipe_ids"])
+    inventory = await db.get_user_inventory(stored["user_id"], raw=True)
+    items = stored.get("items", [])
+    # Already bought counts as on hand until it shows up in the inventory
+    needs = recipe_needs(recipes)
+    managed = list(needs)
+    subtract_inventory(needs, [*inventory, *_as_stock(items)])
+    diff = diff_items(items, to_items(needs.values()), managed)
+    if not diff.empty:
+        await db.apply_shopping_diff(list_id, diff)
+        stored = await db.get_shopping_list(list_id)
+    return stored, diff
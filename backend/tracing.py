@@ -0,0 +1,339 @@
+"""Lightweight, OpenTelemetry-compatible tracing for the API.
+
+Spans carry W3C trace/span ids and are exported as one JSON object per line
+using OTLP-style field names, so the output can be loaded into any
+OpenTelemetry-aware tool for offline analysis.
+
+Configuration (environment):
+    TRACE_EXPORTER  none (default) | console | file
+    TRACE_FILE      path used by the file exporter (default: traces.jsonl)
+"""
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A single timed operation within a trace"""
+
+    __slots__ = ("trace_id", "span_id", "parent_span_id", "name", "kind",
+                 "attributes", "start_ns", "end_ns", "status", "error", "links")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_span_id = parent_span_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        # Spans in other traces that caused this one (e.g. the requests behind a batched write)
+        self.links: List[Dict[str, str]] = []
+
+    def add_link(self, traceparent: Optional[str]) -> None:
+        context = parse_traceparent(traceparent)
+        if context is not None:
+            self.links.append({"trace_id": context["trace_id"], "span_id": context["parent_span_id"]})
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        end_ns = self.end_ns or time.time_ns()
+        data = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+        if self.error:
+            data["error"] = self.error
+        if self.links:
+            data["links"] = self.links
+        return data
+
+
+class ConsoleSpanExporter:
+    """Writes finished spans to stderr as JSON lines"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+
+    def shutdown(self) -> None:
+        self.stream.flush()
+
+
+class FileSpanExporter:
+    """Appends finished spans to a local JSON-lines file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def _new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict[str, str]]:
+    """Parse a W3C ``traceparent`` header into trace and parent span ids"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return {"trace_id": parts[1], "parent_span_id": parts[2]}
+
+
+class Tracer:
+    def __init__(self, exporter=None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def open_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                  kind: str = "internal") -> Span:
+        """Create a child of the current span without making it current; finish with end_span()"""
+        parent = _current_span.get()
+        if parent is not None:
+            return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        return Span(name, _new_trace_id(), None, kind, attributes)
+
+    def end_span(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        try:
+            self.exporter.export(span)
+        except Exception as e:
+            logger.warning(f"Failed to export span {span.name}: {e}")
+
+    @contextmanager
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   kind: str = "internal", traceparent: Optional[str] = None,
+                   links: Optional[Iterable[str]] = None):
+        """Open a child of the current span (or a new root) for the duration of the block
+
+        ``links`` are traceparents of related spans in other traces.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        parent = _current_span.get()
+        remote = parse_traceparent(traceparent) if parent is None else None
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+        elif remote:
+            span = Span(name, remote["trace_id"], remote["parent_span_id"], kind, attributes)
+        else:
+            span = Span(name, _new_trace_id(), None, kind, attributes)
+        for link in links or ():
+            span.add_link(link)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+
+def _build_exporter(exporter_name: str, path: Optional[str]):
+    if exporter_name == "console":
+        return ConsoleSpanExporter()
+    if exporter_name == "file":
+        return FileSpanExporter(path or "traces.jsonl")
+    return None
+
+
+tracer = Tracer(_build_exporter(
+    os.environ.get("TRACE_EXPORTER", "none").lower(),
+    os.environ.get("TRACE_FILE"),
+))
+
+
+def configure_tracing(exporter_name: str = "none", path: Optional[str] = None) -> Tracer:
+    """Swap the global exporter at runtime (e.g. from a benchmark or CLI)"""
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+    tracer.exporter = _build_exporter(exporter_name.lower(), path)
+    return tracer
+
+
+def shutdown_tracing() -> None:
+    if tracer.exporter is not None:
+        tracer.exporter.shutdown()
+
+
+def traced(name: Optional[str] = None, kind: str = "internal") -> Callable:
+    """Decorator wrapping a sync or async function in a span"""
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                # Not made current: the generator is suspended in the caller's context between items
+                span = tracer.open_span(span_name, kind=kind)
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                except BaseException as e:
+                    span.record_exception(e)
+                    raise
+                finally:
+                    tracer.end_span(span)
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with tracer.start_span(span_name, kind=kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.start_span(span_name, kind=kind):
+                return func(*args, **kwargs)
+        return sync_wrapper
+
+    return decorator
+
+
+def instrument(prefix: str, kind: str = "internal") -> Callable:
+    """Class decorator tracing every public method (including staticmethods)"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_"):
+                continue
+            span_name = f"{prefix}.{attr}"
+            if isinstance(value, staticmethod):
+                setattr(cls, attr, staticmethod(traced(span_name, kind)(value.__func__)))
+            elif inspect.isfunction(value):
+                setattr(cls, attr, traced(span_name, kind)(value))
+        return cls
+    return decorator
+
+
+def spawn(coro, name: str, detached: bool = False) -> asyncio.Task:
+    """Run a background coroutine as a task whose span joins the current trace
+
+    ``detached`` tasks (process-lifetime loops such as the write-behind flusher)
+    start from an empty context instead, so their span is the root of a trace of
+    their own rather than hanging off whichever request happened to start them.
+    """
+    async def runner():
+        with tracer.start_span(f"background.{name}", kind="consumer"):
+            return await coro
+    if detached:
+        # create_task copies the running context; run it inside an empty one
+        return Context().run(asyncio.create_task, runner(), name=name)
+    return asyncio.create_task(runner(), name=name)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming = headers.get(b"traceparent", b"").decode("latin-1") or None
+        method = scope.get("method", "GET")
+
+        with tracer.start_span(f"{method} {scope['path']}", kind="server", traceparent=incoming, attributes={
+            "http.method": method,
+            "http.target": scope["path"],
+        }) as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = "error"
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceparent", span.traceparent.encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None and getattr(route, "path", None):
+                    span.name = f"{method} {route.path}"
+                    span.set_attribute("http.route", route.path)
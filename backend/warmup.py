@@ -0,0 +1,115 @@
+"""Process warm-up and readiness.
+
+Two stages, so a worker only takes traffic once it is fast:
+
+* ``preload()`` runs at import time. Under gunicorn with ``preload_app``
+  (see gunicorn.conf.py) that happens once in the master before it forks, so
+  the mock catalogues, barcode hot set, unit tables and warmed ingredient
+  caches are shared copy-on-write by every worker, and the memory-mapped
+  nutrition catalogue (catalogue.py) is mapped once for all of them.
+* ``Readiness.start(warm)`` runs the per-worker steps from the lifespan hook
+  (Mongo reachable, connection pool opened, indexes, recipe catalogue).
+  Startup waits up to ``WARMUP_TIMEOUT`` seconds for them; after that the
+  worker starts anyway but keeps retrying, and reports not ready until they
+  succeed.
+
+``/api/health/live`` answers as long as the event loop does;
+``/api/health/ready`` answers 503 until warm-up is done and again once
+shutdown begins, so load balancers and orchestrators route around workers
+that are starting or draining.
+
+    WARMUP_TIMEOUT            seconds startup waits for warm-up (default 30)
+    WARMUP_POOL_CONNECTIONS   Mongo connections opened up front (default 10)
+"""
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import logging
+import os
+import time
+
+import catalogue
+import services
+from tracing import spawn
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", "30"))
+POOL_CONNECTIONS = int(os.environ.get("WARMUP_POOL_CONNECTIONS", "10"))
+MAX_RETRY_DELAY = 30.0
+
+_preloaded: Optional[Dict[str, Any]] = None
+
+
+def preload() -> Dict[str, Any]:
+    """Build shared read-only data once per process (before fork when preloading)"""
+    global _preloaded
+    if _preloaded is None:
+        started = time.perf_counter()
+        nutrition_catalogue = catalogue.get_catalogue()
+        _preloaded = {**services.preload(), "catalogue": len(nutrition_catalogue) if nutrition_catalogue else 0,
+                      "pid": os.getpid(),
+                      "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        logger.info(f"Preloaded catalogues in {_preloaded['duration_ms']}ms")
+    return _preloaded
+
+
+async def warm_pool(client, connections: int = POOL_CONNECTIONS) -> None:
+    """Ping Mongo, then open ``connections`` pooled sockets with concurrent pings"""
+    await client.admin.command("ping")
+    if connections > 1:
+        await asyncio.gather(*[client.admin.command("ping") for _ in range(connections)])
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.stopping = False
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.warmed_in_ms: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, warm: Callable[[], Awaitable[None]], timeout: float = WARMUP_TIMEOUT) -> None:
+        """Run ``warm`` (retrying) and wait up to ``timeout`` seconds for it"""
+        self.ready, self.stopping = False, False
+        self._task = spawn(self._run(warm), "warmup", detached=True)
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Warm-up not finished after {timeout}s; serving as not ready until it is")
+
+    async def _run(self, warm: Callable[[], Awaitable[None]]) -> None:
+        started = time.perf_counter()
+        while True:
+            self.attempts += 1
+            try:
+                await warm()
+                break
+            except Exception as e:
+                self.error = str(e)[:200]
+                delay = min(2 ** (self.attempts - 1), MAX_RETRY_DELAY)
+                logger.warning(f"Warm-up attempt {self.attempts} failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+        self.error = None
+        self.warmed_in_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.ready = True
+        logger.info(f"Warm-up finished in {self.warmed_in_ms}ms")
+
+    async def stop(self) -> None:
+        """Report not ready from now on (draining) and abandon an unfinished warm-up"""
+        self.stopping, self.ready = True, False
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        state = "stopping" if self.stopping else "ready" if self.ready else "starting"
+        return {"status": state, "attempts": self.attempts, "error": self.error, "warmed_in_ms": self.warmed_in_ms,
+                "pid": os.getpid(), "preloaded": _preloaded}
+
+
+readiness = Readiness()
@@ -0,0 +1,185 @@
+"""Write-behind buffer for high-volume, low-criticality inserts.
+
+Chat messages and status checks used to cost one ``insert_one`` round trip
+each on the request path. ``WriteBehindBuffer.insert`` instead queues the
+document and returns; a background task writes each collection's queue with
+one ``insert_many(ordered=False)`` once it reaches ``max_batch`` documents or
+every ``flush_interval`` seconds, whichever comes first.
+
+* Memory is bounded: with ``max_pending`` documents queued, ``insert`` waits
+  for the next flush instead of growing the queue.
+* A failed batch is retried with backoff (documents that did make it, seen as
+  duplicate ``_id`` errors, are not written twice), then dropped and logged.
+* ``close()`` flushes everything; the server calls it on shutdown before
+  closing the Mongo client.
+* Reads may lag the write by up to ``flush_interval``.
+* Each batch is traced as a ``write_behind.flush`` span in the flusher's own
+  trace, linked to the request spans that queued its documents.
+
+Collections that must be written before the response (or every collection,
+with ``WRITE_BEHIND_MODE=sync``) bypass the buffer:
+
+    WRITE_BEHIND_MODE           buffered (default) or sync
+    WRITE_BEHIND_SYNC           comma-separated collections always written synchronously
+    WRITE_BEHIND_MAX_BATCH      documents per insert_many (default 500)
+    WRITE_BEHIND_FLUSH_MS       longest a document waits (default 50)
+    WRITE_BEHIND_MAX_PENDING    queued documents before insert() waits (default 10000)
+"""
+from typing import Any, Dict, List, Optional, Set
+import asyncio
+import logging
+import os
+
+from pymongo.errors import BulkWriteError
+
+from tracing import spawn, tracer
+
+logger = logging.getLogger(__name__)
+
+MODE = os.environ.get("WRITE_BEHIND_MODE", "buffered")
+SYNC_COLLECTIONS = {name.strip() for name in os.environ.get("WRITE_BEHIND_SYNC", "").split(",") if name.strip()}
+MAX_BATCH = int(os.environ.get("WRITE_BEHIND_MAX_BATCH", "500"))
+FLUSH_INTERVAL = float(os.environ.get("WRITE_BEHIND_FLUSH_MS", "50")) / 1000
+MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "10000"))
+RETRIES = 3
+DUPLICATE_KEY = 11000
+
+
+class _Queue:
+    """Documents waiting for one collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.documents: List[dict] = []
+        self.links: List[Optional[str]] = []  # traceparent of the span that queued each document
+
+
+class WriteBehindBuffer:
+    def __init__(self, max_batch: int = MAX_BATCH, flush_interval: float = FLUSH_INTERVAL,
+                 max_pending: int = MAX_PENDING, mode: str = MODE, sync_collections: Optional[Set[str]] = None):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.mode = mode
+        self.sync_collections = SYNC_COLLECTIONS if sync_collections is None else sync_collections
+        self._queues: Dict[str, _Queue] = {}
+        self._pending = 0
+        self._loop = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._flushed: Optional[asyncio.Event] = None
+        self._closing = False
+        self.counts = {"queued": 0, "written": 0, "batches": 0, "dropped": 0, "waited": 0}
+
+    def is_buffered(self, collection) -> bool:
+        return self.mode != "sync" and collection.name not in self.sync_collections
+
+    async def insert(self, collection, document: dict) -> None:
+        """Write ``document`` to ``collection`` soon (or now, in sync mode)"""
+        if not self.is_buffered(collection):
+            await collection.insert_one(document)
+            return
+        self._start()
+        while self._pending >= self.max_pending:
+            # Backpressure: wait for the flusher rather than queue without bound
+            self.counts["waited"] += 1
+            self._batch_ready.set()
+            self._flushed.clear()
+            await self._flushed.wait()
+
+        # By name: every request gets its own collection object for the same collection
+        key = getattr(collection, "full_name", collection.name)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _Queue(collection)
+        queue.documents.append(document)
+        span = tracer.current_span()
+        queue.links.append(span.traceparent if span is not None else None)
+        self._pending += 1
+        self.counts["queued"] += 1
+        if len(queue.documents) >= self.max_batch:
+            self._batch_ready.set()
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        if self._loop is not loop:
+            # First use, or a new event loop (tests, benchmarks): anything queued on the old one is gone
+            self._queues, self._pending = {}, 0
+            self._batch_ready, self._flushed = asyncio.Event(), asyncio.Event()
+        self._loop = loop
+        self._task = spawn(self._run(), "write_behind.flusher", detached=True)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything queued so far"""
+        batches = []
+        for queue in self._queues.values():
+            while queue.documents:
+                batch, queue.documents = queue.documents[:self.max_batch], queue.documents[self.max_batch:]
+                links, queue.links = queue.links[:self.max_batch], queue.links[self.max_batch:]
+                batches.append((queue.collection, batch, links))
+        if batches:
+            await asyncio.gather(*[self._write(collection, batch, links) for collection, batch, links in batches])
+        if self._flushed is not None:
+            self._flushed.set()
+
+    async def _write(self, collection, documents: List[dict], links: List[Optional[str]]) -> None:
+        # One link per request, however many documents it queued
+        with tracer.start_span("write_behind.flush", {"collection": collection.name, "count": len(documents)},
+                               kind="client", links=dict.fromkeys(link for link in links if link)):
+            await self._insert(collection, documents)
+
+    async def _insert(self, collection, documents: List[dict]) -> None:
+        remaining = documents
+        for attempt in range(RETRIES + 1):
+            try:
+                await collection.insert_many(remaining, ordered=False)
+                remaining = []
+                break
+            except BulkWriteError as e:
+                # Retry only what failed for a reason other than already being there
+                failed = {error["index"] for error in e.details.get("writeErrors", [])
+                          if error.get("code") != DUPLICATE_KEY}
+                remaining = [remaining[i] for i in sorted(failed)]
+                if not remaining:
+                    break
+                error = e
+            except Exception as e:
+                error = e
+            if attempt < RETRIES:
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        if remaining:
+            logger.error(f"Dropping {len(remaining)} buffered {collection.name} documents: {error}")
+            self.counts["dropped"] += len(remaining)
+        self.counts["written"] += len(documents) - len(remaining)
+        self.counts["batches"] += 1
+        self._pending -= len(documents)
+
+    async def close(self) -> None:
+        """Stop the flusher and write what is left"""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        # Let an in-progress flush finish rather than cancel it halfway through a batch
+        self._closing = True
+        self._batch_ready.set()
+        try:
+            await self._task
+            await self.flush()
+        finally:
+            self._task, self._closing = None, False
+
+    def status(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "pending": self._pending, **self.counts}
+
+
+buffer = WriteBehindBuffer()
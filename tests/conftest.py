@@ -0,0 +1,75 @@
+"""Shared fixtures: the backend modules on sys.path and the in-memory Mongo stand-in.
+
+Tests run without a MongoDB server or external services: ``db`` is a
+``Database`` on ``benchmarks.memory_mongo``, and ``client`` drives the app
+in-process with admission control off and mock providers without latency.
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("MONGO_URL", "mongodb://unused")
+os.environ["MOCK_API_LATENCY_SCALE"] = "0"
+
+DB_NAME = "tests"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Process-wide caches start empty in every test"""
+    import meal_planner
+    import read_cache
+
+    monkeypatch.setattr(read_cache, "cache", read_cache.ReadCache(ttl=60))
+    monkeypatch.setattr(meal_planner, "catalogue_cache", meal_planner.CatalogueCache())
+
+
+@pytest.fixture
+def mongo():
+    from benchmarks.memory_mongo import MemoryClient
+
+    return MemoryClient()
+
+
+@pytest.fixture
+def db(mongo):
+    from database import Database
+
+    return Database(mongo, DB_NAME)
+
+
+@pytest.fixture
+async def client(mongo, monkeypatch):
+    import admission
+    import server
+    from api_routes import get_database
+    from database import Database
+
+    monkeypatch.setattr(admission, "ENABLED", False)
+    monkeypatch.setattr(server.idempotency_store, "collection", mongo[DB_NAME].idempotency_keys)
+    server.app.dependency_overrides[get_database] = lambda: Database(mongo, DB_NAME)
+    try:
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            yield http
+    finally:
+        server.app.dependency_overrides.pop(get_database, None)
+
+
+@pytest.fixture
+async def profile(client) -> dict:
+    """A complete profile created through the API"""
+    response = await client.post("/api/users/profile", json={
+        "name": "Test", "age": 30, "weight": 70.0, "height": 175.0, "gender": "female",
+        "activity_level": "moderate", "goals": ["Weight Loss"]})
+    assert response.status_code == 200
+    return response.json()
@@ -0,0 +1,136 @@
+import asyncio
+
+import httpx
+import pytest
+
+import admission
+from admission import AdmissionController, AdmissionMiddleware, MemoryRateStore, Rule
+
+pytestmark = pytest.mark.anyio
+
+
+def _client(controller: AdmissionController, release: asyncio.Event = None) -> httpx.AsyncClient:
+    async def app(scope, receive, send):
+        if release is not None:
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    transport = httpx.ASGITransport(app=AdmissionMiddleware(app, controller))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(admission, "ENABLED", True)
+    yield
+    admission.loop_lag.stop()
+
+
+async def test_rate_limit_is_per_user_with_retry_after():
+    controller = AdmissionController([Rule("llm", r"^POST /api/chat/message$", rate=6, burst=2, concurrency=10)])
+    async with _client(controller) as client:
+        statuses = [(await client.post("/api/chat/message", headers={"X-User-Id": "u1"})).status_code
+                    for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        limited = await client.post("/api/chat/message", headers={"X-User-Id": "u1"})
+        assert limited.status_code == 429
+        assert int(limited.headers["retry-after"]) >= 1
+        # Other users and unmatched routes are not affected
+        assert (await client.post("/api/chat/message", headers={"X-User-Id": "u2"})).status_code == 200
+        assert (await client.get("/api/health")).status_code == 200
+    assert controller.counts["llm"]["rate_limited"] == 2
+
+
+async def test_user_is_read_from_the_json_body():
+    controller = AdmissionController([Rule("scan", r"^POST /api/products/scan$", rate=6, burst=1, concurrency=10)])
+    async with _client(controller) as client:
+        for user, expected in (("a", 200), ("a", 429), ("b", 200)):
+            response = await client.post("/api/products/scan", json={"user_id": user})
+            assert response.status_code == expected
+
+
+async def test_concurrency_cap_counts_requests_in_flight():
+    release = asyncio.Event()
+    controller = AdmissionController([Rule("batch", r"^POST /api/batch$", rate=600, burst=100, concurrency=2)])
+    async with _client(controller, release) as client:
+        running = [asyncio.ensure_future(client.post("/api/batch", headers={"X-User-Id": f"u{i}"}))
+                   for i in range(2)]
+        await asyncio.sleep(0.05)
+        over = await client.post("/api/batch", headers={"X-User-Id": "u9"})
+        assert over.status_code == 429
+        release.set()
+        assert [response.status_code for response in await asyncio.gather(*running)] == [200, 200]
+    assert controller.in_flight["batch"] == 0
+
+
+async def test_requests_waiting_on_the_rate_store_count_against_the_cap():
+    class SlowStore(MemoryRateStore):
+        async def hit(self, key, rule, now):
+            await asyncio.sleep(0.01)
+            return await super().hit(key, rule, now)
+
+    rule = Rule("export", r"^GET /api/export/.*$", rate=600, burst=100, concurrency=3)
+    controller = AdmissionController([rule], SlowStore())
+    results = await asyncio.gather(*(controller.admit(rule, f"u{i}") for i in range(10)), return_exceptions=True)
+    assert sum(result is None for result in results) == 3
+    assert controller.in_flight["export"] == 3
+
+
+async def test_rate_limited_requests_release_their_slot():
+    rule = Rule("llm", r"^POST /x$", rate=6, burst=1, concurrency=5)
+    controller = AdmissionController([rule])
+    await controller.admit(rule, "u1")
+    with pytest.raises(admission.Rejected):
+        await controller.admit(rule, "u1")
+    assert controller.in_flight["llm"] == 1
+
+
+async def test_overload_sheds_with_503(monkeypatch):
+    monkeypatch.setattr(admission.pool_wait, "wait_ms", admission.MAX_POOL_WAIT_MS + 1)
+    controller = AdmissionController([Rule("llm", r"^POST /api/chat/message$", rate=6, burst=2, concurrency=10)])
+    async with _client(controller) as client:
+        response = await client.post("/api/chat/message", headers={"X-User-Id": "u1"})
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert controller.counts["llm"]["shed"] == 1
+
+
+async def test_operator_jobs_are_limited_per_path():
+    controller = AdmissionController()
+    async with _client(controller) as client:
+        # No user id: keyed by client address, but each job has its own bucket
+        for path in ("/api/users/targets/recompute", "/api/analytics/insights/run", "/api/analytics/cohorts/run"):
+            assert (await client.post(path)).status_code == 200
+            assert (await client.post(path)).status_code == 200
+        assert controller.match("GET", "/api/export/user/u1").name == "export"
+
+
+async def test_rejections_carry_cors_headers(client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(admission, "ENABLED", True)
+    monkeypatch.setattr(server.admission_controller, "store", MemoryRateStore())
+    profile = {"weight": 70.0, "height": 175.0, "age": 30, "gender": "female", "activity_level": "moderate"}
+    bulk = {"profiles": [profile] * 300}
+    headers = {"Origin": "http://localhost:3000", "X-User-Id": "u1"}
+    statuses = [(await client.post("/api/users/targets/batch", json=bulk, headers=headers)).status_code
+                for _ in range(2)]
+    assert statuses == [200, 200]
+    limited = await client.post("/api/users/targets/batch", json=bulk, headers=headers)
+    assert limited.status_code == 429
+    assert "access-control-allow-origin" in limited.headers
+    assert "retry-after" in limited.headers["access-control-expose-headers"].lower()
+
+
+async def test_small_target_batches_are_interactive():
+    controller = AdmissionController()
+    profiles = {"profiles": [{"weight": 70.0, "height": 175.0, "age": 30, "gender": "female"}]}
+    async with _client(controller) as client:
+        # A user dragging a slider sends many small what-if requests
+        for _ in range(20):
+            response = await client.post("/api/users/targets/batch", json=profiles, headers={"X-User-Id": "u1"})
+            assert response.status_code == 200
+    assert controller.counts["whatif"]["admitted"] == 20
+    assert controller.counts["batch"]["admitted"] == 0
+    assert controller.match("POST", "/api/users/targets/batch").name == "batch"  # unknown length is bulk
@@ -0,0 +1,67 @@
+import pytest
+
+import catalogue
+import providers
+from catalogue import CatalogueError, NutritionCatalogue, build_catalogue
+
+pytestmark = pytest.mark.anyio
+
+RECORDS = [
+    {"barcode": "0000012345", "name": "Oat Milk", "calories": 46, "protein": 1.0, "carbs": 6.7, "fat": 1.5},
+    {"barcode": "5000000000001", "name": "Crème fraîche", "calories": 292, "fat": 30.0, "sugar": 2.4},
+    {"barcode": "12345", "name": "Oat Milk Barista", "calories": 59.5, "protein": 1.1},
+    {"barcode": "not-a-code", "name": "Skipped"},
+    {"barcode": "7", "name": "Oat Milk", "calories": 130.1},
+]
+
+
+@pytest.fixture
+def built():
+    return build_catalogue(RECORDS)
+
+
+def test_lookup_by_numeric_barcode(built):
+    assert len(built) == 3
+    assert built.get("5000000000001") == {"calories": 292.0, "protein": 0.0, "carbs": 0.0, "fat": 30.0,
+                                          "fiber": 0.0, "sugar": 2.4, "name": "Crème fraîche",
+                                          "barcode": "5000000000001"}
+    # Leading zeros don't matter, and of repeated barcodes the last record wins
+    assert built.get("012345")["name"] == "Oat Milk Barista"
+    assert built.get("7")["calories"] == 130.1
+    assert built.get("8") is None
+    assert built.get("not-a-code") is None
+    assert "7" in built and "8" not in built
+
+
+def test_get_many_matches_get(built):
+    barcodes = ["7", "missing", "12345", "", "99999999999999999999", "5000000000001"]
+    assert built.get_many(barcodes) == [built.get(barcode) for barcode in barcodes]
+    assert build_catalogue([]).get_many(["1"]) == [None]
+
+
+def test_names_are_stored_once(built):
+    assert len(built.name_offsets) - 1 == 3
+
+
+def test_saved_catalogue_is_memory_mapped(built, tmp_path):
+    built.save(tmp_path)
+    loaded = NutritionCatalogue.load(tmp_path)
+    assert loaded.barcodes.base is not None and not loaded.barcodes.flags.writeable
+    assert loaded.get_many(["7", "12345"]) == built.get_many(["7", "12345"])
+
+    with pytest.raises(CatalogueError):
+        NutritionCatalogue.load(tmp_path / "missing")
+
+
+async def test_catalogued_barcodes_skip_the_provider(client, built, monkeypatch):
+    monkeypatch.setattr(catalogue, "_catalogue", built)
+    monkeypatch.setattr(catalogue, "_loaded", True)
+
+    def unavailable():
+        raise AssertionError("the scan provider was called")
+
+    monkeypatch.setattr(providers, "get_provider", unavailable)
+    response = await client.post("/api/products/scan", json={"user_id": "u1", "barcode": "0007"})
+    assert response.status_code == 200
+    product = response.json()["product"]
+    assert (product["name"], product["calories"], product["scanned_by"]) == ("Oat Milk", 130.1, "u1")
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from analytics_engine import CohortAnalyticsEngine
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def population(db):
+    now = datetime.utcnow()
+    await db.user_profiles.insert_many([
+        {"id": "a", "goals": ["Weight Loss"], "dietary_preferences": ["Vegan"], "activity_level": "active",
+         "bmr": 1800},
+        {"id": "b", "goals": ["Muscle Building"], "dietary_preferences": [], "activity_level": None, "bmr": 2600},
+        {"id": "c", "goals": [], "dietary_preferences": None, "activity_level": "sedentary", "bmr": None},
+    ])
+    products = [("a", 300.0, 10.0), ("a", 600.0, 20.0), ("b", 900.0, 40.0), ("b", 1500.0, 60.0), ("b", 600.0, 50.0)]
+    await db.products.insert_many([
+        {"id": f"p{i}", "scanned_by": user, "created_at": now - timedelta(days=i + 1), "calories": calories,
+         "protein": protein, "carbs": 10.0, "fat": 5.0, "fiber": 1.0, "sugar": 2.0}
+        for i, (user, calories, protein) in enumerate(products)
+    ])
+    # Outside the period
+    await db.products.insert_one({"id": "old", "scanned_by": "a", "created_at": now - timedelta(days=60),
+                                  "calories": 10_000.0})
+
+
+def _group(report, dimension, name):
+    return next(group for group in report["groups"][dimension] if group["group"] == name)
+
+
+async def test_report_groups_users_by_profile(db, population):
+    report = await CohortAnalyticsEngine(db).run(days=30, persist=False)
+    assert (report["users"], report["active_users"]) == (3, 2)
+
+    loss = _group(report, "goal", "Weight Loss")
+    assert loss["mean_daily_calories"] == pytest.approx(900 / 30, abs=0.01)
+    assert loss["avg_protein"] == 15.0
+    assert _group(report, "goal", "Muscle Building")["mean_daily_calories"] == pytest.approx(3000 / 30, abs=0.01)
+    assert _group(report, "goal", "none")["active_users"] == 0
+
+    assert {group["group"] for group in report["groups"]["bmr_band"]} == {"1500-2000", "2500-3000", "none"}
+    assert _group(report, "activity_level", "moderate")["users"] == 1
+    assert _group(report, "dietary_preference", "Vegan")["users"] == 1
+    assert sum(week["products"] for week in report["weekly_trends"]) == 5
+
+
+async def test_chunked_reads_match_a_single_batch(db, population):
+    whole = await CohortAnalyticsEngine(db).run(days=30, persist=False)
+    chunked = await CohortAnalyticsEngine(db, batch_size=2).run(days=30, persist=False)
+    assert chunked["groups"] == whole["groups"]
+    assert chunked["weekly_trends"] == whole["weekly_trends"]
+
+
+async def test_cohort_routes(client, db, population):
+    assert (await client.get("/api/analytics/cohorts/latest")).status_code == 404
+    response = await client.post("/api/analytics/cohorts/run", params={"days": 30})
+    assert response.status_code == 200
+    latest = await client.get("/api/analytics/cohorts/latest")
+    assert latest.status_code == 200
+    assert latest.json()["id"] == response.json()["id"]
+    assert latest.json()["active_users"] == 2
@@ -0,0 +1,59 @@
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+
+from benchmarks.seed import product, recipe
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_profile_etag_and_304(client, profile):
+    path = f"/api/users/profile/{profile['id']}"
+    first = await client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    cached = await client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    # Strong and weak forms of the same tag match, as does one tag of several
+    assert (await client.get(path, headers={"If-None-Match": etag[2:]})).status_code == 304
+    assert (await client.get(path, headers={"If-None-Match": f'"other", {etag}'})).status_code == 304
+    assert (await client.get(path, headers={"If-Modified-Since": first.headers["last-modified"]})).status_code == 304
+
+    # ETags have millisecond resolution
+    await asyncio.sleep(0.005)
+    assert (await client.put(path, json={"weight": 68.0})).status_code == 200
+    changed = await client.get(path, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["weight"] == 68.0
+    assert changed.headers["etag"] != etag
+
+
+async def test_conditional_get_of_a_missing_profile_is_404(client):
+    response = await client.get("/api/users/profile/missing", headers={"If-None-Match": 'W/"1"'})
+    assert response.status_code == 404
+
+
+async def test_product_list_etag_changes_with_the_list(client, db, profile):
+    path = f"/api/products/user/{profile['id']}"
+    empty = await client.get(path)
+    etag = empty.headers["etag"]
+    assert (await client.get(path, headers={"If-None-Match": etag})).status_code == 304
+
+    await db.products.insert_one(product(random.Random(1), datetime.utcnow(), profile["id"]))
+    assert (await client.get(path, headers={"If-None-Match": etag})).status_code == 200
+
+
+async def test_recipe_is_immutable(client, db):
+    await db.recipes.insert_one({**recipe(random.Random(1), datetime.utcnow(), "u1"), "id": "r1"})
+    first = await client.get("/api/recipes/r1")
+    assert first.status_code == 200
+    assert "immutable" in first.headers["cache-control"]
+    cached = await client.get("/api/recipes/r1", headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
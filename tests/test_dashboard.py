@@ -0,0 +1,70 @@
+import random
+from datetime import datetime
+
+import pytest
+
+import dashboard
+from benchmarks.seed import inventory_item, product
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def history(db, profile):
+    rng, now = random.Random(11), datetime.utcnow()
+    await db.products.insert_many([product(rng, now, profile["id"]) for _ in range(30)])
+    await db.inventory_items.insert_many([inventory_item(rng, now, profile["id"]) for _ in range(10)])
+
+
+def _count_finds(collection, monkeypatch) -> list:
+    calls = []
+    find = collection.find
+
+    def counting_find(*args, **kwargs):
+        calls.append(args[0] if args else kwargs.get("filter"))
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(collection, "find", counting_find)
+    return calls
+
+
+async def test_every_section_in_one_request(client, profile, history):
+    response = await client.get(f"/api/users/{profile['id']}/dashboard", params={"products_limit": 5})
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == {"user_id", "errors", *dashboard.SECTIONS}
+    assert body["errors"] == {}
+    assert body["profile"]["id"] == profile["id"]
+    assert len(body["recent_products"]) == 5
+    assert set(body["inventory_alerts"]) == {"expiring_items", "low_stock_items"}
+    summary = await client.get(f"/api/analytics/user/{profile['id']}/summary", params={"days": 7})
+    # The same summary as the analytics route, without repeating the profile
+    assert body["analytics"] == {k: v for k, v in summary.json().items() if k != "profile"}
+
+
+async def test_shared_reads_run_once(db, profile, history, monkeypatch):
+    products = _count_finds(db.products, monkeypatch)
+    result = await dashboard.build(db, profile["id"], ["recent_products", "analytics"])
+    assert result["errors"] == {}
+    assert len(products) == 1
+
+
+async def test_a_failed_section_does_not_fail_the_others(client, profile, history, monkeypatch):
+    async def broken(reads, options):
+        raise RuntimeError("settings are down")
+
+    monkeypatch.setitem(dashboard.SECTION_READERS, "settings", broken)
+    response = await client.get(f"/api/users/{profile['id']}/dashboard", params={"sections": "profile,settings"})
+    assert response.status_code == 200
+    assert response.json()["errors"] == {"settings": "Failed to get settings"}
+    assert response.json()["settings"] is None
+    assert response.json()["profile"]["id"] == profile["id"]
+
+    response = await client.get(f"/api/users/{profile['id']}/dashboard", params={"sections": "settings"})
+    assert response.status_code == 500
+
+
+async def test_unknown_sections_are_rejected(client, profile):
+    response = await client.get(f"/api/users/{profile['id']}/dashboard", params={"sections": "profile,weather"})
+    assert response.status_code == 400
+    assert "weather" in response.json()["detail"]
@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import random
+from datetime import datetime
+
+import pytest
+
+import export
+from benchmarks.seed import chat_message, inventory_item, product
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def history(db):
+    rng, now = random.Random(5), datetime.utcnow()
+    await db.products.insert_many([product(rng, now, user) for user in ("u1", "u2") for _ in range(12)])
+    await db.inventory_items.insert_many([inventory_item(rng, now, "u1") for _ in range(5)])
+    await db.chat_messages.insert_many([chat_message(rng, now, "u1", "s1") for _ in range(3)])
+
+
+async def _collect(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def test_ndjson_streams_every_collection_of_one_user(db, history):
+    body = await _collect(export.stream_export(db, ["products", "inventory", "chat"], "ndjson", "u1",
+                                               batch_size=5))
+    rows = [json.loads(line) for line in body.splitlines()]
+    counts = {name: sum(row["collection"] == name for row in rows) for name in ("products", "inventory", "chat")}
+    assert counts == {"products": 12, "inventory": 5, "chat": 3}
+    assert all(row.get("scanned_by", row.get("user_id")) == "u1" for row in rows)
+    assert not any("image_base64" in row or "_id" in row for row in rows)
+
+
+async def test_csv_has_one_header_and_a_row_per_document(db, history):
+    body = await _collect(export.stream_export(db, ["products"], "csv", batch_size=5))
+    rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+    assert len(rows) == 24
+    assert list(rows[0]) == export.EXPORT_SOURCES["products"].columns
+    assert "image_base64" not in rows[0]
+
+
+@pytest.mark.skipif(export.pyarrow is None, reason="pyarrow is not installed")
+async def test_parquet_round_trips(db, history):
+    import pyarrow.parquet
+
+    body = await _collect(export.stream_export(db, ["inventory"], "parquet", "u1", batch_size=2))
+    table = pyarrow.parquet.read_table(io.BytesIO(body))
+    assert table.num_rows == 5
+    assert table.schema == export.arrow_schema(export.EXPORT_SOURCES["inventory"])
+
+
+@pytest.mark.parametrize("fmt, sources", [("xml", ["products"]), ("ndjson", ["recipes"]), ("ndjson", []),
+                                          ("csv", ["products", "chat"])])
+def test_invalid_requests_are_rejected(fmt, sources):
+    with pytest.raises(export.ExportError):
+        export.validate_request(fmt, sources)
+
+
+async def test_export_route(client, db, history):
+    response = await client.get("/api/export/user/u1", params={"format": "csv", "collections": "chat"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="nutrition-export-u1-chat.csv"' in response.headers["content-disposition"]
+    assert len(response.text.strip().splitlines()) == 1 + 3
+
+    response = await client.get("/api/export/user/u1", params={"format": "csv", "collections": "products,chat"})
+    assert response.status_code == 400
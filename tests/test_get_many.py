@@ -0,0 +1,91 @@
+import random
+from datetime import datetime
+
+import pytest
+
+import database
+import read_cache
+from benchmarks.seed import recipe
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def recipe_ids(db):
+    rng, now = random.Random(7), datetime.utcnow()
+    documents = [recipe(rng, now, "u1") for _ in range(25)]
+    await db.recipes.insert_many(documents)
+    return [document["id"] for document in documents]
+
+
+def _count_finds(collection, monkeypatch) -> list:
+    calls = []
+    find = collection.find
+
+    def counting_find(*args, **kwargs):
+        calls.append(args[0] if args else kwargs.get("filter"))
+        return find(*args, **kwargs)
+
+    monkeypatch.setattr(collection, "find", counting_find)
+    return calls
+
+
+async def test_results_follow_the_order_of_ids(db, recipe_ids):
+    ids = [recipe_ids[3], "missing", recipe_ids[0], recipe_ids[3]]
+    expected = [recipe_ids[3], None, recipe_ids[0], recipe_ids[3]]
+    recipes = await db.get_recipes(ids)
+    assert [r.id if r else None for r in recipes] == expected
+    raw = await db.get_recipes(ids, raw=True)
+    assert [r["id"] if r else None for r in raw] == expected
+    assert "_id" not in raw[0]
+
+
+async def test_long_id_lists_are_read_in_chunks(db, recipe_ids, monkeypatch):
+    monkeypatch.setattr(database, "GET_MANY_CHUNK", 10)
+    calls = _count_finds(db.recipes, monkeypatch)
+    recipes = await db.get_recipes(list(reversed(recipe_ids)))
+    assert [r.id for r in recipes] == list(reversed(recipe_ids))
+    assert len(calls) == 3
+
+
+async def test_cached_documents_skip_the_query(db, recipe_ids, monkeypatch):
+    await db.get_recipes(recipe_ids[:10])
+    calls = _count_finds(db.recipes, monkeypatch)
+    await db.get_recipes(recipe_ids[:10])
+    assert calls == []
+    await db.get_recipes(recipe_ids[5:15])
+    # Only the misses are read
+    assert calls == [{"id": {"$in": recipe_ids[10:15]}}]
+
+
+async def test_invalidated_entries_are_read_again(db, recipe_ids, monkeypatch):
+    await db.get_recipes(recipe_ids[:3])
+    await db.recipes.update_one({"id": recipe_ids[0]}, {"$set": {"title": "Renamed"}})
+    assert (await db.get_recipes(recipe_ids[:1]))[0].title != "Renamed"
+
+    read_cache.cache.invalidate(db._cache_namespace("recipes"), recipe_ids[0])
+    assert (await db.get_recipes(recipe_ids[:1]))[0].title == "Renamed"
+    read_cache.cache.clear("tests.recipes")
+    assert read_cache.cache.status()["entries"] == 0
+
+
+async def test_raw_results_are_copies(db, recipe_ids):
+    first = await db.get_recipes(recipe_ids[:1], raw=True)
+    first[0]["title"] = "Changed by a caller"
+    again = await db.get_recipes(recipe_ids[:1], raw=True)
+    assert again[0]["title"] != "Changed by a caller"
+
+
+async def test_disabled_cache_always_queries(db, recipe_ids, monkeypatch):
+    monkeypatch.setattr(read_cache, "cache", read_cache.ReadCache(ttl=0))
+    await db.get_recipes(recipe_ids[:5])
+    calls = _count_finds(db.recipes, monkeypatch)
+    await db.get_recipes(recipe_ids[:5])
+    assert len(calls) == 1
+
+
+async def test_profiles_are_never_served_stale(db, profile):
+    assert (await db.get_user_profiles([profile["id"]]))[0].weight == 70.0
+    # Another worker's update never reaches this process's cache
+    await db.user_profiles.update_one({"id": profile["id"]}, {"$set": {"weight": 65.0}})
+    assert (await db.get_user_profiles([profile["id"]]))[0].weight == 65.0
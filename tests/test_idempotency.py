@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+import idempotency
+
+pytestmark = pytest.mark.anyio
+
+POST = {"author_id": "u1", "author_name": "Test", "title": "Tip", "content": "Drink water", "tags": ["tips"]}
+
+
+async def _posts(db):
+    return await db.community_posts.count_documents({})
+
+
+async def test_replay_returns_the_stored_response(client, db):
+    headers = {"Idempotency-Key": "post-1"}
+    first = await client.post("/api/community/posts", json=POST, headers=headers)
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    replay = await client.post("/api/community/posts", json=POST, headers=headers)
+    assert replay.status_code == 200
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert replay.json() == first.json()
+    assert await _posts(db) == 1
+
+
+async def test_concurrent_retries_run_once(client, db):
+    headers = {"Idempotency-Key": "post-2"}
+    responses = await asyncio.gather(*(client.post("/api/community/posts", json=POST, headers=headers)
+                                       for _ in range(3)))
+    # Retries either wait for the first response or are told it is still in progress
+    assert {response.status_code for response in responses} <= {200, 409}
+    assert len({response.json()["id"] for response in responses if response.status_code == 200}) == 1
+    assert await _posts(db) == 1
+
+
+async def test_key_reused_for_another_request_is_a_conflict(client, db):
+    headers = {"Idempotency-Key": "post-3"}
+    assert (await client.post("/api/community/posts", json=POST, headers=headers)).status_code == 200
+    conflict = await client.post("/api/community/posts", json={**POST, "title": "Other"}, headers=headers)
+    assert conflict.status_code == 422
+    assert "different request" in conflict.json()["detail"]
+    assert await _posts(db) == 1
+
+
+async def test_requests_without_a_key_are_not_deduplicated(client, db):
+    for _ in range(2):
+        assert (await client.post("/api/community/posts", json=POST)).status_code == 200
+    assert await _posts(db) == 2
+
+
+async def test_overlong_key_is_rejected(client):
+    response = await client.post("/api/community/posts", json=POST, headers={"Idempotency-Key": "k" * 300})
+    assert response.status_code == 400
+
+
+def _echo_client(mongo, calls: list) -> httpx.AsyncClient:
+    """The middleware around an app that reads the whole body and answers with its digest"""
+    async def app(scope, receive, send):
+        chunks, more = [], True
+        while more:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more = message.get("more_body", False)
+        body = b"".join(chunks)
+        calls.append(body)
+        digest = hashlib.sha256(body).hexdigest().encode("ascii")
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": digest})
+
+    store = idempotency.IdempotencyStore(mongo["tests"].idempotency_keys)
+    transport = httpx.ASGITransport(app=idempotency.IdempotencyMiddleware(app, store))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def _chunked(*parts: bytes):
+    async def stream():
+        for part in parts:
+            yield part
+    return stream()
+
+
+async def test_chunked_bodies_are_fingerprinted_by_content(mongo, monkeypatch):
+    monkeypatch.setattr(idempotency, "SPOOL_BYTES", 1024)
+    calls = []
+    image = bytes(range(256)) * 64
+    headers = {"Idempotency-Key": "upload-1", "X-User-Id": "u1"}
+    async with _echo_client(mongo, calls) as client:
+        first = await client.post("/api/products/scan/upload", content=_chunked(image[:5000], image[5000:]),
+                                  headers=headers)
+        assert "content-length" not in first.request.headers
+        assert first.text == hashlib.sha256(image).hexdigest()  # spooled to disk and replayed intact
+        replay = await client.post("/api/products/scan/upload", content=_chunked(image), headers=headers)
+        assert replay.headers["idempotent-replayed"] == "true"
+        other = await client.post("/api/products/scan/upload", content=_chunked(image[::-1]), headers=headers)
+        assert other.status_code == 422
+    assert calls == [image]
+
+
+async def test_keys_are_scoped_to_the_user(mongo):
+    calls = []
+    async with _echo_client(mongo, calls) as client:
+        for user in ("u1", "u2"):
+            response = await client.post("/api/community/posts", json={"author_id": user, "title": "Hi"},
+                                         headers={"Idempotency-Key": "same-key"})
+            assert response.status_code == 200
+            assert "idempotent-replayed" not in response.headers
+    assert len(calls) == 2
+
+
+async def test_oversized_body_is_refused(mongo, monkeypatch):
+    monkeypatch.setattr(idempotency, "MAX_BODY_BYTES", 100)
+    calls = []
+    async with _echo_client(mongo, calls) as client:
+        response = await client.post("/api/products/scan/upload", content=_chunked(b"x" * 60, b"x" * 60),
+                                     headers={"Idempotency-Key": "big"})
+    assert response.status_code == 413
+    assert calls == []
@@ -0,0 +1,66 @@
+import base64
+import hashlib
+import tempfile
+
+import pytest
+
+import images
+
+pytestmark = pytest.mark.anyio
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+
+
+@pytest.fixture(autouse=True)
+def in_threads(monkeypatch, tmp_path):
+    """No process pool, and temporary upload files where the test can see them"""
+    monkeypatch.setattr(images, "PROCESS_WORKERS", 0)
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+
+def test_base64_and_data_urls_hash_the_decoded_bytes():
+    encoded = base64.b64encode(PNG).decode("ascii")
+    plain = images.process_base64(encoded)
+    assert plain.sha256 == hashlib.sha256(PNG).hexdigest()
+    assert (plain.size, plain.format) == (len(PNG), "png")
+    assert images.process_base64(f"data:image/png;base64,{encoded}").sha256 == plain.sha256
+
+
+def test_text_that_is_not_base64_is_hashed_as_is():
+    processed = images.process_base64("not base64!")
+    assert processed.sha256 == hashlib.sha256(b"not base64!").hexdigest()
+    assert processed.image_base64 == "not base64!"
+
+
+async def test_oversized_base64_is_rejected_before_decoding(monkeypatch):
+    monkeypatch.setattr(images, "MAX_UPLOAD_BYTES", 10)
+    with pytest.raises(images.UploadTooLargeError):
+        await images.process_base64_async("A" * 100)
+
+
+async def test_raw_and_multipart_uploads_match_the_json_path(client, tmp_path):
+    expected = images.process_base64(base64.b64encode(PNG).decode("ascii")).sha256
+    raw = await client.post("/api/products/scan/upload", params={"user_id": "u1"}, content=PNG,
+                            headers={"content-type": "application/octet-stream"})
+    assert raw.status_code == 200
+    assert raw.json()["image"] == {"sha256": expected, "size": len(PNG), "format": "png", "width": None,
+                                   "height": None}
+
+    multipart = await client.post("/api/products/scan/upload", data={"user_id": "u1"},
+                                  files={"image": ("scan.png", PNG, "image/png")})
+    assert multipart.status_code == 200
+    assert multipart.json()["image"]["sha256"] == expected
+    assert multipart.json()["product"]["scanned_by"] == "u1"
+    # Temporary files are removed once processed
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_upload_rejections_leave_no_files(client, tmp_path):
+    missing_user = await client.post("/api/products/scan/upload", content=PNG,
+                                     headers={"content-type": "application/octet-stream"})
+    assert missing_user.status_code == 422
+    too_large = await client.post("/api/products/scan/upload", params={"user_id": "u1"},
+                                  content=b"\0" * (images.MAX_UPLOAD_BYTES + 1),
+                                  headers={"content-type": "application/octet-stream"})
+    assert too_large.status_code == 413
+    assert list(tmp_path.iterdir()) == []
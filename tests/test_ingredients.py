@@ -0,0 +1,47 @@
+import pytest
+
+from ingredients import UnitError, canonical_name, convert, display_name, parse_ingredient
+
+
+@pytest.mark.parametrize("text, name, quantity, unit, base_quantity", [
+    ("2 cups baby spinach", "spinach", 2.0, "cup", 480.0),
+    ("1/2 cup milk", "milk", 0.5, "cup", 120.0),
+    ("2 1/2 cups flour", "flour", 2.5, "cup", 600.0),
+    ("½ cup milk", "milk", 0.5, "cup", 120.0),
+    ("1,5 kg rice", "rice", 1.5, "kg", 1500.0),
+    ("3 eggs", "egg", 3.0, "pieces", 3.0),
+    ("Greek Yogurt 500g", "greek yogurt", 500.0, "g", 500.0),
+])
+def test_parse_ingredient(text, name, quantity, unit, base_quantity):
+    parsed = parse_ingredient(text)
+    assert (parsed.name, parsed.quantity, parsed.unit) == (name, quantity, unit)
+    assert parsed.base_quantity == pytest.approx(base_quantity)
+
+
+@pytest.mark.parametrize("text", ["1/0 cup milk", "0/0 cup milk"])
+def test_zero_denominator_counts_as_no_quantity(text):
+    parsed = parse_ingredient(text)
+    assert (parsed.name, parsed.quantity, parsed.unit) == ("milk", 1.0, "cup")
+
+
+def test_malformed_fraction_does_not_raise():
+    parsed = parse_ingredient("1/2/3 cup milk")
+    assert parsed.quantity == 1.0
+
+
+def test_line_without_a_name_keeps_the_whole_line():
+    parsed = parse_ingredient("2 cans")
+    assert parsed.name == "2 cans"
+    assert parsed.unit == "pieces"
+
+
+def test_canonical_and_display_names():
+    assert canonical_name("Eggs") == canonical_name("egg")
+    assert display_name("greek yogurt") == "Greek Yogurt"
+
+
+def test_convert_within_and_across_dimensions():
+    assert convert(1, "kg", "g") == 1000
+    assert convert(1, "l", "ml") == 1000
+    with pytest.raises(UnitError):
+        convert(1, "kg", "ml")
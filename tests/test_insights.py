@@ -0,0 +1,53 @@
+import random
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import insights
+from benchmarks.seed import product
+
+pytestmark = pytest.mark.anyio
+
+MESSAGES = {rule["id"]: rule["message"] for rule in insights.INSIGHT_RULES}
+
+
+def test_single_user_rules():
+    profile = {"bmr": 2000, "goals": ["Weight Loss"]}
+    result = insights.insights_for(profile, {"total_calories": 7000, "avg_protein": 10})
+    assert result == [MESSAGES["under_eating"], MESSAGES["low_protein"], MESSAGES["goal_weight_loss"]]
+    assert insights.insights_for({}, {"avg_protein": 30}) == [insights.FALLBACK_INSIGHT]
+
+
+def test_frame_evaluation_matches_single_users():
+    users = [({"bmr": 2000, "goals": ["Muscle Building"]}, {"total_calories": 21000, "avg_protein": 40}),
+             ({"bmr": None, "goals": []}, {"total_calories": 0, "avg_protein": 0}),
+             ({"bmr": 1500, "goals": ["Weight Loss"]}, {"total_calories": 14000, "avg_protein": 20})]
+    frame = pd.DataFrame([{**profile, **summary, "period_days": 7} for profile, summary in users])
+    assert insights.engine.evaluate_frame(frame) == [insights.insights_for(p, s) for p, s in users]
+
+
+@pytest.mark.parametrize("rule", [
+    {"id": "x", "message": "m", "when": [{"metric": "bmr", "op": "between"}]},
+    {"id": "x", "message": "m", "when": [{"metric": "bmr", "op": "lt"}]},
+    {"id": "x", "message": "m", "when": []},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(insights.RuleError):
+        insights.compile_rules([rule])
+
+
+async def test_insight_job_stores_every_users_insights(client, db, profile):
+    now = datetime.utcnow()
+    rng = random.Random(2)
+    await db.products.insert_many([{**product(rng, now, profile["id"]), "protein": 5.0,
+                                    "created_at": now - timedelta(days=1)} for _ in range(3)])
+    run = await client.post("/api/analytics/insights/run")
+    assert run.status_code == 200
+    assert run.json()["users"] == 1 and run.json()["ruleset_version"] == insights.engine.version
+
+    stored = await client.get(f"/api/analytics/user/{profile['id']}/insights")
+    assert stored.status_code == 200
+    assert MESSAGES["low_protein"] in stored.json()["insights"]
+    assert MESSAGES["goal_weight_loss"] in stored.json()["insights"]
+    assert (await client.get("/api/analytics/user/nobody/insights")).status_code == 404
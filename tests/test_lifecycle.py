@@ -0,0 +1,82 @@
+import gzip
+import json
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import lifecycle
+from benchmarks.seed import chat_message, product
+from lifecycle import RetentionPolicy
+from models import ChatMessage, Product
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2026, 3, 1, 12)
+
+
+@pytest.fixture
+async def history(db):
+    """60 products and chat messages per user, one a day going back from NOW"""
+    rng = random.Random(5)
+    for user in ("u1", "u2"):
+        await db.products.insert_many([{**product(rng, NOW, user), "created_at": NOW - timedelta(days=day)}
+                                       for day in range(60)])
+        await db.chat_messages.insert_many([{**chat_message(rng, NOW, user, "s"), "timestamp": NOW - timedelta(days=day)}
+                                            for day in range(60)])
+
+
+async def test_compaction_rolls_up_then_moves_old_products(db, history):
+    policy = RetentionPolicy("products", "created_at", 30, "compact", Product)
+    old = await db.products.find({"created_at": {"$lt": policy.cutoff(NOW)}}).to_list(None)
+
+    result = await lifecycle.run_policy(db, policy, target="collection", batch_size=7, now=NOW)
+    assert result["eligible"] == result["archived"] == len(old)
+    assert await db.products.count_documents({"created_at": {"$lt": policy.cutoff(NOW)}}) == 0
+    assert await db.db.products_archive.count_documents({}) == len(old)
+
+    rollups = await db.product_rollups.find({}).to_list(None)
+    assert sum(r["products"] for r in rollups) == len(old)
+    assert sum(r["calories"] for r in rollups) == pytest.approx(sum(p["calories"] for p in old))
+    assert await db.get_compacted_before("products") == policy.cutoff(NOW)
+
+    again = await lifecycle.run_policy(db, policy, target="collection", now=NOW)
+    assert again["eligible"] == 0 and "archived" not in again
+
+
+async def test_archive_to_gzip_ndjson(db, history, tmp_path):
+    policy = RetentionPolicy("chat_messages", "timestamp", 30, "archive", ChatMessage)
+    result = await lifecycle.run_policy(db, policy, target="files", fmt="ndjson", directory=tmp_path, batch_size=10,
+                                        now=NOW)
+    (path,) = result["files"]
+    with gzip.open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert len(rows) == result["archived"] == result["eligible"]
+    assert "_id" not in rows[0]
+    assert await db.chat_messages.count_documents({}) == 120 - len(rows)
+
+
+async def test_archive_to_parquet(db, history, tmp_path):
+    pyarrow_parquet = pytest.importorskip("pyarrow.parquet")
+    policy = RetentionPolicy("chat_messages", "timestamp", 30, "archive", ChatMessage)
+    result = await lifecycle.run_policy(db, policy, target="files", fmt="parquet", directory=tmp_path, batch_size=25,
+                                        now=NOW)
+    assert len(result["files"]) > 1  # one file per batch
+    rows = sum(pyarrow_parquet.read_table(path).num_rows for path in result["files"])
+    assert rows == result["archived"]
+
+
+async def test_dry_run_and_disabled_policies_change_nothing(db, history):
+    result = await lifecycle.run_policy(db, RetentionPolicy("chat_messages", "timestamp", 30, "archive"),
+                                        dry_run=True, now=NOW)
+    assert result["eligible"] > 0
+    disabled = await lifecycle.run_policy(db, RetentionPolicy("chat_messages", "timestamp", 0, "archive"), now=NOW)
+    assert disabled["skipped"] == "retention disabled"
+    assert await db.chat_messages.count_documents({}) == 120
+
+
+def test_unknown_options_are_rejected():
+    with pytest.raises(lifecycle.LifecycleError):
+        lifecycle.validate_options("s3", "ndjson")
+    with pytest.raises(lifecycle.LifecycleError):
+        lifecycle.validate_options("files", "csv")
@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import meal_planner
+from benchmarks.seed import recipe
+from models import InventoryItemCreate
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def catalogue(db):
+    rng, now = random.Random(3), datetime.utcnow()
+    await db.recipes.insert_many([recipe(rng, now, "u1") for _ in range(200)])
+
+
+async def test_generate_plan_through_the_api(client, catalogue, profile):
+    response = await client.post("/api/meal-plans/generate", json={"user_id": profile["id"], "days": 3,
+                                                                  "meals_per_day": 4})
+    assert response.status_code == 200
+    plan = response.json()
+    assert plan["user_id"] == profile["id"]
+    assert plan["targets"]["calories"] == profile["targets"]["calories"]
+    assert plan["catalogue_size"] == 200
+    assert [day["day"] for day in plan["days"]] == [1, 2, 3]
+    for day in plan["days"]:
+        assert [meal["slot"] for meal in day["meals"]] == meal_planner.MEAL_SLOTS[:4]
+        assert day["totals"]["calories"] == pytest.approx(sum(meal["calories"] for meal in day["meals"]), abs=1)
+
+    stored = await client.get(f"/api/meal-plans/{plan['id']}", params={"include_recipes": "true"})
+    assert stored.status_code == 200
+    for day in stored.json()["days"]:
+        assert all(meal["recipe"]["id"] == meal["recipe_id"] for meal in day["meals"])
+
+
+async def test_plan_tracks_the_calorie_target(db, catalogue):
+    profile = {"id": "u1", "age": 30, "weight": 70, "height": 175, "gender": "male"}
+    plan = await meal_planner.generate_plan(db, profile, days=7, calorie_target=2000)
+    assert plan.targets["calories"] == 2000
+    mean = sum(day.totals["calories"] for day in plan.days) / len(plan.days)
+    assert mean == pytest.approx(2000, rel=0.15)
+
+
+async def test_allergies_exclude_recipes(db, catalogue):
+    profile = {"id": "u1", "allergies": ["dairy"]}
+    plan = await meal_planner.generate_plan(db, profile, days=7, calorie_target=1800)
+    recipes = await db.get_recipes([meal.recipe_id for day in plan.days for meal in day.meals], raw=True)
+    dairy = meal_planner.ALLERGEN_KEYWORDS["dairy"]
+    for document in recipes:
+        text = " ".join(document["ingredients"]).lower()
+        assert not any(keyword in text for keyword in dairy)
+    assert plan.eligible_recipes < plan.catalogue_size
+
+
+async def test_inventory_is_preferred(db, catalogue):
+    profile = {"id": "u1", "age": 30, "weight": 70, "height": 175, "gender": "female"}
+    for name in ("spinach", "greek yogurt", "banana", "rice"):
+        await db.create_inventory_item(InventoryItemCreate(
+            user_id="u1", name=name, quantity=5, unit="pieces", expiry=datetime.utcnow() + timedelta(days=5),
+            category="Produce"))
+    with_inventory = await meal_planner.generate_plan(db, profile, days=7)
+    without = await meal_planner.generate_plan(db, profile, days=7, use_inventory=False)
+
+    def coverage(plan):
+        return sum(meal.inventory_coverage for day in plan.days for meal in day.meals)
+
+    assert coverage(with_inventory) > coverage(without)
+
+
+async def test_incomplete_profile_needs_a_calorie_target(db, catalogue):
+    with pytest.raises(meal_planner.MealPlanError):
+        await meal_planner.generate_plan(db, {"id": "u1"})
+
+
+async def test_empty_catalogue_is_not_reused(db):
+    with pytest.raises(meal_planner.MealPlanError):
+        await meal_planner.generate_plan(db, {"id": "u1"}, calorie_target=2000)
+    await db.create_recipe(recipe(random.Random(1), datetime.utcnow(), "u1"))
+    plan = await meal_planner.generate_plan(db, {"id": "u1"}, days=1, meals_per_day=1, calorie_target=2000)
+    assert plan.catalogue_size == 1
@@ -0,0 +1,58 @@
+import pytest
+
+import nutrition
+
+pytestmark = pytest.mark.anyio
+
+COMPLETE = {"weight": 70.0, "height": 175.0, "age": 30, "gender": "female", "activity_level": "moderate",
+            "goals": ["Weight Loss"]}
+
+
+def test_targets_for_complete_profile():
+    (targets,) = nutrition.targets_for([COMPLETE])
+    # Mifflin-St Jeor: 10*70 + 6.25*175 - 5*30 - 161 = 1482.75
+    assert targets.bmr == 1482
+    assert targets.tdee == 2298  # x 1.55
+    assert targets.calories == 1798  # -500 for weight loss
+    assert targets.protein == 126.0  # 1.8 g/kg
+    assert targets.goal == "weight loss"
+    assert targets.formula_version == nutrition.FORMULA_VERSION
+    assert nutrition.legacy_bmr(targets) == targets.tdee
+
+
+def test_targets_for_incomplete_profiles_are_none():
+    results = nutrition.targets_for([{**COMPLETE, "weight": None}, {**COMPLETE, "gender": None},
+                                     {**COMPLETE, "age": 0}, COMPLETE])
+    assert results[:3] == [None, None, None]
+    assert results[3] is not None
+
+
+def test_calories_do_not_drop_below_the_floor():
+    (targets,) = nutrition.targets_for([{**COMPLETE, "weight": 40.0, "height": 150.0, "age": 80,
+                                         "activity_level": "sedentary"}])
+    assert targets.calories == nutrition.MIN_CALORIES["female"]
+
+
+async def test_profile_targets_follow_updates(client, profile):
+    assert profile["targets"]["calories"] == 1798
+    response = await client.put(f"/api/users/profile/{profile['id']}", json={"goals": ["Muscle Building"]})
+    assert response.status_code == 200
+    assert response.json()["targets"]["goal"] == "muscle building"
+    assert response.json()["targets"]["calories"] == 2298 + 300
+
+
+async def test_recompute_rewrites_outdated_and_leaves_incomplete_profiles(db, client, profile):
+    incomplete = (await client.post("/api/users/profile", json={"name": "New"})).json()
+    await db.user_profiles.update_one({"id": profile["id"]}, {"$set": {"targets.formula_version": 0}})
+    before = await db.get_user_profile_version(incomplete["id"])
+
+    result = await db.recompute_targets()
+    assert result["modified"] == 1
+    assert result["incomplete"] == 1
+    stored = await db.get_user_profile(profile["id"])
+    assert stored.targets.formula_version == result["formula_version"]
+    # Nothing to write for the incomplete profile, so its ETag is unchanged
+    assert await db.get_user_profile_version(incomplete["id"]) == before
+
+    again = await db.recompute_targets()
+    assert again["modified"] == 0
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+import providers
+from providers import (CircuitBreaker, Policy, ProviderBusyError, ProviderResponseError, ProviderUnavailableError,
+                       ResilientProvider)
+
+pytestmark = pytest.mark.anyio
+
+
+class Scripted(providers.Provider):
+    """scan_product plays ``script`` in order: a number sleeps that long, an exception is raised"""
+    name = "scripted"
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def scan_product(self, image_base64=None, barcode=None):
+        self.calls += 1
+        step = self.script.pop(0) if self.script else 0
+        if isinstance(step, Exception):
+            raise step
+        await asyncio.sleep(step)
+        return {"success": True, "product": {"name": f"call {self.calls}"}}
+
+
+def _resilient(inner, **policy) -> ResilientProvider:
+    return ResilientProvider(inner, {"scan_product": Policy(**{"backoff": 0, **policy})})
+
+
+async def test_failed_attempts_are_retried():
+    inner = Scripted(ProviderResponseError("bad gateway", status=502))
+    result = await _resilient(inner, attempts=2).scan_product(barcode="1")
+    assert result["product"]["name"] == "call 2"
+
+
+async def test_client_errors_are_not_retried():
+    inner = Scripted(ProviderResponseError("bad request", status=400))
+    with pytest.raises(ProviderResponseError):
+        await _resilient(inner, attempts=3).scan_product(barcode="1")
+    assert inner.calls == 1
+
+
+async def test_slow_attempts_are_hedged():
+    inner = Scripted(5, 0)
+    provider = _resilient(inner, attempts=2, hedge_after=0.01)
+    result = await provider.scan_product(barcode="1")
+    assert result["product"]["name"] == "call 2"
+    assert provider.status()["scan_product"]["hedges"] == 1
+    # The slow attempt is cancelled and gives its slot back
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert provider.status()["scan_product"]["in_flight"] == 0
+
+
+async def test_timeouts_exhaust_the_attempts():
+    provider = _resilient(Scripted(5, 5), attempts=2, timeout=0.01)
+    with pytest.raises(ProviderUnavailableError):
+        await provider.scan_product(barcode="1")
+
+
+async def test_circuit_opens_after_repeated_failures():
+    inner = Scripted(*[ProviderResponseError("down", status=503)] * 4)
+    provider = _resilient(inner, attempts=1, failure_threshold=2, reset_after=60)
+    for _ in range(2):
+        with pytest.raises(ProviderUnavailableError):
+            await provider.scan_product(barcode="1")
+    with pytest.raises(ProviderUnavailableError, match="circuit open"):
+        await provider.scan_product(barcode="1")
+    assert inner.calls == 2
+    assert provider.status()["scan_product"]["state"] == "open"
+
+
+def test_half_open_circuit_lets_one_probe_through():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 10.0
+    assert breaker.state == "half_open"
+    assert breaker.allow() and not breaker.allow()
+    # A failed probe opens it again for another reset period
+    breaker.record_failure()
+    assert breaker.state == "open"
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+async def test_full_concurrency_answers_busy_without_opening_the_circuit():
+    provider = _resilient(Scripted(0.2), concurrency=1, queue_timeout=0.01, failure_threshold=1)
+    first = asyncio.ensure_future(provider.scan_product(barcode="1"))
+    await asyncio.sleep(0)
+    with pytest.raises(ProviderBusyError):
+        await provider.scan_product(barcode="2")
+    await first
+    assert provider.status()["scan_product"]["state"] == "closed"
+    assert provider.status()["scan_product"]["rejected"] == 1
+
+
+async def test_unavailable_provider_answers_503(client, monkeypatch):
+    failing = _resilient(Scripted(*[ProviderResponseError("down", status=503)] * 2), attempts=2)
+    monkeypatch.setattr(providers, "_provider", failing)
+    response = await client.post("/api/products/scan", json={"user_id": "u1", "barcode": "1"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
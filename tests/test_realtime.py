@@ -0,0 +1,85 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import realtime
+from models import InventoryItemCreate
+
+pytestmark = pytest.mark.anyio
+
+
+class ReplicaSet:
+    """The in-memory database with a server version and a ``watch`` that fails like a real server"""
+
+    def __init__(self, db, version, error):
+        self._db, self.version, self.error = db, version, error
+        self.watches = []
+
+    def __getitem__(self, name):
+        return self._db[name]
+
+    async def command(self, command, **kwargs):
+        return {"ok": 1.0, "versionArray": list(self.version)}
+
+    def watch(self, pipeline, **kwargs):
+        self.watches.append(kwargs)
+        raise self.error
+
+
+async def _until(condition, timeout: float = 1.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def test_subscription_replaces_a_backlog_with_resync():
+    subscription = realtime.Subscription(["inventory:u1"], size=2)
+    for i in range(3):
+        subscription.offer({"type": "upsert", "id": str(i)})
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait() == {"type": "resync", "reason": "overflow"}
+    assert subscription.dropped == 2
+
+
+async def test_pre_images_are_not_requested_from_old_servers(db):
+    source = ReplicaSet(db.db, (5, 0, 14), OperationFailure("Unrecognized option", 9))
+    with pytest.raises(OperationFailure):
+        await realtime.ChangeStreamSource(source, realtime.Hub()).run()
+    assert "full_document_before_change" not in source.watches[0]
+
+    source = ReplicaSet(db.db, (6, 0, 1), OperationFailure("Unrecognized option", 9))
+    with pytest.raises(OperationFailure):
+        await realtime.ChangeStreamSource(source, realtime.Hub()).run()
+    assert source.watches[0]["full_document_before_change"] == "whenAvailable"
+
+
+async def test_auto_source_polls_when_the_first_watch_is_refused(db, monkeypatch):
+    monkeypatch.setattr(realtime, "POLL_SECONDS", 0.01)
+    hub = realtime.Hub()
+    hub.configure(ReplicaSet(db.db, (4, 4, 0), OperationFailure("BSON field is an unknown field", 40415)))
+    subscription = hub.subscribe(["inventory"], "u1")
+    try:
+        await _until(lambda: isinstance(hub.source.active, realtime.PollingSource))
+        item = await db.create_inventory_item(InventoryItemCreate(
+            user_id="u1", name="Milk", quantity=1, unit="l", expiry=datetime.utcnow() + timedelta(days=3),
+            category="Dairy"))
+        event = await subscription.next(1.0)
+        assert (event["type"], event["id"]) == ("upsert", item.id)
+        assert hub.status()["source"] == "PollingSource"
+    finally:
+        hub.unsubscribe(subscription)
+        await hub.stop()
+
+
+async def test_event_stream_starts_with_ready(db):
+    hub = realtime.Hub()
+    stream = realtime.event_stream(hub, ["inventory", "community"], "u1")
+    first = await stream.__anext__()
+    assert first.startswith(b"retry: ")
+    assert b"event: ready" in first and b"inventory:u1" in first
+    assert hub.connections == 1
+    await stream.aclose()
+    assert hub.connections == 0
@@ -0,0 +1,105 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import receipts
+from models import InventoryItemCreate
+
+pytestmark = pytest.mark.anyio
+
+NOW = datetime(2026, 1, 1)
+IMAGE = base64.b64encode(b"receipt image").decode("ascii")
+
+
+def test_parse_lines_combines_the_same_item():
+    lines = receipts.parse_lines([{"name": "Milk 1l", "quantity": 2}, {"name": "milk 500ml"},
+                                  {"name": "Eggs", "quantity": 6}])
+    by_name = {line.name: line for line in lines}
+    assert set(by_name) == {"milk", "egg"}
+    assert (by_name["milk"].quantity, by_name["milk"].unit) == (2.5, "l")  # in the first line's unit
+    assert by_name["milk"].raw_names == ["Milk 1l", "milk 500ml"]
+    assert by_name["egg"].quantity == 6
+
+
+def test_merge_operations_merges_into_matching_items_and_creates_the_rest():
+    inventory = [{"id": "m", "name": "Milk", "quantity": 1, "unit": "l"},
+                 {"id": "e", "name": "Eggs", "quantity": 2, "unit": "kg"}]
+    lines = receipts.parse_lines([{"name": "Milk 500ml"}, {"name": "Eggs", "quantity": 6}])
+    requests, summary = receipts.merge_operations("u1", lines, inventory, NOW)
+    assert len(requests) == 2
+    merged, created = summary
+    # Converted to the stored item's unit
+    assert (merged["action"], merged["item_id"], merged["quantity"], merged["unit"]) == ("merged", "m", 0.5, "l")
+    # Pieces don't convert to kg, so the eggs become a new item
+    assert (created["action"], created["name"], created["quantity"]) == ("created", "Egg", 6)
+
+
+async def test_ingest_merges_into_the_inventory_once_per_image(db, monkeypatch):
+    calls = 0
+
+    async def run_ocr(image_base64):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"success": True, "items": [{"name": "Milk 1l", "price": 1.0}, {"name": "Bread", "price": 2.0}],
+                "total": 3.0}
+
+    monkeypatch.setattr(receipts, "run_ocr", run_ocr)
+    await db.create_inventory_item(InventoryItemCreate(
+        user_id="u1", name="Milk", quantity=1, unit="l", expiry=datetime.utcnow() + timedelta(days=3),
+        category="Dairy"))
+
+    first, concurrent = await asyncio.gather(receipts.ingest_receipt(db, "u1", IMAGE),
+                                             receipts.ingest_receipt(db, "u1", IMAGE))
+    later = await receipts.ingest_receipt(db, "u1", IMAGE)
+    assert calls == 1
+    assert (first["duplicate"], concurrent["duplicate"], later["duplicate"]) == (False, True, True)
+    assert later["scan_id"] == first["scan_id"]
+    assert [entry["action"] for entry in first["merged"]] == ["merged", "created"]
+
+    inventory = {item.name: item.quantity for item in await db.get_user_inventory("u1")}
+    assert inventory == {"Milk": 2, "Bread": 1}
+
+    # Another user's copy of the same image is a separate scan
+    other = await receipts.ingest_receipt(db, "u2", IMAGE)
+    assert other["duplicate"] is False and calls == 2
+
+
+async def test_failed_scan_can_be_retried(db, monkeypatch):
+    results = iter([{"success": False}, {"success": True, "items": [{"name": "Bread"}], "total": 1.0}])
+
+    async def run_ocr(image_base64):
+        return next(results)
+
+    monkeypatch.setattr(receipts, "run_ocr", run_ocr)
+    with pytest.raises(receipts.ReceiptScanError):
+        await receipts.ingest_receipt(db, "u1", IMAGE)
+    retried = await receipts.ingest_receipt(db, "u1", IMAGE)
+    assert retried["duplicate"] is False
+
+
+async def test_claims_are_unique_per_user_and_image(db, monkeypatch):
+    created = []
+
+    async def create_index(keys, **kwargs):
+        created.append((keys, kwargs))
+
+    monkeypatch.setattr(db.receipt_scans, "create_index", create_index)
+    await db.ensure_indexes()
+    assert ([("user_id", 1), ("image_hash", 1)], {"unique": True}) in created
+
+
+async def test_claim_lost_to_a_concurrent_upsert_returns_the_stored_scan(db, monkeypatch):
+    first_id, _ = await db.claim_receipt_scan("u1", "hash")
+
+    async def racing_update_one(query, update, upsert=False, **kwargs):
+        # What the unique index answers when another worker's upsert won
+        raise DuplicateKeyError("E11000 duplicate key error")
+
+    monkeypatch.setattr(db.receipt_scans, "update_one", racing_update_one)
+    scan_id, stored = await db.claim_receipt_scan("u1", "hash")
+    assert scan_id == first_id
+    assert stored["status"] == "processing"
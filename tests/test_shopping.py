@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import shopping
+from models import InventoryItemCreate, ShoppingItem
+
+pytestmark = pytest.mark.anyio
+
+
+def _entry(id, name, needed, unit, purchased=False):
+    return {"id": id, "name": name, "category": "Other", "needed": needed, "unit": unit, "purchased": purchased}
+
+
+def _item(name, needed, unit):
+    return ShoppingItem(name=name, category="Other", needed=needed, unit=unit)
+
+
+def test_compute_items_nets_recipes_against_inventory():
+    recipes = [{"ingredients": ["2 eggs", "200 g rice"]}, {"ingredients": ["1 egg", "300 g rice", "1 l milk"]}]
+    inventory = [{"name": "Eggs", "quantity": 1, "unit": "pieces"}, {"name": "rice", "quantity": 1, "unit": "kg"}]
+    items = {item.name: (item.needed, item.unit) for item in shopping.compute_items(recipes, inventory)}
+    assert items == {"Egg": (2, "pieces"), "Milk": (1, "l")}
+
+
+def test_diff_items_updates_adds_and_removes():
+    existing = [_entry("a", "egg", 2, "pieces"), _entry("b", "Milk", 500, "ml"), _entry("c", "rice", 1, "kg")]
+    diff = shopping.diff_items(existing, [_item("Eggs", 4, "pieces"), _item("Milk", 500, "ml"),
+                                          _item("Flour", 1, "kg")])
+    assert diff.updates == {"a": {"needed": 4, "unit": "pieces"}}
+    assert [item.name for item in diff.additions] == ["Flour"]
+    assert diff.removals == ["c"]
+
+
+def test_diff_items_keeps_unmanaged_and_purchased_entries():
+    existing = [_entry("a", "egg", 2, "pieces"), _entry("b", "egg", 1, "pieces"),
+                _entry("hand", "candles", 1, "pieces"), _entry("bought", "milk", 1, "l", purchased=True)]
+    diff = shopping.diff_items(existing, [_item("Egg", 2, "pieces")], managed=[("egg", "count")])
+    assert diff.updates == {}
+    assert diff.additions == []
+    # The duplicate collapses into the first entry; the hand-added item survives
+    assert diff.removals == ["b"]
+
+
+async def test_generate_and_sync_list(db):
+    await db.recipes.insert_many([
+        {"id": "r1", "title": "Omelette", "ingredients": ["3 eggs", "100 ml milk"]},
+        {"id": "r2", "title": "Rice", "ingredients": ["200 g rice"]},
+    ])
+    generated = await shopping.generate_list(db, "u1", recipe_ids=["r1", "r2", "r1"])
+    items = {item.name: (item.needed, item.unit) for item in generated.items}
+    assert items == {"Egg": (6, "pieces"), "Milk": (200, "ml"), "Rice": (200, "g")}
+
+    await db.create_inventory_item(InventoryItemCreate(
+        user_id="u1", name="Eggs", quantity=4, unit="pieces", expiry=datetime.utcnow() + timedelta(days=7),
+        category="Dairy"))
+    stored, diff = await shopping.sync_list(db, generated.id)
+    assert len(diff.updates) == 1 and not diff.additions and not diff.removals
+    synced = {item["name"]: item["needed"] for item in stored["items"]}
+    assert synced == {"Egg": 2, "Milk": 200, "Rice": 200}
+
+    _, again = await shopping.sync_list(db, generated.id)
+    assert again.empty
+
+
+async def test_sync_requires_a_generated_list(db):
+    await db.shopping_lists.insert_one({"id": "manual", "user_id": "u1", "items": []})
+    with pytest.raises(shopping.ShoppingListError):
+        await shopping.sync_list(db, "manual")
+    assert await shopping.sync_list(db, "missing") == (None, shopping.ListDiff({}, [], []))
+
+
+async def test_add_item_merges_on_the_canonical_key(db):
+    await db.shopping_lists.insert_one({"id": "l1", "user_id": "u1", "items": [
+        _entry("e", "egg", 2, "pieces"), _entry("m", "milk", 500, "ml")]})
+    merged = await shopping.add_item(db, "l1", _item("Eggs", 3, "pieces"))
+    assert (merged.id, merged.needed) == ("e", 5)
+    litres = await shopping.add_item(db, "l1", _item("Milk", 1, "l"))
+    assert (litres.id, litres.needed, litres.unit) == ("m", 1500, "ml")
+    # Another dimension is another entry
+    pieces = await shopping.add_item(db, "l1", _item("Milk", 2, "pieces"))
+    assert pieces.id not in ("e", "m")
+    assert len((await db.get_shopping_list("l1"))["items"]) == 3
+    assert await shopping.add_item(db, "missing", _item("Eggs", 1, "pieces")) is None
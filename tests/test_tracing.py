@@ -0,0 +1,87 @@
+import pytest
+
+import tracing
+from tracing import spawn, tracer
+from write_behind import WriteBehindBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class ListExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span.to_dict())
+
+    def shutdown(self):
+        pass
+
+    def named(self, name):
+        return [span for span in self.spans if span["name"] == name]
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    exporter = ListExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    return exporter
+
+
+def test_parse_traceparent():
+    header = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+    assert tracing.parse_traceparent(header) == {"trace_id": "a" * 32, "parent_span_id": "b" * 16}
+    assert tracing.parse_traceparent("garbage") is None
+
+
+async def test_request_joins_the_incoming_trace(client, exported):
+    trace_id, parent = "1" * 32, "2" * 16
+    response = await client.post("/api/users/profile", json={"name": "Test"},
+                                 headers={"traceparent": f"00-{trace_id}-{parent}-01"})
+    assert response.headers["traceparent"].split("-")[1] == trace_id
+    (server,) = exported.named("POST /api/users/profile")
+    assert (server["trace_id"], server["parent_span_id"]) == (trace_id, parent)
+    (query,) = exported.named("db.create_user_profile")
+    assert (query["trace_id"], query["parent_span_id"]) == (trace_id, server["span_id"])
+
+
+async def test_spawned_tasks_join_the_current_trace(exported):
+    async def work():
+        return tracer.current_span()
+
+    with tracer.start_span("request") as request:
+        task = spawn(work(), "job")
+    span = await task
+    assert (span.trace_id, span.parent_span_id) == (request.trace_id, request.span_id)
+
+
+async def test_detached_tasks_start_their_own_trace(exported):
+    async def loop():
+        return tracer.current_span()
+
+    with tracer.start_span("request") as request:
+        task = spawn(loop(), "loop", detached=True)
+    span = await task
+    assert span.name == "background.loop"
+    assert span.parent_span_id is None and span.trace_id != request.trace_id
+
+
+async def test_write_behind_flush_links_the_requests_that_queued(exported, mongo):
+    buffer = WriteBehindBuffer(flush_interval=0.01, mode="buffered", sync_collections=set())
+    collection = mongo["tests"].chat_messages
+    requests = []
+    for i in range(2):
+        with tracer.start_span("request") as request:
+            # Two documents from one request still make one link
+            await buffer.insert(collection, {"id": f"{i}a"})
+            await buffer.insert(collection, {"id": f"{i}b"})
+        requests.append(request)
+    await buffer.close()
+
+    flushes = exported.named("write_behind.flush")
+    assert sum(span["attributes"]["count"] for span in flushes) == 4
+    (loop,) = exported.named("background.write_behind.flusher")
+    assert loop["parent_span_id"] is None
+    assert not {span["trace_id"] for span in flushes} & {request.trace_id for request in requests}
+    links = [link["span_id"] for span in flushes for link in span.get("links", [])]
+    assert sorted(links) == sorted(request.span_id for request in requests)
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+import warmup
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    fresh = warmup.Readiness()
+    monkeypatch.setattr(warmup, "readiness", fresh)
+    monkeypatch.setattr(warmup, "MAX_RETRY_DELAY", 0.01)
+    return fresh
+
+
+def _flaky(failures: int):
+    calls = []
+
+    async def warm():
+        calls.append(None)
+        if len(calls) <= failures:
+            raise ConnectionError("mongo is not up yet")
+
+    return warm, calls
+
+
+async def test_warm_up_is_retried_until_it_succeeds(readiness):
+    warm, calls = _flaky(2)
+    await readiness.start(warm, timeout=5)
+    assert readiness.ready
+    assert len(calls) == 3
+    assert readiness.status()["status"] == "ready"
+    assert readiness.status()["error"] is None
+
+
+async def test_startup_stops_waiting_but_warm_up_continues(readiness):
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(0.05)
+
+    await readiness.start(slow, timeout=0.001)
+    assert started.is_set() and not readiness.ready
+    for _ in range(100):
+        if readiness.ready:
+            break
+        await asyncio.sleep(0.01)
+    assert readiness.ready
+
+
+async def test_stopping_abandons_warm_up(readiness):
+    warm, calls = _flaky(10 ** 6)
+    await readiness.start(warm, timeout=0.001)
+    await readiness.stop()
+    assert readiness.status()["status"] == "stopping"
+    assert "mongo is not up yet" in readiness.status()["error"]
+    attempts = len(calls)
+    await asyncio.sleep(0.03)
+    assert len(calls) == attempts
+
+
+async def test_probes_follow_readiness(client, readiness):
+    assert (await client.get("/api/health/live")).status_code == 200
+    assert (await client.get("/api/health/ready")).status_code == 503
+
+    await readiness.start(_flaky(0)[0])
+    response = await client.get("/api/health/ready")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+    await readiness.stop()
+    assert (await client.get("/api/health/ready")).status_code == 503
+    assert (await client.get("/api/health/live")).status_code == 200
+
+
+async def test_warm_pool_opens_connections():
+    pings = []
+
+    class Admin:
+        async def command(self, name):
+            pings.append(name)
+            return {"ok": 1.0}
+
+    class Client:
+        admin = Admin()
+
+    await warmup.warm_pool(Client(), connections=4)
+    assert pings == ["ping"] * 5
+
+
+def test_preload_runs_once(monkeypatch):
+    monkeypatch.setattr(warmup, "_preloaded", None)
+    first = warmup.preload()
+    assert warmup.preload() is first
+    assert first["pid"] > 0
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import write_behind
+from write_behind import WriteBehindBuffer
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeCollection:
+    """Records each insert_many; ``failures`` are raised by the next calls, in order"""
+
+    def __init__(self, name="chat_messages"):
+        self.name = name
+        self.full_name = f"tests.{name}"
+        self.batches = []
+        self.failures = []
+
+    async def insert_one(self, document):
+        self.batches.append([document])
+
+    async def insert_many(self, documents, ordered=True):
+        assert not ordered
+        self.batches.append(list(documents))
+        if self.failures:
+            raise self.failures.pop(0)
+
+    @property
+    def documents(self):
+        return [document for batch in self.batches for document in batch]
+
+
+def _bulk_error(*codes):
+    return BulkWriteError({"writeErrors": [{"index": index, "code": code} for index, code in enumerate(codes)]})
+
+
+async def test_full_batches_are_written_together():
+    buffer, collection = WriteBehindBuffer(max_batch=3, flush_interval=60), FakeCollection()
+    try:
+        for i in range(3):
+            await buffer.insert(collection, {"i": i})
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # The full batch went out without waiting for the interval
+        assert collection.batches == [[{"i": 0}, {"i": 1}, {"i": 2}]]
+        for i in range(3, 7):
+            await buffer.insert(collection, {"i": i})
+    finally:
+        await buffer.close()
+    assert [len(batch) for batch in collection.batches] == [3, 3, 1]
+    assert buffer.status()["pending"] == 0
+    assert buffer.status()["written"] == 7
+
+
+async def test_interval_flushes_partial_batches():
+    buffer, collection = WriteBehindBuffer(max_batch=100, flush_interval=0.01), FakeCollection()
+    await buffer.insert(collection, {"i": 0})
+    for _ in range(50):
+        if collection.batches:
+            break
+        await asyncio.sleep(0.01)
+    assert collection.batches == [[{"i": 0}]]
+    await buffer.close()
+
+
+async def test_inserts_wait_when_the_queue_is_full():
+    buffer, collection = WriteBehindBuffer(max_batch=100, flush_interval=60, max_pending=2), FakeCollection()
+    for i in range(5):
+        await buffer.insert(collection, {"i": i})
+        assert buffer.status()["pending"] <= 2
+    assert buffer.status()["waited"] > 0
+    await buffer.close()
+    assert [document["i"] for document in collection.documents] == list(range(5))
+
+
+async def test_failed_documents_are_retried_but_duplicates_are_not(monkeypatch):
+    monkeypatch.setattr(write_behind, "RETRIES", 1)
+    buffer, collection = WriteBehindBuffer(max_batch=100, flush_interval=60), FakeCollection()
+    # The first document was written before the error, the second was not
+    collection.failures.append(_bulk_error(write_behind.DUPLICATE_KEY, 6))
+    await buffer.insert(collection, {"i": 0})
+    await buffer.insert(collection, {"i": 1})
+    await buffer.close()
+    assert collection.batches == [[{"i": 0}, {"i": 1}], [{"i": 1}]]
+    assert buffer.status()["written"] == 2
+    assert buffer.status()["dropped"] == 0
+
+
+async def test_batches_are_dropped_after_the_last_retry(monkeypatch):
+    monkeypatch.setattr(write_behind, "RETRIES", 1)
+    buffer, collection = WriteBehindBuffer(max_batch=100, flush_interval=60), FakeCollection()
+    collection.failures.extend([ConnectionError("down"), ConnectionError("still down")])
+    await buffer.insert(collection, {"i": 0})
+    await buffer.close()
+    assert len(collection.batches) == 2
+    assert buffer.status()["dropped"] == 1
+    assert buffer.status()["pending"] == 0
+
+
+async def test_sync_collections_bypass_the_buffer():
+    buffer = WriteBehindBuffer(flush_interval=60, sync_collections={"status_checks"})
+    status, chat = FakeCollection("status_checks"), FakeCollection("chat_messages")
+    await buffer.insert(status, {"i": 0})
+    await buffer.insert(chat, {"i": 0})
+    assert status.batches == [[{"i": 0}]]
+    assert chat.batches == []
+    await buffer.close()
+    assert chat.batches == [[{"i": 0}]]
+
+    sync = WriteBehindBuffer(mode="sync")
+    await sync.insert(chat, {"i": 1})
+    assert chat.batches[-1] == [{"i": 1}]
+    assert sync.status()["queued"] == 0